@@ -0,0 +1,888 @@
+"""
+Report aggregates on the server.
+
+Port of computeAggregations (frontend/src/utils/analyticsClient.ts) and the
+Love Score (frontend/src/features/insights/loveScore.ts). Given the enriched
+film list, compute_aggregations() returns the same `Computed` structure the
+browser builds: stats, genre/theme/country/director/actor/language rankings,
+decades, years, hidden gems, overrated films, watch time and badges.
+
+Entities are dictionary-encoded once per kind: every (film, entity) pair
+becomes an integer code, in first-appearance order so ties sort like the
+frontend's insertion-ordered Maps. Per-entity counts, rating sums and 4.5+
+tallies are then np.bincount calls over those codes, and Love Scores are
+computed for all entities of a kind as one array expression. bincount adds
+weights in input order, like the frontend's loops, so sums match exactly.
+
+Numbers are rounded like JS `Number(x.toFixed(n))` (half away from zero on
+the exact binary value), so rankings and ties agree with the browser.
+Reference tables (global frequencies, Russian names for badges) come from
+data/analytics/reference.json, exported by scripts/build_analytics_reference.py.
+
+The entity sections are computed from an AggregateState (film totals plus
+per-entity counts, rating sums and 4.5+ tallies). The state serializes to a
+compact JSON form and accepts added or removed films, so apply_delta() updates
+a previous run in time proportional to the delta instead of the whole history.
+States also merge: build_year_slices() splits a film list by watch year in one
+pass, and the year filter becomes a merge of the selected slices.
+
+The work is CPU-bound; compute_aggregations_async() runs it in a process pool
+of ANALYTICS_WORKERS processes (0 = a worker thread) so the event loop stays free.
+The pool spawns its workers: forking the API process, which already runs the
+cache writer and to_thread pools, could copy a lock some thread holds and
+deadlock the child. The async entry points check film field types first
+(validate_films), so malformed input is an AnalyticsInputError, not a failure
+inside a worker.
+"""
+import asyncio
+import functools
+import json
+import logging
+import math
+import multiprocessing
+import numbers
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from decimal import ROUND_HALF_UP, Decimal
+from pathlib import Path
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+ANALYTICS_WORKERS = int(os.getenv("ANALYTICS_WORKERS", "2"))
+REFERENCE_PATH = Path(__file__).resolve().parent.parent / "data" / "analytics" / "reference.json"
+
+TOP_LIST_MAX = 10
+TOP_RATED_MAX = 12
+MAX_BADGES = 12
+HIGH_RATING = 4.5
+DEFAULT_MAX_RATING_SPREAD = 2.0
+UNKNOWN_TITLE = "Неизвестно"
+
+
+class EntityConfig(NamedTuple):
+    max_per_movie: int
+    k: int
+    min_count: int
+    max_rating_spread: float = DEFAULT_MAX_RATING_SPREAD
+
+
+ENTITY_CONFIGS: Dict[str, EntityConfig] = {
+    "genres": EntityConfig(max_per_movie=3, k=5, min_count=5),
+    "themes": EntityConfig(max_per_movie=20, k=8, min_count=8),
+    "countries": EntityConfig(max_per_movie=2, k=5, min_count=5),
+    "directors": EntityConfig(max_per_movie=20, k=3, min_count=3),
+    "actors": EntityConfig(max_per_movie=50, k=3, min_count=3),
+    "decades": EntityConfig(max_per_movie=1, k=5, min_count=12),
+    "years": EntityConfig(max_per_movie=1, k=5, min_count=3),
+}
+
+
+@functools.lru_cache(maxsize=1)
+def reference() -> Dict[str, Dict[str, Any]]:
+    """Reference tables, plus decade frequencies summed from the year table."""
+    with open(REFERENCE_PATH, "r", encoding="utf-8") as f:
+        tables = json.load(f)
+    decades: Dict[str, float] = {}
+    # Same order as createDecadeGlobalFrequencyMap (JS iterates integer keys ascending).
+    for year in sorted(tables["year_global_frequency"], key=int):
+        decade = str(int(year) // 10 * 10)
+        decades[decade] = decades.get(decade, 0) + tables["year_global_frequency"][year]
+    tables["decade_global_frequency"] = decades
+    return tables
+
+
+def to_fixed(value: float, digits: int) -> float:
+    """JS Number(value.toFixed(digits))."""
+    quantum = Decimal(1).scaleb(-digits)
+    # `+ 0.0` turns -0.0 into 0.0, as Number("-0.00") serializes to 0.
+    return float(Decimal(value).quantize(quantum, rounding=ROUND_HALF_UP)) + 0.0
+
+
+def js_round(value: float) -> int:
+    """JS Math.round (halves round up)."""
+    return int(math.floor(value + 0.5))
+
+
+def sequential_sum(values: Sequence[float]) -> float:
+    """Left-to-right float sum, like Array.reduce (np.sum uses pairwise summation)."""
+    if not len(values):
+        return 0.0
+    return float(np.cumsum(np.asarray(values, dtype=np.float64))[-1])
+
+
+def genre_name_ru(name: str) -> str:
+    return reference()["genre_names_ru"].get(name.strip(), name) if name else ""
+
+
+def country_name_ru(name: str) -> str:
+    return reference()["country_names_ru"].get(name.strip(), name) if name else ""
+
+
+def format_love_score(value: float) -> str:
+    return f"{to_fixed(value, 1):.1f}".replace(".", ",")
+
+
+def format_films_count(count: int) -> str:
+    """formatFilmsCount from utils/format.ts (ru-RU grouping with a no-break space)."""
+    number = f"{count:,}".replace(",", "\u00a0")
+    last_digit = count % 10
+    last_two = count % 100
+    if 11 <= last_two <= 14:
+        return f"{number} фильмов"
+    if last_digit == 1:
+        return f"{number} фильм"
+    if 2 <= last_digit <= 4:
+        return f"{number} фильма"
+    return f"{number} фильмов"
+
+
+class EntityTable(NamedTuple):
+    """Dictionary-encoded (film, entity) pairs of one kind."""
+
+    names: List[str]
+    film_index: np.ndarray
+    codes: np.ndarray
+
+
+def encode_entities(values_per_film: Sequence[Optional[Sequence[str]]], max_per_movie: int) -> EntityTable:
+    codes_by_name: Dict[str, int] = {}
+    film_index: List[int] = []
+    codes: List[int] = []
+    for i, values in enumerate(values_per_film):
+        for name in (values or [])[:max_per_movie]:
+            code = codes_by_name.setdefault(name, len(codes_by_name))
+            film_index.append(i)
+            codes.append(code)
+    return EntityTable(
+        names=list(codes_by_name),
+        film_index=np.asarray(film_index, dtype=np.int64),
+        codes=np.asarray(codes, dtype=np.int64),
+    )
+
+
+class EntityStats(NamedTuple):
+    """Per-entity aggregates, indexed by entity code."""
+
+    names: List[str]
+    count: np.ndarray
+    total: np.ndarray
+    high: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+
+def entity_stats(table: EntityTable, ratings: np.ndarray) -> EntityStats:
+    size = len(table.names)
+    film_ratings = ratings[table.film_index]
+    return EntityStats(
+        names=table.names,
+        count=np.bincount(table.codes, minlength=size),
+        total=np.bincount(table.codes, weights=film_ratings, minlength=size),
+        high=np.bincount(table.codes, weights=film_ratings >= HIGH_RATING, minlength=size).astype(np.int64),
+    )
+
+
+def _avg(stats: EntityStats) -> np.ndarray:
+    return np.divide(stats.total, stats.count, out=np.zeros(len(stats)), where=stats.count > 0)
+
+
+def _max_count(stats: EntityStats) -> int:
+    return int(stats.count.max()) if len(stats) else 0
+
+
+def ranked_by_count(stats: EntityStats, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """buildRankedByCount: count desc, then rounded average desc (first `limit` entries if given)."""
+    avg = _avg(stats)
+    candidates: Sequence[int] = range(len(stats))
+    if limit is not None and len(stats) > limit:
+        # Only entities at least as frequent as the limit-th one can make the cut.
+        cutoff = np.partition(stats.count, -limit)[-limit]
+        candidates = np.flatnonzero(stats.count >= cutoff).tolist()
+    ranked = []
+    for code in candidates:
+        count = int(stats.count[code])
+        high = int(stats.high[code])
+        ranked.append({
+            "name": stats.names[code],
+            "count": count,
+            "avg_rating": to_fixed(avg[code], 2),
+            "high_45": high,
+            "share_45": to_fixed(high / count, 2) if count else 0,
+        })
+    ranked.sort(key=lambda e: (-e["count"], -e["avg_rating"]))
+    return ranked[:limit]
+
+
+def love_scores(
+    stats: EntityStats,
+    rating_lift: np.ndarray,
+    max_n: int,
+    config: EntityConfig,
+    global_frequency: Optional[Dict[str, float]] = None,
+    total_films: int = 0,
+) -> np.ndarray:
+    """calculateLoveScore for every entity at once (0..100, not yet rounded)."""
+    n = stats.count.astype(np.float64)
+    rating_norm = np.clip(rating_lift / config.max_rating_spread, -1.0, 1.0)
+    rating_component = (rating_norm + 1) / 2
+    absolute = np.log(1 + n) / math.log(1 + max(1, max_n))
+    relative = absolute.copy()
+    use_global = global_frequency is not None
+    if use_global and total_films:
+        freq = np.array([global_frequency.get(name) or 0.0 for name in stats.names], dtype=np.float64)
+        known = freq > 0
+        ratio = (n[known] / total_films) * 100 / freq[known]
+        relative[known] = np.log(1 + np.clip(ratio, 0.5, 2.0)) / math.log(3)
+    weight = 0.6 if use_global else 1.0
+    frequency_component = weight * relative + (1 - weight) * absolute
+    confidence = n / (n + config.k)
+    score = confidence * (0.65 * rating_component + 0.35 * frequency_component)
+    return np.clip(score, 0.0, 1.0) * 100
+
+
+def ranked_by_love_score(
+    stats: EntityStats,
+    baseline: float,
+    config: EntityConfig,
+    global_frequency: Optional[Dict[str, float]] = None,
+    total_films: int = 0,
+) -> List[Dict[str, Any]]:
+    """buildRankedByLoveScore: entities with count >= min_count, Love Score desc, then count desc."""
+    if not len(stats):
+        return []
+    avg = _avg(stats)
+    eligible = np.flatnonzero(stats.count >= config.min_count)
+    lift = np.zeros(len(stats))
+    lift[eligible] = [to_fixed(v, 2) for v in avg[eligible] - baseline]
+    scores = love_scores(stats, lift, _max_count(stats), config, global_frequency, total_films)
+    ranked = []
+    for code in eligible.tolist():
+        name = stats.names[code]
+        count = int(stats.count[code])
+        high = int(stats.high[code])
+        ranked.append({
+            "name": name,
+            "count": count,
+            "avg_rating": to_fixed(avg[code], 2),
+            "high_45": high,
+            "share_45": to_fixed(high / count, 2) if count else 0,
+            "loveScore": to_fixed(scores[code], 2),
+            "ratingLift": float(lift[code]),
+        })
+    ranked.sort(key=lambda e: (-e["loveScore"], -e["count"]))
+    return ranked
+
+
+def _year_of(film: Dict[str, Any]) -> List[str]:
+    return [str(film["year"])] if film.get("year") else []
+
+
+def _decade_of(film: Dict[str, Any]) -> List[str]:
+    return [str(film["year"] // 10 * 10)] if film.get("year") else []
+
+
+def hidden_gems(films: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """computeHiddenGems: rated >= 3.5, 200+ TMDb votes, at least 1.5 stars above TMDb."""
+    gems = []
+    for f in films:
+        user = f.get("rating") or 0
+        votes = f.get("tmdb_vote_count") or 0
+        tmdb_stars = f.get("tmdb_stars")
+        if user < 3.5 or votes < 200 or tmdb_stars is None or user - tmdb_stars < 1.5:
+            continue
+        gems.append(_diff_entry(f, to_fixed(user - tmdb_stars, 1)))
+    gems.sort(key=lambda g: (-g["diff"], -(g["rating"] or 0)))
+    return gems
+
+
+def overrated(films: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """computeOverrated: TMDb >= 3.5 stars with 200+ votes, rated at least 1.5 stars lower."""
+    result = []
+    for f in films:
+        user = f.get("rating") or 0
+        votes = f.get("tmdb_vote_count") or 0
+        tmdb_stars = f.get("tmdb_stars")
+        if tmdb_stars is None or tmdb_stars < 3.5 or votes < 200 or tmdb_stars - user < 1.5:
+            continue
+        result.append(_diff_entry(f, to_fixed(tmdb_stars - user, 1)))
+    result.sort(key=lambda g: (-g["diff"], -(g["tmdb_stars"] or 0)))
+    return result
+
+
+def _diff_entry(film: Dict[str, Any], diff: float) -> Dict[str, Any]:
+    return {
+        "title": film.get("title"),
+        "year": film.get("year"),
+        "rating": film.get("rating"),
+        "tmdb_stars": film.get("tmdb_stars"),
+        "diff": diff,
+        "poster_url": film.get("poster_url"),
+        "poster_url_w342": film.get("poster_url_w342"),
+        "tmdb_id": film.get("tmdb_id"),
+    }
+
+
+class AnalyticsStateError(ValueError):
+    """A serialized aggregate state or a delta that cannot be applied."""
+
+
+class AnalyticsInputError(ValueError):
+    """A film entry whose fields have the wrong types."""
+
+
+STATE_VERSION = 1
+
+# Entity kinds kept in the aggregate state and the film values behind each.
+_ENTITY_SOURCES: Dict[str, Callable[[Dict[str, Any]], Optional[Sequence[str]]]] = {
+    "genres": lambda f: f.get("genres"),
+    "themes": lambda f: f.get("keywords"),
+    "countries": lambda f: f.get("countries"),
+    "directors": lambda f: f.get("directors"),
+    "actors": lambda f: f.get("actors"),
+    "languages": lambda f: [f["original_language"]] if f.get("original_language") else [],
+    "decades": _decade_of,
+    "years": _year_of,
+}
+_MAX_PER_MOVIE = {kind: config.max_per_movie for kind, config in ENTITY_CONFIGS.items()}
+_MAX_PER_MOVIE["languages"] = 1
+
+
+def _accumulate(total: float, values: Sequence[float], sign: int) -> float:
+    """`total` plus (or minus) `values` one by one, in order, like a running JS sum."""
+    if not len(values):
+        return total
+    return float(np.cumsum(np.concatenate(([total], sign * np.asarray(values, dtype=np.float64))))[-1])
+
+
+class EntityAccumulator:
+    """Running counts, rating sums and 4.5+ tallies of one entity kind."""
+
+    def __init__(
+        self,
+        names: Optional[List[str]] = None,
+        count: Optional[np.ndarray] = None,
+        total: Optional[np.ndarray] = None,
+        high: Optional[np.ndarray] = None,
+    ) -> None:
+        self.names: List[str] = list(names or [])
+        self.codes: Dict[str, int] = {name: code for code, name in enumerate(self.names)}
+        size = len(self.names)
+        self.count = np.zeros(size, dtype=np.int64) if count is None else np.asarray(count, dtype=np.int64)
+        self.total = np.zeros(size, dtype=np.float64) if total is None else np.asarray(total, dtype=np.float64)
+        self.high = np.zeros(size, dtype=np.int64) if high is None else np.asarray(high, dtype=np.int64)
+
+    def add(self, table: EntityTable, ratings: np.ndarray, sign: int = 1) -> None:
+        """Add (sign=1) or subtract (sign=-1) the films of an encoded batch."""
+        if not len(table.codes):
+            return
+        remap = np.array([self.codes.setdefault(name, len(self.codes)) for name in table.names], dtype=np.int64)
+        self._grow(table.names, remap)
+        codes = remap[table.codes]
+        film_ratings = ratings[table.film_index]
+        # np.add.at applies repeated codes one by one, in order, like entity_stats' bincount.
+        np.add.at(self.count, codes, sign)
+        np.add.at(self.total, codes, sign * film_ratings)
+        np.add.at(self.high, codes, sign * (film_ratings >= HIGH_RATING).astype(np.int64))
+
+    def merge(self, other: "EntityAccumulator") -> None:
+        """Add another accumulator's totals (entities new to this one are appended in its order)."""
+        present = np.flatnonzero(other.count > 0)
+        if not len(present):
+            return
+        table_names = [other.names[i] for i in present]
+        remap = np.array([self.codes.setdefault(name, len(self.codes)) for name in table_names], dtype=np.int64)
+        self._grow(table_names, remap)
+        self.count[remap] += other.count[present]
+        self.total[remap] += other.total[present]
+        self.high[remap] += other.high[present]
+
+    def _grow(self, table_names: List[str], remap: np.ndarray) -> None:
+        grow = len(self.codes) - len(self.names)
+        if not grow:
+            return
+        self.names.extend(table_names[i] for i in np.flatnonzero(remap >= len(self.names)))
+        self.count = np.concatenate((self.count, np.zeros(grow, dtype=np.int64)))
+        self.total = np.concatenate((self.total, np.zeros(grow, dtype=np.float64)))
+        self.high = np.concatenate((self.high, np.zeros(grow, dtype=np.int64)))
+
+    def stats(self) -> EntityStats:
+        """Entities still present (count > 0), in first-appearance order."""
+        present = np.flatnonzero(self.count > 0)
+        return EntityStats(
+            names=[self.names[i] for i in present],
+            count=self.count[present],
+            total=self.total[present],
+            high=self.high[present],
+        )
+
+
+class AggregateState:
+    """
+    Everything the entity sections of the report are computed from: film
+    totals plus an EntityAccumulator per kind. Films can be added and removed,
+    so a re-run with a few new or deleted rows costs time proportional to the
+    delta, not to the whole history.
+    """
+
+    def __init__(self) -> None:
+        self.films = 0
+        self.rated = 0
+        self.rating_total = 0.0
+        self.count45 = 0
+        self.runtime_count = 0
+        self.runtime_total = 0.0
+        self.entities: Dict[str, EntityAccumulator] = {kind: EntityAccumulator() for kind in _ENTITY_SOURCES}
+
+    def add(self, films: List[Dict[str, Any]], sign: int = 1) -> None:
+        """Add films, or remove them again with sign=-1 (pass the same film entries)."""
+        if not films:
+            return
+        known = [f["rating"] for f in films if f.get("rating") is not None]
+        runtimes = [f["runtime"] for f in films if f.get("runtime")]
+        self.films += sign * len(films)
+        self.rated += sign * len(known)
+        self.rating_total = _accumulate(self.rating_total, known, sign)
+        self.count45 += sign * sum(1 for r in known if r >= HIGH_RATING)
+        self.runtime_count += sign * len(runtimes)
+        self.runtime_total = _accumulate(self.runtime_total, runtimes, sign)
+        ratings = np.array([f.get("rating") or 0 for f in films], dtype=np.float64)
+        for kind, source in _ENTITY_SOURCES.items():
+            table = encode_entities([source(f) for f in films], _MAX_PER_MOVIE[kind])
+            self.entities[kind].add(table, ratings, sign)
+        if sign < 0 and (
+            self.films < 0 or self.rated < 0 or any((acc.count < 0).any() for acc in self.entities.values())
+        ):
+            raise AnalyticsStateError("Removed films are not part of the aggregate state")
+
+    def merge(self, other: "AggregateState") -> None:
+        """Add the films of another (disjoint) state, e.g. a year slice."""
+        self.films += other.films
+        self.rated += other.rated
+        self.rating_total += other.rating_total
+        self.count45 += other.count45
+        self.runtime_count += other.runtime_count
+        self.runtime_total += other.runtime_total
+        for kind, acc in self.entities.items():
+            acc.merge(other.entities[kind])
+
+    def stats(self) -> Dict[str, Any]:
+        years = [int(name) for name in self.entities["years"].stats().names]
+        return {
+            "totalFilms": self.films,
+            "avgRating": to_fixed(self.rating_total / self.rated, 2) if self.rated else 0,
+            "count45": self.count45,
+            "oldestYear": min(years) if years else None,
+            "newestYear": max(years) if years else None,
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Compact JSON form: parallel arrays per kind, entities that dropped to zero left out."""
+        entities = {}
+        for kind, acc in self.entities.items():
+            stats = acc.stats()
+            entities[kind] = {
+                "names": stats.names,
+                "count": stats.count.tolist(),
+                "total": stats.total.tolist(),
+                "high": stats.high.tolist(),
+            }
+        return {
+            "version": STATE_VERSION,
+            "films": self.films,
+            "rated": self.rated,
+            "rating_total": self.rating_total,
+            "count45": self.count45,
+            "runtime_count": self.runtime_count,
+            "runtime_total": self.runtime_total,
+            "entities": entities,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "AggregateState":
+        if not isinstance(data, dict) or data.get("version") != STATE_VERSION:
+            raise AnalyticsStateError("Unsupported aggregate state version")
+        state = cls()
+        try:
+            state.films = int(data["films"])
+            state.rated = int(data["rated"])
+            state.rating_total = float(data["rating_total"])
+            state.count45 = int(data["count45"])
+            state.runtime_count = int(data["runtime_count"])
+            state.runtime_total = float(data["runtime_total"])
+            for kind, columns in data["entities"].items():
+                if kind not in state.entities:
+                    raise AnalyticsStateError(f"Unknown entity kind: {kind}")
+                names = [str(name) for name in columns["names"]]
+                if not all(len(columns[key]) == len(names) for key in ("count", "total", "high")):
+                    raise AnalyticsStateError(f"Column lengths differ for {kind}")
+                if len(set(names)) != len(names):
+                    raise AnalyticsStateError(f"Duplicate names for {kind}")
+                state.entities[kind] = EntityAccumulator(names, columns["count"], columns["total"], columns["high"])
+        except (KeyError, TypeError, ValueError) as exc:
+            if isinstance(exc, AnalyticsStateError):
+                raise
+            raise AnalyticsStateError(f"Malformed aggregate state: {exc}") from exc
+        return state
+
+
+def build_state(films: List[Dict[str, Any]]) -> AggregateState:
+    state = AggregateState()
+    state.add(films or [])
+    return state
+
+
+def aggregate_sections(state: AggregateState) -> Dict[str, Any]:
+    """The parts of `Computed` that depend only on the aggregate state (no per-film lists or badges)."""
+    tables = reference()
+    stats = state.stats()
+    baseline = stats["avgRating"]
+    total_films = state.films
+    kinds = {kind: acc.stats() for kind, acc in state.entities.items()}
+
+    total_runtime: Any = state.runtime_total
+    if total_runtime.is_integer():
+        total_runtime = int(total_runtime)
+    watch_time = {
+        "totalRuntimeMinutes": total_runtime,
+        "totalRuntimeHours": js_round(total_runtime / 60) if total_runtime else 0,
+        "totalRuntimeDays": to_fixed(total_runtime / 60 / 24, 1) if total_runtime else 0,
+        "avgRuntimeMinutes": to_fixed(total_runtime / state.runtime_count, 2) if state.runtime_count else 0,
+    }
+
+    top_genres_by_avg_min8 = ranked_by_love_score(
+        kinds["genres"], baseline, ENTITY_CONFIGS["genres"], tables["genre_global_frequency"], total_films
+    )
+    decades_by_love = ranked_by_love_score(
+        kinds["decades"], baseline, ENTITY_CONFIGS["decades"], tables["decade_global_frequency"], total_films
+    )
+    return {
+        "stats": stats,
+        "topGenres": ranked_by_count(kinds["genres"], TOP_LIST_MAX),
+        "topGenresByAvg": ranked_by_love_score(kinds["genres"], baseline, ENTITY_CONFIGS["genres"])[:TOP_LIST_MAX],
+        "topGenresByAvgMin8": top_genres_by_avg_min8[:TOP_LIST_MAX],
+        "genreOfTheYear": top_genres_by_avg_min8[0] if top_genres_by_avg_min8 else None,
+        "topTags": ranked_by_love_score(kinds["themes"], baseline, ENTITY_CONFIGS["themes"])[:TOP_LIST_MAX],
+        "watchTime": watch_time,
+        "totalLanguagesCount": len(kinds["languages"]),
+        "topLanguagesByCount": [
+            {"language": e["name"], "count": e["count"], "avg_rating": e["avg_rating"], "high_45": e["high_45"]}
+            for e in ranked_by_count(kinds["languages"], TOP_LIST_MAX)
+        ],
+        "topCountriesByCount": ranked_by_count(kinds["countries"], TOP_LIST_MAX),
+        "topCountriesByAvgRating": ranked_by_love_score(
+            kinds["countries"], baseline, ENTITY_CONFIGS["countries"], tables["country_global_frequency"], total_films
+        )[:TOP_LIST_MAX],
+        "topDirectorsByCount": ranked_by_count(kinds["directors"], TOP_LIST_MAX),
+        "topDirectorsByAvgRating": ranked_by_love_score(
+            kinds["directors"], baseline, ENTITY_CONFIGS["directors"]
+        )[:TOP_LIST_MAX],
+        "topActorsByCount": ranked_by_count(kinds["actors"], TOP_LIST_MAX),
+        "topActorsByAvgRating": ranked_by_love_score(kinds["actors"], baseline, ENTITY_CONFIGS["actors"])[:TOP_LIST_MAX],
+        "decades": [
+            {
+                "decade": int(e["name"]),
+                "count": e["count"],
+                "avgRating": e["avg_rating"],
+                "loveScore": e["loveScore"],
+                "ratingLift": e["ratingLift"],
+            }
+            for e in decades_by_love
+        ],
+        "yearsByLoveScore": ranked_by_love_score(
+            kinds["years"], baseline, ENTITY_CONFIGS["years"], tables["year_global_frequency"], total_films
+        ),
+    }
+
+
+def apply_delta(
+    state: Optional[Dict[str, Any]],
+    added: Optional[List[Dict[str, Any]]] = None,
+    removed: Optional[List[Dict[str, Any]]] = None,
+) -> Dict[str, Any]:
+    """
+    Update a serialized state (None = empty) with added and removed films.
+    Returns {"state": <new serialized state>, "aggregates": aggregate_sections(...)}.
+    """
+    current = AggregateState.from_dict(state) if state is not None else AggregateState()
+    current.add(removed or [], sign=-1)
+    current.add(added or [])
+    return {"state": current.to_dict(), "aggregates": aggregate_sections(current)}
+
+
+_DATE_YEAR = re.compile(r"^\s*(\d{4})-")
+
+
+def watch_year(film: Dict[str, Any]) -> Optional[int]:
+    """Year the film was logged (its `date`), the key of the report's year filter."""
+    match = _DATE_YEAR.match(film.get("date") or "")
+    return int(match.group(1)) or None if match else None
+
+
+def build_year_slices(films: List[Dict[str, Any]]) -> Dict[Optional[int], AggregateState]:
+    """
+    One AggregateState per watch year (None for films without a date), built
+    in a single pass over the films. Merging the slices of the selected years
+    gives the state of filterFilmsByYears(films, years); merging all of them
+    gives the state of the whole list.
+    """
+    groups: Dict[Optional[int], List[Dict[str, Any]]] = {}
+    for film in films or []:
+        groups.setdefault(watch_year(film), []).append(film)
+    return {year: build_state(group) for year, group in groups.items()}
+
+
+def merge_states(states: Sequence[AggregateState]) -> AggregateState:
+    merged = AggregateState()
+    for state in states:
+        merged.merge(state)
+    return merged
+
+
+def year_slices(films: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Serialized year slices: {"years": [...], "slices": {"<year>": state}, "undated": state | None}."""
+    slices = build_year_slices(films)
+    years = sorted(year for year in slices if year is not None)
+    return {
+        "years": years,
+        "slices": {str(year): slices[year].to_dict() for year in years},
+        "undated": slices[None].to_dict() if None in slices else None,
+    }
+
+
+def merge_slices(slices: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Merge serialized slices (pass them in ascending year order so ties rank
+    like the filtered film list). Returns {"state": ..., "aggregates": ...}.
+    """
+    merged = merge_states([AggregateState.from_dict(data) for data in slices])
+    return {"state": merged.to_dict(), "aggregates": aggregate_sections(merged)}
+
+
+def compute_aggregations(films: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """The frontend's computeAggregations(films)."""
+    films = films or []
+    state = build_state(films)
+    sections = aggregate_sections(state)
+    stats = sections["stats"]
+    known_ratings = [f["rating"] for f in films if f.get("rating") is not None]
+    total_runtime = sections["watchTime"]["totalRuntimeMinutes"]
+    genre_of_the_year = sections["genreOfTheYear"]
+    top_genres = sections["topGenres"]
+    countries_by_count = sections["topCountriesByCount"]
+    countries_by_avg = sections["topCountriesByAvgRating"]
+    directors_by_count = sections["topDirectorsByCount"]
+    directors_by_avg = sections["topDirectorsByAvgRating"]
+    top_tags = sections["topTags"]
+    decades = state.entities["decades"].stats()
+
+    top_rated = sorted(films, key=lambda f: (-(f.get("rating") or 0), -(f.get("year") or 0)))[:TOP_RATED_MAX]
+
+    longest = shortest = None
+    for film in films:
+        runtime = film.get("runtime")
+        if not runtime:
+            continue
+        if longest is None or runtime > longest[0]:
+            longest = (runtime, film.get("title") or UNKNOWN_TITLE)
+        if shortest is None or runtime < shortest[0]:
+            shortest = (runtime, film.get("title") or UNKNOWN_TITLE)
+
+    most_watched_decade = None
+    if len(decades):
+        # Stable argmax: the first decade (in appearance order) with the highest count.
+        most_watched_decade = int(decades.names[int(np.argmax(decades.count))])
+    most_loved = sections["decades"][0] if sections["decades"] else None
+
+    badges: List[Dict[str, Any]] = []
+
+    def add_badge(title: str, value: Any, subtitle: str, icon_key: str, tone: str, is_rating: bool = False) -> None:
+        if value is None:
+            return
+        badges.append({
+            "title": title,
+            "value": value,
+            "subtitle": subtitle,
+            "iconKey": icon_key,
+            "tone": tone,
+            "isRating": is_rating,
+        })
+
+    add_badge("Фильмов за год", stats["totalFilms"], "Всего фильмов", "film", "gold")
+    add_badge("Средняя оценка", stats["avgRating"], "Средняя по всем фильмам", "star", "gold", True)
+    add_badge("Пятёрки", sum(1 for r in known_ratings if r == 5), "Оценки 5★", "star", "purple")
+    add_badge("Оценки 4.5–5★", stats["count45"], "Очень высокие оценки", "star", "purple")
+    if genre_of_the_year:
+        add_badge(
+            "Жанр года",
+            genre_name_ru(genre_of_the_year["name"]),
+            f"Love Score: {format_love_score(genre_of_the_year['loveScore'])}",
+            "star",
+            "green",
+        )
+    if top_genres:
+        g = top_genres[0]
+        add_badge("Самый частый жанр", genre_name_ru(g["name"]), format_films_count(g["count"]), "tag", "green")
+    if countries_by_count:
+        c = countries_by_count[0]
+        add_badge("Самая частая страна", country_name_ru(c["name"]), format_films_count(c["count"]), "globe", "blue")
+    if countries_by_avg:
+        c = countries_by_avg[0]
+        add_badge(
+            "Самая любимая страна",
+            country_name_ru(c["name"]),
+            f"Love Score: {format_love_score(c['loveScore'])}",
+            "heart",
+            "blue",
+        )
+    if directors_by_count:
+        d = directors_by_count[0]
+        add_badge("Самый частый режиссёр", d["name"], format_films_count(d["count"]), "trophy", "purple")
+    if directors_by_avg:
+        d = directors_by_avg[0]
+        add_badge(
+            "Самый любимый режиссёр",
+            d["name"],
+            f"Love Score: {format_love_score(d['loveScore'])}",
+            "heart",
+            "purple",
+        )
+    if most_watched_decade:
+        add_badge("Самое частое десятилетие", f"{most_watched_decade}-е", "Чаще всего", "calendar", "gold")
+    if most_loved is not None:
+        add_badge(
+            "Любимое десятилетие",
+            f"{most_loved['decade']}-е",
+            f"Love Score: {format_love_score(most_loved['loveScore'])}",
+            "heart",
+            "gold",
+        )
+    add_badge(
+        "Самый ранний год",
+        str(stats["oldestYear"]) if stats["oldestYear"] else None,
+        "Год старейшего фильма",
+        "calendar",
+        "green",
+    )
+    add_badge(
+        "Самый новый год",
+        str(stats["newestYear"]) if stats["newestYear"] else None,
+        "Год новейшего фильма",
+        "calendar",
+        "green",
+    )
+    add_badge("Всего стран", len(state.entities["countries"].stats()), "Стран в подборке", "globe", "blue")
+    add_badge("Всего языков", sections["totalLanguagesCount"], "Языков в подборке", "globe", "blue")
+    if total_runtime:
+        add_badge("Часы просмотра", js_round(total_runtime / 60), "Суммарно за год", "clock", "gold")
+    if longest:
+        add_badge("Самый длинный фильм", longest[0], longest[1], "clock", "purple")
+    if shortest:
+        add_badge("Самый короткий фильм", shortest[0], shortest[1], "clock", "purple")
+    if top_tags:
+        add_badge("Самая частая тема", top_tags[0]["count"], f"Тема: {top_tags[0]['name']}", "tag", "green")
+        add_badge(
+            "Самая любимая тема",
+            top_tags[0]["avg_rating"],
+            f"Тема: {top_tags[0]['name']}",
+            "heart",
+            "green",
+            True,
+        )
+
+    return {
+        **sections,
+        "hiddenGems": hidden_gems(films),
+        "overrated": overrated(films),
+        "topRatedFilms": top_rated,
+        "badges": badges[:MAX_BADGES],
+    }
+
+
+# Film fields the aggregates read, by expected type (None is always allowed).
+_NUMBER_FIELDS = ("rating", "runtime", "tmdb_stars", "tmdb_vote_count")
+_TEXT_FIELDS = ("title", "date", "original_language")
+_LIST_FIELDS = ("genres", "keywords", "countries", "directors", "actors")
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, numbers.Real) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def validate_films(films: Optional[List[Any]], name: str = "films") -> None:
+    """Raise AnalyticsInputError for the first film field of an unexpected type."""
+    for i, film in enumerate(films or []):
+        if not isinstance(film, dict):
+            raise AnalyticsInputError(f"{name}[{i}] must be an object")
+        year = film.get("year")
+        if year is not None and (not isinstance(year, int) or isinstance(year, bool)):
+            raise AnalyticsInputError(f"{name}[{i}].year must be an integer")
+        for field in _NUMBER_FIELDS:
+            value = film.get(field)
+            if value is not None and not _is_number(value):
+                raise AnalyticsInputError(f"{name}[{i}].{field} must be a number")
+        for field in _TEXT_FIELDS:
+            value = film.get(field)
+            if value is not None and not isinstance(value, str):
+                raise AnalyticsInputError(f"{name}[{i}].{field} must be a string")
+        for field in _LIST_FIELDS:
+            value = film.get(field)
+            if value is not None and (not isinstance(value, list) or not all(isinstance(v, str) for v in value)):
+                raise AnalyticsInputError(f"{name}[{i}].{field} must be a list of strings")
+
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=ANALYTICS_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _executor
+
+
+async def _run_cpu(fn: Callable[..., Any], *args: Any) -> Any:
+    if ANALYTICS_WORKERS <= 0:
+        return await asyncio.to_thread(fn, *args)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), fn, *args)
+
+
+async def compute_aggregations_async(films: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """compute_aggregations off the event loop (process pool, or a thread with ANALYTICS_WORKERS=0)."""
+    validate_films(films)
+    return await _run_cpu(compute_aggregations, films)
+
+
+async def year_slices_async(films: List[Dict[str, Any]]) -> Dict[str, Any]:
+    validate_films(films)
+    return await _run_cpu(year_slices, films)
+
+
+async def merge_slices_async(slices: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return await _run_cpu(merge_slices, slices)
+
+
+async def apply_delta_async(
+    state: Optional[Dict[str, Any]],
+    added: Optional[List[Dict[str, Any]]] = None,
+    removed: Optional[List[Dict[str, Any]]] = None,
+) -> Dict[str, Any]:
+    """apply_delta off the event loop, like compute_aggregations_async."""
+    validate_films(added, "added")
+    validate_films(removed, "removed")
+    return await _run_cpu(apply_delta, state, added, removed)
+
+
+def shutdown() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
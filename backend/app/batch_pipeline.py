@@ -0,0 +1,241 @@
+"""
+Bounded worker pipeline for batch endpoints.
+
+Instead of creating one coroutine per item and gathering them all, a batch
+runs a fixed number of workers (BATCH_WORKERS) that pull the next item from
+the batch, process it and hand the result to the consumer. Workers of all
+batches in the process also share BATCH_MAX_IN_FLIGHT slots, so several
+concurrent 500-item uploads cannot pile up thousands of suspended tasks.
+
+Per batch, at most BATCH_WORKERS items are being processed and at most
+BATCH_WORKERS finished results wait for the consumer; a slow consumer (e.g. a
+streaming client) stops the workers instead of buffering more.
+
+Metrics:
+- tmdb_batch_items_in_flight: items being processed right now, all batches.
+- tmdb_batch_items_buffered: finished results waiting for their consumer.
+- tmdb_batch_items_abandoned_total: items never delivered because the
+  consumer went away (e.g. the client disconnected) and the batch was cancelled.
+- tmdb_batch_deadline_exceeded_total: batches answered partially because the
+  caller's deadline (X-Deadline-Ms) passed.
+"""
+import asyncio
+import logging
+import os
+import time
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Awaitable, Callable, List, Optional, Sequence, Set, Tuple, TypeVar
+
+from prometheus_client import Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+BATCH_WORKERS = int(os.getenv("TMDB_BATCH_WORKERS", "32"))
+BATCH_MAX_IN_FLIGHT = int(os.getenv("TMDB_BATCH_MAX_IN_FLIGHT", "128"))
+# With a request deadline, stop starting new items this long before it.
+DEADLINE_MARGIN_S = float(os.getenv("TMDB_BATCH_DEADLINE_MARGIN_S", "0.5"))
+
+# Placeholder for items without a result when a deadline cut the batch short.
+PENDING: Any = object()
+
+ITEMS_IN_FLIGHT = Gauge(
+    "tmdb_batch_items_in_flight",
+    "Batch items being processed right now, across all batches.",
+)
+ITEMS_BUFFERED = Gauge(
+    "tmdb_batch_items_buffered",
+    "Finished batch results waiting to be consumed, across all batches.",
+)
+ITEMS_ABANDONED = Counter(
+    "tmdb_batch_items_abandoned_total",
+    "Batch items cancelled before their result was delivered.",
+)
+DEADLINE_EXCEEDED = Counter(
+    "tmdb_batch_deadline_exceeded_total",
+    "Batches answered with partial results because the request deadline passed.",
+)
+
+T = TypeVar("T")
+
+_global_slots: Optional[asyncio.Semaphore] = None
+_global_slots_loop: Optional[asyncio.AbstractEventLoop] = None
+# Work left running after its deadline; referenced here so it is not garbage-collected.
+_detached: Set["asyncio.Future[Any]"] = set()
+
+
+def _get_global_slots() -> asyncio.Semaphore:
+    """Process-wide slot semaphore (recreated if the event loop changed, e.g. in tests)."""
+    global _global_slots, _global_slots_loop
+    loop = asyncio.get_running_loop()
+    if _global_slots is None or _global_slots_loop is not loop:
+        _global_slots = asyncio.Semaphore(BATCH_MAX_IN_FLIGHT)
+        _global_slots_loop = loop
+    return _global_slots
+
+
+def deadline_from_ms(ms: int) -> float:
+    """Monotonic deadline `ms` milliseconds from now."""
+    return time.monotonic() + ms / 1000.0
+
+
+def _deadline_near(deadline: Optional[float]) -> bool:
+    return deadline is not None and time.monotonic() >= deadline - DEADLINE_MARGIN_S
+
+
+async def run_unordered(
+    items: Sequence[T],
+    handler: Callable[[T], Awaitable[Any]],
+    workers: Optional[int] = None,
+    deadline: Optional[float] = None,
+) -> AsyncIterator[Tuple[int, Any]]:
+    """
+    Yield (index, result) in completion order. A handler exception is yielded
+    as the result instead of being raised. Closing the generator cancels the
+    workers.
+
+    With a `deadline` (monotonic), no new item is started once it is less than
+    DEADLINE_MARGIN_S away; items never started are simply not yielded.
+    """
+    if not items:
+        return
+    worker_count = max(1, min(workers or BATCH_WORKERS, len(items)))
+    results: "asyncio.Queue[Optional[Tuple[int, Any]]]" = asyncio.Queue(maxsize=worker_count)
+    slots = _get_global_slots()
+    next_index = 0
+
+    async def worker() -> None:
+        nonlocal next_index
+        while next_index < len(items) and not _deadline_near(deadline):
+            index = next_index
+            next_index += 1
+            async with slots:
+                ITEMS_IN_FLIGHT.inc()
+                try:
+                    result = await handler(items[index])
+                except Exception as exc:
+                    result = exc
+                finally:
+                    ITEMS_IN_FLIGHT.dec()
+            await results.put((index, result))
+            ITEMS_BUFFERED.inc()
+        await results.put(None)
+
+    tasks = [asyncio.ensure_future(worker()) for _ in range(worker_count)]
+    delivered = 0
+    finished_workers = 0
+    try:
+        while finished_workers < worker_count:
+            entry = await results.get()
+            if entry is None:
+                finished_workers += 1
+                continue
+            ITEMS_BUFFERED.dec()
+            delivered += 1
+            yield entry
+    finally:
+        if finished_workers < worker_count:
+            ITEMS_ABANDONED.inc(len(items) - delivered)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        while not results.empty():
+            if results.get_nowait() is not None:
+                ITEMS_BUFFERED.dec()
+
+
+async def run_ordered(
+    items: Sequence[T],
+    handler: Callable[[T], Awaitable[Any]],
+    workers: Optional[int] = None,
+    deadline: Optional[float] = None,
+) -> List[Any]:
+    """
+    Like asyncio.gather(..., return_exceptions=True) over `items`, with bounded
+    workers. Items cut off by the `deadline` are left as PENDING.
+    """
+    ordered: List[Any] = [PENDING] * len(items)
+    async for index, result in run_unordered(items, handler, workers, deadline):
+        ordered[index] = result
+    return ordered
+
+
+async def until_deadline(
+    results: AsyncIterator[Tuple[int, Any]],
+    count: int,
+    deadline: Optional[float],
+) -> AsyncIterator[Tuple[int, Any]]:
+    """
+    Yield the (index, result) pairs of `results` until `deadline`, then
+    (index, PENDING) for each index in range(count) not yielded yet, so a
+    streaming consumer learns which items were cut off and the stream ends on
+    time. As with wait_until, the remaining work keeps running in the
+    background so late results still reach the cache; closing the generator
+    before the deadline cancels it.
+    """
+    if deadline is None:
+        async with aclosing(results):
+            async for entry in results:
+                yield entry
+        return
+    outstanding = set(range(count))
+    step: "Optional[asyncio.Future[Any]]" = asyncio.ensure_future(results.__anext__())
+    try:
+        while True:
+            done, _ = await asyncio.wait({step}, timeout=max(0.0, deadline - time.monotonic()))
+            if not done:
+                break
+            try:
+                index, result = step.result()
+            except StopAsyncIteration:
+                return
+            outstanding.discard(index)
+            yield index, result
+            step = asyncio.ensure_future(results.__anext__())
+        DEADLINE_EXCEEDED.inc()
+        drain = asyncio.ensure_future(_drain(step, results))
+        step = None
+        _detached.add(drain)
+        drain.add_done_callback(_detached.discard)
+        for index in sorted(outstanding):
+            yield index, PENDING
+    finally:
+        if step is not None:
+            step.cancel()
+            await asyncio.gather(step, return_exceptions=True)
+            await results.aclose()
+
+
+async def _drain(step: "asyncio.Future[Any]", results: AsyncIterator[Any]) -> None:
+    """Run `results` (whose next step is in flight) to the end, discarding what it yields."""
+    async with aclosing(results):
+        try:
+            await step
+        except StopAsyncIteration:
+            return
+        async for _ in results:
+            pass
+
+
+async def wait_until(work: Awaitable[Any], deadline: Optional[float]) -> bool:
+    """
+    Await `work` until `deadline`. Returns True if it finished; False if the
+    deadline passed first, in which case the work keeps running in the
+    background (so late fetches still reach the cache) and the caller answers
+    with what it has. Cancelling the caller before the deadline cancels the work.
+    """
+    if deadline is None:
+        await work
+        return True
+    task = asyncio.ensure_future(work)
+    try:
+        done, _ = await asyncio.wait({task}, timeout=max(0.0, deadline - time.monotonic()))
+    except asyncio.CancelledError:
+        task.cancel()
+        raise
+    if done:
+        task.result()
+        return True
+    DEADLINE_EXCEEDED.inc()
+    _detached.add(task)
+    task.add_done_callback(_detached.discard)
+    return False
@@ -9,7 +9,22 @@ Concurrency model (writer queue):
   writes or 1 second. Writer uses PRAGMA busy_timeout and retries on lock/busy.
 - READS use thread-local connections; many threads can read concurrently (WAL).
   Only one writer runs at a time, so no write/write or read/write lock storms.
+
+report_cache holds finished analysis reports (app/jobs.py) keyed by the
+digest of their row set, as one zlib-compressed JSON blob per report, so an
+identical re-upload is answered with a single read.
+
+movie_cache, credits_cache and keywords_cache rows carry a content_hash of
+their JSON, set by the writer. get_entry_versions() combines the three into
+the version of a film's entry, so delta sync (POST /tmdb/movies/sync) can tell
+which of a client's entries changed without decoding any payload. Databases
+created before the column existed are migrated and backfilled by
+init_cache_db.
+
+Expired rows are kept until overwritten. Getters ignore them unless called
+with allow_stale=True, which the TMDb circuit breaker's degraded mode uses.
 """
+import hashlib
 import json
 import logging
 import os
@@ -17,8 +32,9 @@ import queue
 import sqlite3
 import threading
 import time
+import zlib
 from datetime import datetime, timedelta, timezone
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
 logger = logging.getLogger(__name__)
 
@@ -31,6 +47,7 @@ DISABLE_CACHE = os.getenv("DISABLE_CACHE", "").lower() in ("1", "true", "yes")
 
 # Writer: one thread, one connection, processes this queue 
 # item = ("search", title, year, tmdb_id) | ("movie", tmdb_id, payload) | ("credits", tmdb_id, payload) | ("keywords", tmdb_id, keywords)
+#        | ("report", digest, compressed_blob, item_count)
 # Bounded queue for backpressure (300-500); commit every 50 writes or 1s
 _WRITE_QUEUE_MAXSIZE = 500
 _WRITE_QUEUE: queue.Queue = queue.Queue(maxsize=_WRITE_QUEUE_MAXSIZE)
@@ -41,6 +58,12 @@ _BATCH_TIMEOUT_S = 1.0
 _FLUSH_MAX_RETRIES = 5
 _FLUSH_RETRY_DELAY_S = 0.05
 _WRITER_BUSY_TIMEOUT_MS = 15_000
+_REPORT_COMPRESS_LEVEL = 6
+# The `->` JSON operator (SQLite 3.38+) lets batch reads extract single keys of a payload.
+_JSON_ARROW = sqlite3.sqlite_version_info >= (3, 38, 0)
+
+# Tables whose rows carry a content_hash, with their JSON column.
+_HASHED_TABLES = (("movie_cache", "payload_json"), ("credits_cache", "payload_json"), ("keywords_cache", "keywords_json"))
 
 # Thread-local read connections (no init_db, no writes)
 _read_local = threading.local()
@@ -103,12 +126,46 @@ def init_cache_db(db_path: Optional[str] = None) -> None:
                 updated_at TEXT NOT NULL
             );
             CREATE INDEX IF NOT EXISTS ix_keywords_updated ON keywords_cache(updated_at);
+
+            CREATE TABLE IF NOT EXISTS report_cache (
+                digest TEXT PRIMARY KEY,
+                payload BLOB NOT NULL,
+                item_count INTEGER NOT NULL,
+                updated_at TEXT NOT NULL
+            );
         """)
+        _migrate_content_hash(conn)
         conn.commit()
     finally:
         conn.close()
 
 
+def _migrate_content_hash(conn: sqlite3.Connection) -> None:
+    """Add content_hash to tables created without it and hash rows that lack one."""
+    conn.create_function("content_hash_of", 1, content_hash, deterministic=True)
+    for table, column in _HASHED_TABLES:
+        columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+        if "content_hash" not in columns:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN content_hash TEXT")
+        conn.execute(f"UPDATE {table} SET content_hash = content_hash_of({column}) WHERE content_hash IS NULL")
+
+
+def content_hash(payload_json: str) -> str:
+    """Hash of a cached JSON payload, as stored in content_hash."""
+    return hashlib.sha256(payload_json.encode("utf-8")).hexdigest()[:16]
+
+
+def payload_hash(payload: Any) -> str:
+    """content_hash of a payload as set_movie/set_credits/set_keywords store it."""
+    return content_hash(json.dumps(payload))
+
+
+def entry_version(movie_hash: str, credits_hash: Optional[str], keywords_hash: Optional[str]) -> str:
+    """Version of a film's full entry from the hashes of its facets (None: facet missing)."""
+    combined = f"{movie_hash}:{credits_hash or ''}:{keywords_hash or ''}"
+    return hashlib.sha256(combined.encode("utf-8")).hexdigest()[:16]
+
+
 def _get_read_conn() -> sqlite3.Connection:
     """Thread-local read-only connection; no PRAGMA or CREATE TABLE."""
     if not hasattr(_read_local, "conn") or _read_local.conn is None:
@@ -151,19 +208,23 @@ def _flush_batch(conn: sqlite3.Connection, batch: List[Tuple]) -> None:
     movie_items: List[Tuple] = []
     credits_items: List[Tuple] = []
     keywords_items: List[Tuple] = []
+    report_items: List[Tuple] = []
     for x in batch:
         if x[0] == "search":
             _, t, y, tid = x
             search_items.append((t, y, tid, now))
         elif x[0] == "movie":
             _, tid, p = x
-            movie_items.append((tid, p, now))
+            movie_items.append((tid, p, content_hash(p), now))
         elif x[0] == "credits":
             _, tid, p = x
-            credits_items.append((tid, p, now))
+            credits_items.append((tid, p, content_hash(p), now))
         elif x[0] == "keywords":
             _, tid, kw = x
-            keywords_items.append((tid, kw, now))
+            keywords_items.append((tid, kw, content_hash(kw), now))
+        elif x[0] == "report":
+            _, digest, blob, count = x
+            report_items.append((digest, blob, count, now))
 
     last_err: Optional[Exception] = None
     for attempt in range(_FLUSH_MAX_RETRIES):
@@ -176,19 +237,24 @@ def _flush_batch(conn: sqlite3.Connection, batch: List[Tuple]) -> None:
                 )
             if movie_items:
                 conn.executemany(
-                    "INSERT OR REPLACE INTO movie_cache (tmdb_id, payload_json, updated_at) VALUES (?, ?, ?)",
+                    "INSERT OR REPLACE INTO movie_cache (tmdb_id, payload_json, content_hash, updated_at) VALUES (?, ?, ?, ?)",
                     movie_items,
                 )
             if credits_items:
                 conn.executemany(
-                    "INSERT OR REPLACE INTO credits_cache (tmdb_id, payload_json, updated_at) VALUES (?, ?, ?)",
+                    "INSERT OR REPLACE INTO credits_cache (tmdb_id, payload_json, content_hash, updated_at) VALUES (?, ?, ?, ?)",
                     credits_items,
                 )
             if keywords_items:
                 conn.executemany(
-                    "INSERT OR REPLACE INTO keywords_cache (tmdb_id, keywords_json, updated_at) VALUES (?, ?, ?)",
+                    "INSERT OR REPLACE INTO keywords_cache (tmdb_id, keywords_json, content_hash, updated_at) VALUES (?, ?, ?, ?)",
                     keywords_items,
                 )
+            if report_items:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO report_cache (digest, payload, item_count, updated_at) VALUES (?, ?, ?, ?)",
+                    report_items,
+                )
             conn.commit()
             return
         except sqlite3.OperationalError as e:
@@ -280,7 +346,7 @@ def stop_writer() -> None:
 
 # --- Public API: reads use thread-local conn; writes enqueue ---
 
-def get_search(title: str, year: Optional[int]) -> Optional[int]:
+def get_search(title: str, year: Optional[int], allow_stale: bool = False) -> Optional[int]:
     if DISABLE_CACHE:
         return None
     year_val = year if year is not None else 0
@@ -292,7 +358,7 @@ def get_search(title: str, year: Optional[int]) -> Optional[int]:
     ).fetchone()
     if not row:
         return None
-    if _is_expired(row["updated_at"]):
+    if not allow_stale and _is_expired(row["updated_at"]):
         return None
     return row["tmdb_id"]
 
@@ -303,17 +369,18 @@ def set_search(title: str, year: Optional[int], tmdb_id: Optional[int]) -> None:
     _WRITE_QUEUE.put(("search", title_n, year_val, tmdb_id))
 
 
-def get_movie(tmdb_id: int) -> Optional[Any]:
+def get_movie(tmdb_id: int, allow_stale: bool = False, keys: Optional[Sequence[str]] = None) -> Optional[Any]:
     if DISABLE_CACHE:
         return None
     conn = _get_read_conn()
+    payload, params = _payload_select("payload_json", keys)
     row = conn.execute(
-        "SELECT payload_json, updated_at FROM movie_cache WHERE tmdb_id = ?",
-        (tmdb_id,),
+        f"SELECT {payload}, updated_at FROM movie_cache WHERE tmdb_id = ?",
+        params + (tmdb_id,),
     ).fetchone()
     if not row:
         return None
-    if _is_expired(row["updated_at"]):
+    if not allow_stale and _is_expired(row["updated_at"]):
         return None
     return json.loads(row["payload_json"])
 
@@ -323,17 +390,18 @@ def set_movie(tmdb_id: int, payload: Any) -> None:
     _WRITE_QUEUE.put(("movie", tmdb_id, payload_json))
 
 
-def get_credits(tmdb_id: int) -> Optional[Any]:
+def get_credits(tmdb_id: int, allow_stale: bool = False, keys: Optional[Sequence[str]] = None) -> Optional[Any]:
     if DISABLE_CACHE:
         return None
     conn = _get_read_conn()
+    payload, params = _payload_select("payload_json", keys)
     row = conn.execute(
-        "SELECT payload_json, updated_at FROM credits_cache WHERE tmdb_id = ?",
-        (tmdb_id,),
+        f"SELECT {payload}, updated_at FROM credits_cache WHERE tmdb_id = ?",
+        params + (tmdb_id,),
     ).fetchone()
     if not row:
         return None
-    if _is_expired(row["updated_at"]):
+    if not allow_stale and _is_expired(row["updated_at"]):
         return None
     return json.loads(row["payload_json"])
 
@@ -343,7 +411,7 @@ def set_credits(tmdb_id: int, payload: Any) -> None:
     _WRITE_QUEUE.put(("credits", tmdb_id, payload_json))
 
 
-def get_keywords(tmdb_id: int) -> Optional[List[str]]:
+def get_keywords(tmdb_id: int, allow_stale: bool = False) -> Optional[List[str]]:
     if DISABLE_CACHE:
         return None
     conn = _get_read_conn()
@@ -353,7 +421,7 @@ def get_keywords(tmdb_id: int) -> Optional[List[str]]:
     ).fetchone()
     if not row:
         return None
-    if _is_expired(row["updated_at"]):
+    if not allow_stale and _is_expired(row["updated_at"]):
         return None
     return json.loads(row["keywords_json"])
 
@@ -363,21 +431,43 @@ def set_keywords(tmdb_id: int, keywords: List[str]) -> None:
     _WRITE_QUEUE.put(("keywords", tmdb_id, keywords_json))
 
 
-def get_movie_batch(tmdb_ids: List[int]) -> Dict[int, Optional[Any]]:
-    """Batch get movies from cache. Returns {tmdb_id: movie_data or None}."""
+def _payload_select(column: str, keys: Optional[Sequence[str]]) -> Tuple[str, Tuple[str, ...]]:
+    """
+    SELECT expression (and its parameters) for a JSON payload column, limited
+    to top-level `keys` when given: SQLite builds the smaller object, so
+    Python only decodes what the caller uses. `->` copies values as written,
+    numbers included.
+    """
+    if not keys or not _JSON_ARROW:
+        return column, ()
+    expression = "json_object(" + ", ".join(f"?, {column} -> ?" for _ in keys) + ")"
+    params: Tuple[str, ...] = ()
+    for key in keys:
+        params += (key, f'$."{key}"')
+    return f"{expression} AS {column}", params
+
+
+def get_movie_batch(
+    tmdb_ids: List[int], allow_stale: bool = False, keys: Optional[Sequence[str]] = None
+) -> Dict[int, Optional[Any]]:
+    """
+    Batch get movies from cache. Returns {tmdb_id: movie_data or None}.
+    With `keys`, movie_data holds only those top-level keys (missing ones as None).
+    """
     if DISABLE_CACHE:
         return {tmdb_id: None for tmdb_id in tmdb_ids}
     if not tmdb_ids:
         return {}
     conn = _get_read_conn()
     placeholders = ",".join("?" * len(tmdb_ids))
+    payload, params = _payload_select("payload_json", keys)
     rows = conn.execute(
-        f"SELECT tmdb_id, payload_json, updated_at FROM movie_cache WHERE tmdb_id IN ({placeholders})",
-        tuple(tmdb_ids),
+        f"SELECT tmdb_id, {payload}, updated_at FROM movie_cache WHERE tmdb_id IN ({placeholders})",
+        params + tuple(tmdb_ids),
     ).fetchall()
     result = {}
     for row in rows:
-        if not _is_expired(row["updated_at"]):
+        if allow_stale or not _is_expired(row["updated_at"]):
             result[row["tmdb_id"]] = json.loads(row["payload_json"])
     for tmdb_id in tmdb_ids:
         if tmdb_id not in result:
@@ -385,21 +475,24 @@ def get_movie_batch(tmdb_ids: List[int]) -> Dict[int, Optional[Any]]:
     return result
 
 
-def get_credits_batch(tmdb_ids: List[int]) -> Dict[int, Optional[Any]]:
-    """Batch get credits from cache. Returns {tmdb_id: credits_data or None}."""
+def get_credits_batch(
+    tmdb_ids: List[int], allow_stale: bool = False, keys: Optional[Sequence[str]] = None
+) -> Dict[int, Optional[Any]]:
+    """Batch get credits from cache. Returns {tmdb_id: credits_data or None}, limited to `keys` if given."""
     if DISABLE_CACHE:
         return {tmdb_id: None for tmdb_id in tmdb_ids}
     if not tmdb_ids:
         return {}
     conn = _get_read_conn()
     placeholders = ",".join("?" * len(tmdb_ids))
+    payload, params = _payload_select("payload_json", keys)
     rows = conn.execute(
-        f"SELECT tmdb_id, payload_json, updated_at FROM credits_cache WHERE tmdb_id IN ({placeholders})",
-        tuple(tmdb_ids),
+        f"SELECT tmdb_id, {payload}, updated_at FROM credits_cache WHERE tmdb_id IN ({placeholders})",
+        params + tuple(tmdb_ids),
     ).fetchall()
     result = {}
     for row in rows:
-        if not _is_expired(row["updated_at"]):
+        if allow_stale or not _is_expired(row["updated_at"]):
             result[row["tmdb_id"]] = json.loads(row["payload_json"])
     for tmdb_id in tmdb_ids:
         if tmdb_id not in result:
@@ -407,7 +500,7 @@ def get_credits_batch(tmdb_ids: List[int]) -> Dict[int, Optional[Any]]:
     return result
 
 
-def get_keywords_batch(tmdb_ids: List[int]) -> Dict[int, Optional[List[str]]]:
+def get_keywords_batch(tmdb_ids: List[int], allow_stale: bool = False) -> Dict[int, Optional[List[str]]]:
     """Batch get keywords from cache. Returns {tmdb_id: keywords_list or None}."""
     if DISABLE_CACHE:
         return {tmdb_id: None for tmdb_id in tmdb_ids}
@@ -421,7 +514,7 @@ def get_keywords_batch(tmdb_ids: List[int]) -> Dict[int, Optional[List[str]]]:
     ).fetchall()
     result = {}
     for row in rows:
-        if not _is_expired(row["updated_at"]):
+        if allow_stale or not _is_expired(row["updated_at"]):
             result[row["tmdb_id"]] = json.loads(row["keywords_json"])
     for tmdb_id in tmdb_ids:
         if tmdb_id not in result:
@@ -429,6 +522,69 @@ def get_keywords_batch(tmdb_ids: List[int]) -> Dict[int, Optional[List[str]]]:
     return result
 
 
+def get_entry_versions(tmdb_ids: List[int]) -> Dict[int, Optional[str]]:
+    """
+    Batch read of entry versions (see entry_version). Returns {tmdb_id: version or None}.
+
+    The movie row must be cached, hashed and fresh. A missing credits or
+    keywords row is versioned as an empty facet (None), since empty facets are
+    never written (tmdb_batch_movies._store_full skips them); requiring the
+    row would refetch films without keywords on every sync. A facet row that
+    is present must be hashed and fresh too.
+    """
+    if DISABLE_CACHE:
+        return {tmdb_id: None for tmdb_id in tmdb_ids}
+    if not tmdb_ids:
+        return {}
+    conn = _get_read_conn()
+    placeholders = ",".join("?" * len(tmdb_ids))
+    rows = conn.execute(
+        f"""
+        SELECT m.tmdb_id, m.content_hash AS movie_hash, m.updated_at AS movie_updated_at,
+               c.content_hash AS credits_hash, c.updated_at AS credits_updated_at,
+               k.content_hash AS keywords_hash, k.updated_at AS keywords_updated_at
+        FROM movie_cache m
+        LEFT JOIN credits_cache c ON c.tmdb_id = m.tmdb_id
+        LEFT JOIN keywords_cache k ON k.tmdb_id = m.tmdb_id
+        WHERE m.tmdb_id IN ({placeholders})
+        """,
+        tuple(tmdb_ids),
+    ).fetchall()
+    result: Dict[int, Optional[str]] = {tmdb_id: None for tmdb_id in tmdb_ids}
+    for row in rows:
+        facets = [(row["movie_hash"], row["movie_updated_at"])]
+        # A LEFT JOIN miss leaves updated_at NULL: that facet is absent, not stale.
+        for prefix in ("credits", "keywords"):
+            if row[f"{prefix}_updated_at"] is not None:
+                facets.append((row[f"{prefix}_hash"], row[f"{prefix}_updated_at"]))
+        if all(h and not _is_expired(updated) for h, updated in facets):
+            result[row["tmdb_id"]] = entry_version(row["movie_hash"], row["credits_hash"], row["keywords_hash"])
+    return result
+
+
+def get_report(digest: str, allow_stale: bool = False) -> Optional[List[Dict[str, Any]]]:
+    """Stored report (list of enriched films) for a row-set digest."""
+    if DISABLE_CACHE:
+        return None
+    conn = _get_read_conn()
+    row = conn.execute(
+        "SELECT payload, updated_at FROM report_cache WHERE digest = ?",
+        (digest,),
+    ).fetchone()
+    if not row:
+        return None
+    if not allow_stale and _is_expired(row["updated_at"]):
+        return None
+    return json.loads(zlib.decompress(row["payload"]))
+
+
+def set_report(digest: str, films: List[Dict[str, Any]]) -> None:
+    """Compress (in the caller's thread) and enqueue a report write."""
+    payload = json.dumps(films, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    blob = zlib.compress(payload, _REPORT_COMPRESS_LEVEL)
+    _WRITE_QUEUE.put(("report", digest, blob, len(films)))
+
+
 # --- Legacy CacheConnection: keep for compatibility but route to module API ---
 
 class CacheConnection:
@@ -0,0 +1,184 @@
+"""
+Circuit breaker for TMDb upstream calls.
+
+When TMDb is down, every uncached item would otherwise run the full retry
+schedule, so a 500-item batch hangs for tens of seconds. The breaker watches
+the outcome of upstream calls over a rolling window:
+
+- CLOSED: calls go through. If at least CIRCUIT_MIN_REQUESTS calls in the last
+  CIRCUIT_WINDOW_S seconds failed at CIRCUIT_ERROR_RATE or more, it opens.
+- OPEN: calls are rejected immediately; batches fall back to cached rows
+  (stale ones included) and per-item errors. After CIRCUIT_OPEN_S it moves on.
+- HALF_OPEN: up to CIRCUIT_HALF_OPEN_PROBES calls are let through as probes.
+  A successful probe closes the circuit, a failed one re-opens it. A probe
+  that reports nothing within CIRCUIT_PROBE_TIMEOUT_S (cancelled on client
+  disconnect or deadline, or ended by an unexpected exception) re-opens it
+  too, so its slot cannot stay taken for good. Only the outcome of a call
+  allow_request() admitted as a probe of the current half-open round counts:
+  a late answer to a call admitted before the circuit opened is ignored.
+  The admission is remembered in a context variable, so it follows the
+  asyncio task that made the call to its record_* call.
+
+Failures are 5xx responses and transport errors (timeouts, connection
+errors). 429 and other 4xx mean TMDb is up, so they count as successes.
+"""
+import contextvars
+import logging
+import os
+import time
+from collections import deque
+from typing import Deque, Optional, Tuple
+
+from prometheus_client import Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+CIRCUIT_WINDOW_S = float(os.getenv("TMDB_CIRCUIT_WINDOW_S", "30"))
+CIRCUIT_MIN_REQUESTS = int(os.getenv("TMDB_CIRCUIT_MIN_REQUESTS", "20"))
+CIRCUIT_ERROR_RATE = float(os.getenv("TMDB_CIRCUIT_ERROR_RATE", "0.5"))
+CIRCUIT_OPEN_S = float(os.getenv("TMDB_CIRCUIT_OPEN_S", "15"))
+CIRCUIT_HALF_OPEN_PROBES = int(os.getenv("TMDB_CIRCUIT_HALF_OPEN_PROBES", "1"))
+# Longer than the 20s upstream request timeout, so a live probe always reports first.
+CIRCUIT_PROBE_TIMEOUT_S = float(os.getenv("TMDB_CIRCUIT_PROBE_TIMEOUT_S", "30"))
+
+CIRCUIT_OPEN_ERROR = "TMDb unavailable (circuit open)"
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+CIRCUIT_STATE = Gauge(
+    "tmdb_circuit_state",
+    "TMDb circuit breaker state (0=closed, 1=half-open, 2=open).",
+)
+CIRCUIT_REJECTED = Counter(
+    "tmdb_circuit_rejected_total",
+    "Upstream TMDb calls rejected because the circuit was open.",
+)
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        window_s: float = CIRCUIT_WINDOW_S,
+        min_requests: int = CIRCUIT_MIN_REQUESTS,
+        error_rate: float = CIRCUIT_ERROR_RATE,
+        open_s: float = CIRCUIT_OPEN_S,
+        half_open_probes: int = CIRCUIT_HALF_OPEN_PROBES,
+        probe_timeout_s: float = CIRCUIT_PROBE_TIMEOUT_S,
+    ) -> None:
+        self.window_s = window_s
+        self.min_requests = min_requests
+        self.error_rate = error_rate
+        self.open_s = open_s
+        self.half_open_probes = half_open_probes
+        self.probe_timeout_s = probe_timeout_s
+        self._outcomes: Deque[Tuple[float, bool]] = deque()
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probe_started_at = 0.0
+        # Half-open round number; the current task's admitted probe round is kept in _probe.
+        self._generation = 0
+        self._probe: "contextvars.ContextVar[Optional[int]]" = contextvars.ContextVar(
+            f"circuit_probe_{id(self)}", default=None
+        )
+        CIRCUIT_STATE.set(_STATE_VALUES[CLOSED])
+
+    @property
+    def state(self) -> str:
+        now = time.monotonic()
+        if self._state == OPEN and now - self._opened_at >= self.open_s:
+            self._set_state(HALF_OPEN)
+            self._probes_in_flight = 0
+            self._generation += 1
+        elif (
+            self._state == HALF_OPEN
+            and self._probes_in_flight
+            and now - self._probe_started_at >= self.probe_timeout_s
+        ):
+            logger.warning("TMDb circuit probe did not report within %.0fs; re-opening circuit", self.probe_timeout_s)
+            self._open()
+        return self._state
+
+    def is_open(self) -> bool:
+        """True while calls are being rejected (does not consume a half-open probe)."""
+        state = self.state
+        return state == OPEN or (state == HALF_OPEN and self._probes_in_flight >= self.half_open_probes)
+
+    def allow_request(self) -> bool:
+        """Call before each upstream request; False means fail fast."""
+        state = self.state
+        if state == CLOSED:
+            self._probe.set(None)
+            return True
+        if state == HALF_OPEN and self._probes_in_flight < self.half_open_probes:
+            if not self._probes_in_flight:
+                self._probe_started_at = time.monotonic()
+            self._probes_in_flight += 1
+            self._probe.set(self._generation)
+            return True
+        CIRCUIT_REJECTED.inc()
+        return False
+
+    def _is_probe(self) -> bool:
+        """True (once) if the current task's call is a probe of this half-open round."""
+        if self._probe.get() != self._generation:
+            return False
+        self._probe.set(None)
+        return True
+
+    def record_success(self) -> None:
+        if self._state == HALF_OPEN:
+            if self._is_probe():
+                logger.info("TMDb circuit probe succeeded; closing circuit")
+                self._outcomes.clear()
+                self._set_state(CLOSED)
+            return
+        self._record(True)
+
+    def record_failure(self) -> None:
+        if self._state == HALF_OPEN:
+            if self._is_probe():
+                logger.warning("TMDb circuit probe failed; re-opening circuit")
+                self._open()
+            return
+        self._record(False)
+        if self._state == CLOSED and self._should_open():
+            self._open()
+
+    def record_response(self, status_code: int) -> None:
+        if status_code >= 500:
+            self.record_failure()
+        else:
+            self.record_success()
+
+    def _record(self, ok: bool) -> None:
+        now = time.monotonic()
+        self._outcomes.append((now, ok))
+        while self._outcomes and self._outcomes[0][0] < now - self.window_s:
+            self._outcomes.popleft()
+
+    def _should_open(self) -> bool:
+        total = len(self._outcomes)
+        if total < self.min_requests:
+            return False
+        failures = sum(1 for _, ok in self._outcomes if not ok)
+        return failures / total >= self.error_rate
+
+    def _open(self) -> None:
+        if self._state != OPEN:
+            logger.warning("TMDb circuit opened; serving cached data only for %.0fs", self.open_s)
+        self._opened_at = time.monotonic()
+        self._probes_in_flight = 0
+        self._outcomes.clear()
+        self._set_state(OPEN)
+
+    def _set_state(self, state: str) -> None:
+        self._state = state
+        CIRCUIT_STATE.set(_STATE_VALUES[state])
+
+
+# Process-wide breaker shared by every TMDb call site.
+tmdb = CircuitBreaker()
@@ -0,0 +1,195 @@
+"""
+Columnar MessagePack encoding for batch responses.
+
+Batch endpoints return `{"results": [entry, ...]}` where every entry has the
+same shape, so JSON spends most of its bytes on repeated keys and repeated
+strings (genre, country and language names, directors, actors, keywords).
+With `Accept: application/vnd.msgpack` the batch endpoints answer with one
+MessagePack document instead:
+
+    {"format": "columnar-batch", "version": 1, "count": <entries>,
+     "strings": [<dictionary>], "columns": {<key>: <column>, ...}}
+
+A column holds one key of every entry, in entry order. Its `type` is:
+
+- `plain`: `values` as they are (numbers, booleans, nil, unique strings);
+- `dict`: strings as indices into `strings` (nil stays nil);
+- `dict_list`: lists of strings as lists of indices (nil stays nil);
+- `decimal`: floats as integers of `value * scale`; `n / scale` gives back
+  the same double, so nothing is lost (vote averages are 3 decimals);
+- `object`: nested objects, with `fields` columns over the rows that are
+  objects and `nulls` listing the rows that are nil.
+
+`missing` (optional) lists rows that do not have the key at all, such as
+`stale` or `pending`, which only appear when true. Positions are row numbers
+within the column. A string column is dictionary-encoded when some string in
+it repeats; unique titles and poster paths stay plain.
+
+decode() is the reference decoder: it rebuilds exactly the JSON results.
+"""
+from typing import Any, Dict, List, Optional, Sequence
+
+from fastapi.responses import Response
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - msgpack is optional
+    msgpack = None
+
+FORMAT = "columnar-batch"
+FORMAT_VERSION = 1
+MEDIA_TYPE = "application/vnd.msgpack"
+# Media types clients use for MessagePack; all get the same document.
+ACCEPTED_MEDIA_TYPES = (MEDIA_TYPE, "application/x-msgpack", "application/msgpack")
+DECIMAL_SCALES = (10, 100, 1000)
+
+_MISSING = object()
+
+
+class ColumnarError(ValueError):
+    """A document that is not a valid columnar batch."""
+
+
+def available() -> bool:
+    return msgpack is not None
+
+
+def wants_columnar(accept: Optional[str]) -> bool:
+    """Whether the Accept header asks for MessagePack (and msgpack is installed)."""
+    if not accept or msgpack is None:
+        return False
+    accept = accept.lower()
+    return any(media_type in accept for media_type in ACCEPTED_MEDIA_TYPES)
+
+
+def _has_repeats(strings: Sequence[str]) -> bool:
+    return len(set(strings)) < len(strings)
+
+
+def _decimal_scale(values: Sequence[Any]) -> Optional[int]:
+    numbers = [value for value in values if value is not None]
+    if not numbers or not all(isinstance(value, float) for value in numbers):
+        return None
+    for scale in DECIMAL_SCALES:
+        if all(round(value * scale) / scale == value for value in numbers):
+            return scale
+    return None
+
+
+def _column(values: List[Any], strings: Dict[str, int]) -> Dict[str, Any]:
+    """Column of `values`; new dictionary strings are added to `strings` (string -> index)."""
+    missing = [i for i, value in enumerate(values) if value is _MISSING]
+    present = [value for value in values if value is not _MISSING] if missing else values
+    non_null = [value for value in present if value is not None]
+
+    if non_null and all(isinstance(value, dict) for value in non_null):
+        keys: List[str] = []
+        for value in non_null:
+            keys.extend(key for key in value if key not in keys)
+        column: Dict[str, Any] = {
+            "type": "object",
+            "nulls": [i for i, value in enumerate(present) if value is None],
+            "fields": {key: _column([value.get(key, _MISSING) for value in non_null], strings) for key in keys},
+        }
+    elif non_null and all(isinstance(value, str) for value in non_null) and _has_repeats(non_null):
+        index = strings.setdefault
+        column = {"type": "dict", "values": [None if value is None else index(value, len(strings)) for value in present]}
+    elif (
+        non_null
+        and all(isinstance(value, list) and all(isinstance(item, str) for item in value) for value in non_null)
+        and _has_repeats([item for value in non_null for item in value])
+    ):
+        index = strings.setdefault
+        column = {
+            "type": "dict_list",
+            "values": [
+                None if value is None else [index(item, len(strings)) for item in value] for value in present
+            ],
+        }
+    else:
+        scale = _decimal_scale(non_null)
+        if scale is not None:
+            column = {
+                "type": "decimal",
+                "scale": scale,
+                "values": [None if value is None else round(value * scale) for value in present],
+            }
+        else:
+            column = {"type": "plain", "values": list(present)}
+    if missing:
+        column["missing"] = missing
+    return column
+
+
+def encode(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """The columnar document for a list of result entries."""
+    strings: Dict[str, int] = {}
+    keys: List[str] = []
+    for entry in results:
+        keys.extend(key for key in entry if key not in keys)
+    columns = {key: _column([entry.get(key, _MISSING) for entry in results], strings) for key in keys}
+    return {
+        "format": FORMAT,
+        "version": FORMAT_VERSION,
+        "count": len(results),
+        "strings": list(strings),
+        "columns": columns,
+    }
+
+
+def _column_values(column: Dict[str, Any], count: int, strings: List[str]) -> List[Any]:
+    """The column's values for `count` rows, with _MISSING where the key is absent."""
+    kind = column.get("type")
+    missing = set(column.get("missing") or ())
+    present_count = count - len(missing)
+    if kind == "object":
+        nulls = set(column["nulls"])
+        objects: List[Dict[str, Any]] = [{} for _ in range(present_count - len(nulls))]
+        for key, field in column["fields"].items():
+            for obj, value in zip(objects, _column_values(field, len(objects), strings)):
+                if value is not _MISSING:
+                    obj[key] = value
+        remaining = iter(objects)
+        present = [None if i in nulls else next(remaining) for i in range(present_count)]
+    elif kind == "dict":
+        present = [None if value is None else strings[value] for value in column["values"]]
+    elif kind == "dict_list":
+        present = [None if value is None else [strings[item] for item in value] for value in column["values"]]
+    elif kind == "decimal":
+        scale = column["scale"]
+        present = [None if value is None else value / scale for value in column["values"]]
+    elif kind == "plain":
+        present = list(column["values"])
+    else:
+        raise ColumnarError(f"Unknown column type: {kind!r}")
+    if len(present) != present_count:
+        raise ColumnarError("Column length does not match the row count")
+    if not missing:
+        return present
+    values = iter(present)
+    return [_MISSING if i in missing else next(values) for i in range(count)]
+
+
+def decode(document: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Result entries of a columnar document (inverse of encode)."""
+    if document.get("format") != FORMAT or document.get("version") != FORMAT_VERSION:
+        raise ColumnarError("Not a columnar batch document (format/version mismatch)")
+    count = document["count"]
+    rows: List[Dict[str, Any]] = [{} for _ in range(count)]
+    for key, column in document["columns"].items():
+        for row, value in zip(rows, _column_values(column, count, document["strings"])):
+            if value is not _MISSING:
+                row[key] = value
+    return rows
+
+
+def dumps(results: List[Dict[str, Any]]) -> bytes:
+    return msgpack.packb(encode(results), use_bin_type=True)
+
+
+def loads(body: bytes) -> List[Dict[str, Any]]:
+    return decode(msgpack.unpackb(body, raw=False, strict_map_key=False))
+
+
+def response(results: List[Dict[str, Any]]) -> Response:
+    return Response(content=dumps(results), media_type=MEDIA_TYPE, headers={"Vary": "Accept"})
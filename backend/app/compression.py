@@ -0,0 +1,250 @@
+"""
+Response compression negotiated from Accept-Encoding.
+
+CompressionMiddleware is a plain ASGI middleware, so it sees every body
+message as it is sent and works for streaming responses too:
+
+- one-shot bodies (JSON responses) are compressed in one go and get an exact
+  Content-Length; bodies of at least COMPRESSION_THREAD_BYTES are compressed
+  in a worker thread so the event loop keeps serving other requests;
+- streamed bodies (NDJSON batches, job SSE events) are compressed chunk by
+  chunk with a flush after each one, so every line reaches the client as soon
+  as it is produced instead of waiting in the compressor's window.
+
+Codings are tried in the order zstd, br, gzip; zstd and br only when the
+optional `zstandard` / `brotli` packages are installed. Responses are left
+alone when they already carry a Content-Encoding (precompressed demo assets,
+/metrics), when their type is already compressed (images from the proxy,
+which is skipped by path as well), when they are partial (206 or a
+Content-Range: the range refers to the identity bytes, e.g. FileResponse
+range requests on /api/demo-csv), when they say Cache-Control: no-transform,
+or when a one-shot body is smaller than COMPRESSION_MIN_BYTES: the headers
+would cost more than they save.
+
+A compressed response is a different representation, so a strong ETag set by
+the endpoint gets the coding appended (`"<tag>-gzip"`, as precompressed.py
+names its variants); precompressed.etag_matches() accepts either form. A 304
+has no body to compress, so endpoints that revalidate set the coded ETag
+themselves (response_encoding()).
+
+Metrics:
+- http_compression_bytes_total{encoding,direction}: bytes in (uncompressed)
+  and out (compressed). Overall ratio = in / out.
+- http_compression_cpu_seconds_total{encoding}: thread CPU time spent in the
+  compressors.
+- http_compression_ratio{encoding}: per-response ratio histogram.
+- http_compression_skipped_total{reason}: responses left uncompressed although
+  the client accepted a coding (encoded, content_type, partial, no_transform,
+  small).
+"""
+import asyncio
+import os
+import time
+import zlib
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from prometheus_client import Counter, Histogram
+from starlette.datastructures import Headers, MutableHeaders
+
+from .precompressed import choose_encoding, encoded_etag
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - zstandard is optional
+    zstandard = None
+
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "1").strip().lower() in ("1", "true", "yes")
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+COMPRESSION_THREAD_BYTES = int(os.getenv("COMPRESSION_THREAD_BYTES", "262144"))
+# Fast settings: responses are compressed on every request, unlike the precompressed assets.
+GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+ZSTD_LEVEL = int(os.getenv("COMPRESSION_ZSTD_LEVEL", "3"))
+
+SKIP_PATH_PREFIXES = ("/tmdb/image/",)
+INCOMPRESSIBLE_TYPES = ("image/", "video/", "audio/", "application/zip", "application/gzip", "application/zstd")
+
+COMPRESSION_BYTES = Counter(
+    "http_compression_bytes_total",
+    "Response bytes before (in) and after (out) compression.",
+    ["encoding", "direction"],
+)
+COMPRESSION_CPU = Counter(
+    "http_compression_cpu_seconds_total",
+    "Thread CPU time spent compressing responses.",
+    ["encoding"],
+)
+COMPRESSION_RATIO = Histogram(
+    "http_compression_ratio",
+    "Uncompressed / compressed size of each compressed response.",
+    ["encoding"],
+    buckets=(1, 1.5, 2, 3, 4, 6, 8, 12, 16, 32),
+)
+COMPRESSION_SKIPPED = Counter(
+    "http_compression_skipped_total",
+    "Responses sent uncompressed although the client accepted a coding.",
+    ["reason"],
+)
+
+Message = Dict[str, Any]
+Send = Callable[[Message], Awaitable[None]]
+
+
+def available_encodings() -> List[str]:
+    """Supported codings in preference order."""
+    encodings = []
+    if zstandard is not None:
+        encodings.append("zstd")
+    if brotli is not None:
+        encodings.append("br")
+    encodings.append("gzip")
+    return encodings
+
+
+def response_encoding(accept_encoding: Optional[str], body_size: int) -> str:
+    """
+    Coding CompressionMiddleware gives a one-shot body of `body_size` bytes,
+    for endpoints that answer 304 and must send the ETag the 200 would carry.
+    """
+    if not COMPRESSION_ENABLED or body_size < COMPRESSION_MIN_BYTES:
+        return "identity"
+    return choose_encoding(accept_encoding, available_encodings())
+
+
+class Encoder:
+    """Incremental compressor for one response: chunk() flushes, finish() ends the stream."""
+
+    def __init__(self, encoding: str) -> None:
+        self.encoding = encoding
+        self.bytes_in = 0
+        self.bytes_out = 0
+        if encoding == "gzip":
+            self._compressor: Any = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+        elif encoding == "br":
+            self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        elif encoding == "zstd":
+            self._compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+        else:
+            raise ValueError(f"Unsupported encoding: {encoding}")
+
+    def _run(self, data: bytes, final: bool) -> bytes:
+        start = time.thread_time()
+        compressor = self._compressor
+        if self.encoding == "gzip":
+            out = compressor.compress(data) + compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+        elif self.encoding == "br":
+            out = compressor.process(data) + (compressor.finish() if final else compressor.flush())
+        else:
+            flush_mode = zstandard.COMPRESSOBJ_FLUSH_FINISH if final else zstandard.COMPRESSOBJ_FLUSH_BLOCK
+            out = compressor.compress(data) + compressor.flush(flush_mode)
+        COMPRESSION_CPU.labels(encoding=self.encoding).inc(time.thread_time() - start)
+        self.bytes_in += len(data)
+        self.bytes_out += len(out)
+        return out
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._run(data, final=False)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        out = self._run(data, final=True)
+        COMPRESSION_BYTES.labels(encoding=self.encoding, direction="in").inc(self.bytes_in)
+        COMPRESSION_BYTES.labels(encoding=self.encoding, direction="out").inc(self.bytes_out)
+        if self.bytes_out:
+            COMPRESSION_RATIO.labels(encoding=self.encoding).observe(self.bytes_in / self.bytes_out)
+        return out
+
+
+def _skip_reason(status: int, headers: Headers) -> Optional[str]:
+    if "content-encoding" in headers:
+        return "encoded"
+    if status == 206 or "content-range" in headers:
+        return "partial"
+    if "no-transform" in headers.get("cache-control", "").lower():
+        return "no_transform"
+    content_type = headers.get("content-type", "").lower()
+    if content_type.startswith(INCOMPRESSIBLE_TYPES):
+        return "content_type"
+    return None
+
+
+class CompressionMiddleware:
+    def __init__(self, app: Any, minimum_size: int = COMPRESSION_MIN_BYTES) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Message, receive: Any, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"].startswith(SKIP_PATH_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding"), available_encodings())
+        if encoding == "identity":
+            await self.app(scope, receive, send)
+            return
+        await self.app(scope, receive, _CompressingSend(send, encoding, self.minimum_size))
+
+
+class _CompressingSend:
+    """Send wrapper: holds the response start until the first body message decides whether to compress."""
+
+    def __init__(self, send: Send, encoding: str, minimum_size: int) -> None:
+        self.send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.start: Optional[Message] = None
+        self.encoder: Optional[Encoder] = None
+        self.passthrough = False
+
+    async def __call__(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self.start = message
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+        body: bytes = message.get("body", b"")
+        more_body: bool = message.get("more_body", False)
+
+        if self.encoder is not None:
+            data = self.encoder.chunk(body) if more_body else self.encoder.finish(body)
+            await self.send({"type": "http.response.body", "body": data, "more_body": more_body})
+            return
+
+        start, self.start = self.start, None
+        assert start is not None, "response body before response start"
+        headers = MutableHeaders(scope=start)
+        reason = _skip_reason(start["status"], headers)
+        if reason is None and not more_body and len(body) < self.minimum_size:
+            reason = "small"
+        if reason is not None:
+            COMPRESSION_SKIPPED.labels(reason=reason).inc()
+            self.passthrough = True
+            await self.send(start)
+            await self.send(message)
+            return
+
+        self.encoder = Encoder(self.encoding)
+        if more_body:
+            data = self.encoder.chunk(body)
+        elif len(body) >= COMPRESSION_THREAD_BYTES:
+            data = await asyncio.to_thread(self.encoder.finish, body)
+        else:
+            data = self.encoder.finish(body)
+
+        headers["Content-Encoding"] = self.encoding
+        if "accept-encoding" not in headers.get("vary", "").lower():
+            headers.add_vary_header("Accept-Encoding")
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            headers["ETag"] = encoded_etag(etag, self.encoding)
+        if more_body:
+            del headers["Content-Length"]
+        else:
+            headers["Content-Length"] = str(len(data))
+        await self.send(start)
+        await self.send({"type": "http.response.body", "body": data, "more_body": more_body})
+
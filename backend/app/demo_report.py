@@ -0,0 +1,198 @@
+"""
+Compact demo report format.
+
+The report the frontend saves (demo_report_1000.json) holds `filmsLite` and
+`filmsLiteAll` as two full copies of the same film objects, and every film
+repeats its poster URLs although they follow from `poster_path`. The compact
+form stores:
+
+- `fields`: film field names, once;
+- `films`: one array of values per film, in `fields` order;
+- `views`: each film list of the report as indices into `films`;
+- `poster_base`: the image proxy prefix the poster URLs are derived from;
+- `meta`: the remaining report keys (availableYears, fileName, ...);
+- `key_order`: the report's top-level key order.
+
+compat_view() rebuilds the original report shape (same keys, same key order),
+and film_slice() reads a range, a watch year and/or a field subset of the film
+table without materializing the rest.
+"""
+import json
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+FORMAT = "demo-report-compact"
+FORMAT_VERSION = 1
+DEMO_DIR = Path(__file__).resolve().parent.parent / "data" / "demo"
+COMPACT_PATH = DEMO_DIR / "demo_report_1000.compact.json"
+
+# Report keys that are film lists; everything else goes to `meta`.
+VIEW_KEYS = ("filmsLite", "filmsLiteAll")
+# Derived film field -> (field it follows, image size).
+DERIVED_FIELDS = {"poster_url": ("poster_path", "w500"), "poster_url_w342": ("poster_path", "w342")}
+
+
+class DemoReportError(ValueError):
+    """A report that cannot be converted, or a malformed compact report."""
+
+
+def _poster_url(poster_base: str, size: str, poster_path: Optional[str]) -> Optional[str]:
+    return f"{poster_base}/{size}{poster_path}" if poster_path else None
+
+
+def _detect_poster_base(films: Sequence[Dict[str, Any]]) -> str:
+    bases: Counter = Counter()
+    for film in films:
+        url, poster_path = film.get("poster_url"), film.get("poster_path")
+        suffix = f"/w500{poster_path}"
+        if url and poster_path and url.endswith(suffix):
+            bases[url[: -len(suffix)]] += 1
+    return bases.most_common(1)[0][0] if bases else ""
+
+
+def _film_key(film: Dict[str, Any]) -> str:
+    return json.dumps(film, ensure_ascii=False, sort_keys=True)
+
+
+def to_compact(report: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert a report in the frontend's shape to the compact form (lossless, or DemoReportError)."""
+    all_films = [film for key in VIEW_KEYS for film in report.get(key) or []]
+    poster_base = _detect_poster_base(all_films)
+
+    fields: List[str] = []
+    for film in all_films:
+        for key in film:
+            if key not in DERIVED_FIELDS and key not in fields:
+                fields.append(key)
+
+    films: List[List[Any]] = []
+    index_by_key: Dict[str, int] = {}
+    views: Dict[str, List[int]] = {}
+    for view in VIEW_KEYS:
+        if view not in report:
+            continue
+        indices = []
+        for film in report[view] or []:
+            for derived, (source, size) in DERIVED_FIELDS.items():
+                if film.get(derived) != _poster_url(poster_base, size, film.get(source)):
+                    raise DemoReportError(
+                        f"{derived} of {film.get('title')!r} does not follow from {source}; "
+                        "cannot drop it losslessly"
+                    )
+            key = _film_key(film)
+            if key not in index_by_key:
+                index_by_key[key] = len(films)
+                films.append([film.get(field) for field in fields])
+            indices.append(index_by_key[key])
+        views[view] = indices
+
+    return {
+        "format": FORMAT,
+        "version": FORMAT_VERSION,
+        "poster_base": poster_base,
+        "fields": fields,
+        "films": films,
+        "views": views,
+        "meta": {key: value for key, value in report.items() if key not in VIEW_KEYS},
+        "key_order": list(report),
+    }
+
+
+def _check(compact: Dict[str, Any]) -> None:
+    if compact.get("format") != FORMAT or compact.get("version") != FORMAT_VERSION:
+        raise DemoReportError("Not a compact demo report (format/version mismatch)")
+
+
+def _output_fields(fields: Sequence[str]) -> List[str]:
+    """Stored fields with the derived ones inserted after their source field, as in the original films."""
+    output = []
+    for field in fields:
+        output.append(field)
+        output.extend(derived for derived, (source, _) in DERIVED_FIELDS.items() if source == field)
+    return output
+
+
+class FilmTable:
+    """Row access to the compact film table, with derived fields filled in on demand."""
+
+    def __init__(self, compact: Dict[str, Any]) -> None:
+        _check(compact)
+        self.poster_base: str = compact["poster_base"]
+        self.fields: List[str] = compact["fields"]
+        self.rows: List[List[Any]] = compact["films"]
+        self.all_fields = _output_fields(self.fields)
+        self._position = {field: i for i, field in enumerate(self.fields)}
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def film(self, index: int, fields: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+        row = self.rows[index]
+        result = {}
+        for field in fields or self.all_fields:
+            if field in DERIVED_FIELDS:
+                source, size = DERIVED_FIELDS[field]
+                result[field] = _poster_url(self.poster_base, size, row[self._position[source]])
+            else:
+                result[field] = row[self._position[field]]
+        return result
+
+    def watch_year(self, index: int) -> Optional[int]:
+        date = self.rows[index][self._position["date"]] if "date" in self._position else None
+        return int(date[:4]) if isinstance(date, str) and date[:4].isdigit() else None
+
+
+def compat_view(compact: Dict[str, Any]) -> Dict[str, Any]:
+    """The report in its original shape (filmsLite, filmsLiteAll, availableYears, ...)."""
+    table = FilmTable(compact)
+    report: Dict[str, Any] = {}
+    for key in compact.get("key_order") or [*compact["views"], *compact["meta"]]:
+        if key in compact["views"]:
+            report[key] = [table.film(i) for i in compact["views"][key]]
+        else:
+            report[key] = compact["meta"][key]
+    return report
+
+
+def film_slice(
+    table: FilmTable,
+    offset: int = 0,
+    limit: Optional[int] = None,
+    year: Optional[int] = None,
+    fields: Optional[Sequence[str]] = None,
+) -> Dict[str, Any]:
+    """
+    Films `offset`..`offset + limit` of the table (after filtering by watch
+    `year`), each with only `fields` (all by default, derived ones included).
+    """
+    unknown = [field for field in fields or [] if field not in table.all_fields]
+    if unknown:
+        raise DemoReportError(f"Unknown fields: {', '.join(unknown)}")
+    indices = range(len(table)) if year is None else [i for i in range(len(table)) if table.watch_year(i) == year]
+    end = len(indices) if limit is None else offset + limit
+    return {
+        "total": len(indices),
+        "offset": offset,
+        "fields": list(fields or table.all_fields),
+        "films": [table.film(i, fields) for i in indices[offset:end]],
+    }
+
+
+def dump_compact(compact: Dict[str, Any]) -> str:
+    """Compact JSON text with one film per line, so regenerated files diff by film."""
+    parts = []
+    for key, value in compact.items():
+        if key == "films":
+            rows = ",\n".join(json.dumps(row, ensure_ascii=False, separators=(",", ":")) for row in value)
+            parts.append(f'"films":[\n{rows}\n]')
+        else:
+            parts.append(f"{json.dumps(key)}:{json.dumps(value, ensure_ascii=False, separators=(',', ':'))}")
+    return "{\n" + ",\n".join(parts) + "\n}\n"
+
+
+def load_compact(path: Path = COMPACT_PATH) -> Dict[str, Any]:
+    with open(path, "r", encoding="utf-8") as f:
+        compact = json.load(f)
+    _check(compact)
+    return compact
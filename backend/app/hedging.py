@@ -0,0 +1,176 @@
+"""
+Hedged TMDb requests.
+
+A batch waits on asyncio.gather for every item, so one slow upstream call sets
+the batch's wall-clock time. With hedging enabled (TMDB_HEDGE_ENABLED=1), a call
+still running after the observed p95 latency of its endpoint gets a duplicate,
+but only if the rate budget has a spare token right now. Hedges never wait for
+budget. Whichever call answers first wins, and the other is cancelled.
+
+Latency is tracked per endpoint over the last HEDGE_WINDOW primary calls,
+whether they answer, fail or are cancelled. A primary cancelled because its
+hedge won is recorded at its elapsed time, a lower bound of its real latency;
+leaving it out would shrink p95 towards the calls that beat the hedge delay.
+Hedging starts once HEDGE_MIN_SAMPLES are recorded.
+
+Metrics:
+- tmdb_hedge_calls_total{endpoint,result}: result is not_hedged, no_budget,
+  primary_won or hedge_won. Only calls made while hedging is armed (enabled
+  and HEDGE_MIN_SAMPLES recorded) are counted, so the hedge rate is
+  (primary_won + hedge_won) / sum over all four results, of armed calls.
+- tmdb_hedge_latency_saved_seconds_total{endpoint}: estimated saving when the
+  hedge wins. The cancelled primary would have taken at least as long as the
+  mean of the slow tail (calls above p95); the saving counted is that mean
+  minus the actual latency.
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+import httpx
+from prometheus_client import Counter
+
+from . import tmdb_keys
+
+logger = logging.getLogger(__name__)
+
+HEDGE_ENABLED = os.getenv("TMDB_HEDGE_ENABLED", "0").strip().lower() in ("1", "true", "yes")
+HEDGE_QUANTILE = float(os.getenv("TMDB_HEDGE_QUANTILE", "0.95"))
+HEDGE_MIN_DELAY_S = float(os.getenv("TMDB_HEDGE_MIN_DELAY_S", "0.05"))
+HEDGE_WINDOW = 500
+HEDGE_MIN_SAMPLES = 50
+
+HEDGE_CALLS = Counter(
+    "tmdb_hedge_calls_total",
+    "TMDb upstream calls by hedging outcome.",
+    ["endpoint", "result"],
+)
+HEDGE_LATENCY_SAVED = Counter(
+    "tmdb_hedge_latency_saved_seconds_total",
+    "Estimated latency saved by hedges that answered before the primary call.",
+    ["endpoint"],
+)
+
+
+class LatencyTracker:
+    """Rolling window of call latencies for one endpoint."""
+
+    def __init__(self, size: int = HEDGE_WINDOW) -> None:
+        self._samples: Deque[float] = deque(maxlen=size)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def tail_mean(self, threshold: float) -> Optional[float]:
+        tail = [s for s in self._samples if s >= threshold]
+        if not tail:
+            return None
+        return sum(tail) / len(tail)
+
+
+_trackers: Dict[str, LatencyTracker] = {}
+
+
+def tracker(endpoint: str) -> LatencyTracker:
+    if endpoint not in _trackers:
+        _trackers[endpoint] = LatencyTracker()
+    return _trackers[endpoint]
+
+
+def hedge_delay(endpoint: str) -> Optional[float]:
+    """Seconds after which a call to `endpoint` gets hedged, or None if hedging is off."""
+    if not HEDGE_ENABLED:
+        return None
+    latencies = tracker(endpoint)
+    if len(latencies) < HEDGE_MIN_SAMPLES:
+        return None
+    p = latencies.quantile(HEDGE_QUANTILE)
+    if p is None:
+        return None
+    return max(HEDGE_MIN_DELAY_S, p)
+
+
+async def _cancel(task: "asyncio.Future[Any]") -> None:
+    task.cancel()
+    try:
+        await task
+    except BaseException:
+        pass
+
+
+async def get(
+    client: httpx.AsyncClient,
+    endpoint: str,
+    url: str,
+    params: Dict[str, Any],
+    key: Optional[str],
+    timeout: float,
+) -> Tuple[httpx.Response, Optional[str]]:
+    """
+    GET `url` with the pool `key`, hedging when the call is slow.
+    Returns (response, key that produced it) so the caller reports the right key.
+    """
+    latencies = tracker(endpoint)
+    start = time.monotonic()
+    delay = hedge_delay(endpoint)
+    if delay is None:
+        try:
+            return await client.get(url, params=tmdb_keys.with_key(params, key), timeout=timeout), key
+        finally:
+            latencies.record(time.monotonic() - start)
+
+    primary = asyncio.ensure_future(client.get(url, params=tmdb_keys.with_key(params, key), timeout=timeout))
+    # Fires when the primary answers, fails or is cancelled after losing to its hedge.
+    primary.add_done_callback(lambda _: latencies.record(time.monotonic() - start))
+    tasks = [primary]
+    try:
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            HEDGE_CALLS.labels(endpoint=endpoint, result="not_hedged").inc()
+            return primary.result(), key
+
+        got_token, hedge_key = await tmdb_keys.try_acquire_now()
+        if not got_token:
+            HEDGE_CALLS.labels(endpoint=endpoint, result="no_budget").inc()
+            return await primary, key
+
+        hedge = asyncio.ensure_future(
+            client.get(url, params=tmdb_keys.with_key(params, hedge_key), timeout=timeout)
+        )
+        tasks.append(hedge)
+        keys = {primary: key, hedge: hedge_key}
+        pending = {primary, hedge}
+        while True:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            # Prefer a task that produced a response; an error only wins when both failed.
+            winner = next((t for t in done if t.exception() is None), None)
+            if winner is None and pending:
+                continue
+            winner = winner or next(iter(done))
+            break
+
+        elapsed = time.monotonic() - start
+        if winner is hedge:
+            HEDGE_CALLS.labels(endpoint=endpoint, result="hedge_won").inc()
+            tail = latencies.tail_mean(delay)
+            if tail is not None and tail > elapsed:
+                HEDGE_LATENCY_SAVED.labels(endpoint=endpoint).inc(tail - elapsed)
+        else:
+            HEDGE_CALLS.labels(endpoint=endpoint, result="primary_won").inc()
+        return winner.result(), keys[winner]
+    finally:
+        for task in tasks:
+            if not task.done():
+                await _cancel(task)
@@ -0,0 +1,283 @@
+"""
+SQLite checkpoints for analysis jobs (app/jobs.py).
+
+A job's rows, status and event log are written to a small SQLite file
+(JOB_STORE_DB, default app/jobs.db) as the job runs. Events are appended in
+batches, so a crash loses at most the last few items, which the resumed job
+simply fetches again (mostly from the TMDb cache).
+
+- Clients reconnect to /api/jobs/{id}/events with Last-Event-ID and get only
+  events they have not seen, even after a restart.
+- On startup, jobs still marked queued/running are loaded and resumed.
+
+Several workers can share one file. A job is run by the worker holding its
+lease (owner, lease_until): save_job() takes it for new jobs, claim() takes
+it for unfinished jobs whose owner released it or stopped renewing it for
+JOB_LEASE_S, and checkpoint() writes nothing once the lease has moved on.
+Other workers serve the job's events from the store (load_events). Leases
+compare wall-clock time.time() across processes, so workers need roughly
+synchronised clocks.
+
+The store is one connection behind a lock; callers run it via
+asyncio.to_thread. Until init_job_store() runs, every call is a no-op, so
+tests and scripts that never start the app stay in memory.
+"""
+import json
+import logging
+import os
+import sqlite3
+import socket
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_DIR = os.path.dirname(os.path.abspath(__file__))
+DB_PATH = os.getenv("JOB_STORE_DB") or os.path.join(_DIR, "jobs.db")
+JOB_LEASE_S = float(os.getenv("JOB_LEASE_S", "60"))
+
+# Lease owner name for this process.
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+_conn: Optional[sqlite3.Connection] = None
+_lock = threading.Lock()
+
+
+def init_job_store(db_path: Optional[str] = None) -> None:
+    """Open the store and create tables. Run once per process on startup."""
+    global _conn
+    path = db_path or DB_PATH
+    conn = sqlite3.connect(path, timeout=15.0, check_same_thread=False)
+    conn.executescript("""
+        PRAGMA journal_mode=WAL;
+        PRAGMA synchronous=NORMAL;
+        CREATE TABLE IF NOT EXISTS jobs (
+            job_id TEXT PRIMARY KEY,
+            rows_json TEXT NOT NULL,
+            status TEXT NOT NULL,
+            error TEXT,
+            created_at REAL NOT NULL,
+            finished_at REAL,
+            base_digest TEXT,
+            owner TEXT,
+            lease_until REAL
+        );
+        CREATE INDEX IF NOT EXISTS ix_jobs_status ON jobs(status);
+
+        CREATE TABLE IF NOT EXISTS job_events (
+            job_id TEXT NOT NULL,
+            seq INTEGER NOT NULL,
+            event TEXT NOT NULL,
+            data_json TEXT NOT NULL,
+            PRIMARY KEY (job_id, seq)
+        );
+    """)
+    _migrate_lease_columns(conn)
+    conn.commit()
+    with _lock:
+        if _conn is not None:
+            _conn.close()
+        _conn = conn
+
+
+def _migrate_lease_columns(conn: sqlite3.Connection) -> None:
+    """Add base_digest and the lease columns to job tables created without them."""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+    for column, kind in (("base_digest", "TEXT"), ("owner", "TEXT"), ("lease_until", "REAL")):
+        if column not in columns:
+            conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+
+
+def close_job_store() -> None:
+    global _conn
+    with _lock:
+        if _conn is not None:
+            _conn.close()
+            _conn = None
+
+
+def enabled() -> bool:
+    return _conn is not None
+
+
+def save_job(
+    job_id: str,
+    rows: List[Dict[str, Any]],
+    status: str,
+    created_at: float,
+    base_digest: Optional[str] = None,
+) -> None:
+    """Store a new job, leased to this worker. A job that is already stored is left as is."""
+    with _lock:
+        if _conn is None:
+            return
+        _conn.execute(
+            "INSERT OR IGNORE INTO jobs (job_id, rows_json, status, created_at, base_digest, owner, lease_until)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                job_id,
+                json.dumps(rows, ensure_ascii=False),
+                status,
+                created_at,
+                base_digest,
+                WORKER_ID,
+                time.time() + JOB_LEASE_S,
+            ),
+        )
+        _conn.commit()
+
+
+def claim(job_id: str, statuses: List[str]) -> bool:
+    """
+    Lease a job in one of `statuses` to this worker if nobody holds it (no
+    owner, or the owner's lease expired). True if this worker now owns it.
+    """
+    now = time.time()
+    placeholders = ",".join("?" * len(statuses))
+    with _lock:
+        if _conn is None:
+            return True
+        cur = _conn.execute(
+            f"UPDATE jobs SET owner = ?, lease_until = ? WHERE job_id = ? AND status IN ({placeholders})"
+            " AND (owner IS NULL OR owner = ? OR lease_until IS NULL OR lease_until < ?)",
+            (WORKER_ID, now + JOB_LEASE_S, job_id, *statuses, WORKER_ID, now),
+        )
+        _conn.commit()
+    return cur.rowcount == 1
+
+
+def renew_lease(job_id: str) -> bool:
+    """Extend this worker's lease on a job. False if another worker took it over."""
+    with _lock:
+        if _conn is None:
+            return True
+        cur = _conn.execute(
+            "UPDATE jobs SET lease_until = ? WHERE job_id = ? AND owner = ?",
+            (time.time() + JOB_LEASE_S, job_id, WORKER_ID),
+        )
+        _conn.commit()
+    return cur.rowcount == 1
+
+
+def release(job_id: str) -> None:
+    """Give up this worker's lease so another worker can claim the job right away."""
+    with _lock:
+        if _conn is None:
+            return
+        _conn.execute(
+            "UPDATE jobs SET owner = NULL, lease_until = NULL WHERE job_id = ? AND owner = ?",
+            (job_id, WORKER_ID),
+        )
+        _conn.commit()
+
+
+def checkpoint(
+    job_id: str,
+    events: List[Dict[str, Any]],
+    status: str,
+    error: Optional[str] = None,
+    finished_at: Optional[float] = None,
+) -> bool:
+    """
+    Append `events` and update the job's status in one transaction. Writes
+    nothing and returns False if this worker no longer holds the job's lease.
+    """
+    with _lock:
+        if _conn is None:
+            return True
+        cur = _conn.execute(
+            "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE job_id = ? AND owner = ?",
+            (status, error, finished_at, job_id, WORKER_ID),
+        )
+        if cur.rowcount != 1:
+            _conn.rollback()
+            return False
+        _conn.executemany(
+            "INSERT OR IGNORE INTO job_events (job_id, seq, event, data_json) VALUES (?, ?, ?, ?)",
+            [
+                (job_id, e["seq"], e["event"], json.dumps(e["data"], ensure_ascii=False))
+                for e in events
+            ],
+        )
+        _conn.commit()
+    return True
+
+
+def load_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """Stored job as {job_id, rows, base_digest, status, error, created_at, finished_at, events}."""
+    with _lock:
+        if _conn is None:
+            return None
+        row = _conn.execute(
+            "SELECT job_id, rows_json, base_digest, status, error, created_at, finished_at FROM jobs WHERE job_id = ?",
+            (job_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        events = _select_events(job_id, 0)
+    return {
+        "job_id": row[0],
+        "rows": json.loads(row[1]),
+        "base_digest": row[2],
+        "status": row[3],
+        "error": row[4],
+        "created_at": row[5],
+        "finished_at": row[6],
+        "events": events,
+    }
+
+
+def load_events(job_id: str, after: int) -> Optional[Dict[str, Any]]:
+    """A job's status and the stored events with seq > `after`: {status, error, finished_at, events}."""
+    with _lock:
+        if _conn is None:
+            return None
+        row = _conn.execute(
+            "SELECT status, error, finished_at FROM jobs WHERE job_id = ?",
+            (job_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        events = _select_events(job_id, after)
+    return {"status": row[0], "error": row[1], "finished_at": row[2], "events": events}
+
+
+def _select_events(job_id: str, after: int) -> List[Dict[str, Any]]:
+    rows = _conn.execute(
+        "SELECT seq, event, data_json FROM job_events WHERE job_id = ? AND seq > ? ORDER BY seq",
+        (job_id, after),
+    ).fetchall()
+    return [{"seq": seq, "event": event, "data": json.loads(data)} for seq, event, data in rows]
+
+
+def unfinished_job_ids(statuses: List[str]) -> List[str]:
+    with _lock:
+        if _conn is None:
+            return []
+        placeholders = ",".join("?" * len(statuses))
+        rows = _conn.execute(
+            f"SELECT job_id FROM jobs WHERE status IN ({placeholders}) ORDER BY created_at",
+            statuses,
+        ).fetchall()
+    return [r[0] for r in rows]
+
+
+def delete_finished_before(cutoff: float) -> int:
+    """Drop jobs that finished before `cutoff` (epoch seconds). Returns how many."""
+    with _lock:
+        if _conn is None:
+            return 0
+        ids = [
+            r[0] for r in _conn.execute(
+                "SELECT job_id FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?",
+                (cutoff,),
+            ).fetchall()
+        ]
+        if ids:
+            placeholders = ",".join("?" * len(ids))
+            _conn.execute(f"DELETE FROM job_events WHERE job_id IN ({placeholders})", ids)
+            _conn.execute(f"DELETE FROM jobs WHERE job_id IN ({placeholders})", ids)
+            _conn.commit()
+    return len(ids)
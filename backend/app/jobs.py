@@ -0,0 +1,554 @@
+"""
+Server-side analysis jobs.
+
+The browser used to drive enrichment itself (runStagedAnalysis in
+frontend/src/utils/tmdbProxyClient.ts): chunk rows, call /tmdb/search/batch,
+then /tmdb/movies/full/batch, one round trip per chunk and at most 500 items
+each. A job runs the same stages on the server as one pipeline:
+
+1. Rows are deduplicated by the frontend's searchKey (`title.trim().lower():year`).
+2. Unique keys go through the streaming search; every match is queued for
+   full metadata right away, so details for early matches load while later
+   titles are still being searched.
+3. Matched ids are resolved in chunks through the streaming full batch.
+
+Everything a client needs is appended to the job's event log, and
+GET /api/jobs/{id}/events streams it as Server-Sent Events:
+
+- progress: {stage: tmdb_search|tmdb_details, done, total}
+- search:   {indices, title, year, tmdb_id, error} per unique key
+- details:  full-batch entry per matched tmdb id (rows map to ids via `search`)
+- done / failed: final status (last event)
+
+There is no per-job item cap beyond JOB_MAX_ROWS; the bounded batch pipeline
+keeps memory flat. Finished jobs are dropped after JOB_TTL_S.
+
+Finished reports are also stored whole in the cache's report_cache, keyed by
+the digest of the job's unique search keys (report_digest). A job whose row set
+was seen before replays the stored report as its events in one read; with
+`base_digest` (the digest of a previous upload) only rows missing from that
+report go upstream. The `done` event carries the digest for the next upload.
+
+Jobs are checkpointed to app/job_store.py every CHECKPOINT_EVERY events. A
+client that reconnects with Last-Event-ID only gets the events after it, and
+jobs interrupted by a restart resume from their last checkpoint: searched rows
+and fetched details already in the log are not requested again.
+
+With several workers on one job store, a job runs on the worker holding its
+lease (see job_store). That worker renews the lease every JOB_LEASE_S / 3; the
+others serve the job from the store, polling its checkpoints every
+FOLLOW_POLL_S, so they trail the owner by up to CHECKPOINT_EVERY events. Every
+JOB_LEASE_S each worker claims jobs whose lease was released or has expired
+and resumes them, so a job outlives the worker that started it.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import time
+import uuid
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from prometheus_client import Counter, Gauge
+
+from . import cache, job_store, tmdb_batch, tmdb_batch_movies
+
+logger = logging.getLogger(__name__)
+
+JOB_MAX_ROWS = int(os.getenv("JOB_MAX_ROWS", "20000"))
+JOB_UPLOAD_MAX_BYTES = int(os.getenv("JOB_UPLOAD_MAX_BYTES", str(32 * 1024 * 1024)))
+JOB_TTL_S = float(os.getenv("JOB_TTL_S", "3600"))
+DETAILS_CHUNK = 100
+PROGRESS_EVERY = 25
+CHECKPOINT_EVERY = 25
+FOLLOW_POLL_S = float(os.getenv("JOB_FOLLOW_POLL_S", "1.0"))
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+TERMINAL_EVENTS = (DONE, FAILED)
+UNFINISHED = [QUEUED, RUNNING]
+
+JOBS_RUNNING = Gauge("analysis_jobs_running", "Analysis jobs currently running.")
+JOBS_FINISHED = Counter("analysis_jobs_finished_total", "Analysis jobs finished, by status.", ["status"])
+REPORT_CACHE = Counter(
+    "analysis_report_cache_total",
+    "Stored-report lookups for new jobs: hit (same row set), delta (base_digest) or miss.",
+    ["result"],
+)
+
+
+class LeaseLost(Exception):
+    """Another worker took over the job's lease; this worker stops running it."""
+
+
+def search_key(title: str, year: Optional[int]) -> str:
+    """Same key as the frontend's searchKey(): rows with equal keys share one lookup."""
+    return f"{(title or '').strip().lower()}:{year or 0}"
+
+
+def report_digest(rows: List[Dict[str, Any]]) -> str:
+    """Digest of a row set: sha256 over its sorted unique search keys."""
+    keys = sorted({search_key(row["title"], row.get("year")) for row in rows})
+    return hashlib.sha256("\n".join(keys).encode("utf-8")).hexdigest()
+
+
+class Job:
+    def __init__(self, job_id: str, rows: List[Dict[str, Any]], base_digest: Optional[str] = None) -> None:
+        self.id = job_id
+        self.rows = rows
+        self.digest = report_digest(rows)
+        self.base_digest = base_digest
+        self.status = QUEUED
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.events: List[Dict[str, Any]] = []
+        self.progress: Dict[str, Dict[str, int]] = {}
+        self.task: Optional["asyncio.Task[None]"] = None
+        # Number of events already written to the job store.
+        self.saved = 0
+        # Run by another worker: events come from the job store, not from emit().
+        self.follower = False
+        self.lease_lost = False
+        self._changed = asyncio.Event()
+
+    @classmethod
+    def from_stored(cls, stored: Dict[str, Any]) -> "Job":
+        job = cls(stored["job_id"], stored["rows"], stored["base_digest"])
+        job.created_at = stored["created_at"]
+        job._apply_stored(stored)
+        return job
+
+    def _apply_stored(self, stored: Dict[str, Any]) -> None:
+        """Take status and new events from a job_store.load_job/load_events result."""
+        self.status = stored["status"]
+        self.error = stored["error"]
+        self.finished_at = stored["finished_at"]
+        self.events.extend(stored["events"])
+        self.saved = len(self.events)
+        for event in stored["events"]:
+            if event["event"] == "progress":
+                data = event["data"]
+                self.progress[data["stage"]] = {"done": data["done"], "total": data["total"]}
+
+    @property
+    def finished(self) -> bool:
+        return self.status in TERMINAL_EVENTS
+
+    def emit(self, event: str, data: Dict[str, Any]) -> None:
+        self.events.append({"seq": len(self.events) + 1, "event": event, "data": data})
+        # Wake every subscriber, then arm a fresh event for the next append.
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def set_progress(self, stage: str, done: int, total: int, force: bool = False) -> None:
+        self.progress[stage] = {"done": done, "total": total}
+        if force or done == total or done % PROGRESS_EVERY == 0:
+            self.emit("progress", {"stage": stage, "done": done, "total": total})
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "digest": self.digest,
+            "total": len(self.rows),
+            "progress": self.progress,
+            "error": self.error,
+            "events": len(self.events),
+        }
+
+    async def subscribe(self, after: int = 0) -> AsyncIterator[Dict[str, Any]]:
+        """Yield events with seq > `after`, waiting for new ones until the job finishes."""
+        cursor = after
+        while True:
+            changed = self._changed
+            while cursor < len(self.events):
+                event = self.events[cursor]
+                cursor += 1
+                yield event
+            if self.finished and cursor >= len(self.events):
+                return
+            if self.follower:
+                await asyncio.sleep(FOLLOW_POLL_S)
+                await self._poll_store()
+            else:
+                await changed.wait()
+
+    async def _poll_store(self) -> None:
+        stored = await asyncio.to_thread(job_store.load_events, self.id, len(self.events))
+        if stored is None:
+            # Dropped from the store; end the stream rather than poll forever.
+            self.status = FAILED
+            self.error = "Job no longer in the job store"
+            return
+        self._apply_stored(stored)
+
+
+_jobs: Dict[str, Job] = {}
+_reclaimer: Optional["asyncio.Task[None]"] = None
+
+
+def _purge_expired() -> None:
+    now = time.time()
+    expired = [
+        job_id for job_id, job in _jobs.items()
+        if job.finished_at is not None and now - job.finished_at > JOB_TTL_S
+    ]
+    for job_id in expired:
+        del _jobs[job_id]
+
+
+async def get_job(job_id: str) -> Optional[Job]:
+    """
+    Job from memory, or from the store: a finished job (e.g. after a restart),
+    or an unfinished one another worker runs, which then follows the store.
+    """
+    job = _jobs.get(job_id)
+    if job is not None or not job_store.enabled():
+        return job
+    stored = await asyncio.to_thread(job_store.load_job, job_id)
+    if stored is None:
+        return None
+    job = Job.from_stored(stored)
+    if job.finished:
+        _jobs[job_id] = job
+    else:
+        # Not cached: the next request reloads whatever the owner checkpointed since.
+        job.follower = True
+    return job
+
+
+def create_job(rows: List[Dict[str, Any]], api_key: str, base_digest: Optional[str] = None) -> Job:
+    """
+    Register a job for `rows` ({title, year}) and start it in the background.
+    `base_digest` names a previous report whose entries can be reused.
+    """
+    _purge_expired()
+    job = Job(uuid.uuid4().hex, rows, base_digest)
+    _jobs[job.id] = job
+    job.task = asyncio.ensure_future(_run(job, api_key))
+    return job
+
+
+async def resume_unfinished(api_key: str) -> List[Job]:
+    """
+    Restart jobs left queued/running in the store by a previous process, and
+    keep claiming jobs whose lease lapses (see _reclaim_loop).
+    """
+    global _reclaimer
+    if not job_store.enabled():
+        return []
+    await asyncio.to_thread(job_store.delete_finished_before, time.time() - JOB_TTL_S)
+    resumed = await _resume_claimable(api_key)
+    if _reclaimer is None or _reclaimer.done():
+        _reclaimer = asyncio.ensure_future(_reclaim_loop(api_key))
+    return resumed
+
+
+async def _resume_claimable(api_key: str) -> List[Job]:
+    resumed = []
+    for job_id in await asyncio.to_thread(job_store.unfinished_job_ids, UNFINISHED):
+        if job_id in _jobs:
+            continue
+        # Another worker may hold the lease, or claim the job between these two calls.
+        if not await asyncio.to_thread(job_store.claim, job_id, UNFINISHED):
+            continue
+        stored = await asyncio.to_thread(job_store.load_job, job_id)
+        if stored is None:
+            continue
+        job = Job.from_stored(stored)
+        _jobs[job.id] = job
+        job.task = asyncio.ensure_future(_run(job, api_key))
+        resumed.append(job)
+    if resumed:
+        logger.info("Resumed %s unfinished analysis job(s)", len(resumed))
+    return resumed
+
+
+async def _reclaim_loop(api_key: str) -> None:
+    """Resume jobs whose owner released them or stopped renewing the lease."""
+    while True:
+        await asyncio.sleep(job_store.JOB_LEASE_S)
+        try:
+            await _resume_claimable(api_key)
+        except Exception as exc:
+            logger.warning("Reclaiming analysis jobs failed: %s", exc)
+
+
+async def shutdown() -> None:
+    """
+    Stop running jobs, checkpointing each and releasing its lease; they stay
+    unfinished and resume on the next start or on another worker.
+    """
+    tasks = [job.task for job in _jobs.values() if job.task is not None and not job.task.done()]
+    if _reclaimer is not None and not _reclaimer.done():
+        tasks.append(_reclaimer)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def _checkpoint(job: Job, force: bool = False) -> None:
+    """Write unsaved events and the current status, every CHECKPOINT_EVERY events or when forced."""
+    unsaved = job.events[job.saved:]
+    if not job_store.enabled() or (not force and len(unsaved) < CHECKPOINT_EVERY):
+        return
+    saved = job.saved
+    job.saved = len(job.events)
+    written = await asyncio.shield(
+        asyncio.to_thread(job_store.checkpoint, job.id, unsaved, job.status, job.error, job.finished_at)
+    )
+    if not written:
+        # Concurrent checkpoints may have failed too; keep the lowest count actually written.
+        job.saved = min(job.saved, saved)
+        raise LeaseLost(job.id)
+
+
+async def _hold_lease(job: Job, task: "asyncio.Task[None]") -> None:
+    """Renew the job's lease until cancelled; stop `task` if another worker took the job over."""
+    while True:
+        await asyncio.sleep(job_store.JOB_LEASE_S / 3)
+        try:
+            renewed = await asyncio.to_thread(job_store.renew_lease, job.id)
+        except Exception as exc:
+            logger.warning("Lease renewal failed for job %s: %s", job.id, exc)
+            continue
+        if not renewed:
+            job.lease_lost = True
+            task.cancel()
+            return
+
+
+def _follow(job: Job) -> None:
+    """
+    Hand a job this worker lost to the store: drop the events the new owner
+    never saw and have subscribers poll the store from there.
+    """
+    logger.warning("Analysis job %s was taken over by another worker", job.id)
+    del job.events[job.saved:]
+    job.follower = True
+    if _jobs.get(job.id) is job:
+        del _jobs[job.id]
+    job._changed.set()
+
+
+def _unique_searches(rows: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[List[int]]]:
+    """Unique {title, year} items (first spelling wins) and the row indices of each."""
+    items: List[Dict[str, Any]] = []
+    indices: List[List[int]] = []
+    position: Dict[str, int] = {}
+    for i, row in enumerate(rows):
+        key = search_key(row["title"], row.get("year"))
+        if key not in position:
+            position[key] = len(items)
+            items.append({"title": row["title"].strip(), "year": row.get("year")})
+            indices.append([])
+        indices[position[key]].append(i)
+    return items, indices
+
+
+def _finish(job: Job, status: str, error: Optional[str] = None) -> None:
+    job.status = status
+    job.error = error
+    job.finished_at = time.time()
+    if status == DONE:
+        job.emit(DONE, {"status": DONE, "progress": job.progress, "digest": job.digest})
+    else:
+        job.emit(FAILED, {"status": FAILED, "error": error})
+    JOBS_FINISHED.labels(status=status).inc()
+
+
+async def _run(job: Job, api_key: str) -> None:
+    job.status = RUNNING
+    JOBS_RUNNING.inc()
+    lease = asyncio.ensure_future(_hold_lease(job, asyncio.current_task())) if job_store.enabled() else None
+    try:
+        try:
+            await asyncio.to_thread(
+                job_store.save_job, job.id, job.rows, job.status, job.created_at, job.base_digest
+            )
+            await _run_pipeline(job, api_key)
+            _finish(job, DONE)
+        except asyncio.CancelledError:
+            if job.lease_lost:
+                raise LeaseLost(job.id)
+            # Shutdown: keep what was done; the job stays unfinished in the store.
+            await _checkpoint(job, force=True)
+            await asyncio.to_thread(job_store.release, job.id)
+            raise
+        except LeaseLost:
+            raise
+        except Exception as exc:
+            logger.exception("Analysis job %s failed: %s", job.id, exc)
+            _finish(job, FAILED, str(exc))
+        finally:
+            JOBS_RUNNING.dec()
+        await _checkpoint(job, force=True)
+    except LeaseLost:
+        _follow(job)
+    finally:
+        if lease is not None:
+            lease.cancel()
+
+
+async def _load_report(digest: str) -> Optional[List[Dict[str, Any]]]:
+    try:
+        return await asyncio.to_thread(cache.get_report, digest)
+    except Exception as exc:
+        logger.warning("Report cache read failed for %s: %s", digest, exc)
+        return None
+
+
+async def _seed_from_report(job: Job, items: List[Dict[str, Any]], indices: List[List[int]]) -> bool:
+    """
+    Emit search/details events for every item a stored report already covers
+    (this row set's report, else the base_digest one). Returns True on an
+    exact hit. The pipeline then treats those items like a resumed job would.
+    """
+    report = await _load_report(job.digest)
+    exact = report is not None
+    if report is None and job.base_digest:
+        report = await _load_report(job.base_digest)
+    if report is None:
+        REPORT_CACHE.labels(result="miss").inc()
+        return False
+    REPORT_CACHE.labels(result="hit" if exact else "delta").inc()
+
+    films = {film["key"]: film for film in report}
+    emitted_ids = set()
+    for position, item in enumerate(items):
+        film = films.get(search_key(item["title"], item.get("year")))
+        if film is None:
+            continue
+        job.emit(
+            "search",
+            {
+                "indices": indices[position],
+                "title": item["title"],
+                "year": item.get("year"),
+                "tmdb_id": film["tmdb_id"],
+                "error": None,
+            },
+        )
+        if film["details"] is not None and film["tmdb_id"] not in emitted_ids:
+            emitted_ids.add(film["tmdb_id"])
+            job.emit("details", film["details"])
+    return exact
+
+
+def _report_from_events(job: Job, items: List[Dict[str, Any]], position_by_row: Dict[int, int]) -> List[Dict[str, Any]]:
+    """Enriched film list for the report cache; failed searches and details are left out."""
+    details = {
+        e["data"]["tmdb_id"]: e["data"]
+        for e in job.events
+        if e["event"] == "details" and not e["data"].get("error") and not e["data"].get("stale")
+    }
+    films = []
+    for event in job.events:
+        data = event["data"]
+        if event["event"] != "search" or data["error"]:
+            continue
+        item = items[position_by_row[data["indices"][0]]]
+        films.append({
+            "key": search_key(item["title"], item.get("year")),
+            "tmdb_id": data["tmdb_id"],
+            "details": details.get(data["tmdb_id"]) if data["tmdb_id"] else None,
+        })
+    return films
+
+
+async def _store_report(job: Job, items: List[Dict[str, Any]], position_by_row: Dict[int, int]) -> None:
+    films = _report_from_events(job, items, position_by_row)
+    if not films:
+        return
+    try:
+        await asyncio.to_thread(cache.set_report, job.digest, films)
+    except Exception as exc:
+        logger.warning("Report cache write failed for job %s: %s", job.id, exc)
+
+
+async def _run_pipeline(job: Job, api_key: str) -> None:
+    items, indices = _unique_searches(job.rows)
+    position_by_row = {rows[0]: position for position, rows in enumerate(indices)}
+    id_queue: "asyncio.Queue[Optional[int]]" = asyncio.Queue()
+
+    exact_hit = False
+    if not job.events:
+        exact_hit = await _seed_from_report(job, items, indices)
+
+    # A resumed job skips what its event log already covers.
+    searched_positions = set()
+    matched_ids: List[int] = []
+    detailed_ids = set()
+    for event in job.events:
+        data = event["data"]
+        if event["event"] == "search":
+            searched_positions.add(position_by_row[data["indices"][0]])
+            if data["tmdb_id"] and data["tmdb_id"] not in matched_ids:
+                matched_ids.append(data["tmdb_id"])
+        elif event["event"] == "details":
+            detailed_ids.add(data["tmdb_id"])
+    queued_ids = set(matched_ids)
+    for tmdb_id in matched_ids:
+        if tmdb_id not in detailed_ids:
+            id_queue.put_nowait(tmdb_id)
+    pending = [position for position in range(len(items)) if position not in searched_positions]
+    details_total = len(queued_ids)
+    details_done = len(detailed_ids)
+    details_known = details_done
+
+    async def details_stage() -> None:
+        nonlocal details_done
+        search_finished = False
+        while not search_finished:
+            first = await id_queue.get()
+            if first is None:
+                break
+            chunk = [first]
+            while len(chunk) < DETAILS_CHUNK and not id_queue.empty():
+                next_id = id_queue.get_nowait()
+                if next_id is None:
+                    search_finished = True
+                    break
+                chunk.append(next_id)
+            async for _, entry in tmdb_batch_movies.full_batch_stream(chunk, api_key):
+                details_done += 1
+                job.emit("details", entry)
+                job.set_progress("tmdb_details", details_done, details_total)
+                await _checkpoint(job)
+
+    details = asyncio.ensure_future(details_stage())
+    try:
+        searched = len(items) - len(pending)
+        job.set_progress("tmdb_search", searched, len(items), force=True)
+        async for j, result in tmdb_batch.search_batch_stream([items[p] for p in pending], api_key):
+            i = pending[j]
+            searched += 1
+            tmdb_id = (result.get("tmdb") or {}).get("tmdb_id")
+            job.emit(
+                "search",
+                {
+                    "indices": indices[i],
+                    "title": result["title"],
+                    "year": result["year"],
+                    "tmdb_id": tmdb_id,
+                    "error": result.get("error"),
+                },
+            )
+            if tmdb_id and tmdb_id not in queued_ids:
+                queued_ids.add(tmdb_id)
+                details_total += 1
+                id_queue.put_nowait(tmdb_id)
+            job.set_progress("tmdb_search", searched, len(items))
+            await _checkpoint(job)
+        job.set_progress("tmdb_details", details_done, details_total, force=True)
+        id_queue.put_nowait(None)
+        await details
+        if not exact_hit or pending or details_done > details_known:
+            await _store_report(job, items, position_by_row)
+    finally:
+        if not details.done():
+            details.cancel()
+            await asyncio.gather(details, return_exceptions=True)
@@ -0,0 +1,92 @@
+"""
+Fast JSON responses for the API.
+
+FastJSONResponse renders with orjson when it is installed, and produces the
+same bytes as Starlette's JSONResponse (json.dumps with ensure_ascii=False and
+separators=(",", ":")). Endpoints return it directly, so FastAPI's
+jsonable_encoder pass is skipped as well.
+
+The two encoders agree except on a few inputs, which fall back to the stdlib
+path (jsonable_encoder + json.dumps) so the output stays byte-identical:
+- floats json prints with an exponent: orjson writes 1e-6 / 1e16, json
+  1e-06 / 1e+16, and in [1e-5, 1e-4) orjson has no exponent at all
+  (0.000015, json 1.5e-05). orjson's output is scanned for a number token
+  with an exponent or starting with 0.0000 and a nonzero digit; a string that
+  happens to look like one only costs the fallback;
+- values orjson cannot encode: integers beyond 64 bits, Pydantic models and
+  other objects jsonable_encoder knows about.
+
+NaN and infinity are the one difference left: json.dumps(allow_nan=False)
+raises, orjson writes null.
+"""
+import json
+from typing import Any
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+_DIGITS_TO_ZERO = bytes.maketrans(b"123456789", b"000000000")
+
+
+def _at_number_start(body: bytes, pos: int) -> bool:
+    """Whether a number token could start at `pos`: numbers follow `:`, `,` or `[` in compact output."""
+    return pos == 0 or body[pos - 1] in b":,["
+
+
+def _has_small_decimal(body: bytes) -> bool:
+    """Whether orjson output has a number in [1e-5, 1e-4), which json.dumps writes with an exponent."""
+    pos = body.find(b"0.0000")
+    while pos >= 0:
+        if body[pos + 6:pos + 7] in (b"1", b"2", b"3", b"4", b"5", b"6", b"7", b"8", b"9"):
+            start = pos - 1 if pos > 0 and body[pos - 1:pos] == b"-" else pos
+            if _at_number_start(body, start):
+                return True
+        pos = body.find(b"0.0000", pos + 6)
+    return False
+
+
+def _has_exponent_number(body: bytes) -> bool:
+    """Whether orjson output has a number token with an exponent (digit, `e`, sign or digit)."""
+    # With every digit mapped to 0, candidates are found with bytes.find instead of a regex scan.
+    shape = body.translate(_DIGITS_TO_ZERO)
+    pos = shape.find(b"0e")
+    while pos >= 0:
+        if shape[pos + 2:pos + 3] in (b"0", b"-"):
+            start = pos
+            while start > 0 and shape[start - 1] in b"0.-":
+                start -= 1
+            # Anything not at a number start is inside a string.
+            if _at_number_start(shape, start):
+                return True
+        pos = shape.find(b"0e", pos + 2)
+    return False
+
+
+def dumps(content: Any) -> bytes:
+    """JSON bytes of `content`, identical to JSONResponse's rendering."""
+    if orjson is not None:
+        try:
+            body = orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            pass
+        else:
+            if not _has_exponent_number(body) and not _has_small_decimal(body):
+                return body
+    # Starlette's JSONResponse.render.
+    return json.dumps(
+        jsonable_encoder(content),
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,75 @@
+"""
+Curated list progress (IMDb Top 250, 1001 Movies, ...) on the server.
+
+The index (data/lists/index.json, built from frontend/src/data/movieLists.ts
+by scripts/build_list_index.py) maps every listed TMDb id to a dense integer
+and stores each list as sorted dense ids. At load time the lists are packed
+into one CSR-style pair of arrays (all members back to back plus the list each
+member belongs to).
+
+Progress for a user's films is then two vector operations regardless of the
+number of lists: np.searchsorted maps the user's TMDb ids onto the dense id
+space (ids on no list drop out), and np.bincount over the member arrays counts
+the hits per list. Same numbers as ListsProgressSection.tsx: watched = listed
+films the user has, percent = Math.round(watched / total * 100).
+"""
+import functools
+import json
+import math
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional
+
+import numpy as np
+
+INDEX_PATH = Path(__file__).resolve().parent.parent / "data" / "lists" / "index.json"
+
+
+class ListIndex(NamedTuple):
+    lists: List[Dict[str, Any]]
+    tmdb_ids: np.ndarray
+    members: np.ndarray
+    owners: np.ndarray
+
+
+@functools.lru_cache(maxsize=1)
+def load_index(path: Path = INDEX_PATH) -> ListIndex:
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    lists = [{key: value for key, value in entry.items() if key != "members"} for entry in data["lists"]]
+    sizes = [len(entry["members"]) for entry in data["lists"]]
+    members = [entry["members"] for entry in data["lists"]]
+    return ListIndex(
+        lists=lists,
+        tmdb_ids=np.asarray(data["tmdb_ids"], dtype=np.int64),
+        members=np.asarray([m for list_members in members for m in list_members], dtype=np.int64),
+        owners=np.repeat(np.arange(len(lists), dtype=np.int64), sizes),
+    )
+
+
+def dense_ids(index: ListIndex, tmdb_ids: Iterable[int]) -> np.ndarray:
+    """Dense ids of the given TMDb ids that appear on any list (unique, sorted)."""
+    ids = np.unique(np.fromiter((int(i) for i in tmdb_ids), dtype=np.int64))
+    if not len(ids) or not len(index.tmdb_ids):
+        return np.zeros(0, dtype=np.int64)
+    positions = np.searchsorted(index.tmdb_ids, ids)
+    positions[positions == len(index.tmdb_ids)] = 0
+    return positions[index.tmdb_ids[positions] == ids]
+
+
+def progress(tmdb_ids: Iterable[int], index: Optional[ListIndex] = None) -> List[Dict[str, Any]]:
+    """Every list with `watched` and `percent` for a user's TMDb ids."""
+    if index is None:
+        index = load_index()
+    owned = np.zeros(len(index.tmdb_ids), dtype=bool)
+    owned[dense_ids(index, tmdb_ids)] = True
+    watched = np.bincount(index.owners, weights=owned[index.members], minlength=len(index.lists))
+    result = []
+    for entry, count in zip(index.lists, watched.tolist()):
+        count = int(count)
+        total = entry["total"]
+        result.append({
+            **entry,
+            "watched": count,
+            "percent": int(math.floor(count / total * 100 + 0.5)) if total > 0 else 0,
+        })
+    return result
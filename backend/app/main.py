@@ -1,3 +1,5 @@
+import asyncio
+import hashlib
 import logging
 import os
 from contextlib import asynccontextmanager
@@ -6,15 +8,20 @@ from typing import Dict, Optional, Any, List
 from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
 
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException, Body, Request
+from fastapi import FastAPI, HTTPException, Body, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse, FileResponse, PlainTextResponse
+from fastapi.responses import StreamingResponse, FileResponse, PlainTextResponse, Response
 from pydantic import BaseModel
 import httpx
 import json
 import sentry_sdk
+from prometheus_client import Counter
 from prometheus_fastapi_instrumentator import Instrumentator
 from sentry_sdk.integrations.fastapi import FastApiIntegration
+from starlette.datastructures import UploadFile
+
+from . import batch_pipeline, columnar, compression, json_response, projection, tmdb_keys
+from .json_response import FastJSONResponse
 
 # Load .env from backend dir when running locally; production uses env vars (e.g. Render)
 _env_path = Path(__file__).resolve().parent.parent / ".env"
@@ -90,26 +97,32 @@ async def lifespan(_app: FastAPI):
         except Exception as exc:
             logger.warning("Could not set ProactorEventLoop: %s", exc)
 
-    api_key = (os.getenv("TMDB_API_KEY") or "").strip()
-    if not api_key:
+    key_count = len(tmdb_keys.get_pool())
+    if not key_count:
         logger.warning(
             "TMDB_API_KEY is not set. TMDB endpoints will not work, but demo report asset endpoints are available."
         )
     else:
-        logger.info("Backend started; TMDB_API_KEY is set.")
+        logger.info("Backend started; %s TMDb API key(s) configured.", key_count)
 
-    from . import cache
+    from . import analytics, cache, job_store, jobs
     cache.init_cache_db()
     cache.start_writer()
+    job_store.init_job_store()
+    if key_count:
+        await jobs.resume_unfinished(tmdb_keys.primary_key())
     logger.info("Backend started successfully.")
     try:
         yield
     finally:
+        await jobs.shutdown()
+        analytics.shutdown()
+        job_store.close_job_store()
         cache.stop_writer()
         logger.info("Backend shutting down; cache writer stopped.")
 
 
-app = FastAPI(lifespan=lifespan)
+app = FastAPI(lifespan=lifespan, default_response_class=FastJSONResponse)
 _init_sentry_from_env()
 
 # CORS configuration:
@@ -125,6 +138,9 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# gzip/br/zstd for JSON and NDJSON responses; see app/compression.py.
+if compression.COMPRESSION_ENABLED:
+    app.add_middleware(compression.CompressionMiddleware)
 
 
 @app.middleware("http")
@@ -205,21 +221,125 @@ class BatchSearchItem(BaseModel):
 
 class BatchSearchRequest(BaseModel):
     items: List[BatchSearchItem]
+    # Projection, e.g. ["tmdb.tmdb_id"]; see app/projection.py.
+    fields: Optional[List[str]] = None
 
 
 class BatchMoviesRequest(BaseModel):
     tmdb_ids: List[int]
+    # Projection, e.g. ["movie.poster_path", "movie.runtime"]; see app/projection.py.
+    fields: Optional[List[str]] = None
+
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+# Time budget for a batch request in milliseconds, counted from arrival.
+DEADLINE_HEADER = "X-Deadline-Ms"
+DISCONNECT_POLL_S = 0.5
+# Non-standard "client closed request" status; nobody reads it, but it keeps abandoned batches out of 2xx.
+CLIENT_CLOSED_REQUEST = 499
+
+BATCH_REQUESTS_ABANDONED = Counter(
+    "tmdb_batch_requests_abandoned_total",
+    "Batch requests cancelled because the client disconnected before the response.",
+    ["endpoint"],
+)
+
+
+async def _run_until_disconnect(http_request: Request, work: Any, endpoint: str) -> Any:
+    """
+    Await `work` while polling for client disconnect (the frontend aborts via AbortSignal).
+    On disconnect the work is cancelled; results already fetched stay in the cache.
+    Returns the work's result, or a 499 response if the client went away.
+    """
+    task = asyncio.ensure_future(work)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_S)
+            if done:
+                return task.result()
+            if await http_request.is_disconnected():
+                logger.info("Client disconnected; cancelling %s", endpoint)
+                BATCH_REQUESTS_ABANDONED.labels(endpoint=endpoint).inc()
+                return Response(status_code=CLIENT_CLOSED_REQUEST)
+    finally:
+        if not task.done():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+
+def _request_deadline(http_request: Request) -> Optional[float]:
+    """
+    Deadline from the X-Deadline-Ms header. Batches then answer within it,
+    marking unfinished items `pending`, instead of waiting for every item.
+    """
+    raw = http_request.headers.get(DEADLINE_HEADER)
+    if raw is None:
+        return None
+    try:
+        ms = int(raw)
+    except ValueError:
+        ms = 0
+    if ms <= 0:
+        raise HTTPException(status_code=400, detail=f"Invalid {DEADLINE_HEADER} header")
+    return batch_pipeline.deadline_from_ms(ms)
+
+
+def _batch_projection(endpoint: str, fields: Optional[List[str]]) -> Optional[projection.Projection]:
+    try:
+        return projection.parse(endpoint, fields)
+    except projection.FieldsError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _wants_ndjson(http_request: Request) -> bool:
+    return NDJSON_MEDIA_TYPE in (http_request.headers.get("accept") or "")
+
+
+def _batch_response(http_request: Request, results: List[Dict[str, Any]]) -> Response:
+    """`{"results": ...}` as JSON, or as a columnar MessagePack document when the client asks for it."""
+    if columnar.wants_columnar(http_request.headers.get("accept")):
+        return columnar.response(results)
+    return FastJSONResponse({"results": results})
+
+
+def _ndjson_response(results: Any, label: str) -> StreamingResponse:
+    """
+    Stream (index, result) pairs as NDJSON, one line per item in completion order.
+    Each line is the regular result object plus its `index` in the request.
+    """
+    async def generate():
+        count = 0
+        completed = False
+        try:
+            async for index, result in results:
+                count += 1
+                yield json.dumps({"index": index, **result}, ensure_ascii=False) + "\n"
+            completed = True
+        finally:
+            # StreamingResponse cancels this generator when the client disconnects.
+            await results.aclose()
+            if completed:
+                logger.info("Streamed %s completed: %s results", label, count)
+            else:
+                BATCH_REQUESTS_ABANDONED.labels(endpoint=label).inc()
+                logger.info("Streamed %s abandoned after %s results", label, count)
+
+    return StreamingResponse(generate(), media_type=NDJSON_MEDIA_TYPE)
 
 
 @app.post("/tmdb/search/batch")
-async def tmdb_search_batch(request: BatchSearchRequest = Body(...)) -> Dict[str, List[Dict[str, Any]]]:
+async def tmdb_search_batch(http_request: Request, request: BatchSearchRequest = Body(...)) -> Any:
     """
     Batch search endpoint for TMDB.
     Processes multiple search requests with rate limiting, retry, and caching.
+    With `Accept: application/x-ndjson` results are streamed as they complete;
+    with `Accept: application/vnd.msgpack` they come as one columnar MessagePack document.
     """
     try:
         logger.info("Batch search request received: %s items", len(request.items))
-        api_key = (os.getenv("TMDB_API_KEY") or "").strip()
+        deadline = _request_deadline(http_request)
+        selection = _batch_projection("search", request.fields)
+        api_key = tmdb_keys.primary_key()
         if not api_key:
             raise HTTPException(
                 status_code=500,
@@ -227,7 +347,7 @@ async def tmdb_search_batch(request: BatchSearchRequest = Body(...)) -> Dict[str
             )
         
         if not request.items:
-            return {"results": []}
+            return _batch_response(http_request, [])
         
         if len(request.items) > 500:
             raise HTTPException(
@@ -239,10 +359,18 @@ async def tmdb_search_batch(request: BatchSearchRequest = Body(...)) -> Dict[str
         
         items_dict = [{"title": item.title, "year": item.year} for item in request.items]
         logger.info("Processing batch search for %s items", len(items_dict))
-        results = await tmdb_batch.search_batch(items_dict, api_key)
+        if _wants_ndjson(http_request):
+            return _ndjson_response(
+                tmdb_batch.search_batch_stream(items_dict, api_key, deadline, projection=selection), "batch search"
+            )
+        results = await _run_until_disconnect(
+            http_request, tmdb_batch.search_batch(items_dict, api_key, deadline, projection=selection), "batch search"
+        )
+        if isinstance(results, Response):
+            return results
         logger.info("Batch search completed: %s results", len(results))
         
-        return {"results": results}
+        return _batch_response(http_request, results)
     except HTTPException:
         raise
     except Exception as e:
@@ -251,25 +379,33 @@ async def tmdb_search_batch(request: BatchSearchRequest = Body(...)) -> Dict[str
 
 
 @app.post("/tmdb/movies/batch")
-async def tmdb_movies_batch(request: BatchMoviesRequest = Body(...)) -> Dict[str, List[Dict[str, Any]]]:
+async def tmdb_movies_batch(http_request: Request, request: BatchMoviesRequest = Body(...)) -> Any:
     """Batch movie details endpoint."""
     try:
         logger.info("Batch movies request received: %s items", len(request.tmdb_ids))
-        api_key = (os.getenv("TMDB_API_KEY") or "").strip()
+        deadline = _request_deadline(http_request)
+        selection = _batch_projection("movies", request.fields)
+        api_key = tmdb_keys.primary_key()
         if not api_key:
             raise HTTPException(status_code=500, detail="TMDB_API_KEY is not set")
         
         if not request.tmdb_ids:
-            return {"results": []}
+            return FastJSONResponse({"results": []})
         
         if len(request.tmdb_ids) > 500:
             raise HTTPException(status_code=400, detail="Too many items. Maximum 500 items per batch.")
         
         from . import tmdb_batch_movies
-        results = await tmdb_batch_movies.movies_batch(request.tmdb_ids, api_key)
+        results = await _run_until_disconnect(
+            http_request,
+            tmdb_batch_movies.movies_batch(request.tmdb_ids, api_key, deadline, projection=selection),
+            "batch movies",
+        )
+        if isinstance(results, Response):
+            return results
         logger.info("Batch movies completed: %s results", len(results))
         
-        return {"results": results}
+        return FastJSONResponse({"results": results})
     except HTTPException:
         raise
     except Exception as e:
@@ -278,25 +414,33 @@ async def tmdb_movies_batch(request: BatchMoviesRequest = Body(...)) -> Dict[str
 
 
 @app.post("/tmdb/movies/credits/batch")
-async def tmdb_credits_batch(request: BatchMoviesRequest = Body(...)) -> Dict[str, List[Dict[str, Any]]]:
+async def tmdb_credits_batch(http_request: Request, request: BatchMoviesRequest = Body(...)) -> Any:
     """Batch credits endpoint."""
     try:
         logger.info("Batch credits request received: %s items", len(request.tmdb_ids))
-        api_key = (os.getenv("TMDB_API_KEY") or "").strip()
+        deadline = _request_deadline(http_request)
+        selection = _batch_projection("credits", request.fields)
+        api_key = tmdb_keys.primary_key()
         if not api_key:
             raise HTTPException(status_code=500, detail="TMDB_API_KEY is not set")
         
         if not request.tmdb_ids:
-            return {"results": []}
+            return FastJSONResponse({"results": []})
         
         if len(request.tmdb_ids) > 500:
             raise HTTPException(status_code=400, detail="Too many items. Maximum 500 items per batch.")
         
         from . import tmdb_batch_movies
-        results = await tmdb_batch_movies.credits_batch(request.tmdb_ids, api_key)
+        results = await _run_until_disconnect(
+            http_request,
+            tmdb_batch_movies.credits_batch(request.tmdb_ids, api_key, deadline, projection=selection),
+            "batch credits",
+        )
+        if isinstance(results, Response):
+            return results
         logger.info("Batch credits completed: %s results", len(results))
         
-        return {"results": results}
+        return FastJSONResponse({"results": results})
     except HTTPException:
         raise
     except Exception as e:
@@ -305,25 +449,33 @@ async def tmdb_credits_batch(request: BatchMoviesRequest = Body(...)) -> Dict[st
 
 
 @app.post("/tmdb/movies/keywords/batch")
-async def tmdb_keywords_batch(request: BatchMoviesRequest = Body(...)) -> Dict[str, List[Dict[str, Any]]]:
+async def tmdb_keywords_batch(http_request: Request, request: BatchMoviesRequest = Body(...)) -> Any:
     """Batch keywords endpoint."""
     try:
         logger.info("Batch keywords request received: %s items", len(request.tmdb_ids))
-        api_key = (os.getenv("TMDB_API_KEY") or "").strip()
+        deadline = _request_deadline(http_request)
+        selection = _batch_projection("keywords", request.fields)
+        api_key = tmdb_keys.primary_key()
         if not api_key:
             raise HTTPException(status_code=500, detail="TMDB_API_KEY is not set")
         
         if not request.tmdb_ids:
-            return {"results": []}
+            return FastJSONResponse({"results": []})
         
         if len(request.tmdb_ids) > 500:
             raise HTTPException(status_code=400, detail="Too many items. Maximum 500 items per batch.")
         
         from . import tmdb_batch_movies
-        results = await tmdb_batch_movies.keywords_batch(request.tmdb_ids, api_key)
+        results = await _run_until_disconnect(
+            http_request,
+            tmdb_batch_movies.keywords_batch(request.tmdb_ids, api_key, deadline, projection=selection),
+            "batch keywords",
+        )
+        if isinstance(results, Response):
+            return results
         logger.info("Batch keywords completed: %s results", len(results))
         
-        return {"results": results}
+        return FastJSONResponse({"results": results})
     except HTTPException:
         raise
     except Exception as e:
@@ -332,25 +484,42 @@ async def tmdb_keywords_batch(request: BatchMoviesRequest = Body(...)) -> Dict[s
 
 
 @app.post("/tmdb/movies/full/batch")
-async def tmdb_full_batch(request: BatchMoviesRequest = Body(...)) -> Dict[str, List[Dict[str, Any]]]:
-    """Batch full metadata endpoint (movie details + credits + keywords)."""
+async def tmdb_full_batch(http_request: Request, request: BatchMoviesRequest = Body(...)) -> Any:
+    """
+    Batch full metadata endpoint (movie details + credits + keywords).
+    With `Accept: application/x-ndjson` results are streamed as they complete;
+    with `Accept: application/vnd.msgpack` they come as one columnar MessagePack document.
+    """
     try:
         logger.info("Batch full metadata request received: %s items", len(request.tmdb_ids))
-        api_key = (os.getenv("TMDB_API_KEY") or "").strip()
+        deadline = _request_deadline(http_request)
+        selection = _batch_projection("full", request.fields)
+        api_key = tmdb_keys.primary_key()
         if not api_key:
             raise HTTPException(status_code=500, detail="TMDB_API_KEY is not set")
         
         if not request.tmdb_ids:
-            return {"results": []}
+            return _batch_response(http_request, [])
         
         if len(request.tmdb_ids) > 500:
             raise HTTPException(status_code=400, detail="Too many items. Maximum 500 items per batch.")
         
         from . import tmdb_batch_movies
-        results = await tmdb_batch_movies.full_batch(request.tmdb_ids, api_key)
+        if _wants_ndjson(http_request):
+            return _ndjson_response(
+                tmdb_batch_movies.full_batch_stream(request.tmdb_ids, api_key, deadline, projection=selection),
+                "batch full metadata",
+            )
+        results = await _run_until_disconnect(
+            http_request,
+            tmdb_batch_movies.full_batch(request.tmdb_ids, api_key, deadline, projection=selection),
+            "batch full metadata",
+        )
+        if isinstance(results, Response):
+            return results
         logger.info("Batch full metadata completed: %s results", len(results))
         
-        return {"results": results}
+        return _batch_response(http_request, results)
     except HTTPException:
         raise
     except Exception as e:
@@ -358,36 +527,522 @@ async def tmdb_full_batch(request: BatchMoviesRequest = Body(...)) -> Dict[str,
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 
-# Cache for demo report asset to avoid loading from disk on every request
-_demo_report_cache: Optional[Dict[str, Any]] = None
+# GET variants of the movie batch endpoints: `?ids=` (sorted, deduplicated) and
+# optional `&fields=` make the URL the cache key for browsers and CDNs.
+BATCH_GET_MAX_AGE_S = int(os.getenv("TMDB_BATCH_GET_MAX_AGE_S", str(24 * 60 * 60)))
+BATCH_GET_MAX_IDS = 500
+
+
+def _canonical_ids(ids: str) -> List[int]:
+    try:
+        tmdb_ids = sorted({int(part) for part in ids.split(",") if part.strip()})
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be comma-separated TMDb ids")
+    if not tmdb_ids or tmdb_ids[0] <= 0:
+        raise HTTPException(status_code=400, detail="ids must be comma-separated TMDb ids")
+    if len(tmdb_ids) > BATCH_GET_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"Too many items. Maximum {BATCH_GET_MAX_IDS} items per batch.")
+    return tmdb_ids
+
+
+def _canonical_batch_query(tmdb_ids: List[int], fields: Optional[List[str]]) -> str:
+    params = [("ids", ",".join(map(str, tmdb_ids)))]
+    if fields is not None:
+        params.append(("fields", ",".join(fields)))
+    return urlencode(params, safe=",")
+
+
+def _cacheable_batch_response(http_request: Request, results: List[Dict[str, Any]]) -> Response:
+    """
+    `{"results": ...}` with a content-hash strong ETag (304 on If-None-Match).
+    Complete results are public for BATCH_GET_MAX_AGE_S; results with an
+    error, a stale or a pending entry are not stored, so caches do not pin them.
+    """
+    from . import precompressed
+
+    body = json_response.dumps({"results": results})
+    etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+    complete = not any(r.get("error") or r.get("stale") or r.get("pending") for r in results)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={BATCH_GET_MAX_AGE_S}" if complete else "no-store",
+        "Vary": "Accept-Encoding",
+    }
+    if_none_match = http_request.headers.get("if-none-match")
+    if if_none_match and precompressed.etag_matches(if_none_match, etag):
+        # The 200 got its ETag suffixed by CompressionMiddleware; a 304 must repeat that tag.
+        encoding = compression.response_encoding(http_request.headers.get("accept-encoding"), len(body))
+        return Response(status_code=304, headers={**headers, "ETag": precompressed.encoded_etag(etag, encoding)})
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+async def _cacheable_batch(http_request: Request, endpoint: str, ids: str, fields: Optional[str]) -> Any:
+    """
+    Shared GET handler: redirects (308) to the canonical query, then runs the
+    `<endpoint>_batch` of tmdb_batch_movies without a deadline (pending
+    entries would make the bytes depend on timing).
+    """
+    label = f"batch {endpoint} (GET)"
+    try:
+        tmdb_ids = _canonical_ids(ids)
+        selected = None if fields is None else sorted({f.strip() for f in fields.split(",") if f.strip()})
+        selection = _batch_projection(endpoint, selected)
+        query = _canonical_batch_query(tmdb_ids, selected)
+        if http_request.url.query != query:
+            return Response(
+                status_code=308,
+                headers={"Location": str(http_request.url.replace(query=query)), "Cache-Control": f"public, max-age={BATCH_GET_MAX_AGE_S}"},
+            )
+        api_key = tmdb_keys.primary_key()
+        if not api_key:
+            raise HTTPException(status_code=500, detail="TMDB_API_KEY is not set")
+
+        from . import tmdb_batch_movies
+        batch = getattr(tmdb_batch_movies, f"{endpoint}_batch")
+        results = await _run_until_disconnect(
+            http_request, batch(tmdb_ids, api_key, None, projection=selection), label
+        )
+        if isinstance(results, Response):
+            return results
+        logger.info("%s completed: %s results", label, len(results))
+        return _cacheable_batch_response(http_request, results)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception("Error in %s endpoint: %s", label, e)
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+@app.get("/tmdb/movies/batch")
+async def tmdb_movies_batch_get(http_request: Request, ids: str, fields: Optional[str] = None) -> Any:
+    """Cacheable batch movie details: `?ids=1,2,3[&fields=...]` (canonical: sorted, deduplicated)."""
+    return await _cacheable_batch(http_request, "movies", ids, fields)
+
+
+@app.get("/tmdb/movies/credits/batch")
+async def tmdb_credits_batch_get(http_request: Request, ids: str, fields: Optional[str] = None) -> Any:
+    """Cacheable batch credits; see tmdb_movies_batch_get."""
+    return await _cacheable_batch(http_request, "credits", ids, fields)
+
+
+@app.get("/tmdb/movies/keywords/batch")
+async def tmdb_keywords_batch_get(http_request: Request, ids: str, fields: Optional[str] = None) -> Any:
+    """Cacheable batch keywords; see tmdb_movies_batch_get."""
+    return await _cacheable_batch(http_request, "keywords", ids, fields)
+
+
+@app.get("/tmdb/movies/full/batch")
+async def tmdb_full_batch_get(http_request: Request, ids: str, fields: Optional[str] = None) -> Any:
+    """Cacheable batch full metadata; see tmdb_movies_batch_get."""
+    return await _cacheable_batch(http_request, "full", ids, fields)
+
+
+class SyncEntry(BaseModel):
+    tmdb_id: int
+    # Version from a previous sync; None when the client has no copy.
+    version: Optional[str] = None
+
+
+class SyncRequest(BaseModel):
+    entries: List[SyncEntry]
+
+
+@app.post("/tmdb/movies/sync")
+async def tmdb_movies_sync(http_request: Request, request: SyncRequest = Body(...)) -> Any:
+    """
+    Delta sync of the client's full-metadata cache: `entries` are the
+    (tmdb_id, version) pairs it holds. Returns {results, deleted, unchanged}:
+    full entries with a new `version` only where the server's data differs,
+    tombstones (ids TMDb no longer has), and the count of current entries.
+    """
+    try:
+        logger.info("Sync request received: %s entries", len(request.entries))
+        api_key = tmdb_keys.primary_key()
+        if not api_key:
+            raise HTTPException(status_code=500, detail="TMDB_API_KEY is not set")
+
+        if not request.entries:
+            return FastJSONResponse({"results": [], "deleted": [], "unchanged": 0})
+
+        if len(request.entries) > 500:
+            raise HTTPException(status_code=400, detail="Too many items. Maximum 500 items per batch.")
+
+        from . import tmdb_batch_movies
+        # A repeated id keeps its last version.
+        known = {entry.tmdb_id: entry.version for entry in request.entries}
+        delta = await _run_until_disconnect(http_request, tmdb_batch_movies.sync_batch(known, api_key), "sync")
+        if isinstance(delta, Response):
+            return delta
+        logger.info(
+            "Sync completed: %s changed, %s deleted, %s unchanged",
+            len(delta["results"]),
+            len(delta["deleted"]),
+            delta["unchanged"],
+        )
+        return FastJSONResponse(delta)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception("Error in sync endpoint: %s", e)
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+class JobRow(BaseModel):
+    title: str
+    year: Optional[int] = None
+
+
+class JobCreateRequest(BaseModel):
+    rows: List[JobRow]
+    # Digest of a previous upload's report (from its `done` event); its entries are reused.
+    base_digest: Optional[str] = None
+
+
+SSE_MEDIA_TYPE = "text/event-stream"
+
+
+def _sse_event(event: Dict[str, Any]) -> str:
+    data = json.dumps(event["data"], ensure_ascii=False)
+    return f"id: {event['seq']}\nevent: {event['event']}\ndata: {data}\n\n"
+
+
+@app.post("/api/jobs", status_code=202)
+async def create_analysis_job(request: JobCreateRequest = Body(...)) -> Any:
+    """
+    Start a server-side analysis job: search every row, then fetch full metadata
+    for the matches, as one pipeline. Progress is read from /api/jobs/{job_id}/events.
+    """
+    from . import jobs
+
+    api_key = tmdb_keys.primary_key()
+    if not api_key:
+        raise HTTPException(status_code=500, detail="TMDB_API_KEY is not set")
+    if len(request.rows) > jobs.JOB_MAX_ROWS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many rows. Maximum {jobs.JOB_MAX_ROWS} rows per job.",
+        )
+    rows = [{"title": row.title, "year": row.year} for row in request.rows]
+    job = jobs.create_job(rows, api_key, request.base_digest)
+    logger.info("Analysis job %s created: %s rows", job.id, len(rows))
+    return FastJSONResponse(
+        {"job_id": job.id, "status": job.status, "total": len(rows), "digest": job.digest}, status_code=202
+    )
+
+
+def _limit_body(http_request: Request, max_bytes: int) -> Request:
+    """
+    The same request with its body capped at `max_bytes`: 413 as soon as more
+    arrives (a chunked upload has no Content-Length to check up front).
+    """
+    received = 0
+
+    async def receive() -> Dict[str, Any]:
+        nonlocal received
+        message = await http_request.receive()
+        if message["type"] == "http.request":
+            received += len(message.get("body", b""))
+            if received > max_bytes:
+                raise HTTPException(status_code=413, detail=f"Upload too large. Maximum {max_bytes} bytes.")
+        return message
+
+    return Request(http_request.scope, receive)
+
+
+@app.post("/api/jobs/upload", status_code=202)
+async def upload_analysis_job(http_request: Request) -> Any:
+    """
+    Start an analysis job from an uploaded ratings.csv or Letterboxd export ZIP
+    (multipart field `file`, optional `base_digest`), parsed on the server
+    instead of in the browser. The parsed rows (with rating, date and
+    Letterboxd URI) are available at /api/jobs/{job_id}/rows.
+
+    The body is capped at JOB_UPLOAD_MAX_BYTES while it is received, so an
+    oversized upload is refused before it is spooled in full.
+    """
+    from . import jobs, ratings_import
+
+    api_key = tmdb_keys.primary_key()
+    if not api_key:
+        raise HTTPException(status_code=500, detail="TMDB_API_KEY is not set")
+    content_length = http_request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > jobs.JOB_UPLOAD_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"Upload too large. Maximum {jobs.JOB_UPLOAD_MAX_BYTES} bytes.")
+
+    form = await _limit_body(http_request, jobs.JOB_UPLOAD_MAX_BYTES).form(max_files=1)
+    try:
+        file = form.get("file")
+        if not isinstance(file, UploadFile):
+            raise HTTPException(status_code=400, detail="Missing file upload")
+        base_digest = form.get("base_digest")
+        try:
+            rows = await asyncio.to_thread(ratings_import.read_ratings, file.file, jobs.JOB_MAX_ROWS)
+        except ratings_import.RatingsImportError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+    finally:
+        await form.close()
+    if not rows:
+        raise HTTPException(status_code=400, detail="No rated films found in the upload")
+    job = jobs.create_job(rows, api_key, base_digest if isinstance(base_digest, str) else None)
+    unique = len({jobs.search_key(row["title"], row["year"]) for row in rows})
+    logger.info("Analysis job %s created from %s: %s rows, %s unique", job.id, file.filename, len(rows), unique)
+    return FastJSONResponse(
+        {"job_id": job.id, "status": job.status, "total": len(rows), "unique": unique, "digest": job.digest},
+        status_code=202,
+    )
+
+
+@app.get("/api/jobs/{job_id}")
+async def get_analysis_job(job_id: str) -> Any:
+    from . import jobs
+
+    job = await jobs.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return FastJSONResponse(job.summary())
+
+
+@app.get("/api/jobs/{job_id}/rows")
+async def get_analysis_job_rows(job_id: str) -> Any:
+    """Rows the job was created with; `search` event indices point into this list."""
+    from . import jobs
+
+    job = await jobs.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return FastJSONResponse({"rows": job.rows})
+
+
+@app.get("/api/jobs/{job_id}/events")
+async def stream_analysis_job(http_request: Request, job_id: str, after: Optional[int] = None) -> Any:
+    """
+    Server-Sent Events for a job: progress, search and details events, ending
+    with `done` or `failed`. Events already emitted are replayed first; a
+    reconnecting client sends Last-Event-ID (or `?after=<seq>`) to skip the
+    ones it has seen.
+    """
+    from . import jobs
+
+    job = await jobs.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if after is None:
+        last_event_id = http_request.headers.get("last-event-id")
+        try:
+            after = int(last_event_id) if last_event_id else 0
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid Last-Event-ID header")
+
+    async def generate():
+        async for event in job.subscribe(after=max(0, after)):
+            yield _sse_event(event)
+
+    return StreamingResponse(
+        generate(),
+        media_type=SSE_MEDIA_TYPE,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+class AnalyticsRequest(BaseModel):
+    films: List[Dict[str, Any]]
+
+
+@app.post("/api/analytics")
+async def compute_analytics(request: AnalyticsRequest = Body(...)) -> Any:
+    """
+    Report aggregates (the frontend's `Computed`) for an enriched film list,
+    computed like computeAggregations in utils/analyticsClient.ts.
+    """
+    from . import analytics
+
+    try:
+        return FastJSONResponse(await analytics.compute_aggregations_async(request.films))
+    except analytics.AnalyticsInputError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.exception("Error computing analytics: %s", e)
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+class AnalyticsDeltaRequest(BaseModel):
+    state: Optional[Dict[str, Any]] = None
+    added: List[Dict[str, Any]] = []
+    removed: List[Dict[str, Any]] = []
+
+
+@app.post("/api/analytics/delta")
+async def compute_analytics_delta(request: AnalyticsDeltaRequest = Body(...)) -> Any:
+    """
+    Update a previous aggregate `state` (as returned by this endpoint; omit it
+    to start empty) with `added` and `removed` films. Returns the new `state`
+    and the entity `aggregates` (stats, rankings, decades, years, watch time).
+    """
+    from . import analytics
+
+    try:
+        return FastJSONResponse(await analytics.apply_delta_async(request.state, request.added, request.removed))
+    except (analytics.AnalyticsInputError, analytics.AnalyticsStateError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.exception("Error updating analytics state: %s", e)
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+@app.post("/api/analytics/slices")
+async def compute_analytics_slices(request: AnalyticsRequest = Body(...)) -> Any:
+    """
+    Per-watch-year aggregate states of a film list, built in one pass:
+    {years, slices: {"<year>": state}, undated}. Merge the selected years with
+    /api/analytics/merge instead of recomputing the filtered list.
+    """
+    from . import analytics
+
+    try:
+        return FastJSONResponse(await analytics.year_slices_async(request.films))
+    except analytics.AnalyticsInputError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.exception("Error computing analytics slices: %s", e)
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+class AnalyticsMergeRequest(BaseModel):
+    slices: List[Dict[str, Any]]
+
+
+@app.post("/api/analytics/merge")
+async def merge_analytics_slices(request: AnalyticsMergeRequest = Body(...)) -> Any:
+    """Merge aggregate states (e.g. the slices of the selected years) into one `state` and its `aggregates`."""
+    from . import analytics
+
+    try:
+        return FastJSONResponse(await analytics.merge_slices_async(request.slices))
+    except analytics.AnalyticsStateError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.exception("Error merging analytics slices: %s", e)
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+class ListsProgressRequest(BaseModel):
+    tmdb_ids: List[int]
+
+
+@app.post("/api/lists/progress")
+async def lists_progress(request: ListsProgressRequest = Body(...)) -> Any:
+    """
+    Progress on every curated list (data/lists/index.json) for the user's
+    TMDb ids: list metadata with `watched` and `percent`.
+    """
+    from . import list_index
+
+    try:
+        return FastJSONResponse({"lists": list_index.progress(request.tmdb_ids)})
+    except Exception as e:
+        logger.exception("Error computing list progress: %s", e)
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+# Demo report assets, built once from the compact file: the compatibility view
+# and the compact file as precompressed bytes, plus the film table for slices
+_demo_assets: Optional[Dict[str, Any]] = None
+_demo_assets_lock = asyncio.Lock()
+
+
+def _load_demo_assets() -> Dict[str, Any]:
+    from . import demo_report, precompressed
+
+    raw = demo_report.COMPACT_PATH.read_bytes()
+    compact = json.loads(raw)
+    report = json.dumps(demo_report.compat_view(compact), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    assets = {
+        "report": precompressed.precompress(report),
+        "compact": precompressed.precompress(raw),
+        "table": demo_report.FilmTable(compact),
+    }
+    logger.info(
+        "Demo report asset loaded into cache: compact %.2f MB, compatibility view %.2f MB (%s)",
+        len(raw) / (1024 * 1024),
+        len(report) / (1024 * 1024),
+        ", ".join(f"{coding} {len(data)} B" for coding, data in assets["report"].variants.items()),
+    )
+    return assets
+
+
+async def _get_demo_assets() -> Dict[str, Any]:
+    global _demo_assets
+    from . import demo_report
+
+    if _demo_assets is None:
+        async with _demo_assets_lock:
+            if _demo_assets is None:
+                if not demo_report.COMPACT_PATH.exists():
+                    raise HTTPException(
+                        status_code=404,
+                        detail="Demo report asset not found at backend/data/demo/demo_report_1000.compact.json. Please generate it first."
+                    )
+                _demo_assets = await asyncio.to_thread(_load_demo_assets)
+    return _demo_assets
 
 
 @app.get("/api/demo-report")
-async def get_demo_report():
+async def get_demo_report(request: Request):
     """
     Get the pre-generated demo report asset (1000 films).
     Returns JSON with filmsLite, filmsLiteAll, and availableYears.
+
+    The report is the compatibility view of the compact asset, serialized once
+    and served from memory, gzip or brotli encoded per Accept-Encoding, with a
+    strong ETag (304 on If-None-Match).
     """
-    global _demo_report_cache
-    
+    from . import precompressed
+
     try:
-        if _demo_report_cache is None:
-            demo_file = Path(__file__).resolve().parent.parent / "data" / "demo" / "demo_report_1000.json"
-            if not demo_file.exists():
-                raise HTTPException(
-                    status_code=404,
-                    detail="Demo report asset not found at backend/data/demo/demo_report_1000.json. Please generate it first."
-                )
-            
-            with open(demo_file, "r", encoding="utf-8") as f:
-                _demo_report_cache = json.load(f)
-            
-            # Log memory usage estimate
-            import sys
-            cache_size_mb = sys.getsizeof(json.dumps(_demo_report_cache)) / (1024 * 1024)
-            logger.info(f"Demo report asset loaded into cache. Estimated size: {cache_size_mb:.2f} MB")
-        
-        return _demo_report_cache
+        assets = await _get_demo_assets()
+        return precompressed.respond(request, assets["report"])
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception("Error loading demo report asset: %s", e)
+        raise HTTPException(status_code=500, detail=f"Failed to load demo report asset: {str(e)}")
+
+
+@app.get("/api/demo-report/compact")
+async def get_demo_report_compact(request: Request):
+    """The demo report in the compact format (films once, views as indices; see app/demo_report.py)."""
+    from . import precompressed
+
+    try:
+        assets = await _get_demo_assets()
+        return precompressed.respond(request, assets["compact"])
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception("Error loading demo report asset: %s", e)
+        raise HTTPException(status_code=500, detail=f"Failed to load demo report asset: {str(e)}")
+
+
+@app.get("/api/demo-report/films")
+async def get_demo_report_films(
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1),
+    year: Optional[int] = None,
+    fields: Optional[str] = None,
+):
+    """
+    A slice of the demo film table: `offset`/`limit` range, optionally only
+    films watched in `year`, and only the comma-separated `fields`.
+    Returns {total, offset, fields, films}.
+    """
+    from . import demo_report
+
+    try:
+        assets = await _get_demo_assets()
+        selected = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+        return FastJSONResponse(demo_report.film_slice(assets["table"], offset, limit, year, selected))
+    except demo_report.DemoReportError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except HTTPException:
         raise
     except Exception as e:
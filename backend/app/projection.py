@@ -0,0 +1,91 @@
+"""
+Field projection for the /tmdb/*/batch endpoints.
+
+A request may name the parts of each result it needs, e.g.
+`fields: ["movie.poster_path", "movie.runtime"]` to refresh the films grid.
+A field is a facet (`movie`, `credits`, `keywords`, `tmdb`) or one key of a
+facet (`movie.runtime`, `credits.directors`, `tmdb.tmdb_id`). Without
+`fields` results are unchanged.
+
+Facets that are not requested are dropped from the results, and the batch
+modules neither read them from the cache nor fetch them from TMDb; for
+`movie` and `credits` only the requested keys are extracted from the cached
+JSON (cache.get_movie/get_credits and their _batch forms with `keys`).
+Identity keys and status flags (`tmdb_id` or `title`/`year`, `error`,
+`stale`, `pending`) are always kept.
+"""
+from typing import Any, Dict, FrozenSet, Iterable, Optional, Tuple
+
+MOVIE_KEYS = (
+    "id",
+    "poster_path",
+    "genres",
+    "runtime",
+    "vote_average",
+    "vote_count",
+    "original_language",
+    "production_countries",
+    "release_date",
+)
+CREDITS_KEYS = ("directors", "actors")
+SEARCH_KEYS = ("tmdb_id", "title", "year", *MOVIE_KEYS[1:])
+
+# Endpoint -> facet -> keys of the facet (None: the facet is a list, selected as a whole).
+FACETS: Dict[str, Dict[str, Optional[Tuple[str, ...]]]] = {
+    "search": {"tmdb": SEARCH_KEYS},
+    "movies": {"movie": MOVIE_KEYS},
+    "credits": {"credits": CREDITS_KEYS},
+    "keywords": {"keywords": None},
+    "full": {"movie": MOVIE_KEYS, "credits": CREDITS_KEYS, "keywords": None},
+}
+ALWAYS_KEPT = frozenset({"tmdb_id", "title", "year", "error", "stale", "pending"})
+
+
+class FieldsError(ValueError):
+    """A `fields` entry that names no facet or key of the endpoint."""
+
+
+class Projection:
+    """Requested facets of one endpoint, each with its requested keys (None: all keys)."""
+
+    def __init__(self, endpoint: str, facets: Dict[str, Optional[FrozenSet[str]]]) -> None:
+        self.endpoint = endpoint
+        self.facets = facets
+
+    def wants(self, facet: str) -> bool:
+        return facet in self.facets
+
+    def keys(self, facet: str) -> Optional[FrozenSet[str]]:
+        """Requested keys of a facet; None when the whole facet (or nothing of it) is requested."""
+        return self.facets.get(facet)
+
+    def apply(self, entry: Dict[str, Any]) -> Dict[str, Any]:
+        result = {}
+        for key, value in entry.items():
+            if key in ALWAYS_KEPT:
+                result[key] = value
+            elif key in self.facets:
+                keys = self.facets[key]
+                if keys is not None and isinstance(value, dict):
+                    value = {k: v for k, v in value.items() if k in keys}
+                result[key] = value
+        return result
+
+
+def parse(endpoint: str, fields: Optional[Iterable[str]]) -> Optional[Projection]:
+    """Projection for a `fields` list (None when absent: everything), or FieldsError."""
+    if fields is None:
+        return None
+    available = FACETS[endpoint]
+    facets: Dict[str, Optional[set]] = {}
+    for field in fields:
+        facet, _, key = field.strip().partition(".")
+        if facet not in available or (key and (available[facet] is None or key not in available[facet])):
+            raise FieldsError(f"Unknown field: {field!r}")
+        if not key:
+            facets[facet] = None
+        elif facet not in facets or facets[facet] is not None:
+            facets.setdefault(facet, set()).add(key)
+    if not facets:
+        raise FieldsError("fields must name at least one field")
+    return Projection(endpoint, {facet: None if keys is None else frozenset(keys) for facet, keys in facets.items()})
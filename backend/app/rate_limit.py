@@ -0,0 +1,233 @@
+"""
+Shared token-bucket rate limiter for TMDb upstream calls.
+
+TMDb's ~40 req/s budget is enforced per API key, not per process. An
+in-process limiter lets every gunicorn worker spend the full budget on its
+own, so N workers quietly send N times the allowed rate.
+
+Backends (TMDB_RATE_LIMIT_BACKEND):
+- "memory" (default): bucket state lives in this process. Fine for one worker.
+- "sqlite": bucket rows live in a SQLite file (TMDB_RATE_LIMIT_DB) shared by
+  every worker on the host; each acquire is one short BEGIN IMMEDIATE
+  transaction, so processes serialize on the row instead of racing.
+
+Multi-host deployments can plug in their own backend (e.g. a Redis script
+doing the same refill-and-take) by implementing RateLimiterBackend and
+calling set_backend() on startup.
+"""
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_DIR = os.path.dirname(os.path.abspath(__file__))
+DB_PATH = os.getenv("TMDB_RATE_LIMIT_DB") or os.path.join(_DIR, "rate_limit.db")
+
+# TMDb docs: no strict limit, upper bound ~40 req/s per key.
+RATE_LIMIT_PER_SECOND = float(os.getenv("TMDB_RATE_LIMIT_PER_SECOND", "40"))
+# Tokens that can accumulate while idle; keeps bursts after a quiet period short.
+RATE_LIMIT_BURST = float(os.getenv("TMDB_RATE_LIMIT_BURST", "10"))
+DEFAULT_BUCKET = "tmdb"
+
+_SQLITE_BUSY_TIMEOUT_S = 5.0
+
+
+def _refill(tokens: float, updated_at: float, now: float, rate: float, capacity: float) -> float:
+    elapsed = max(0.0, now - updated_at)
+    return min(capacity, tokens + elapsed * rate)
+
+
+def _take(tokens: float, requested: float, rate: float) -> Tuple[float, float]:
+    """Returns (tokens_left, wait_seconds). wait_seconds == 0 means the take succeeded."""
+    if tokens >= requested:
+        return tokens - requested, 0.0
+    return tokens, (requested - tokens) / rate
+
+
+class RateLimiterBackend(ABC):
+    """
+    Storage for token buckets. Implementations must make try_acquire atomic
+    across every process that shares the budget.
+
+    Refill is computed from wall-clock time.time(), since a monotonic clock
+    means nothing to another process. For SQLiteRateLimiter every worker
+    compares its own time.time() against the updated_at another one stored,
+    so a clock step (NTP correction, manual change) matters. A jump forward
+    refills the buckets at once. A jump back, or a worker whose clock lags the
+    one that wrote the row, counts no elapsed time, which drains them.
+    Workers sharing a file need synchronised clocks.
+    """
+
+    # True when calls do blocking I/O and should run off the event loop.
+    blocking_io = False
+
+    @abstractmethod
+    def try_acquire(self, bucket: str, rate: float, capacity: float, tokens: float = 1.0) -> float:
+        """Take tokens if available. Returns 0.0 on success, else seconds until they will be."""
+
+    @abstractmethod
+    def available(self, bucket: str, rate: float, capacity: float) -> float:
+        """Tokens currently in the bucket (after refill), without taking any."""
+
+    def close(self) -> None:
+        pass
+
+
+class MemoryRateLimiter(RateLimiterBackend):
+    """Per-process buckets guarded by a lock (requests may come from worker threads)."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+
+    def _current(self, bucket: str, capacity: float, rate: float, now: float) -> float:
+        tokens, updated_at = self._buckets.get(bucket, (capacity, now))
+        return _refill(tokens, updated_at, now, rate, capacity)
+
+    def try_acquire(self, bucket: str, rate: float, capacity: float, tokens: float = 1.0) -> float:
+        with self._lock:
+            now = time.time()
+            left, wait = _take(self._current(bucket, capacity, rate, now), tokens, rate)
+            self._buckets[bucket] = (left, now)
+            return wait
+
+    def available(self, bucket: str, rate: float, capacity: float) -> float:
+        with self._lock:
+            return self._current(bucket, capacity, rate, time.time())
+
+
+class SQLiteRateLimiter(RateLimiterBackend):
+    """Buckets in a SQLite table, shared by all processes that open the same file."""
+
+    blocking_io = True
+
+    def __init__(self, db_path: Optional[str] = None) -> None:
+        self.db_path = db_path or DB_PATH
+        self._local = threading.local()
+        # Every thread's connection, so close() can reach those of worker threads too.
+        self._conns: List[sqlite3.Connection] = []
+        self._conns_lock = threading.Lock()
+        conn = sqlite3.connect(self.db_path, timeout=_SQLITE_BUSY_TIMEOUT_S)
+        try:
+            conn.executescript("""
+                PRAGMA journal_mode=WAL;
+                CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+                    bucket TEXT PRIMARY KEY,
+                    tokens REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                );
+            """)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit mode so BEGIN IMMEDIATE below controls the transaction.
+            # Only this thread uses it; close() may run in another one.
+            conn = sqlite3.connect(
+                self.db_path, timeout=_SQLITE_BUSY_TIMEOUT_S, isolation_level=None, check_same_thread=False
+            )
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with self._conns_lock:
+                self._conns.append(conn)
+            self._local.conn = conn
+        return conn
+
+    def _read(self, conn: sqlite3.Connection, bucket: str, capacity: float, rate: float, now: float) -> float:
+        row = conn.execute(
+            "SELECT tokens, updated_at FROM rate_limit_buckets WHERE bucket = ?",
+            (bucket,),
+        ).fetchone()
+        if row is None:
+            return capacity
+        return _refill(row[0], row[1], now, rate, capacity)
+
+    def try_acquire(self, bucket: str, rate: float, capacity: float, tokens: float = 1.0) -> float:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            left, wait = _take(self._read(conn, bucket, capacity, rate, now), tokens, rate)
+            conn.execute(
+                "INSERT OR REPLACE INTO rate_limit_buckets (bucket, tokens, updated_at) VALUES (?, ?, ?)",
+                (bucket, left, now),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return wait
+
+    def available(self, bucket: str, rate: float, capacity: float) -> float:
+        return self._read(self._conn(), bucket, capacity, rate, time.time())
+
+    def close(self) -> None:
+        """Close the connections of all threads; a later call opens new ones."""
+        with self._conns_lock:
+            conns, self._conns = self._conns, []
+            self._local = threading.local()
+        for conn in conns:
+            conn.close()
+
+
+_backend: Optional[RateLimiterBackend] = None
+
+
+def _backend_from_env() -> RateLimiterBackend:
+    name = (os.getenv("TMDB_RATE_LIMIT_BACKEND") or "memory").strip().lower()
+    if name == "sqlite":
+        logger.info("TMDb rate limiter: shared SQLite bucket at %s", DB_PATH)
+        return SQLiteRateLimiter()
+    if name != "memory":
+        logger.warning("Unknown TMDB_RATE_LIMIT_BACKEND=%r, using in-process limiter", name)
+    return MemoryRateLimiter()
+
+
+def get_backend() -> RateLimiterBackend:
+    global _backend
+    if _backend is None:
+        _backend = _backend_from_env()
+    return _backend
+
+
+def set_backend(backend: Optional[RateLimiterBackend]) -> None:
+    """Install a custom backend (or None to re-read the environment on next use)."""
+    global _backend
+    if _backend is not None and _backend is not backend:
+        _backend.close()
+    _backend = backend
+
+
+async def _try_acquire(backend: RateLimiterBackend, bucket: str, tokens: float) -> float:
+    if backend.blocking_io:
+        return await asyncio.to_thread(
+            backend.try_acquire, bucket, RATE_LIMIT_PER_SECOND, RATE_LIMIT_BURST, tokens
+        )
+    return backend.try_acquire(bucket, RATE_LIMIT_PER_SECOND, RATE_LIMIT_BURST, tokens)
+
+
+async def acquire(bucket: str = DEFAULT_BUCKET, tokens: float = 1.0) -> None:
+    """Wait until `tokens` can be taken from `bucket`."""
+    backend = get_backend()
+    while True:
+        wait = await _try_acquire(backend, bucket, tokens)
+        if wait <= 0:
+            return
+        await asyncio.sleep(wait)
+
+
+async def try_acquire_now(bucket: str = DEFAULT_BUCKET, tokens: float = 1.0) -> bool:
+    """Take tokens only if they are available right now; never waits."""
+    return await _try_acquire(get_backend(), bucket, tokens) <= 0
+
+
+def available(bucket: str = DEFAULT_BUCKET) -> float:
+    return get_backend().available(bucket, RATE_LIMIT_PER_SECOND, RATE_LIMIT_BURST)
@@ -0,0 +1,141 @@
+"""
+Server-side parsing of Letterboxd exports for analysis jobs.
+
+Mirrors frontend/src/workers/csvParseCore.ts (parseRatings) so an upload
+gives the same rows the browser would: the same header matching (findCol),
+comma or tab separated cells trimmed, blank titles skipped, and year/rating
+parsed like parseInt/parseFloat with 0 treated as missing.
+
+Accepts `ratings.csv` itself or the full Letterboxd export ZIP, whose
+top-level ratings.csv is read straight from the archive (the export's
+deleted/ and orphaned/ folders have their own ratings.csv, which is ignored).
+The file is decoded and parsed row by row (csv over io.TextIOWrapper), so
+memory grows with the parsed rows, not with the raw upload. The upload itself
+is spooled to disk by Starlette, capped at JOB_UPLOAD_MAX_BYTES (a ZIP is
+read from its central directory at the end, so it cannot be parsed as it
+streams in).
+"""
+import csv
+import io
+import logging
+import re
+import zipfile
+from typing import IO, Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+RATINGS_MEMBER = "ratings.csv"
+ZIP_MAGIC = b"PK\x03\x04"
+
+_LEADING_INT = re.compile(r"\s*([+-]?\d+)")
+_LEADING_FLOAT = re.compile(r"\s*([+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)")
+
+
+class RatingsImportError(ValueError):
+    """The upload is not a readable ratings.csv or Letterboxd export."""
+
+
+def find_column(fieldnames: List[str], *candidates: str) -> Optional[int]:
+    """Index of the first header matching a candidate, like findCol() in csvParseCore.ts."""
+    norm = [(h or "").lower().strip() for h in fieldnames]
+    for candidate in candidates:
+        cnorm = candidate.lower().strip()
+        for i, n in enumerate(norm):
+            if cnorm in n or n in cnorm:
+                return i
+    return None
+
+
+def _parse_int(value: str) -> Optional[int]:
+    match = _LEADING_INT.match(value)
+    return int(match.group(1)) or None if match else None
+
+
+def _parse_float(value: str) -> Optional[float]:
+    match = _LEADING_FLOAT.match(value)
+    return float(match.group(1)) or None if match else None
+
+
+def _cell(cells: List[str], index: Optional[int]) -> str:
+    if index is None or index >= len(cells):
+        return ""
+    return cells[index]
+
+
+def iter_ratings(text: IO[str]) -> Iterator[Dict[str, Any]]:
+    """Yield {title, year, rating, date, letterboxd_url} rows from a CSV text stream."""
+    header_line = text.readline()
+    if not header_line.strip():
+        return
+    delimiter = "\t" if "\t" in header_line and "," not in header_line else ","
+    header = [h.strip() for h in next(csv.reader([header_line], delimiter=delimiter))]
+    name_col = find_column(header, "Name", "name", "Title")
+    if name_col is None:
+        raise RatingsImportError("No Name/Title column in the CSV header")
+    year_col = find_column(header, "Year", "year")
+    rating_col = find_column(header, "Rating", "rating")
+    date_col = find_column(header, "Date", "date")
+    uri_col = find_column(header, "Letterboxd URI", "URI", "letterboxd")
+
+    for raw in csv.reader(text, delimiter=delimiter):
+        cells = [c.strip() for c in raw]
+        title = _cell(cells, name_col)
+        if not title:
+            continue
+        yield {
+            "title": title,
+            "year": _parse_int(_cell(cells, year_col)) if year_col is not None else None,
+            "rating": _parse_float(_cell(cells, rating_col)) if rating_col is not None else None,
+            "date": _cell(cells, date_col) or None if date_col is not None else None,
+            "letterboxd_url": _cell(cells, uri_col) or None if uri_col is not None else None,
+        }
+
+
+def _is_zip(binary: IO[bytes]) -> bool:
+    position = binary.tell()
+    magic = binary.read(len(ZIP_MAGIC))
+    binary.seek(position)
+    return magic == ZIP_MAGIC
+
+
+def _open_ratings_member(archive: zipfile.ZipFile) -> IO[bytes]:
+    for info in archive.infolist():
+        if info.filename.lower() == RATINGS_MEMBER:
+            return archive.open(info)
+    raise RatingsImportError(f"No {RATINGS_MEMBER} in the ZIP archive")
+
+
+def read_ratings(binary: IO[bytes], max_rows: int) -> List[Dict[str, Any]]:
+    """
+    Parse an uploaded ratings.csv or Letterboxd export ZIP (seekable binary
+    file). Raises RatingsImportError for unreadable input or more than
+    `max_rows` rows.
+    """
+    archive = None
+    try:
+        if _is_zip(binary):
+            try:
+                archive = zipfile.ZipFile(binary)
+            except zipfile.BadZipFile as exc:
+                raise RatingsImportError("Invalid ZIP archive") from exc
+            source = _open_ratings_member(archive)
+        else:
+            source = binary
+        text = io.TextIOWrapper(source, encoding="utf-8-sig", newline="")
+        rows: List[Dict[str, Any]] = []
+        try:
+            for row in iter_ratings(text):
+                if len(rows) >= max_rows:
+                    raise RatingsImportError(f"Too many rows. Maximum {max_rows} rows per job.")
+                rows.append(row)
+        except UnicodeDecodeError as exc:
+            raise RatingsImportError("The CSV is not UTF-8 encoded") from exc
+        except csv.Error as exc:
+            raise RatingsImportError(f"Malformed CSV: {exc}") from exc
+        finally:
+            # Keep the caller's upload file open; only the wrapper is released.
+            text.detach()
+        return rows
+    finally:
+        if archive is not None:
+            archive.close()
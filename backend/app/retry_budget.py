@@ -0,0 +1,108 @@
+"""
+Retry budget and backoff for TMDb upstream calls.
+
+Per-call retries multiply load exactly when TMDb is struggling: with
+MAX_RETRIES=3 a failing upstream sees up to 4x the traffic. The budget caps
+retries process-wide to a fraction of recent successful traffic:
+
+    retries in the last RETRY_BUDGET_WINDOW_S
+        <= max(RETRY_BUDGET_MIN_RETRIES, RETRY_BUDGET_RATIO * successes)
+
+RETRY_BUDGET_MIN_RETRIES keeps retries possible at low traffic. When the
+budget is spent the call fails with its last error instead of retrying.
+
+Backoff uses decorrelated jitter (sleep = min(cap, uniform(base, prev * 3)))
+so that items which failed together do not retry together. An explicit
+Retry-After is honoured, plus up to `base` of jitter.
+
+Callers must sleep outside their concurrency semaphore so a waiting retry
+does not hold a slot other items could use.
+"""
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Deque, Optional
+
+from prometheus_client import Counter
+
+logger = logging.getLogger(__name__)
+
+RETRY_BUDGET_RATIO = float(os.getenv("TMDB_RETRY_BUDGET_RATIO", "0.2"))
+RETRY_BUDGET_MIN_RETRIES = int(os.getenv("TMDB_RETRY_BUDGET_MIN_RETRIES", "20"))
+RETRY_BUDGET_WINDOW_S = float(os.getenv("TMDB_RETRY_BUDGET_WINDOW_S", "10"))
+
+RETRIES = Counter(
+    "tmdb_retries_total",
+    "TMDb retry attempts by outcome (allowed by the retry budget or denied).",
+    ["outcome"],
+)
+
+
+class RetryBudget:
+    def __init__(
+        self,
+        ratio: float = RETRY_BUDGET_RATIO,
+        min_retries: int = RETRY_BUDGET_MIN_RETRIES,
+        window_s: float = RETRY_BUDGET_WINDOW_S,
+    ) -> None:
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self.window_s = window_s
+        self._lock = threading.Lock()
+        self._successes: Deque[float] = deque()
+        self._retries: Deque[float] = deque()
+
+    def _trim(self, now: float) -> None:
+        cutoff = now - self.window_s
+        while self._successes and self._successes[0] < cutoff:
+            self._successes.popleft()
+        while self._retries and self._retries[0] < cutoff:
+            self._retries.popleft()
+
+    def record_success(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._successes.append(now)
+            self._trim(now)
+
+    def allowance(self) -> int:
+        """Retries still allowed in the current window."""
+        now = time.monotonic()
+        with self._lock:
+            self._trim(now)
+            limit = max(self.min_retries, int(self.ratio * len(self._successes)))
+            return max(0, limit - len(self._retries))
+
+    def try_spend(self) -> bool:
+        """Take one retry from the budget. False means do not retry."""
+        now = time.monotonic()
+        with self._lock:
+            self._trim(now)
+            limit = max(self.min_retries, int(self.ratio * len(self._successes)))
+            if len(self._retries) >= limit:
+                RETRIES.labels(outcome="denied").inc()
+                return False
+            self._retries.append(now)
+        RETRIES.labels(outcome="allowed").inc()
+        return True
+
+
+def next_delay(previous: float, base: float, cap: float, retry_after: Optional[str] = None) -> float:
+    """
+    Delay before the next retry. `previous` is the last delay (0 on the first
+    retry). Retry-After, when parseable, wins over the jittered schedule.
+    """
+    if retry_after:
+        try:
+            return max(0.0, float(retry_after)) + random.uniform(0.0, base)
+        except ValueError:
+            pass
+    upper = max(base, previous * 3)
+    return min(cap, random.uniform(base, upper))
+
+
+# Process-wide budget shared by every TMDb call site.
+tmdb = RetryBudget()
@@ -6,28 +6,25 @@ import asyncio
 import logging
 import os
 import time
-from collections import deque
-from typing import Any, Dict, List, Optional, Tuple
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
 
 import httpx
 
 from . import cache as cache_module
+from . import batch_pipeline, circuit_breaker, hedging, retry_budget, tmdb_keys
+from .projection import Projection
 
 logger = logging.getLogger(__name__)
 
 TMDB_BASE_URL = "https://api.themoviedb.org/3"
-# TMDb docs: no strict limit, upper bound ~40 req/s. Using 40 for maximum speed.
+# The ~40 req/s TMDb budget is enforced by rate_limit.py (shared across workers).
 # Increased concurrency for local development to reduce semaphore wait times
 MAX_CONCURRENCY = 16  # Increased from 8 to reduce wait times
 # Separate semaphore for cache operations to avoid blocking HTTP requests
 CACHE_CONCURRENCY = 50  # Cache reads can be more concurrent
-RATE_LIMIT_PER_SECOND = 40.0
 MAX_RETRIES = 3
-RETRY_DELAYS = (0.5, 1.0, 2.0)
-
-# Rate limiter: track request timestamps
-_request_times: deque = deque()
-_rate_lock = asyncio.Lock()
+RETRY_DELAYS = (0.5, 1.0, 2.0)  # backoff base .. cap, jittered by retry_budget.next_delay
 
 # Cache semaphore for concurrent cache operations
 _cache_semaphore: Optional[asyncio.Semaphore] = None
@@ -40,23 +37,26 @@ def _get_cache_semaphore() -> asyncio.Semaphore:
     return _cache_semaphore
 
 
-async def _rate_limit() -> None:
-    """Wait if needed to respect rate limit (RATE_LIMIT_PER_SECOND)."""
-    async with _rate_lock:
-        now = time.time()
-        # Remove timestamps older than 1 second
-        while _request_times and _request_times[0] < now - 1.0:
-            _request_times.popleft()
-        # If we have 6+ requests in the last second, wait
-        if len(_request_times) >= RATE_LIMIT_PER_SECOND:
-            wait_time = 1.0 - (now - _request_times[0])
-            if wait_time > 0:
-                await asyncio.sleep(wait_time)
-                # Clean up again after wait
-                now = time.time()
-                while _request_times and _request_times[0] < now - 1.0:
-                    _request_times.popleft()
-        _request_times.append(time.time())
+async def _rate_limit() -> Optional[str]:
+    """
+    Wait for a token from the shared TMDb budget (see rate_limit.py).
+    Returns the pool key the token was charged to, if a key pool is configured.
+    """
+    return await tmdb_keys.acquire()
+
+
+def _next_delay(previous: float, retry_after: Optional[str] = None) -> float:
+    return retry_budget.next_delay(previous, RETRY_DELAYS[0], RETRY_DELAYS[-1], retry_after)
+
+
+async def _write_cache(write: Callable[..., None], *args: Any) -> None:
+    """
+    Cache write on the cache semaphore. Shielded: if the request is cancelled
+    (client disconnected), data already fetched from TMDb is still committed.
+    """
+    cache_sem = _get_cache_semaphore()
+    async with cache_sem:
+        await asyncio.shield(asyncio.to_thread(write, *args))
 
 
 def _normalize_title(title: str) -> str:
@@ -64,33 +64,75 @@ def _normalize_title(title: str) -> str:
     return title.strip().lower()
 
 
-async def _search_single(
-    client: httpx.AsyncClient,
-    api_key: str,
+async def _read_stale(getter: Any, *args: Any) -> Any:
+    """Cache read that also returns expired rows; used while the circuit is open."""
+    try:
+        return await asyncio.to_thread(getter, *args, allow_stale=True)
+    except Exception as e:
+        logger.warning("Stale cache read error: %s", e)
+        return None
+
+
+async def _search_stale(
     title: str,
+    title_norm: str,
     year: Optional[int],
-    semaphore: asyncio.Semaphore,
 ) -> Tuple[Optional[int], Optional[Dict[str, Any]], Optional[str]]:
+    """Degraded-mode search: answer from cached rows of any age, else fail fast."""
+    tmdb_id = await _read_stale(cache_module.get_search, title_norm, year)
+    if tmdb_id is not None:
+        movie_data = await _read_stale(cache_module.get_movie, tmdb_id)
+        if movie_data:
+            logger.debug("Circuit open; serving stale cache for %s (%s)", title, year)
+            return tmdb_id, movie_data, None
+    return None, None, circuit_breaker.CIRCUIT_OPEN_ERROR
+
+
+async def _search_cached(
+    title: str, year: Optional[int], details: bool = True
+) -> Optional[Tuple[int, Optional[Dict[str, Any]]]]:
     """
-    Search for a single movie. Returns (tmdb_id, movie_data, error).
-    Uses cache first, then TMDB API with retry/backoff.
+    Cache-only lookup: (tmdb_id, movie_data) when both rows are cached, else None.
+    Without `details` only the match is needed: (tmdb_id, None) from the search row.
     """
     title_norm = _normalize_title(title)
-    year_val = year or 0
-    
-    # Check cache first using separate semaphore to avoid blocking HTTP requests
+    # Separate semaphore to avoid blocking HTTP requests
     cache_sem = _get_cache_semaphore()
     try:
         async with cache_sem:
             tmdb_id = await asyncio.to_thread(cache_module.get_search, title_norm, year)
+        if tmdb_id is not None and not details:
+            return tmdb_id, None
         if tmdb_id is not None:
             async with cache_sem:
                 movie_data = await asyncio.to_thread(cache_module.get_movie, tmdb_id)
             if movie_data:
                 logger.debug("Cache hit for %s (%s)", title, year)
-                return tmdb_id, movie_data, None
+                return tmdb_id, movie_data
     except Exception as e:
         logger.warning("Cache read error for %s: %s", title, e)
+    return None
+
+
+async def _search_single(
+    client: httpx.AsyncClient,
+    api_key: str,
+    title: str,
+    year: Optional[int],
+    semaphore: asyncio.Semaphore,
+    details: bool = True,
+) -> Tuple[Optional[int], Optional[Dict[str, Any]], Optional[str]]:
+    """
+    Search for a single movie. Returns (tmdb_id, movie_data, error).
+    Uses cache first, then TMDB API with retry/backoff.
+    Without `details` the movie details are neither read nor fetched (movie_data is None).
+    """
+    title_norm = _normalize_title(title)
+    year_val = year or 0
+    
+    cached = await _search_cached(title, year, details)
+    if cached is not None:
+        return cached[0], cached[1], None
     
     # Not in cache, fetch from TMDB
     params = {"api_key": api_key, "query": title}
@@ -101,9 +143,12 @@ async def _search_single(
     movie_data = None
     
     # Search for movie
+    delay = 0.0
     for attempt in range(MAX_RETRIES + 1):
+        if not circuit_breaker.tmdb.allow_request():
+            return await _search_stale(title, title_norm, year)
         try:
-            await _rate_limit()
+            key = await _rate_limit()
             
             semaphore_start = time.time()
             async with semaphore:
@@ -113,9 +158,12 @@ async def _search_single(
                 
                 request_start = time.time()
                 try:
-                    response = await client.get(
+                    response, key = await hedging.get(
+                        client,
+                        "search",
                         f"{TMDB_BASE_URL}/search/movie",
-                        params=params,
+                        params,
+                        key,
                         timeout=10.0,
                     )
                 except Exception as e:
@@ -125,63 +173,74 @@ async def _search_single(
                 request_duration = time.time() - request_start
                 if request_duration > 5.0:
                     logger.warning("TMDB request for %s took %.2f seconds", title, request_duration)
-                
-                if response.status_code == 429 or response.status_code >= 500:
-                    if attempt >= MAX_RETRIES:
-                        return None, None, f"TMDb error {response.status_code}"
-                    delay = RETRY_DELAYS[min(attempt, len(RETRY_DELAYS) - 1)]
-                    retry_after = response.headers.get("Retry-After")
-                    if retry_after:
-                        try:
-                            delay = float(retry_after)
-                        except ValueError:
-                            pass
-                    logger.warning(
-                        "TMDb rate-limit/error %s for %s, retry %s/%s in %.1fs",
-                        response.status_code,
-                        title,
-                        attempt + 1,
-                        MAX_RETRIES,
-                        delay,
-                    )
-                    await asyncio.sleep(delay)
-                    continue
-                
-                response.raise_for_status()
-                data = response.json()
-                results = data.get("results") or []
-                
-                if not results:
-                    tmdb_id = None
-                    break
-                else:
-                    first = results[0]
-                    tmdb_id = first.get("id")
-                    break
+            
+            # Semaphore released: backoff sleeps below do not hold a concurrency slot.
+            tmdb_keys.report(key, response.status_code)
+            circuit_breaker.tmdb.record_response(response.status_code)
+            if response.status_code == 429 or response.status_code >= 500:
+                if attempt >= MAX_RETRIES or not retry_budget.tmdb.try_spend():
+                    return None, None, f"TMDb error {response.status_code}"
+                delay = _next_delay(delay, response.headers.get("Retry-After"))
+                logger.warning(
+                    "TMDb rate-limit/error %s for %s, retry %s/%s in %.1fs",
+                    response.status_code,
+                    title,
+                    attempt + 1,
+                    MAX_RETRIES,
+                    delay,
+                )
+                await asyncio.sleep(delay)
+                continue
+            
+            response.raise_for_status()
+            retry_budget.tmdb.record_success()
+            data = response.json()
+            results = data.get("results") or []
+            
+            if not results:
+                tmdb_id = None
+                break
+            else:
+                first = results[0]
+                tmdb_id = first.get("id")
+                break
                     
         except httpx.HTTPStatusError as e:
-            if attempt >= MAX_RETRIES:
-                return None, None, f"HTTP {e.response.status_code}"
-            await asyncio.sleep(RETRY_DELAYS[min(attempt, len(RETRY_DELAYS) - 1)])
+            # Other 4xx (429 is handled above): resending gets the same answer.
+            return None, None, f"HTTP {e.response.status_code}"
         except (httpx.RequestError, httpx.HTTPError) as e:
-            if attempt >= MAX_RETRIES:
+            circuit_breaker.tmdb.record_failure()
+            if attempt >= MAX_RETRIES or not retry_budget.tmdb.try_spend():
                 return None, None, str(e)
-            await asyncio.sleep(RETRY_DELAYS[min(attempt, len(RETRY_DELAYS) - 1)])
+            delay = _next_delay(delay)
+            await asyncio.sleep(delay)
     
     if tmdb_id is None:
         # Cache negative result
         try:
-            cache_sem = _get_cache_semaphore()
-            async with cache_sem:
-                await asyncio.to_thread(cache_module.set_search, title_norm, year, None)
+            await _write_cache(cache_module.set_search, title_norm, year, None)
         except Exception:
             pass
         return None, None, None
     
+    # Commit the match now so it is kept even if the request is abandoned during the details call
+    try:
+        await _write_cache(cache_module.set_search, title_norm, year, tmdb_id)
+    except Exception as e:
+        logger.warning("Cache write error for %s: %s", title, e)
+    if not details:
+        return tmdb_id, None, None
+    
     # Fetch movie details
+    delay = 0.0
     for attempt in range(MAX_RETRIES + 1):
+        if not circuit_breaker.tmdb.allow_request():
+            stale_movie = await _read_stale(cache_module.get_movie, tmdb_id)
+            if stale_movie:
+                return tmdb_id, stale_movie, None
+            return tmdb_id, None, circuit_breaker.CIRCUIT_OPEN_ERROR
         try:
-            await _rate_limit()
+            key = await _rate_limit()
             
             semaphore_start = time.time()
             async with semaphore:
@@ -190,47 +249,43 @@ async def _search_single(
                     logger.warning("Semaphore wait for movie details %s took %.2f seconds", tmdb_id, semaphore_wait)
                 
                 request_start = time.time()
-                movie_response = await client.get(
+                movie_response, key = await hedging.get(
+                    client,
+                    "movie",
                     f"{TMDB_BASE_URL}/movie/{tmdb_id}",
-                    params={"api_key": api_key},
+                    {"api_key": api_key},
+                    key,
                     timeout=10.0,
                 )
                 request_duration = time.time() - request_start
                 if request_duration > 5.0:
                     logger.warning("TMDB movie details request for %s took %.2f seconds", tmdb_id, request_duration)
-                
-                if movie_response.status_code == 429 or movie_response.status_code >= 500:
-                    if attempt >= MAX_RETRIES:
-                        return tmdb_id, None, f"TMDb error {movie_response.status_code}"
-                    delay = RETRY_DELAYS[min(attempt, len(RETRY_DELAYS) - 1)]
-                    retry_after = movie_response.headers.get("Retry-After")
-                    if retry_after:
-                        try:
-                            delay = float(retry_after)
-                        except ValueError:
-                            pass
-                    await asyncio.sleep(delay)
-                    continue
-                movie_response.raise_for_status()
-                movie_data = movie_response.json()
-                break
+            
+            tmdb_keys.report(key, movie_response.status_code)
+            circuit_breaker.tmdb.record_response(movie_response.status_code)
+            if movie_response.status_code == 429 or movie_response.status_code >= 500:
+                if attempt >= MAX_RETRIES or not retry_budget.tmdb.try_spend():
+                    return tmdb_id, None, f"TMDb error {movie_response.status_code}"
+                delay = _next_delay(delay, movie_response.headers.get("Retry-After"))
+                await asyncio.sleep(delay)
+                continue
+            movie_response.raise_for_status()
+            retry_budget.tmdb.record_success()
+            movie_data = movie_response.json()
+            break
         except httpx.HTTPStatusError as e:
-            if attempt >= MAX_RETRIES:
-                return tmdb_id, None, f"HTTP {e.response.status_code}"
-            await asyncio.sleep(RETRY_DELAYS[min(attempt, len(RETRY_DELAYS) - 1)])
+            # Other 4xx (429 is handled above): resending gets the same answer.
+            return tmdb_id, None, f"HTTP {e.response.status_code}"
         except (httpx.RequestError, httpx.HTTPError) as e:
-            if attempt >= MAX_RETRIES:
+            circuit_breaker.tmdb.record_failure()
+            if attempt >= MAX_RETRIES or not retry_budget.tmdb.try_spend():
                 return tmdb_id, None, str(e)
-            await asyncio.sleep(RETRY_DELAYS[min(attempt, len(RETRY_DELAYS) - 1)])
+            delay = _next_delay(delay)
+            await asyncio.sleep(delay)
     
-    # Cache results using separate semaphore
     try:
-        cache_sem = _get_cache_semaphore()
-        async with cache_sem:
-            await asyncio.to_thread(cache_module.set_search, title_norm, year, tmdb_id)
         if movie_data:
-            async with cache_sem:
-                await asyncio.to_thread(cache_module.set_movie, tmdb_id, movie_data)
+            await _write_cache(cache_module.set_movie, tmdb_id, movie_data)
     except Exception as e:
         logger.warning("Cache write error for %s: %s", title, e)
     
@@ -243,8 +298,9 @@ def _format_result(
     tmdb_id: Optional[int],
     movie_data: Optional[Dict[str, Any]],
     error: Optional[str],
+    details: bool = True,
 ) -> Dict[str, Any]:
-    """Format result in the expected format."""
+    """Format result in the expected format; without `details` `tmdb` holds only the match id."""
     if error:
         return {
             "title": title,
@@ -253,6 +309,14 @@ def _format_result(
             "error": error,
         }
     
+    if tmdb_id and not details:
+        return {
+            "title": title,
+            "year": year,
+            "tmdb": {"tmdb_id": tmdb_id},
+            "error": None,
+        }
+    
     if not tmdb_id or not movie_data:
         return {
             "title": title,
@@ -303,9 +367,59 @@ def _format_result(
     }
 
 
+def _format_outcome(item: Dict[str, Any], result: Any, projection: Optional[Projection] = None) -> Dict[str, Any]:
+    """Format a `_search_single` outcome (or the exception it raised) for one item."""
+    if isinstance(result, Exception):
+        return {
+            "title": item["title"],
+            "year": item.get("year"),
+            "tmdb": None,
+            "error": str(result),
+        }
+    tmdb_id, movie_data, error = result
+    entry = _format_result(item["title"], item.get("year"), tmdb_id, movie_data, error, _wants_details(projection))
+    return projection.apply(entry) if projection is not None else entry
+
+
+def _wants_details(projection: Optional[Projection]) -> bool:
+    """Whether the requested `tmdb` keys need the movie details (anything beyond the match id)."""
+    if projection is None:
+        return True
+    keys = projection.keys("tmdb")
+    return keys is None or bool(keys - {"tmdb_id"})
+
+
+def _new_client() -> httpx.AsyncClient:
+    # Reduce keepalive connections on Windows to avoid file descriptor limit
+    import platform
+    max_keepalive = 5 if platform.system() == 'Windows' else 10
+    
+    # Use shorter timeouts for local development to avoid hanging
+    timeout_config = httpx.Timeout(10.0, connect=5.0)  # 10s total, 5s connect
+    return httpx.AsyncClient(
+        base_url=TMDB_BASE_URL,
+        timeout=timeout_config,
+        limits=httpx.Limits(max_keepalive_connections=max_keepalive, keepalive_expiry=30.0, max_connections=100),
+        trust_env=False,
+    )
+
+
+def _pending_result(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Placeholder for an item the request deadline cut off; it may be cached by a later call."""
+    return {
+        "title": item["title"],
+        "year": item.get("year"),
+        "tmdb": None,
+        "error": None,
+        "pending": True,
+    }
+
+
 async def search_batch(
     items: List[Dict[str, Any]],
     api_key: str,
+    deadline: Optional[float] = None,
+    projection: Optional[Projection] = None,
 ) -> List[Dict[str, Any]]:
     """
     Process batch of search requests.
@@ -313,6 +427,10 @@ async def search_batch(
     Args:
         items: List of {title: str, year: int|None}
         api_key: TMDB API key
+        deadline: optional monotonic deadline; cache hits are served first and
+            items not finished by then come back with `pending: True`
+        projection: optional `tmdb` keys to return; with `tmdb.tmdb_id` alone
+            the movie details are not read or fetched
     
     Returns:
         List of {title, year, tmdb: {...}, error: str|None}
@@ -320,46 +438,91 @@ async def search_batch(
     if not items:
         return []
     
+    if deadline is not None:
+        collected: List[Any] = [batch_pipeline.PENDING] * len(items)
+        
+        async def collect() -> None:
+            async for i, result in search_batch_stream(items, api_key, deadline, projection):
+                collected[i] = result
+        
+        await batch_pipeline.wait_until(collect(), deadline)
+        return [
+            _pending_result(items[i]) if result is batch_pipeline.PENDING else result
+            for i, result in enumerate(collected)
+        ]
+    
     semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+    details = _wants_details(projection)
     
-    # Reduce keepalive connections on Windows to avoid file descriptor limit
-    import platform
-    max_keepalive = 5 if platform.system() == 'Windows' else 10
-    
-    # Use shorter timeouts for local development to avoid hanging
-    timeout_config = httpx.Timeout(10.0, connect=5.0)  # 10s total, 5s connect
-    async with httpx.AsyncClient(
-        base_url=TMDB_BASE_URL,
-        timeout=timeout_config,
-        limits=httpx.Limits(max_keepalive_connections=max_keepalive, keepalive_expiry=30.0, max_connections=100),
-        trust_env=False,
-    ) as client:
-        tasks = [
-            _search_single(client, api_key, item["title"], item.get("year"), semaphore)
-            for item in items
-        ]
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+    async with _new_client() as client:
+        results = await batch_pipeline.run_ordered(
+            items,
+            lambda item: _search_single(client, api_key, item["title"], item.get("year"), semaphore, details),
+        )
     
     formatted_results = []
     for i, result in enumerate(results):
         if isinstance(result, Exception):
             logger.warning("Task %s/%s raised exception: %s", i+1, len(results), result)
-            formatted_results.append({
-                "title": items[i]["title"],
-                "year": items[i].get("year"),
-                "tmdb": None,
-                "error": str(result),
-            })
-        else:
-            tmdb_id, movie_data, error = result
-            formatted_results.append(
-                _format_result(
-                    items[i]["title"],
-                    items[i].get("year"),
-                    tmdb_id,
-                    movie_data,
-                    error,
-                )
-            )
+        formatted_results.append(_format_outcome(items[i], result, projection))
     
     return formatted_results
+
+
+async def search_batch_stream(
+    items: List[Dict[str, Any]],
+    api_key: str,
+    deadline: Optional[float] = None,
+    projection: Optional[Projection] = None,
+) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+    """
+    Streaming variant of search_batch: yields (index, result) as each item completes.
+    Cache hits are yielded first; the rest follow in completion order.
+    Closing the generator cancels the work still in flight.
+    With a deadline, no upstream search starts once it is near, and when it
+    passes every unfinished item is yielded with `pending: True` (the work
+    goes on in the background, as in search_batch).
+    """
+    results = batch_pipeline.until_deadline(_search_stream(items, api_key, deadline, projection), len(items), deadline)
+    async with aclosing(results):
+        async for i, result in results:
+            yield i, _pending_result(items[i]) if result is batch_pipeline.PENDING else result
+
+
+async def _search_stream(
+    items: List[Dict[str, Any]],
+    api_key: str,
+    deadline: Optional[float],
+    projection: Optional[Projection],
+) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+    if not items:
+        return
+    
+    details = _wants_details(projection)
+    misses = []
+    cache_pass = batch_pipeline.run_unordered(
+        items, lambda item: _search_cached(item["title"], item.get("year"), details)
+    )
+    async with aclosing(cache_pass):
+        async for i, hit in cache_pass:
+            if hit is None or isinstance(hit, Exception):
+                misses.append(i)
+            else:
+                yield i, _format_outcome(items[i], (hit[0], hit[1], None), projection)
+    if not misses:
+        return
+    misses.sort()
+    
+    semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+    async with _new_client() as client:
+        upstream = batch_pipeline.run_unordered(
+            misses,
+            lambda i: _search_single(client, api_key, items[i]["title"], items[i].get("year"), semaphore, details),
+            deadline=deadline,
+        )
+        async with aclosing(upstream):
+            async for position, result in upstream:
+                i = misses[position]
+                if isinstance(result, Exception):
+                    logger.warning("Task %s/%s raised exception: %s", i+1, len(items), result)
+                yield i, _format_outcome(items[i], result, projection)
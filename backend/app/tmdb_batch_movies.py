@@ -4,29 +4,30 @@ Handles multiple requests with rate limiting, retry, and caching.
 """
 import asyncio
 import logging
-from typing import Any, Dict, List, Optional, Tuple
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
 
 import httpx
 
 from . import cache as cache_module
+from . import batch_pipeline, circuit_breaker, hedging, retry_budget, tmdb_keys
+from .projection import Projection
 
 logger = logging.getLogger(__name__)
 
 import platform
+import time
 
 TMDB_BASE_URL = "https://api.themoviedb.org/3"
-# TMDb docs: no strict limit, upper bound ~40 req/s. Using 40 for maximum speed.
+# The ~40 req/s TMDb budget is enforced by rate_limit.py (shared across workers).
 # Reduced concurrency on Windows to avoid file descriptor limit in select()
 MAX_CONCURRENCY = 4 if platform.system() == 'Windows' else 8
-RATE_LIMIT_PER_SECOND = 40.0
 MAX_RETRIES = 3
-RETRY_DELAYS = (0.5, 1.0, 2.0)
+RETRY_DELAYS = (0.5, 1.0, 2.0)  # backoff base .. cap, jittered by retry_budget.next_delay
+FULL_FACETS = ("movie", "credits", "keywords")
+# Error of a fetch for an id TMDb does not know (anymore); sync_batch reports it as deleted.
+NOT_FOUND_ERROR = "HTTP 404"
 
-# Rate limiter: track request timestamps
-from collections import deque
-import time
-_request_times: deque = deque()
-_rate_lock = asyncio.Lock()
 
 def _named_values(items: Any) -> List[str]:
     """Extract non-empty `name` fields from a list of dict-like items."""
@@ -41,20 +42,63 @@ def _named_values(items: Any) -> List[str]:
     return values
 
 
-async def _rate_limit() -> None:
-    """Wait if needed to respect rate limit (RATE_LIMIT_PER_SECOND)."""
-    async with _rate_lock:
-        now = time.time()
-        while _request_times and _request_times[0] < now - 1.0:
-            _request_times.popleft()
-        if len(_request_times) >= RATE_LIMIT_PER_SECOND:
-            wait_time = 1.0 - (now - _request_times[0])
-            if wait_time > 0:
-                await asyncio.sleep(wait_time)
-                now = time.time()
-                while _request_times and _request_times[0] < now - 1.0:
-                    _request_times.popleft()
-        _request_times.append(time.time())
+async def _rate_limit() -> Optional[str]:
+    """
+    Wait for a token from the shared TMDb budget (see rate_limit.py).
+    Returns the pool key the token was charged to, if a key pool is configured.
+    """
+    return await tmdb_keys.acquire()
+
+
+def _next_delay(previous: float, retry_after: Optional[str] = None) -> float:
+    return retry_budget.next_delay(previous, RETRY_DELAYS[0], RETRY_DELAYS[-1], retry_after)
+
+
+async def _write_cache(write: Callable[..., None], *args: Any) -> None:
+    """
+    Cache write in a worker thread. Shielded: if the request is cancelled
+    (client disconnected), data already fetched from TMDb is still committed.
+    """
+    await asyncio.shield(asyncio.to_thread(write, *args))
+
+
+def _store_full(
+    tmdb_id: int,
+    movie_data: Dict[str, Any],
+    credits_data: Optional[Dict[str, Any]],
+    keywords_data: Optional[List[str]],
+) -> None:
+    cache_module.set_movie(tmdb_id, movie_data)
+    if credits_data:
+        cache_module.set_credits(tmdb_id, credits_data)
+    if keywords_data:
+        cache_module.set_keywords(tmdb_id, keywords_data)
+
+
+def _keys_kwargs(keys: Optional[Iterable[str]]) -> Dict[str, Any]:
+    """Cache getter arguments limiting a payload to projected `keys` (none: whole payload)."""
+    return {"keys": sorted(keys)} if keys else {}
+
+
+async def _read_stale(getter: Any, tmdb_id: int, keys: Optional[Iterable[str]] = None) -> Any:
+    """Cache read that also returns expired rows; used while the circuit is open."""
+    try:
+        return await asyncio.to_thread(getter, tmdb_id, allow_stale=True, **_keys_kwargs(keys))
+    except Exception as e:
+        logger.warning("Stale cache read error for movie %s: %s", tmdb_id, e)
+        return None
+
+
+async def _full_stale(
+    tmdb_id: int,
+) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]], Optional[List[str]], Optional[str], Optional[str]]:
+    """Degraded-mode full metadata: whatever is cached, of any age, else fail fast."""
+    movie_data = await _read_stale(cache_module.get_movie, tmdb_id)
+    if not movie_data:
+        return None, None, None, circuit_breaker.CIRCUIT_OPEN_ERROR, "circuit_open"
+    credits_data = await _read_stale(cache_module.get_credits, tmdb_id)
+    keywords_data = await _read_stale(cache_module.get_keywords, tmdb_id)
+    return movie_data, credits_data, keywords_data, None, "stale"
 
 
 async def _get_movie_details(
@@ -63,14 +107,16 @@ async def _get_movie_details(
     tmdb_id: int,
     semaphore: asyncio.Semaphore,
     include_credits_keywords: bool = False,
+    keys: Optional[Iterable[str]] = None,
 ) -> Tuple[Optional[Dict[str, Any]], Optional[str], Optional[str]]:
     """Get movie details. Returns (movie_data, error, cache_status).
     
     If include_credits_keywords is True, uses append_to_response to get credits and keywords in one request.
+    With `keys`, cached movie_data holds only those keys.
     """
     cache_start = time.time()
     try:
-        cached = await asyncio.to_thread(cache_module.get_movie, tmdb_id)
+        cached = await asyncio.to_thread(cache_module.get_movie, tmdb_id, **_keys_kwargs(keys))
         cache_duration = (time.time() - cache_start) * 1000
         if cached:
             logger.debug("Movie %s: cached (%.2f ms)", tmdb_id, cache_duration)
@@ -84,53 +130,61 @@ async def _get_movie_details(
     if include_credits_keywords:
         params["append_to_response"] = "credits,keywords"
     
+    delay = 0.0
     for attempt in range(MAX_RETRIES + 1):
+        if not circuit_breaker.tmdb.allow_request():
+            stale = await _read_stale(cache_module.get_movie, tmdb_id, keys)
+            if stale:
+                return stale, None, "stale"
+            return None, circuit_breaker.CIRCUIT_OPEN_ERROR, "circuit_open"
         try:
-            await _rate_limit()
+            key = await _rate_limit()
             async with semaphore:
                 logger.debug("Fetching movie details for TMDB ID %s, attempt %s", tmdb_id, attempt + 1)
-                response = await client.get(
+                response, key = await hedging.get(
+                    client,
+                    "movie_full" if include_credits_keywords else "movie",
                     f"{TMDB_BASE_URL}/movie/{tmdb_id}",
-                    params=params,
+                    params,
+                    key,
                     timeout=20.0,
                 )
-                if response.status_code == 429 or response.status_code >= 500:
-                    if attempt >= MAX_RETRIES:
-                        api_duration = (time.time() - api_start) * 1000
-                        logger.debug("Movie %s: api error (%.2f ms)", tmdb_id, api_duration)
-                        return None, f"TMDb error {response.status_code}", "api_error"
-                    delay = RETRY_DELAYS[min(attempt, len(RETRY_DELAYS) - 1)]
-                    retry_after = response.headers.get("Retry-After")
-                    if retry_after:
-                        try:
-                            delay = float(retry_after)
-                        except ValueError:
-                            pass
-                    await asyncio.sleep(delay)
-                    continue
-                response.raise_for_status()
-                movie_data = response.json()
-                api_duration = (time.time() - api_start) * 1000
-                
-                try:
-                    await asyncio.to_thread(cache_module.set_movie, tmdb_id, movie_data)
-                except Exception as e:
-                    logger.warning("Cache write error for movie %s: %s", tmdb_id, e)
-                
-                logger.debug("Movie %s: api (%.2f ms)", tmdb_id, api_duration)
-                return movie_data, None, "api"
+            
+            tmdb_keys.report(key, response.status_code)
+            circuit_breaker.tmdb.record_response(response.status_code)
+            if response.status_code == 429 or response.status_code >= 500:
+                if attempt >= MAX_RETRIES or not retry_budget.tmdb.try_spend():
+                    api_duration = (time.time() - api_start) * 1000
+                    logger.debug("Movie %s: api error (%.2f ms)", tmdb_id, api_duration)
+                    return None, f"TMDb error {response.status_code}", "api_error"
+                delay = _next_delay(delay, response.headers.get("Retry-After"))
+                await asyncio.sleep(delay)
+                continue
+            response.raise_for_status()
+            retry_budget.tmdb.record_success()
+            movie_data = response.json()
+            api_duration = (time.time() - api_start) * 1000
+            
+            try:
+                await _write_cache(cache_module.set_movie, tmdb_id, movie_data)
+            except Exception as e:
+                logger.warning("Cache write error for movie %s: %s", tmdb_id, e)
+            
+            logger.debug("Movie %s: api (%.2f ms)", tmdb_id, api_duration)
+            return movie_data, None, "api"
         except httpx.HTTPStatusError as e:
-            if attempt >= MAX_RETRIES:
-                api_duration = (time.time() - api_start) * 1000
-                logger.debug("Movie %s: api error (%.2f ms)", tmdb_id, api_duration)
-                return None, f"HTTP {e.response.status_code}", "api_error"
-            await asyncio.sleep(RETRY_DELAYS[min(attempt, len(RETRY_DELAYS) - 1)])
+            # Other 4xx (429 is handled above): resending gets the same answer.
+            api_duration = (time.time() - api_start) * 1000
+            logger.debug("Movie %s: api error (%.2f ms)", tmdb_id, api_duration)
+            return None, f"HTTP {e.response.status_code}", "api_error"
         except (httpx.RequestError, httpx.HTTPError) as e:
-            if attempt >= MAX_RETRIES:
+            circuit_breaker.tmdb.record_failure()
+            if attempt >= MAX_RETRIES or not retry_budget.tmdb.try_spend():
                 api_duration = (time.time() - api_start) * 1000
                 logger.debug("Movie %s: api error (%.2f ms)", tmdb_id, api_duration)
                 return None, str(e), "api_error"
-            await asyncio.sleep(RETRY_DELAYS[min(attempt, len(RETRY_DELAYS) - 1)])
+            delay = _next_delay(delay)
+            await asyncio.sleep(delay)
     
     api_duration = (time.time() - api_start) * 1000
     logger.debug("Movie %s: api error (%.2f ms)", tmdb_id, api_duration)
@@ -170,93 +224,118 @@ async def _get_movie_details_with_credits_keywords(
     api_start = time.time()
     params = {"api_key": api_key, "append_to_response": "credits,keywords"}
     
+    delay = 0.0
     for attempt in range(MAX_RETRIES + 1):
+        if not circuit_breaker.tmdb.allow_request():
+            return await _full_stale(tmdb_id)
         try:
-            await _rate_limit()
+            key = await _rate_limit()
             async with semaphore:
                 logger.debug("Fetching movie details with credits/keywords for TMDB ID %s, attempt %s", tmdb_id, attempt + 1)
-                response = await client.get(
+                response, key = await hedging.get(
+                    client,
+                    "movie_full",
                     f"{TMDB_BASE_URL}/movie/{tmdb_id}",
-                    params=params,
+                    params,
+                    key,
                     timeout=20.0,
                 )
-                if response.status_code == 429 or response.status_code >= 500:
-                    if attempt >= MAX_RETRIES:
-                        api_duration = (time.time() - api_start) * 1000
-                        logger.debug("Movie %s: api error (%.2f ms)", tmdb_id, api_duration)
-                        return None, None, None, f"TMDb error {response.status_code}", "api_error"
-                    delay = RETRY_DELAYS[min(attempt, len(RETRY_DELAYS) - 1)]
-                    retry_after = response.headers.get("Retry-After")
-                    if retry_after:
-                        try:
-                            delay = float(retry_after)
-                        except ValueError:
-                            pass
-                    await asyncio.sleep(delay)
-                    continue
-                response.raise_for_status()
-                data = response.json()
-                api_duration = (time.time() - api_start) * 1000
-                
-                # Extract movie data (main response)
-                movie_data = {k: v for k, v in data.items() if k not in ["credits", "keywords"]}
-                
-                # Extract credits data
-                credits_raw = data.get("credits")
-                credits_data = None
-                if credits_raw:
-                    directors = [c.get("name") for c in credits_raw.get("crew", []) if c.get("job") == "Director" and c.get("name")]
-                    actors = [c.get("name") for c in credits_raw.get("cast", [])[:20] if c.get("name")]
-                    credits_data = {"directors": directors, "actors": actors}
-                
-                # Extract keywords data
-                keywords_raw = data.get("keywords")
-                keywords_data = None
-                if keywords_raw and isinstance(keywords_raw, dict):
-                    keywords_data = [kw.get("name") for kw in keywords_raw.get("keywords", []) if kw.get("name")]
-                elif isinstance(keywords_raw, list):
-                    keywords_data = [kw.get("name") if isinstance(kw, dict) else kw for kw in keywords_raw if kw]
-                
-                # Cache all three types
-                try:
-                    await asyncio.to_thread(cache_module.set_movie, tmdb_id, movie_data)
-                    if credits_data:
-                        await asyncio.to_thread(cache_module.set_credits, tmdb_id, credits_data)
-                    if keywords_data:
-                        await asyncio.to_thread(cache_module.set_keywords, tmdb_id, keywords_data)
-                except Exception as e:
-                    logger.warning("Cache write error for movie %s: %s", tmdb_id, e)
-                
-                logger.debug("Movie %s: api with credits/keywords (%.2f ms)", tmdb_id, api_duration)
-                return movie_data, credits_data, keywords_data, None, "api"
+            
+            tmdb_keys.report(key, response.status_code)
+            circuit_breaker.tmdb.record_response(response.status_code)
+            if response.status_code == 429 or response.status_code >= 500:
+                if attempt >= MAX_RETRIES or not retry_budget.tmdb.try_spend():
+                    api_duration = (time.time() - api_start) * 1000
+                    logger.debug("Movie %s: api error (%.2f ms)", tmdb_id, api_duration)
+                    return None, None, None, f"TMDb error {response.status_code}", "api_error"
+                delay = _next_delay(delay, response.headers.get("Retry-After"))
+                await asyncio.sleep(delay)
+                continue
+            response.raise_for_status()
+            retry_budget.tmdb.record_success()
+            data = response.json()
+            api_duration = (time.time() - api_start) * 1000
+            
+            # Extract movie data (main response)
+            movie_data = {k: v for k, v in data.items() if k not in ["credits", "keywords"]}
+            
+            # Extract credits data
+            credits_raw = data.get("credits")
+            credits_data = None
+            if credits_raw:
+                directors = [c.get("name") for c in credits_raw.get("crew", []) if c.get("job") == "Director" and c.get("name")]
+                actors = [c.get("name") for c in credits_raw.get("cast", [])[:20] if c.get("name")]
+                credits_data = {"directors": directors, "actors": actors}
+            
+            # Extract keywords data
+            keywords_raw = data.get("keywords")
+            keywords_data = None
+            if keywords_raw and isinstance(keywords_raw, dict):
+                keywords_data = [kw.get("name") for kw in keywords_raw.get("keywords", []) if kw.get("name")]
+            elif isinstance(keywords_raw, list):
+                keywords_data = [kw.get("name") if isinstance(kw, dict) else kw for kw in keywords_raw if kw]
+            
+            # Cache all three types
+            try:
+                await _write_cache(_store_full, tmdb_id, movie_data, credits_data, keywords_data)
+            except Exception as e:
+                logger.warning("Cache write error for movie %s: %s", tmdb_id, e)
+            
+            logger.debug("Movie %s: api with credits/keywords (%.2f ms)", tmdb_id, api_duration)
+            return movie_data, credits_data, keywords_data, None, "api"
         except httpx.HTTPStatusError as e:
-            if attempt >= MAX_RETRIES:
-                api_duration = (time.time() - api_start) * 1000
-                logger.debug("Movie %s: api error (%.2f ms)", tmdb_id, api_duration)
-                return None, None, None, f"HTTP {e.response.status_code}", "api_error"
-            await asyncio.sleep(RETRY_DELAYS[min(attempt, len(RETRY_DELAYS) - 1)])
+            # Other 4xx (429 is handled above): resending gets the same answer.
+            api_duration = (time.time() - api_start) * 1000
+            logger.debug("Movie %s: api error (%.2f ms)", tmdb_id, api_duration)
+            return None, None, None, f"HTTP {e.response.status_code}", "api_error"
         except (httpx.RequestError, httpx.HTTPError) as e:
-            if attempt >= MAX_RETRIES:
+            circuit_breaker.tmdb.record_failure()
+            if attempt >= MAX_RETRIES or not retry_budget.tmdb.try_spend():
                 api_duration = (time.time() - api_start) * 1000
                 logger.debug("Movie %s: api error (%.2f ms)", tmdb_id, api_duration)
                 return None, None, None, str(e), "api_error"
-            await asyncio.sleep(RETRY_DELAYS[min(attempt, len(RETRY_DELAYS) - 1)])
+            delay = _next_delay(delay)
+            await asyncio.sleep(delay)
     
     api_duration = (time.time() - api_start) * 1000
     logger.debug("Movie %s: api error (%.2f ms)", tmdb_id, api_duration)
     return None, None, None, "Max retries exceeded", "api_error"
 
 
+async def _fetch_facets(
+    client: httpx.AsyncClient,
+    api_key: str,
+    tmdb_id: int,
+    semaphore: asyncio.Semaphore,
+    facets: Tuple[str, ...],
+) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]], Optional[List[str]], Optional[str], Optional[str]]:
+    """
+    full_batch fetch for the requested facets only, with the unified call's result shape.
+    One facet uses its own endpoint; two or more cost one append_to_response call either way.
+    """
+    if facets == ("movie",):
+        movie_data, error, cache_status = await _get_movie_details(client, api_key, tmdb_id, semaphore)
+        return movie_data, None, None, error, cache_status
+    if facets == ("credits",):
+        credits_data, error, cache_status = await _get_movie_credits(client, api_key, tmdb_id, semaphore)
+        return None, credits_data, None, error, cache_status
+    if facets == ("keywords",):
+        keywords_data, error, cache_status = await _get_movie_keywords(client, api_key, tmdb_id, semaphore)
+        return None, None, keywords_data, error, cache_status
+    return await _get_movie_details_with_credits_keywords(client, api_key, tmdb_id, semaphore)
+
+
 async def _get_movie_credits(
     client: httpx.AsyncClient,
     api_key: str,
     tmdb_id: int,
     semaphore: asyncio.Semaphore,
+    keys: Optional[Iterable[str]] = None,
 ) -> Tuple[Optional[Dict[str, Any]], Optional[str], Optional[str]]:
-    """Get movie credits. Returns ({directors, actors}, error, cache_status)."""
+    """Get movie credits. Returns ({directors, actors}, error, cache_status); cached data limited to `keys` if given."""
     cache_start = time.time()
     try:
-        cached = await asyncio.to_thread(cache_module.get_credits, tmdb_id)
+        cached = await asyncio.to_thread(cache_module.get_credits, tmdb_id, **_keys_kwargs(keys))
         cache_duration = (time.time() - cache_start) * 1000
         if cached:
             logger.debug("Credits %s: cached (%.2f ms)", tmdb_id, cache_duration)
@@ -266,55 +345,63 @@ async def _get_movie_credits(
         pass
     
     api_start = time.time()
+    delay = 0.0
     for attempt in range(MAX_RETRIES + 1):
+        if not circuit_breaker.tmdb.allow_request():
+            stale = await _read_stale(cache_module.get_credits, tmdb_id, keys)
+            if stale:
+                return stale, None, "stale"
+            return None, circuit_breaker.CIRCUIT_OPEN_ERROR, "circuit_open"
         try:
-            await _rate_limit()
+            key = await _rate_limit()
             async with semaphore:
-                response = await client.get(
+                response, key = await hedging.get(
+                    client,
+                    "credits",
                     f"{TMDB_BASE_URL}/movie/{tmdb_id}/credits",
-                    params={"api_key": api_key},
+                    {"api_key": api_key},
+                    key,
                     timeout=20.0,
                 )
-                if response.status_code == 429 or response.status_code >= 500:
-                    if attempt >= MAX_RETRIES:
-                        api_duration = (time.time() - api_start) * 1000
-                        logger.debug("Credits %s: api error (%.2f ms)", tmdb_id, api_duration)
-                        return None, f"TMDb error {response.status_code}", "api_error"
-                    delay = RETRY_DELAYS[min(attempt, len(RETRY_DELAYS) - 1)]
-                    retry_after = response.headers.get("Retry-After")
-                    if retry_after:
-                        try:
-                            delay = float(retry_after)
-                        except ValueError:
-                            pass
-                    await asyncio.sleep(delay)
-                    continue
-                response.raise_for_status()
-                data = response.json()
-                directors = [c.get("name") for c in data.get("crew", []) if c.get("job") == "Director" and c.get("name")]
-                actors = [c.get("name") for c in data.get("cast", [])[:20] if c.get("name")]
-                credits_data = {"directors": directors, "actors": actors}
-                api_duration = (time.time() - api_start) * 1000
-                
-                try:
-                    await asyncio.to_thread(cache_module.set_credits, tmdb_id, credits_data)
-                except Exception:
-                    pass
-                
-                logger.debug("Credits %s: api (%.2f ms)", tmdb_id, api_duration)
-                return credits_data, None, "api"
+            
+            tmdb_keys.report(key, response.status_code)
+            circuit_breaker.tmdb.record_response(response.status_code)
+            if response.status_code == 429 or response.status_code >= 500:
+                if attempt >= MAX_RETRIES or not retry_budget.tmdb.try_spend():
+                    api_duration = (time.time() - api_start) * 1000
+                    logger.debug("Credits %s: api error (%.2f ms)", tmdb_id, api_duration)
+                    return None, f"TMDb error {response.status_code}", "api_error"
+                delay = _next_delay(delay, response.headers.get("Retry-After"))
+                await asyncio.sleep(delay)
+                continue
+            response.raise_for_status()
+            retry_budget.tmdb.record_success()
+            data = response.json()
+            directors = [c.get("name") for c in data.get("crew", []) if c.get("job") == "Director" and c.get("name")]
+            actors = [c.get("name") for c in data.get("cast", [])[:20] if c.get("name")]
+            credits_data = {"directors": directors, "actors": actors}
+            api_duration = (time.time() - api_start) * 1000
+            
+            try:
+                await _write_cache(cache_module.set_credits, tmdb_id, credits_data)
+            except Exception:
+                pass
+            
+            logger.debug("Credits %s: api (%.2f ms)", tmdb_id, api_duration)
+            return credits_data, None, "api"
         except httpx.HTTPStatusError as e:
-            if attempt >= MAX_RETRIES:
-                api_duration = (time.time() - api_start) * 1000
-                logger.debug("Credits %s: api error (%.2f ms)", tmdb_id, api_duration)
-                return None, f"HTTP {e.response.status_code}", "api_error"
-            await asyncio.sleep(RETRY_DELAYS[min(attempt, len(RETRY_DELAYS) - 1)])
+            # Other 4xx (429 is handled above): resending gets the same answer.
+            api_duration = (time.time() - api_start) * 1000
+            logger.debug("Credits %s: api error (%.2f ms)", tmdb_id, api_duration)
+            return None, f"HTTP {e.response.status_code}", "api_error"
         except (httpx.RequestError, httpx.HTTPError) as e:
-            if attempt >= MAX_RETRIES:
+            circuit_breaker.tmdb.record_failure()
+            if attempt >= MAX_RETRIES or not retry_budget.tmdb.try_spend():
                 api_duration = (time.time() - api_start) * 1000
                 logger.debug("Credits %s: api error (%.2f ms)", tmdb_id, api_duration)
                 return None, str(e), "api_error"
-            await asyncio.sleep(RETRY_DELAYS[min(attempt, len(RETRY_DELAYS) - 1)])
+            delay = _next_delay(delay)
+            await asyncio.sleep(delay)
     
     api_duration = (time.time() - api_start) * 1000
     logger.debug("Credits %s: api error (%.2f ms)", tmdb_id, api_duration)
@@ -340,87 +427,143 @@ async def _get_movie_keywords(
         pass
     
     api_start = time.time()
+    delay = 0.0
     for attempt in range(MAX_RETRIES + 1):
+        if not circuit_breaker.tmdb.allow_request():
+            stale = await _read_stale(cache_module.get_keywords, tmdb_id)
+            if stale:
+                return stale, None, "stale"
+            return None, circuit_breaker.CIRCUIT_OPEN_ERROR, "circuit_open"
         try:
-            await _rate_limit()
+            key = await _rate_limit()
             async with semaphore:
-                response = await client.get(
+                response, key = await hedging.get(
+                    client,
+                    "keywords",
                     f"{TMDB_BASE_URL}/movie/{tmdb_id}/keywords",
-                    params={"api_key": api_key},
+                    {"api_key": api_key},
+                    key,
                     timeout=20.0,
                 )
-                if response.status_code == 429 or response.status_code >= 500:
-                    if attempt >= MAX_RETRIES:
-                        api_duration = (time.time() - api_start) * 1000
-                        logger.debug("Keywords %s: api error (%.2f ms)", tmdb_id, api_duration)
-                        return None, f"TMDb error {response.status_code}", "api_error"
-                    delay = RETRY_DELAYS[min(attempt, len(RETRY_DELAYS) - 1)]
-                    retry_after = response.headers.get("Retry-After")
-                    if retry_after:
-                        try:
-                            delay = float(retry_after)
-                        except ValueError:
-                            pass
-                    await asyncio.sleep(delay)
-                    continue
-                response.raise_for_status()
-                data = response.json()
-                keywords = [k.get("name") for k in data.get("keywords", [])[:20] if k.get("name")]
-                api_duration = (time.time() - api_start) * 1000
-                
-                try:
-                    await asyncio.to_thread(cache_module.set_keywords, tmdb_id, keywords)
-                except Exception:
-                    pass
-                
-                logger.debug("Keywords %s: api (%.2f ms)", tmdb_id, api_duration)
-                return keywords, None, "api"
+            
+            tmdb_keys.report(key, response.status_code)
+            circuit_breaker.tmdb.record_response(response.status_code)
+            if response.status_code == 429 or response.status_code >= 500:
+                if attempt >= MAX_RETRIES or not retry_budget.tmdb.try_spend():
+                    api_duration = (time.time() - api_start) * 1000
+                    logger.debug("Keywords %s: api error (%.2f ms)", tmdb_id, api_duration)
+                    return None, f"TMDb error {response.status_code}", "api_error"
+                delay = _next_delay(delay, response.headers.get("Retry-After"))
+                await asyncio.sleep(delay)
+                continue
+            response.raise_for_status()
+            retry_budget.tmdb.record_success()
+            data = response.json()
+            keywords = [k.get("name") for k in data.get("keywords", [])[:20] if k.get("name")]
+            api_duration = (time.time() - api_start) * 1000
+            
+            try:
+                await _write_cache(cache_module.set_keywords, tmdb_id, keywords)
+            except Exception:
+                pass
+            
+            logger.debug("Keywords %s: api (%.2f ms)", tmdb_id, api_duration)
+            return keywords, None, "api"
         except httpx.HTTPStatusError as e:
-            if attempt >= MAX_RETRIES:
-                api_duration = (time.time() - api_start) * 1000
-                logger.debug("Keywords %s: api error (%.2f ms)", tmdb_id, api_duration)
-                return None, f"HTTP {e.response.status_code}", "api_error"
-            await asyncio.sleep(RETRY_DELAYS[min(attempt, len(RETRY_DELAYS) - 1)])
+            # Other 4xx (429 is handled above): resending gets the same answer.
+            api_duration = (time.time() - api_start) * 1000
+            logger.debug("Keywords %s: api error (%.2f ms)", tmdb_id, api_duration)
+            return None, f"HTTP {e.response.status_code}", "api_error"
         except (httpx.RequestError, httpx.HTTPError) as e:
-            if attempt >= MAX_RETRIES:
+            circuit_breaker.tmdb.record_failure()
+            if attempt >= MAX_RETRIES or not retry_budget.tmdb.try_spend():
                 api_duration = (time.time() - api_start) * 1000
                 logger.debug("Keywords %s: api error (%.2f ms)", tmdb_id, api_duration)
                 return None, str(e), "api_error"
-            await asyncio.sleep(RETRY_DELAYS[min(attempt, len(RETRY_DELAYS) - 1)])
+            delay = _next_delay(delay)
+            await asyncio.sleep(delay)
     
     api_duration = (time.time() - api_start) * 1000
     logger.debug("Keywords %s: api error (%.2f ms)", tmdb_id, api_duration)
     return None, "Max retries exceeded", "api_error"
 
 
+async def _run_per_id(
+    tmdb_ids: List[int],
+    api_key: str,
+    fetch: Callable[..., Awaitable[Tuple[Any, Optional[str], Optional[str]]]],
+    batch_getter: Callable[..., Dict[int, Any]],
+    deadline: Optional[float],
+    keys: Optional[Iterable[str]] = None,
+) -> List[Any]:
+    """
+    Run `fetch(client, api_key, tmdb_id, semaphore)` for every id through the
+    worker pipeline; outcomes come back in request order.
+    
+    With a deadline, cached ids are read in one batch first so they are always
+    answered, and ids not finished in time are left as batch_pipeline.PENDING
+    while their fetches complete in the background and fill the cache.
+    With `keys` (a projection's keys of the facet), both the batch and the
+    per-id cache reads extract only those keys of the cached payload.
+    """
+    outcomes: List[Any] = [batch_pipeline.PENDING] * len(tmdb_ids)
+    todo = list(range(len(tmdb_ids)))
+    fetch_kwargs = _keys_kwargs(keys)
+    if deadline is not None:
+        try:
+            cached = await _read_facet(batch_getter, tmdb_ids, keys)
+        except Exception as exc:
+            logger.warning("Batch cache read failed: %s", exc)
+            cached = {}
+        if not isinstance(cached, dict):
+            cached = {}
+        todo = []
+        for i, tmdb_id in enumerate(tmdb_ids):
+            if cached.get(tmdb_id):
+                outcomes[i] = (cached[tmdb_id], None, "cached")
+            else:
+                todo.append(i)
+    
+    semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+    
+    async def run() -> None:
+        async with _new_client() as client:
+            upstream = batch_pipeline.run_unordered(
+                todo,
+                lambda i: fetch(client, api_key, tmdb_ids[i], semaphore, **fetch_kwargs),
+                deadline=deadline,
+            )
+            async with aclosing(upstream):
+                async for position, outcome in upstream:
+                    outcomes[todo[position]] = outcome
+    
+    await batch_pipeline.wait_until(run(), deadline)
+    return list(outcomes)
+
+
 async def movies_batch(
     tmdb_ids: List[int],
     api_key: str,
+    deadline: Optional[float] = None,
+    projection: Optional[Projection] = None,
 ) -> List[Dict[str, Any]]:
     """Process batch of movie details requests."""
     if not tmdb_ids:
         return []
     
-    semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
-    
-    # Reduce keepalive connections on Windows to avoid file descriptor limit
-    max_keepalive = 5 if platform.system() == 'Windows' else 10
-    
-    async with httpx.AsyncClient(
-        base_url=TMDB_BASE_URL,
-        timeout=30.0,
-        limits=httpx.Limits(max_keepalive_connections=max_keepalive, keepalive_expiry=30.0, max_connections=100),
-        trust_env=False,
-    ) as client:
-        tasks = [
-            _get_movie_details(client, api_key, tmdb_id, semaphore)
-            for tmdb_id in tmdb_ids
-        ]
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+    keys = projection.keys("movie") if projection is not None else None
+    results = await _run_per_id(tmdb_ids, api_key, _get_movie_details, cache_module.get_movie_batch, deadline, keys)
     
     formatted_results = []
     for i, result in enumerate(results):
-        if isinstance(result, Exception):
+        if result is batch_pipeline.PENDING:
+            formatted_results.append({
+                "tmdb_id": tmdb_ids[i],
+                "movie": None,
+                "error": None,
+                "pending": True,
+            })
+        elif isinstance(result, Exception):
             formatted_results.append({
                 "tmdb_id": tmdb_ids[i],
                 "movie": None,
@@ -444,53 +587,53 @@ async def movies_batch(
                     except ValueError:
                         pass
                 
-                formatted_results.append({
+                entry = {
                     "tmdb_id": tmdb_ids[i],
-                        "movie": {
-                            "id": movie_data.get("id") if movie_data else tmdb_ids[i],
-                            "poster_path": movie_data.get("poster_path") if movie_data else None,
-                            "genres": _named_values(movie_data.get("genres", [])) if movie_data else [],
-                            "runtime": movie_data.get("runtime") if movie_data else None,
-                            "vote_average": movie_data.get("vote_average") if movie_data else None,
-                            "vote_count": movie_data.get("vote_count") or 0 if movie_data else 0,
-                            "original_language": movie_data.get("original_language") if movie_data else None,
-                            "production_countries": _named_values(movie_data.get("production_countries", [])) if movie_data else [],
-                            "release_date": release_date,
-                        },
-                        "error": None,
-                    })
+                    "movie": {
+                        "id": movie_data.get("id") if movie_data else tmdb_ids[i],
+                        "poster_path": movie_data.get("poster_path") if movie_data else None,
+                        "genres": _named_values(movie_data.get("genres", [])) if movie_data else [],
+                        "runtime": movie_data.get("runtime") if movie_data else None,
+                        "vote_average": movie_data.get("vote_average") if movie_data else None,
+                        "vote_count": movie_data.get("vote_count") or 0 if movie_data else 0,
+                        "original_language": movie_data.get("original_language") if movie_data else None,
+                        "production_countries": _named_values(movie_data.get("production_countries", [])) if movie_data else [],
+                        "release_date": release_date,
+                    },
+                    "error": None,
+                }
+                if cache_status == "stale":
+                    entry["stale"] = True
+                formatted_results.append(entry)
     
+    if projection is not None:
+        return [projection.apply(entry) for entry in formatted_results]
     return formatted_results
 
 
 async def credits_batch(
     tmdb_ids: List[int],
     api_key: str,
+    deadline: Optional[float] = None,
+    projection: Optional[Projection] = None,
 ) -> List[Dict[str, Any]]:
     """Process batch of credits requests."""
     if not tmdb_ids:
         return []
     
-    semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
-    
-    # Reduce keepalive connections on Windows to avoid file descriptor limit
-    max_keepalive = 5 if platform.system() == 'Windows' else 10
-    
-    async with httpx.AsyncClient(
-        base_url=TMDB_BASE_URL,
-        timeout=30.0,
-        limits=httpx.Limits(max_keepalive_connections=max_keepalive, keepalive_expiry=30.0, max_connections=100),
-        trust_env=False,
-    ) as client:
-        tasks = [
-            _get_movie_credits(client, api_key, tmdb_id, semaphore)
-            for tmdb_id in tmdb_ids
-        ]
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+    keys = projection.keys("credits") if projection is not None else None
+    results = await _run_per_id(tmdb_ids, api_key, _get_movie_credits, cache_module.get_credits_batch, deadline, keys)
     
     formatted_results = []
     for i, result in enumerate(results):
-        if isinstance(result, Exception):
+        if result is batch_pipeline.PENDING:
+            formatted_results.append({
+                "tmdb_id": tmdb_ids[i],
+                "credits": None,
+                "error": None,
+                "pending": True,
+            })
+        elif isinstance(result, Exception):
             formatted_results.append({
                 "tmdb_id": tmdb_ids[i],
                 "credits": None,
@@ -506,43 +649,42 @@ async def credits_batch(
                     "error": error,
                 })
             else:
-                formatted_results.append({
+                entry = {
                     "tmdb_id": tmdb_ids[i],
                     "credits": credits_data,
                     "error": None,
-                })
+                }
+                if cache_status == "stale":
+                    entry["stale"] = True
+                formatted_results.append(entry)
     
+    if projection is not None:
+        return [projection.apply(entry) for entry in formatted_results]
     return formatted_results
 
 
 async def keywords_batch(
     tmdb_ids: List[int],
     api_key: str,
+    deadline: Optional[float] = None,
+    projection: Optional[Projection] = None,
 ) -> List[Dict[str, Any]]:
     """Process batch of keywords requests."""
     if not tmdb_ids:
         return []
     
-    semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
-    
-    # Reduce keepalive connections on Windows to avoid file descriptor limit
-    max_keepalive = 5 if platform.system() == 'Windows' else 10
-    
-    async with httpx.AsyncClient(
-        base_url=TMDB_BASE_URL,
-        timeout=30.0,
-        limits=httpx.Limits(max_keepalive_connections=max_keepalive, keepalive_expiry=30.0, max_connections=100),
-        trust_env=False,
-    ) as client:
-        tasks = [
-            _get_movie_keywords(client, api_key, tmdb_id, semaphore)
-            for tmdb_id in tmdb_ids
-        ]
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+    results = await _run_per_id(tmdb_ids, api_key, _get_movie_keywords, cache_module.get_keywords_batch, deadline)
     
     formatted_results = []
     for i, result in enumerate(results):
-        if isinstance(result, Exception):
+        if result is batch_pipeline.PENDING:
+            formatted_results.append({
+                "tmdb_id": tmdb_ids[i],
+                "keywords": None,
+                "error": None,
+                "pending": True,
+            })
+        elif isinstance(result, Exception):
             formatted_results.append({
                 "tmdb_id": tmdb_ids[i],
                 "keywords": None,
@@ -558,28 +700,103 @@ async def keywords_batch(
                     "error": error,
                 })
             else:
-                formatted_results.append({
+                entry = {
                     "tmdb_id": tmdb_ids[i],
                     "keywords": keywords or [],
                     "error": None,
-                })
+                }
+                if cache_status == "stale":
+                    entry["stale"] = True
+                formatted_results.append(entry)
     
+    if projection is not None:
+        return [projection.apply(entry) for entry in formatted_results]
     return formatted_results
 
 
-async def full_batch(
-    tmdb_ids: List[int],
-    api_key: str,
-) -> List[Dict[str, Any]]:
-    """Process batch of full movie metadata (details + credits + keywords) in parallel."""
-    if not tmdb_ids:
-        return []
+def _format_full(
+    tmdb_id: int,
+    movie_data: Optional[Dict[str, Any]],
+    credits_data: Optional[Dict[str, Any]],
+    keywords_data: Any,
+    error: Optional[str],
+    stale: bool,
+    projection: Optional[Projection] = None,
+) -> Dict[str, Any]:
+    """Format one full-metadata entry from merged cache/API data, limited to `projection` if given."""
+    result = {
+        "tmdb_id": tmdb_id,
+        "movie": None,
+        "credits": None,
+        "keywords": None,
+        "error": None,
+    }
+    
+    if movie_data:
+        release_date = movie_data.get("release_date") or ""
+        result["movie"] = {
+            "id": movie_data.get("id") if movie_data else tmdb_id,
+            "poster_path": movie_data.get("poster_path") if movie_data else None,
+            "genres": _named_values(movie_data.get("genres", [])) if movie_data else [],
+            "runtime": movie_data.get("runtime") if movie_data else None,
+            "vote_average": movie_data.get("vote_average") if movie_data else None,
+            "vote_count": movie_data.get("vote_count") or 0 if movie_data else 0,
+            "original_language": movie_data.get("original_language") if movie_data else None,
+            "production_countries": _named_values(movie_data.get("production_countries", [])) if movie_data else [],
+            "release_date": release_date,
+        }
+    
+    if credits_data:
+        result["credits"] = credits_data
+    
+    if keywords_data:
+        result["keywords"] = keywords_data if isinstance(keywords_data, list) else []
+    
+    if not movie_data and error:
+        result["error"] = error
+    if stale:
+        result["stale"] = True
     
+    return projection.apply(result) if projection is not None else result
+
+
+def _full_facets(projection: Optional[Projection]) -> Tuple[str, ...]:
+    """Facets a full_batch request needs: all of them, or the projected ones."""
+    if projection is None:
+        return FULL_FACETS
+    return tuple(facet for facet in FULL_FACETS if projection.wants(facet))
+
+
+def _is_cached(tmdb_id: int, facets: Tuple[str, ...], cached: Tuple[Dict[int, Any], ...]) -> bool:
+    return all(rows.get(tmdb_id) is not None for facet, rows in zip(FULL_FACETS, cached) if facet in facets)
+
+
+async def _read_facet(getter: Callable[..., Dict[int, Any]], tmdb_ids: List[int], keys: Any) -> Dict[int, Any]:
+    return await asyncio.to_thread(getter, tmdb_ids, **_keys_kwargs(keys))
+
+
+async def _read_full_cache(
+    tmdb_ids: List[int],
+    projection: Optional[Projection] = None,
+) -> Tuple[Dict[int, Any], Dict[int, Any], Dict[int, Any]]:
+    """
+    Batch cache read of movie/credits/keywords rows; empty maps if the cache fails.
+    With a projection, facets it leaves out are not read (empty maps) and
+    movie/credits rows hold only the projected keys.
+    """
+    facets = _full_facets(projection)
+    keys = projection.keys if projection is not None else (lambda facet: None)
     # Batch cache read is an optimization. If it fails, continue with API path.
     try:
-        cached_movies = await asyncio.to_thread(cache_module.get_movie_batch, tmdb_ids)
-        cached_credits = await asyncio.to_thread(cache_module.get_credits_batch, tmdb_ids)
-        cached_keywords = await asyncio.to_thread(cache_module.get_keywords_batch, tmdb_ids)
+        cached_movies = (
+            await _read_facet(cache_module.get_movie_batch, tmdb_ids, keys("movie")) if "movie" in facets else {}
+        )
+        cached_credits = (
+            await _read_facet(cache_module.get_credits_batch, tmdb_ids, keys("credits")) if "credits" in facets else {}
+        )
+        cached_keywords = (
+            await _read_facet(cache_module.get_keywords_batch, tmdb_ids, None) if "keywords" in facets else {}
+        )
     except Exception as exc:
         logger.warning("Batch cache read failed in full_batch: %s", exc)
         cached_movies = {}
@@ -592,48 +809,90 @@ async def full_batch(
         cached_credits = {}
     if not isinstance(cached_keywords, dict):
         cached_keywords = {}
+    return cached_movies, cached_credits, cached_keywords
+
+
+def _new_client() -> httpx.AsyncClient:
+    # Reduce keepalive connections on Windows to avoid file descriptor limit
+    max_keepalive = 5 if platform.system() == 'Windows' else 10
+    
+    return httpx.AsyncClient(
+        base_url=TMDB_BASE_URL,
+        timeout=30.0,
+        limits=httpx.Limits(max_keepalive_connections=max_keepalive, keepalive_expiry=30.0, max_connections=100),
+        trust_env=False,
+    )
+
+
+async def full_batch(
+    tmdb_ids: List[int],
+    api_key: str,
+    deadline: Optional[float] = None,
+    projection: Optional[Projection] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Process batch of full movie metadata (details + credits + keywords) in parallel.
+    With a deadline, cached ids are answered first and ids not finished in time
+    come back with `pending: True`. With a projection, only its facets are read
+    and fetched.
+    """
+    if not tmdb_ids:
+        return []
+    
+    if deadline is not None:
+        collected: List[Any] = [batch_pipeline.PENDING] * len(tmdb_ids)
+        
+        async def collect() -> None:
+            async for i, result in full_batch_stream(tmdb_ids, api_key, deadline, projection):
+                collected[i] = result
+        
+        await batch_pipeline.wait_until(collect(), deadline)
+        return [
+            {**_format_full(tmdb_ids[i], None, None, None, None, False, projection), "pending": True}
+            if result is batch_pipeline.PENDING else result
+            for i, result in enumerate(collected)
+        ]
+    
+    facets = _full_facets(projection)
+    cached = await _read_full_cache(tmdb_ids, projection)
+    cached_movies, cached_credits, cached_keywords = cached
     
     # Determine which IDs need API calls
-    # Use unified approach: if ANY data is missing, fetch all via append_to_response
+    # Use unified approach: if ANY requested data is missing, fetch all of it via append_to_response
     ids_needing_api = set()
     for tid in tmdb_ids:
-        if (cached_movies.get(tid) is None or 
-            cached_credits.get(tid) is None or 
-            cached_keywords.get(tid) is None):
+        if not _is_cached(tid, facets, cached):
             ids_needing_api.add(tid)
     
     ids_for_api = list(ids_needing_api)
     
     semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
     
-    # Reduce keepalive connections on Windows to avoid file descriptor limit
-    max_keepalive = 5 if platform.system() == 'Windows' else 10
-    
-    async with httpx.AsyncClient(
-        base_url=TMDB_BASE_URL,
-        timeout=30.0,
-        limits=httpx.Limits(max_keepalive_connections=max_keepalive, keepalive_expiry=30.0, max_connections=100),
-        trust_env=False,
-    ) as client:
-        # Create tasks using append_to_response to get movie + credits + keywords in one request
-        unified_tasks = [
-            _get_movie_details_with_credits_keywords(client, api_key, tmdb_id, semaphore)
-            for tmdb_id in ids_for_api
-        ]
-        
-        # Execute all unified API calls in parallel
-        unified_results = await asyncio.gather(*unified_tasks, return_exceptions=True) if unified_tasks else []
+    async with _new_client() as client:
+        # append_to_response gets movie + credits + keywords in one request (see _fetch_facets)
+        unified_results = await batch_pipeline.run_ordered(
+            ids_for_api,
+            lambda tmdb_id: _fetch_facets(client, api_key, tmdb_id, semaphore, facets),
+        )
     
     # Build result maps from API calls
     api_movies = {}
     api_credits = {}
     api_keywords = {}
+    api_errors: Dict[int, str] = {}
+    stale_ids = set()
     
     for i, result in enumerate(unified_results):
-        if not isinstance(result, Exception):
+        tmdb_id = ids_for_api[i]
+        if isinstance(result, Exception):
+            api_errors[tmdb_id] = str(result)
+        else:
             movie_data, credits_data, keywords_data, error, cache_status = result
-            tmdb_id = ids_for_api[i]
-            if not error:
+            if error:
+                api_errors[tmdb_id] = error
+            else:
+                if cache_status == "stale":
+                    stale_ids.add(tmdb_id)
                 if movie_data:
                     api_movies[tmdb_id] = movie_data
                 if credits_data:
@@ -647,40 +906,178 @@ async def full_batch(
     all_keywords = {**cached_keywords, **api_keywords}
     
     # Format results
-    formatted_results = []
-    for tmdb_id in tmdb_ids:
-        movie_data = all_movies.get(tmdb_id)
-        credits_data = all_credits.get(tmdb_id)
-        keywords_data = all_keywords.get(tmdb_id)
-        
-        result = {
-            "tmdb_id": tmdb_id,
-            "movie": None,
-            "credits": None,
-            "keywords": None,
-            "error": None,
-        }
-        
-        if movie_data:
-            release_date = movie_data.get("release_date") or ""
-            result["movie"] = {
-                "id": movie_data.get("id") if movie_data else tmdb_id,
-                "poster_path": movie_data.get("poster_path") if movie_data else None,
-                "genres": _named_values(movie_data.get("genres", [])) if movie_data else [],
-                "runtime": movie_data.get("runtime") if movie_data else None,
-                "vote_average": movie_data.get("vote_average") if movie_data else None,
-                "vote_count": movie_data.get("vote_count") or 0 if movie_data else 0,
-                "original_language": movie_data.get("original_language") if movie_data else None,
-                "production_countries": _named_values(movie_data.get("production_countries", [])) if movie_data else [],
-                "release_date": release_date,
-            }
-        
-        if credits_data:
-            result["credits"] = credits_data
-        
-        if keywords_data:
-            result["keywords"] = keywords_data if isinstance(keywords_data, list) else []
-        
-        formatted_results.append(result)
+    return [
+        _format_full(
+            tmdb_id,
+            all_movies.get(tmdb_id),
+            all_credits.get(tmdb_id),
+            all_keywords.get(tmdb_id),
+            api_errors.get(tmdb_id),
+            tmdb_id in stale_ids,
+            projection,
+        )
+        for tmdb_id in tmdb_ids
+    ]
+
+
+async def full_batch_stream(
+    tmdb_ids: List[int],
+    api_key: str,
+    deadline: Optional[float] = None,
+    projection: Optional[Projection] = None,
+) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+    """
+    Streaming variant of full_batch: yields (index, result) as each item completes.
+    Fully cached ids are yielded first; the rest follow in completion order.
+    Closing the generator cancels the work still in flight.
+    With a deadline, no upstream call starts once it is near, and when it
+    passes every unfinished id is yielded with `pending: True` (the work goes
+    on in the background, as in full_batch).
+    """
+    results = batch_pipeline.until_deadline(
+        _full_stream(tmdb_ids, api_key, deadline, projection), len(tmdb_ids), deadline
+    )
+    async with aclosing(results):
+        async for i, result in results:
+            if result is batch_pipeline.PENDING:
+                result = {**_format_full(tmdb_ids[i], None, None, None, None, False, projection), "pending": True}
+            yield i, result
+
+
+async def _full_stream(
+    tmdb_ids: List[int],
+    api_key: str,
+    deadline: Optional[float],
+    projection: Optional[Projection],
+) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+    if not tmdb_ids:
+        return
     
-    return formatted_results
+    facets = _full_facets(projection)
+    cached = await _read_full_cache(tmdb_ids, projection)
+    cached_movies, cached_credits, cached_keywords = cached
+    
+    # Duplicate ids share one upstream call and are yielded once per index.
+    indices_by_id: Dict[int, List[int]] = {}
+    for i, tid in enumerate(tmdb_ids):
+        if not _is_cached(tid, facets, cached):
+            indices_by_id.setdefault(tid, []).append(i)
+        else:
+            yield i, _format_full(
+                tid, cached_movies.get(tid), cached_credits.get(tid), cached_keywords.get(tid), None, False, projection
+            )
+    if not indices_by_id:
+        return
+    
+    semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+    async with _new_client() as client:
+        ids_for_api = list(indices_by_id)
+        upstream = batch_pipeline.run_unordered(
+            ids_for_api,
+            lambda tid: _fetch_facets(client, api_key, tid, semaphore, facets),
+            deadline=deadline,
+        )
+        async with aclosing(upstream):
+            async for position, outcome in upstream:
+                tid = ids_for_api[position]
+                error: Optional[str] = None
+                stale = False
+                movie_data, credits_data, keywords_data = None, None, None
+                if isinstance(outcome, Exception):
+                    error = str(outcome)
+                else:
+                    movie_data, credits_data, keywords_data, error, cache_status = outcome
+                    stale = not error and cache_status == "stale"
+                # Partially cached rows fill in whatever the API call did not return.
+                entry = _format_full(
+                    tid,
+                    movie_data or cached_movies.get(tid),
+                    credits_data or cached_credits.get(tid),
+                    keywords_data or cached_keywords.get(tid),
+                    error,
+                    stale,
+                    projection,
+                )
+                for i in indices_by_id[tid]:
+                    yield i, entry
+
+
+def _entry_version(movie_data: Dict[str, Any], credits_data: Optional[Dict[str, Any]], keywords_data: Any) -> str:
+    """cache.entry_version of payloads as the cache stores them."""
+    return cache_module.entry_version(
+        cache_module.payload_hash(movie_data),
+        cache_module.payload_hash(credits_data) if credits_data else None,
+        cache_module.payload_hash(keywords_data) if keywords_data else None,
+    )
+
+
+async def sync_batch(known: Dict[int, Optional[str]], api_key: str) -> Dict[str, Any]:
+    """
+    Delta sync of a client's cached full entries. `known` maps tmdb_id to the
+    entry version the client holds (None: it has none). Returns
+    {"results": [...], "deleted": [...], "unchanged": n}: full entries with
+    their `version` for ids whose version differs (or that failed, with
+    `error`), ids TMDb answers 404 for, and how many entries are current.
+
+    Versions of fresh, fully cached ids come from cache.get_entry_versions
+    without decoding payloads; only the remaining ids are read or fetched,
+    as in full_batch. Versions hash the cached TMDb payloads, so a refresh
+    that changes a field the entries leave out also yields a new version.
+    """
+    tmdb_ids = list(known)
+    try:
+        versions = await asyncio.to_thread(cache_module.get_entry_versions, tmdb_ids)
+    except Exception as exc:
+        logger.warning("Entry version read failed in sync_batch: %s", exc)
+        versions = {}
+
+    unchanged = 0
+    ids_to_read = []
+    for tid in tmdb_ids:
+        if versions.get(tid) is not None and versions[tid] == known[tid]:
+            unchanged += 1
+        else:
+            ids_to_read.append(tid)
+
+    cached = await _read_full_cache(ids_to_read)
+    ids_for_api = [tid for tid in ids_to_read if not _is_cached(tid, FULL_FACETS, cached)]
+    fetched: Dict[int, Any] = {}
+    if ids_for_api:
+        semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+        async with _new_client() as client:
+            outcomes = await batch_pipeline.run_ordered(
+                ids_for_api,
+                lambda tid: _fetch_facets(client, api_key, tid, semaphore, FULL_FACETS),
+            )
+        fetched = dict(zip(ids_for_api, outcomes))
+
+    results: List[Dict[str, Any]] = []
+    deleted: List[int] = []
+    for tid in ids_to_read:
+        movie_data, credits_data, keywords_data = (rows.get(tid) for rows in cached)
+        error: Optional[str] = None
+        stale = False
+        if tid in fetched:
+            outcome = fetched[tid]
+            if isinstance(outcome, Exception):
+                error = str(outcome)
+            else:
+                api_movie, api_credits, api_keywords, error, cache_status = outcome
+                stale = not error and cache_status == "stale"
+                movie_data = api_movie or movie_data
+                credits_data = api_credits or credits_data
+                keywords_data = api_keywords or keywords_data
+        if not movie_data:
+            if error == NOT_FOUND_ERROR:
+                deleted.append(tid)
+            else:
+                results.append(_format_full(tid, None, None, None, error or "No data", False))
+            continue
+        version = _entry_version(movie_data, credits_data, keywords_data)
+        if version == known[tid]:
+            unchanged += 1
+            continue
+        entry = _format_full(tid, movie_data, credits_data, keywords_data, None, stale)
+        entry["version"] = version
+        results.append(entry)
+    return {"results": results, "deleted": deleted, "unchanged": unchanged}
@@ -0,0 +1,206 @@
+"""
+Pool of TMDb API keys.
+
+Keys come from TMDB_API_KEYS (comma-separated) or, when that is unset, the
+single TMDB_API_KEY. Every key has its own token bucket in rate_limit.py, so
+adding keys adds upstream budget. Each request goes to the healthy key with
+the most tokens available.
+
+Health:
+- 401 means the key is revoked or mistyped: quarantined for an hour.
+- KEY_MAX_CONSECUTIVE_429 429s in a row: quarantined for KEY_429_QUARANTINE_S.
+- Any other response resets the 429 streak.
+
+Health is per process. Buckets may be shared between workers
+(TMDB_RATE_LIMIT_BACKEND=sqlite), but the 429 streaks and quarantine
+deadlines live in this module. So every worker finds a bad key on its own:
+each spends up to one 401, or KEY_MAX_CONSECUTIVE_429 429s, on it before
+quarantining it. A restart clears quarantine. The tmdb_api_key_quarantined
+gauge is per worker too.
+
+Keys never appear in logs or metrics; they are identified by a short hash.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from prometheus_client import Counter, Gauge
+
+from . import rate_limit
+
+logger = logging.getLogger(__name__)
+
+KEY_MAX_CONSECUTIVE_429 = 3
+KEY_429_QUARANTINE_S = 30.0
+KEY_401_QUARANTINE_S = 3600.0
+
+KEY_REQUESTS = Counter(
+    "tmdb_api_key_requests_total",
+    "Upstream TMDb responses per API key (hashed) and status class.",
+    ["key", "status"],
+)
+KEY_QUARANTINED = Gauge(
+    "tmdb_api_key_quarantined",
+    "1 while the API key (hashed) is quarantined, else 0.",
+    ["key"],
+)
+
+
+def fingerprint(key: str) -> str:
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:8]
+
+
+def _status_class(status_code: int) -> str:
+    if status_code in (401, 429):
+        return str(status_code)
+    return f"{status_code // 100}xx"
+
+
+class _KeyState:
+    def __init__(self, key: str) -> None:
+        self.key = key
+        self.fingerprint = fingerprint(key)
+        self.bucket = f"tmdb:{self.fingerprint}"
+        self.consecutive_429 = 0
+        self.quarantined_until = 0.0
+
+    def is_healthy(self, now: float) -> bool:
+        return self.quarantined_until <= now
+
+
+class KeyPool:
+    def __init__(self, keys: List[str]) -> None:
+        self._lock = threading.Lock()
+        self._states: Dict[str, _KeyState] = {}
+        for key in keys:
+            if key and key not in self._states:
+                self._states[key] = _KeyState(key)
+        for state in self._states.values():
+            KEY_QUARANTINED.labels(key=state.fingerprint).set(0)
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+    @property
+    def keys(self) -> List[str]:
+        return list(self._states)
+
+    def _pick(self) -> _KeyState:
+        now = time.monotonic()
+        with self._lock:
+            states = list(self._states.values())
+        healthy = [s for s in states if s.is_healthy(now)]
+        if not healthy:
+            # Every key is quarantined: use the one that recovers first rather than failing the request.
+            logger.warning("All %s TMDb API keys are quarantined", len(states))
+            return min(states, key=lambda s: s.quarantined_until)
+        if len(healthy) == 1:
+            return healthy[0]
+        return max(healthy, key=lambda s: rate_limit.available(s.bucket))
+
+    async def acquire(self) -> str:
+        """Pick a key and wait for a token from its bucket. Returns the key."""
+        if rate_limit.get_backend().blocking_io:
+            state = await asyncio.to_thread(self._pick)
+        else:
+            state = self._pick()
+        await rate_limit.acquire(state.bucket)
+        return state.key
+
+    async def try_acquire_now(self) -> Optional[str]:
+        """Like acquire(), but returns None instead of waiting when the picked key has no spare token."""
+        if rate_limit.get_backend().blocking_io:
+            state = await asyncio.to_thread(self._pick)
+        else:
+            state = self._pick()
+        if await rate_limit.try_acquire_now(state.bucket):
+            return state.key
+        return None
+
+    def report(self, key: str, status_code: int) -> None:
+        state = self._states.get(key)
+        if state is None:
+            return
+        KEY_REQUESTS.labels(key=state.fingerprint, status=_status_class(status_code)).inc()
+        now = time.monotonic()
+        with self._lock:
+            if status_code == 401:
+                state.quarantined_until = now + KEY_401_QUARANTINE_S
+                logger.error("TMDb API key %s rejected (401); quarantined", state.fingerprint)
+            elif status_code == 429:
+                state.consecutive_429 += 1
+                if state.consecutive_429 >= KEY_MAX_CONSECUTIVE_429:
+                    state.quarantined_until = now + KEY_429_QUARANTINE_S
+                    state.consecutive_429 = 0
+                    logger.warning(
+                        "TMDb API key %s hit %s consecutive 429s; quarantined for %.0fs",
+                        state.fingerprint,
+                        KEY_MAX_CONSECUTIVE_429,
+                        KEY_429_QUARANTINE_S,
+                    )
+            else:
+                state.consecutive_429 = 0
+            quarantined = not state.is_healthy(now)
+        KEY_QUARANTINED.labels(key=state.fingerprint).set(1 if quarantined else 0)
+
+
+def _keys_from_env() -> List[str]:
+    raw = os.getenv("TMDB_API_KEYS") or os.getenv("TMDB_API_KEY") or ""
+    return [k.strip() for k in raw.split(",") if k.strip()]
+
+
+_pool: Optional[KeyPool] = None
+_pool_source: Optional[List[str]] = None
+
+
+def get_pool() -> KeyPool:
+    """Pool for the current environment; rebuilt when the configured keys change."""
+    global _pool, _pool_source
+    keys = _keys_from_env()
+    if _pool is None or keys != _pool_source:
+        _pool = KeyPool(keys)
+        _pool_source = keys
+    return _pool
+
+
+def primary_key() -> str:
+    """First configured key, or "" when none is set."""
+    keys = _keys_from_env()
+    return keys[0] if keys else ""
+
+
+async def acquire() -> Optional[str]:
+    """
+    Wait for upstream budget. Returns the pool key to use, or None when no keys
+    are configured (the caller keeps its own key and the default bucket is used).
+    """
+    pool = get_pool()
+    if not len(pool):
+        await rate_limit.acquire()
+        return None
+    return await pool.acquire()
+
+
+async def try_acquire_now() -> Tuple[bool, Optional[str]]:
+    """Non-blocking acquire(): (got_token, key). Used for optional extra calls such as hedges."""
+    pool = get_pool()
+    if not len(pool):
+        return await rate_limit.try_acquire_now(), None
+    key = await pool.try_acquire_now()
+    return key is not None, key
+
+
+def report(key: Optional[str], status_code: int) -> None:
+    if key:
+        get_pool().report(key, status_code)
+
+
+def with_key(params: Dict[str, Any], key: Optional[str]) -> Dict[str, Any]:
+    """Request params with `api_key` swapped for the pool key, when one was picked."""
+    if not key:
+        return params
+    return {**params, "api_key": key}
@@ -0,0 +1,99 @@
+"""
+Benchmark: batch response payload size and decode time, JSON vs columnar MessagePack.
+
+Payloads are 500-item /tmdb/movies/full/batch and /tmdb/search/batch results
+built from the demo films (see bench_json_response.py). For each format it
+prints the body size raw and gzip-compressed (level 6, as the compression
+middleware sends it) and the best decode time:
+
+- json: json.loads, and orjson.loads when installed;
+- columnar: msgpack.unpackb alone, and unpackb + columnar.decode back to the
+  JSON result objects (what a client needs to use the data).
+
+Decoded results are checked to equal the JSON results.
+
+Usage (from backend/):
+    python scripts/bench_batch_formats.py [repeats]
+"""
+import gzip
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+import msgpack  # noqa: E402
+
+from app import columnar  # noqa: E402
+from app.json_response import dumps as json_dumps, orjson  # noqa: E402
+from bench_json_response import demo_report_payload, synthetic_full_batch  # noqa: E402
+
+
+def synthetic_search_batch(size: int = 500) -> Dict[str, Any]:
+    """A search_batch response shaped like tmdb_batch._format_result output."""
+    films = demo_report_payload()["filmsLiteAll"]
+    results: List[Dict[str, Any]] = []
+    for i in range(size):
+        film = films[i % len(films)]
+        results.append({
+            "title": film["title"],
+            "year": film["year"],
+            "tmdb": {
+                "tmdb_id": film["tmdb_id"] or i,
+                "title": film["title"],
+                "year": film["year"],
+                "poster_path": film["poster_path"],
+                "vote_average": film["tmdb_vote_average"],
+                "vote_count": film["tmdb_vote_count"] or 0,
+                "genres": film["genres"],
+                "runtime": film["runtime"],
+                "production_countries": film["countries"],
+                "original_language": film["original_language"],
+                "release_date": f"{film['year']}-01-01" if film["year"] else "",
+            },
+            "error": None,
+        })
+    return {"results": results}
+
+
+def _best_ms(fn: Callable[[bytes], Any], body: bytes, repeats: int) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(body)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def _size(body: bytes) -> str:
+    return f"{len(body) / 1024:7.1f} KiB (gzip {len(gzip.compress(body, 6)) / 1024:6.1f} KiB)"
+
+
+def main() -> None:
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    print(f"best of {repeats}")
+    for name, payload in (("full_batch x500", synthetic_full_batch()), ("search_batch x500", synthetic_search_batch())):
+        results = payload["results"]
+        json_body = json_dumps(payload)
+        packed = columnar.dumps(results)
+        if columnar.loads(packed) != json.loads(json_body)["results"]:
+            raise SystemExit(f"{name}: columnar round trip differs from JSON")
+
+        print(name)
+        print(f"  json      {_size(json_body)}  json.loads {_best_ms(json.loads, json_body, repeats):6.2f} ms", end="")
+        if orjson is not None:
+            print(f"  orjson.loads {_best_ms(orjson.loads, json_body, repeats):6.2f} ms", end="")
+        print()
+        unpack_ms = _best_ms(lambda body: msgpack.unpackb(body, raw=False), packed, repeats)
+        print(
+            f"  columnar  {_size(packed)}  unpackb {unpack_ms:6.2f} ms  "
+            f"unpackb+decode {_best_ms(columnar.loads, packed, repeats):6.2f} ms  "
+            f"(encode {_best_ms(lambda _: columnar.dumps(results), b'', repeats):6.2f} ms)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Micro-benchmark: API response serialization, stdlib path vs FastJSONResponse.
+
+Payloads:
+- the demo report (compatibility view of data/demo/demo_report_1000.compact.json);
+- a synthetic 500-item /tmdb/movies/full/batch result built from the demo
+  films (movie details, 20 actors, directors and keywords per entry).
+
+"before" is what FastAPI did for a returned dict: jsonable_encoder, then
+Starlette's JSONResponse.render (json.dumps). "after" is
+FastJSONResponse.render on the dict. Both outputs are checked to be
+byte-identical.
+
+Usage (from backend/):
+    python scripts/bench_json_response.py [repeats]
+"""
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+
+from app import demo_report  # noqa: E402
+from app.json_response import FastJSONResponse, orjson  # noqa: E402
+
+
+def demo_report_payload() -> Dict[str, Any]:
+    return demo_report.compat_view(demo_report.load_compact())
+
+
+def synthetic_full_batch(size: int = 500) -> Dict[str, Any]:
+    """A full_batch response shaped like tmdb_batch_movies._format_full_entry output."""
+    films = demo_report_payload()["filmsLiteAll"]
+    results: List[Dict[str, Any]] = []
+    for i in range(size):
+        film = films[i % len(films)]
+        results.append({
+            "tmdb_id": film["tmdb_id"] or i,
+            "movie": {
+                "id": film["tmdb_id"] or i,
+                "poster_path": film["poster_path"],
+                "genres": film["genres"],
+                "runtime": film["runtime"],
+                "vote_average": film["tmdb_vote_average"],
+                "vote_count": film["tmdb_vote_count"] or 0,
+                "original_language": film["original_language"],
+                "production_countries": film["countries"],
+                "release_date": f"{film['year']}-01-01" if film["year"] else "",
+            },
+            "credits": {"directors": film["directors"], "actors": film["actors"]},
+            "keywords": film["keywords"],
+            "error": None,
+        })
+    return {"results": results}
+
+
+def _stdlib(content: Any) -> bytes:
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+def _fast(content: Any) -> bytes:
+    return FastJSONResponse(content).body
+
+
+def _best_ms(fn: Callable[[Any], bytes], content: Any, repeats: int) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(content)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main() -> None:
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    print(f"orjson: {'yes' if orjson is not None else 'not installed (stdlib fallback)'}; best of {repeats}")
+    for name, payload in (("demo report", demo_report_payload()), ("full_batch x500", synthetic_full_batch())):
+        before_bytes = _stdlib(payload)
+        if _fast(payload) != before_bytes:
+            raise SystemExit(f"{name}: output differs from JSONResponse")
+        before = _best_ms(_stdlib, payload, repeats)
+        after = _best_ms(_fast, payload, repeats)
+        print(
+            f"{name:16} {len(before_bytes) / 1024:8.0f} KiB  "
+            f"jsonable_encoder+json {before:7.2f} ms  FastJSONResponse {after:6.2f} ms  x{before / after:.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
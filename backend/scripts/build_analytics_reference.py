@@ -0,0 +1,70 @@
+"""
+Export the frontend's analytics reference tables for the backend analytics module.
+
+Reads the TypeScript object literals the report code uses:
+- GENRE_GLOBAL_FREQUENCY, COUNTRY_GLOBAL_FREQUENCY, YEAR_GLOBAL_FREQUENCY (utils/*GlobalFrequency.ts)
+- genreNamesRu, countryNamesRu (utils/genresRu.ts, utils/countriesRu.ts)
+
+and writes them to backend/data/analytics/reference.json, so app/analytics.py
+ranks and labels entities exactly like utils/analyticsClient.ts. Re-run after
+changing any of those tables.
+"""
+import json
+import re
+from pathlib import Path
+from typing import Dict, Union
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+FRONTEND_UTILS = BACKEND_DIR.parent / "frontend" / "src" / "utils"
+OUTPUT = BACKEND_DIR / "data" / "analytics" / "reference.json"
+
+TABLES = {
+    "genre_global_frequency": ("genreGlobalFrequency.ts", "GENRE_GLOBAL_FREQUENCY"),
+    "country_global_frequency": ("countryGlobalFrequency.ts", "COUNTRY_GLOBAL_FREQUENCY"),
+    "year_global_frequency": ("yearGlobalFrequency.ts", "YEAR_GLOBAL_FREQUENCY"),
+    "genre_names_ru": ("genresRu.ts", "genreNamesRu"),
+    "country_names_ru": ("countriesRu.ts", "countryNamesRu"),
+}
+
+# One `key: value,` entry per line; keys are bare identifiers or quoted, values strings or numbers.
+ENTRY = re.compile(
+    r"""^\s*(?:'(?P<sq>[^']*)'|"(?P<dq>[^"]*)"|(?P<bare>[A-Za-z_$][\w$]*))\s*:\s*"""
+    r"""(?:'(?P<sval>[^']*)'|"(?P<dval>[^"]*)"|(?P<num>[-+]?[\d.]+(?:[eE][-+]?\d+)?))\s*,?\s*$"""
+)
+
+
+def parse_object_literal(source: str, name: str) -> Dict[str, Union[str, float]]:
+    """Entries of `const <name>: ... = { ... }` (top-level literal closed by a `}` line)."""
+    start = re.search(rf"(?:export\s+)?const\s+{re.escape(name)}\b[^=]*=\s*{{\s*$", source, re.MULTILINE)
+    if start is None:
+        raise ValueError(f"{name} not found")
+    entries: Dict[str, Union[str, float]] = {}
+    for line in source[start.end():].splitlines():
+        if line.startswith("}"):
+            return entries
+        if not line.strip() or line.strip().startswith("//"):
+            continue
+        match = ENTRY.match(line)
+        if match is None:
+            raise ValueError(f"Unparsed line in {name}: {line!r}")
+        key = match.group("sq") or match.group("dq") or match.group("bare")
+        if match.group("num") is not None:
+            entries[key] = float(match.group("num"))
+        else:
+            entries[key] = match.group("sval") if match.group("sval") is not None else match.group("dval")
+    raise ValueError(f"{name} is not closed")
+
+
+def main() -> None:
+    reference = {}
+    for table, (filename, name) in TABLES.items():
+        source = (FRONTEND_UTILS / filename).read_text(encoding="utf-8")
+        reference[table] = parse_object_literal(source, name)
+        print(f"{table}: {len(reference[table])} entries")
+    OUTPUT.parent.mkdir(parents=True, exist_ok=True)
+    OUTPUT.write_text(json.dumps(reference, ensure_ascii=False, indent=1) + "\n", encoding="utf-8")
+    print(f"Wrote {OUTPUT}")
+
+
+if __name__ == "__main__":
+    main()
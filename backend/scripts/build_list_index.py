@@ -0,0 +1,88 @@
+"""
+Build the curated list index used by POST /api/lists/progress.
+
+Reads MOVIE_LISTS and the TMDb id arrays from frontend/src/data/movieLists.ts
+and writes backend/data/lists/index.json:
+
+- `tmdb_ids`: every TMDb id that appears in any list, sorted; an id's
+  position in this array is its dense id.
+- `lists`: list metadata (id, name, description, url, total) with `members`,
+  the sorted, de-duplicated dense ids of the list.
+
+Re-run after changing movieLists.ts.
+"""
+import json
+import re
+from pathlib import Path
+from typing import Any, Dict, List
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+SOURCE = BACKEND_DIR.parent / "frontend" / "src" / "data" / "movieLists.ts"
+OUTPUT = BACKEND_DIR / "data" / "lists" / "index.json"
+
+ID_ARRAY = re.compile(r"const\s+([A-Z0-9_]+)\s*:\s*number\[\]\s*=\s*\[(.*?)\]", re.DOTALL)
+LIST_ENTRY = re.compile(r"\{(.*?tmdbIds:\s*new Set\(\s*([A-Z0-9_]+)\s*\).*?)\}", re.DOTALL)
+STRING_FIELD = r"""{name}:\s*(?:'((?:[^'\\]|\\.)*)'|"((?:[^"\\]|\\.)*)")"""
+NUMBER_FIELD = r"{name}:\s*(\d+)"
+
+
+def _string_field(body: str, name: str) -> str:
+    match = re.search(STRING_FIELD.format(name=name), body)
+    if match is None:
+        raise ValueError(f"No {name} in list entry: {body.strip()[:80]!r}")
+    value = match.group(1) if match.group(1) is not None else match.group(2)
+    return re.sub(r"\\(.)", r"\1", value)
+
+
+def parse_movie_lists(source: str) -> List[Dict[str, Any]]:
+    """MOVIE_LISTS entries with their `tmdb_ids` resolved from the id arrays."""
+    arrays = {
+        name: [int(token) for token in re.findall(r"\d+", re.sub(r"//[^\n]*", "", body))]
+        for name, body in ID_ARRAY.findall(source)
+    }
+    start = source.find("MOVIE_LISTS")
+    if start < 0:
+        raise ValueError("MOVIE_LISTS not found")
+    lists = []
+    for body, array_name in LIST_ENTRY.findall(source[start:]):
+        if array_name not in arrays:
+            raise ValueError(f"Unknown id array {array_name}")
+        total = re.search(NUMBER_FIELD.format(name="total"), body)
+        lists.append({
+            "id": _string_field(body, "id"),
+            "name": _string_field(body, "name"),
+            "description": _string_field(body, "description"),
+            "url": _string_field(body, "url"),
+            "total": int(total.group(1)) if total else len(set(arrays[array_name])),
+            "tmdb_ids": arrays[array_name],
+        })
+    return lists
+
+
+def build_index(lists: List[Dict[str, Any]]) -> Dict[str, Any]:
+    tmdb_ids = sorted({tmdb_id for entry in lists for tmdb_id in entry["tmdb_ids"]})
+    dense = {tmdb_id: i for i, tmdb_id in enumerate(tmdb_ids)}
+    return {
+        "tmdb_ids": tmdb_ids,
+        "lists": [
+            {
+                **{key: value for key, value in entry.items() if key != "tmdb_ids"},
+                "members": sorted({dense[tmdb_id] for tmdb_id in entry["tmdb_ids"]}),
+            }
+            for entry in lists
+        ],
+    }
+
+
+def main() -> None:
+    lists = parse_movie_lists(SOURCE.read_text(encoding="utf-8"))
+    index = build_index(lists)
+    for entry in index["lists"]:
+        print(f"{entry['id']}: {len(entry['members'])} unique ids (total {entry['total']})")
+    OUTPUT.parent.mkdir(parents=True, exist_ok=True)
+    OUTPUT.write_text(json.dumps(index, ensure_ascii=False, separators=(",", ":")) + "\n", encoding="utf-8")
+    print(f"Wrote {OUTPUT} ({len(index['tmdb_ids'])} distinct TMDb ids)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""
+Convert a demo report saved by the frontend (docs/demo-report.md) to the
+compact format served by GET /api/demo-report (see app/demo_report.py).
+
+Usage (from backend/):
+    python scripts/convert_demo_report.py [input.json] [output.compact.json]
+
+Defaults: data/demo/demo_report_1000.json -> data/demo/demo_report_1000.compact.json.
+The conversion is checked to be lossless: the compatibility view of the
+output must equal the input.
+"""
+import json
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from app import demo_report  # noqa: E402
+
+
+def main() -> None:
+    source = Path(sys.argv[1]) if len(sys.argv) > 1 else demo_report.DEMO_DIR / "demo_report_1000.json"
+    target = Path(sys.argv[2]) if len(sys.argv) > 2 else demo_report.COMPACT_PATH
+    with open(source, "r", encoding="utf-8-sig") as f:
+        report = json.load(f)
+
+    compact = demo_report.to_compact(report)
+    if demo_report.compat_view(compact) != report:
+        raise SystemExit("Round trip mismatch: the compact report does not reproduce the input")
+    text = demo_report.dump_compact(compact)
+    target.write_text(text, encoding="utf-8")
+
+    views = ", ".join(f"{key}: {len(indices)}" for key, indices in compact["views"].items())
+    print(f"{len(compact['films'])} unique films ({views})")
+    print(f"{source.stat().st_size} B -> {len(text.encode('utf-8'))} B, wrote {target}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from app import analytics, demo_report, main
+
+# computeAggregations(filmsLite) from utils/analyticsClient.ts, run on the demo report.
+DEMO_COMPUTED = BACKEND_DIR / "tests" / "fixtures" / "demo_computed_1000.json"
+
+
+@pytest.fixture(scope="module")
+def demo_films():
+    return demo_report.compat_view(demo_report.load_compact())["filmsLite"]
+
+
+def _film(title, rating, year=2000, **extra):
+    film = {"title": title, "rating": rating, "year": year, "genres": [], "countries": [], "directors": []}
+    film.update(extra)
+    return film
+
+
+def test_demo_report_matches_frontend_compute_aggregations(demo_films):
+    with open(DEMO_COMPUTED, "r", encoding="utf-8") as f:
+        expected = json.load(f)
+
+    assert analytics.compute_aggregations(demo_films) == expected
+
+
+def test_to_fixed_rounds_like_javascript():
+    assert analytics.to_fixed(0.125, 2) == 0.13
+    assert analytics.to_fixed(-0.125, 2) == -0.13
+    assert analytics.to_fixed(1.005, 2) == 1.0
+    assert str(analytics.to_fixed(-0.001, 2)) == "0.0"
+    assert analytics.js_round(2.5) == 3
+    assert analytics.js_round(-2.5) == -2
+
+
+def test_entity_stats_aggregate_encoded_entities_with_max_per_movie():
+    table = analytics.encode_entities([["Drama", "Crime", "War"], ["Crime"], None], max_per_movie=2)
+    stats = analytics.entity_stats(table, np.array([5.0, 3.0, 4.0]))
+
+    assert stats.names == ["Drama", "Crime"]
+    assert stats.count.tolist() == [1, 2]
+    assert stats.total.tolist() == [5.0, 8.0]
+    assert stats.high.tolist() == [1, 1]
+
+
+def test_love_score_ranking_applies_min_count_and_global_frequency():
+    films = [_film(f"f{i}", 5 if i < 2 else 3, genres=["Western"] if i < 2 else ["Drama"]) for i in range(12)]
+    table = analytics.encode_entities([f["genres"] for f in films], 3)
+    stats = analytics.entity_stats(table, np.array([f["rating"] for f in films], dtype=float))
+    config = analytics.ENTITY_CONFIGS["genres"]._replace(min_count=2)
+
+    plain = analytics.ranked_by_love_score(stats, 3.33, config)
+    weighted = analytics.ranked_by_love_score(
+        stats, 3.33, config, analytics.reference()["genre_global_frequency"], len(films)
+    )
+
+    plain_by_name = {e["name"]: e for e in plain}
+    weighted_by_name = {e["name"]: e for e in weighted}
+    assert plain_by_name["Western"]["ratingLift"] == 1.67
+    # Western is rare on TMDb, so two films weigh more against global frequency.
+    assert weighted_by_name["Western"]["loveScore"] > plain_by_name["Western"]["loveScore"]
+
+
+def test_badges_use_russian_names_and_film_counts():
+    films = [
+        _film(f"f{i}", 4.5, genres=["Science Fiction"], countries=["United States of America"], runtime=100)
+        for i in range(21)
+    ]
+
+    computed = analytics.compute_aggregations(films)
+    badges = {b["title"]: b for b in computed["badges"]}
+
+    assert badges["Самый частый жанр"]["value"] == "Научная фантастика"
+    assert badges["Самый частый жанр"]["subtitle"] == "21 фильм"
+    assert badges["Самая частая страна"]["value"] == "США"
+    assert badges["Средняя оценка"]["isRating"] is True
+    assert len(computed["badges"]) <= analytics.MAX_BADGES
+
+
+def test_format_films_count_matches_ru_locale():
+    assert analytics.format_films_count(1) == "1 фильм"
+    assert analytics.format_films_count(3) == "3 фильма"
+    assert analytics.format_films_count(12) == "12 фильмов"
+    assert analytics.format_films_count(1046) == "1 046 фильмов"
+
+
+def test_empty_film_list_returns_empty_sections():
+    computed = analytics.compute_aggregations([])
+
+    assert computed["stats"] == {"totalFilms": 0, "avgRating": 0, "count45": 0, "oldestYear": None, "newestYear": None}
+    assert computed["topGenres"] == []
+    assert computed["genreOfTheYear"] is None
+
+
+def test_delta_matches_full_recomputation(demo_films):
+    expected = analytics.aggregate_sections(analytics.build_state(demo_films))
+    base = json.loads(json.dumps(analytics.build_state(demo_films[:900]).to_dict()))
+
+    result = analytics.apply_delta(base, added=demo_films[900:])
+
+    assert result["aggregates"] == expected
+    assert result["state"] == analytics.build_state(demo_films).to_dict()
+
+
+def test_removing_films_drops_emptied_entities(demo_films):
+    full = analytics.build_state(demo_films).to_dict()
+
+    result = analytics.apply_delta(full, removed=demo_films[946:])
+
+    assert result["aggregates"] == analytics.aggregate_sections(analytics.build_state(demo_films[:946]))
+    assert result["state"] == analytics.build_state(demo_films[:946]).to_dict()
+    assert all(c > 0 for kind in result["state"]["entities"].values() for c in kind["count"])
+
+
+def test_delta_rejects_films_missing_from_state():
+    state = analytics.build_state([_film("a", 4, genres=["Drama"])]).to_dict()
+
+    with pytest.raises(analytics.AnalyticsStateError):
+        analytics.apply_delta(state, removed=[_film("b", 3, genres=["Horror"])])
+    with pytest.raises(analytics.AnalyticsStateError):
+        analytics.apply_delta({**state, "version": 0})
+
+
+def _spread_over_years(films, years):
+    """Copies of `films` with watch dates spread over `years`, in date order like a Letterboxd export."""
+    per_year = -(-len(films) // len(years))
+    return [
+        {**film, "date": f"{years[i // per_year]}{film['date'][4:]}"}
+        for i, film in enumerate(films)
+    ]
+
+
+def _filter_by_years(films, years):
+    return [f for f in films if analytics.watch_year(f) in set(years)]
+
+
+def test_year_slices_merge_to_filtered_aggregates(demo_films):
+    films = _spread_over_years(demo_films, [2021, 2022, 2023, 2024]) + [_film("undated", 4, genres=["Drama"])]
+    slices = analytics.build_year_slices(films)
+
+    assert sorted(y for y in slices if y is not None) == [2021, 2022, 2023, 2024]
+    assert slices[None].films == 1
+    for selected in ([2022], [2021, 2023], [2022, 2023, 2024]):
+        merged = analytics.merge_states([slices[y] for y in selected])
+        expected = analytics.aggregate_sections(analytics.build_state(_filter_by_years(films, selected)))
+        assert analytics.aggregate_sections(merged) == expected
+    everything = analytics.merge_states([slices[y] for y in (2021, 2022, 2023, 2024, None)])
+    assert analytics.aggregate_sections(everything) == analytics.aggregate_sections(analytics.build_state(films))
+
+
+def test_serialized_slices_merge_like_states(demo_films):
+    films = _spread_over_years(demo_films[:200], [2023, 2024])
+    payload = json.loads(json.dumps(analytics.year_slices(films)))
+
+    merged = analytics.merge_slices([payload["slices"]["2023"], payload["slices"]["2024"]])
+
+    assert payload["years"] == [2023, 2024]
+    assert payload["undated"] is None
+    assert merged["aggregates"] == analytics.aggregate_sections(analytics.build_state(films))
+
+
+def test_async_compute_runs_in_process_pool(demo_films, monkeypatch):
+    monkeypatch.setattr(analytics, "ANALYTICS_WORKERS", 1)
+    try:
+        computed = asyncio.run(analytics.compute_aggregations_async(demo_films[:50]))
+    finally:
+        analytics.shutdown()
+
+    assert computed == analytics.compute_aggregations(demo_films[:50])
+
+
+def test_process_pool_spawns_workers(monkeypatch):
+    monkeypatch.setattr(analytics, "ANALYTICS_WORKERS", 1)
+    try:
+        assert analytics._get_executor()._mp_context.get_start_method() == "spawn"
+    finally:
+        analytics.shutdown()
+
+
+def test_analytics_endpoint_returns_computed(demo_films, monkeypatch):
+    monkeypatch.setattr("app.cache.init_cache_db", lambda: None)
+    monkeypatch.setattr("app.cache.start_writer", lambda: None)
+    monkeypatch.setattr("app.cache.stop_writer", lambda: None)
+    monkeypatch.setattr("app.job_store.init_job_store", lambda: None)
+    monkeypatch.setattr(analytics, "ANALYTICS_WORKERS", 0)
+
+    with TestClient(main.app) as client:
+        response = client.post("/api/analytics", json={"films": demo_films[:20]})
+
+    assert response.status_code == 200
+    assert response.json()["stats"]["totalFilms"] == 20
+
+
+def test_analytics_slices_and_merge_endpoints(demo_films, monkeypatch):
+    monkeypatch.setattr("app.cache.init_cache_db", lambda: None)
+    monkeypatch.setattr("app.cache.start_writer", lambda: None)
+    monkeypatch.setattr("app.cache.stop_writer", lambda: None)
+    monkeypatch.setattr("app.job_store.init_job_store", lambda: None)
+    monkeypatch.setattr(analytics, "ANALYTICS_WORKERS", 0)
+    films = _spread_over_years(demo_films[:60], [2024, 2025, 2026])
+
+    with TestClient(main.app) as client:
+        slices = client.post("/api/analytics/slices", json={"films": films}).json()
+        merged = client.post("/api/analytics/merge", json={"slices": [slices["slices"]["2025"]]})
+        invalid = client.post("/api/analytics/merge", json={"slices": [{"version": 1}]})
+
+    assert slices["years"] == [2024, 2025, 2026]
+    assert merged.status_code == 200
+    assert merged.json()["aggregates"]["stats"]["totalFilms"] == 20
+    assert invalid.status_code == 400
+
+
+def test_analytics_delta_endpoint_round_trips_state(demo_films, monkeypatch):
+    monkeypatch.setattr("app.cache.init_cache_db", lambda: None)
+    monkeypatch.setattr("app.cache.start_writer", lambda: None)
+    monkeypatch.setattr("app.cache.stop_writer", lambda: None)
+    monkeypatch.setattr("app.job_store.init_job_store", lambda: None)
+    monkeypatch.setattr(analytics, "ANALYTICS_WORKERS", 0)
+
+    with TestClient(main.app) as client:
+        first = client.post("/api/analytics/delta", json={"added": demo_films[:30]})
+        second = client.post("/api/analytics/delta", json={"state": first.json()["state"], "added": demo_films[30:40]})
+        invalid = client.post("/api/analytics/delta", json={"state": {"version": 99}})
+
+    assert second.status_code == 200
+    assert second.json()["aggregates"]["stats"]["totalFilms"] == 40
+    assert second.json()["aggregates"] == analytics.aggregate_sections(analytics.build_state(demo_films[:40]))
+    assert invalid.status_code == 400
+
+
+@pytest.mark.parametrize(
+    ("field", "value"),
+    [("year", "2020"), ("rating", "4.5"), ("runtime", [90]), ("genres", "Drama"), ("directors", [1])],
+)
+def test_analytics_endpoints_reject_malformed_films(monkeypatch, field, value):
+    monkeypatch.setattr("app.cache.init_cache_db", lambda: None)
+    monkeypatch.setattr("app.cache.start_writer", lambda: None)
+    monkeypatch.setattr("app.cache.stop_writer", lambda: None)
+    monkeypatch.setattr("app.job_store.init_job_store", lambda: None)
+    monkeypatch.setattr(analytics, "ANALYTICS_WORKERS", 0)
+    films = [_film("A", 4.0), {**_film("B", 3.0), field: value}]
+
+    with TestClient(main.app) as client:
+        responses = [
+            client.post("/api/analytics", json={"films": films}),
+            client.post("/api/analytics/slices", json={"films": films}),
+            client.post("/api/analytics/delta", json={"added": films}),
+        ]
+
+    assert [r.status_code for r in responses] == [400, 400, 400]
+    assert f"[1].{field}" in responses[0].json()["detail"]
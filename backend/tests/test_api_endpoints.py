@@ -1,3 +1,5 @@
+import asyncio
+import json
 import sys
 import types
 from pathlib import Path
@@ -20,6 +22,49 @@ def mock_cache(monkeypatch):
     monkeypatch.setattr('app.cache.stop_writer', lambda: None)
 
 
+def test_demo_report_is_served_precompressed_with_etag(monkeypatch):
+    from app import demo_report
+
+    monkeypatch.setattr(main, '_demo_assets', None)
+    expected = demo_report.compat_view(demo_report.load_compact())
+
+    with TestClient(main.app) as client:
+        plain = client.get('/api/demo-report', headers={'Accept-Encoding': 'identity'})
+        encoded = client.get('/api/demo-report', headers={'Accept-Encoding': 'gzip'})
+        revalidated = client.get('/api/demo-report', headers={'If-None-Match': plain.headers['etag']})
+        compact = client.get('/api/demo-report/compact', headers={'Accept-Encoding': 'gzip'})
+
+    assert plain.status_code == 200
+    assert plain.json() == expected
+    assert plain.headers['content-type'] == 'application/json'
+    assert encoded.headers['content-encoding'] == 'gzip'
+    assert encoded.content == plain.content
+    assert revalidated.status_code == 304
+    assert compact.content == demo_report.COMPACT_PATH.read_bytes()
+    assert compact.headers['etag'] != encoded.headers['etag']
+
+
+def test_demo_report_films_slices_by_range_year_and_fields(monkeypatch):
+    monkeypatch.setattr(main, '_demo_assets', None)
+
+    with TestClient(main.app) as client:
+        page = client.get('/api/demo-report/films', params={'offset': 10, 'limit': 5, 'fields': 'title,poster_url'})
+        by_year = client.get('/api/demo-report/films', params={'year': 2026, 'fields': 'tmdb_id'})
+        empty_year = client.get('/api/demo-report/films', params={'year': 1999})
+        unknown = client.get('/api/demo-report/films', params={'fields': 'title,budget'})
+        full = client.get('/api/demo-report').json()
+
+    assert page.status_code == 200
+    assert page.json()['fields'] == ['title', 'poster_url']
+    assert page.json()['films'] == [
+        {'title': f['title'], 'poster_url': f['poster_url']} for f in full['filmsLiteAll'][10:15]
+    ]
+    assert by_year.json()['total'] == len(full['filmsLiteAll'])
+    assert empty_year.json()['total'] == 0
+    assert empty_year.json()['films'] == []
+    assert unknown.status_code == 400
+
+
 def test_health_endpoint_returns_ok():
     with TestClient(main.app) as client:
         response = client.get('/health')
@@ -43,7 +88,7 @@ def test_tmdb_endpoints_return_200_with_stubbed_modules(monkeypatch, path, paylo
 
     captured = {}
 
-    async def fake_batch(arg, api_key):
+    async def fake_batch(arg, api_key, deadline=None, projection=None):
         captured['arg'] = arg
         captured['api_key'] = api_key
         return [{'id': 1, 'ok': True}]
@@ -123,3 +168,238 @@ def test_tmdb_endpoints_return_422_for_invalid_payload(monkeypatch, path, payloa
         response = client.post(path, json=payload)
 
     assert response.status_code == 422
+
+
+def test_full_batch_streams_ndjson_when_requested(monkeypatch):
+    monkeypatch.setenv('TMDB_API_KEY', 'test-key')
+
+    async def fake_stream(tmdb_ids, _api_key, _deadline=None, projection=None):
+        for index in reversed(range(len(tmdb_ids))):
+            yield index, {'tmdb_id': tmdb_ids[index], 'error': None}
+
+    stub = types.SimpleNamespace(full_batch_stream=fake_stream)
+    monkeypatch.setattr(app_pkg, 'tmdb_batch_movies', stub, raising=False)
+    monkeypatch.setitem(sys.modules, 'app.tmdb_batch_movies', stub)
+
+    with TestClient(main.app) as client:
+        response = client.post(
+            '/tmdb/movies/full/batch',
+            json={'tmdb_ids': [10, 20]},
+            headers={'Accept': 'application/x-ndjson'},
+        )
+
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('application/x-ndjson')
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines == [
+        {'index': 1, 'tmdb_id': 20, 'error': None},
+        {'index': 0, 'tmdb_id': 10, 'error': None},
+    ]
+
+
+def test_batch_work_is_cancelled_when_client_disconnects(monkeypatch):
+    monkeypatch.setattr(main, 'DISCONNECT_POLL_S', 0.01)
+    cancelled = []
+
+    class _GoneRequest:
+        async def is_disconnected(self):
+            return True
+
+    async def slow_batch():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    before = main.BATCH_REQUESTS_ABANDONED.labels(endpoint='batch test')._value.get()
+    response = asyncio.run(main._run_until_disconnect(_GoneRequest(), slow_batch(), 'batch test'))
+
+    assert response.status_code == 499
+    assert cancelled == [True]
+    assert main.BATCH_REQUESTS_ABANDONED.labels(endpoint='batch test')._value.get() == before + 1
+
+
+def test_batch_rejects_invalid_deadline_header(monkeypatch):
+    monkeypatch.setenv('TMDB_API_KEY', 'test-key')
+
+    with TestClient(main.app) as client:
+        response = client.post('/tmdb/movies/batch', json={'tmdb_ids': [1]}, headers={'X-Deadline-Ms': 'soon'})
+
+    assert response.status_code == 400
+    assert response.json()['detail'] == 'Invalid X-Deadline-Ms header'
+
+
+@pytest.mark.parametrize(
+    ('path', 'payload', 'module_name', 'function_name'),
+    [
+        ('/tmdb/search/batch', {'items': [{'title': 'Parasite', 'year': 2019}]}, 'tmdb_batch', 'search_batch'),
+        ('/tmdb/movies/full/batch', {'tmdb_ids': [1, 2]}, 'tmdb_batch_movies', 'full_batch'),
+    ],
+)
+def test_batch_endpoints_negotiate_columnar_msgpack(monkeypatch, path, payload, module_name, function_name):
+    pytest.importorskip('msgpack')
+    from app import columnar
+
+    monkeypatch.setenv('TMDB_API_KEY', 'test-key')
+    results = [
+        {'tmdb_id': 1, 'genres': ['Drama', 'Comedy'], 'error': None},
+        {'tmdb_id': 2, 'genres': ['Drama'], 'error': None, 'stale': True},
+    ]
+
+    async def fake_batch(arg, api_key, deadline=None, projection=None):
+        return results
+
+    stub = types.SimpleNamespace(**{function_name: fake_batch})
+    monkeypatch.setattr(app_pkg, module_name, stub, raising=False)
+    monkeypatch.setitem(sys.modules, f'app.{module_name}', stub)
+
+    with TestClient(main.app) as client:
+        packed = client.post(path, json=payload, headers={'Accept': 'application/vnd.msgpack'})
+        plain = client.post(path, json=payload)
+
+    assert packed.status_code == 200
+    assert packed.headers['content-type'] == 'application/vnd.msgpack'
+    assert columnar.loads(packed.content) == results
+    assert plain.json() == {'results': results}
+
+
+def _stub_movies_batches(monkeypatch, results_for):
+    calls = []
+
+    async def fake_batch(tmdb_ids, api_key, deadline=None, projection=None):
+        calls.append((tmdb_ids, deadline, projection))
+        return [results_for(tmdb_id) for tmdb_id in tmdb_ids]
+
+    stub = types.SimpleNamespace(
+        movies_batch=fake_batch,
+        credits_batch=fake_batch,
+        keywords_batch=fake_batch,
+        full_batch=fake_batch,
+    )
+    monkeypatch.setattr(app_pkg, 'tmdb_batch_movies', stub, raising=False)
+    monkeypatch.setitem(sys.modules, 'app.tmdb_batch_movies', stub)
+    return calls
+
+
+@pytest.mark.parametrize(
+    ('query', 'location'),
+    [
+        ('ids=3,1,2,3', '/tmdb/movies/batch?ids=1,2,3'),
+        ('ids=2%2C1', '/tmdb/movies/batch?ids=1,2'),
+        ('fields=movie.runtime,movie.genres,movie.runtime&ids=5', '/tmdb/movies/batch?ids=5&fields=movie.genres,movie.runtime'),
+    ],
+)
+def test_batch_get_redirects_to_the_canonical_query(monkeypatch, query, location):
+    monkeypatch.setenv('TMDB_API_KEY', 'test-key')
+    calls = _stub_movies_batches(monkeypatch, lambda tmdb_id: {'tmdb_id': tmdb_id, 'movie': {}, 'error': None})
+
+    with TestClient(main.app) as client:
+        response = client.get(f'/tmdb/movies/batch?{query}', follow_redirects=False)
+
+    assert response.status_code == 308
+    assert response.headers['location'].endswith(location)
+    assert calls == []
+
+
+def test_batch_get_serves_deterministic_bytes_with_strong_etag(monkeypatch):
+    monkeypatch.setenv('TMDB_API_KEY', 'test-key')
+    calls = _stub_movies_batches(
+        monkeypatch, lambda tmdb_id: {'tmdb_id': tmdb_id, 'movie': {'runtime': 90 + tmdb_id}, 'error': None}
+    )
+
+    with TestClient(main.app) as client:
+        first = client.get('/tmdb/movies/full/batch?ids=1,2&fields=movie.runtime')
+        second = client.get('/tmdb/movies/full/batch?ids=1,2&fields=movie.runtime')
+        revalidated = client.get(
+            '/tmdb/movies/full/batch?ids=1,2&fields=movie.runtime', headers={'If-None-Match': first.headers['etag']}
+        )
+        gzip_tag = client.get(
+            '/tmdb/movies/full/batch?ids=1,2&fields=movie.runtime',
+            headers={'If-None-Match': first.headers['etag'][:-1] + '-gzip"'},
+        )
+        other = client.get('/tmdb/movies/full/batch?ids=1,3&fields=movie.runtime')
+
+    assert first.status_code == 200
+    assert first.json()['results'][1] == {'tmdb_id': 2, 'movie': {'runtime': 92}, 'error': None}
+    assert first.content == second.content
+    assert first.headers['etag'] == second.headers['etag']
+    assert first.headers['etag'].startswith('"')
+    assert first.headers['cache-control'] == f'public, max-age={main.BATCH_GET_MAX_AGE_S}'
+    assert revalidated.status_code == 304
+    assert revalidated.content == b''
+    assert gzip_tag.status_code == 304
+    assert other.headers['etag'] != first.headers['etag']
+    tmdb_ids, deadline, selection = calls[0]
+    assert tmdb_ids == [1, 2]
+    assert deadline is None
+    assert selection.keys('movie') == frozenset({'runtime'})
+
+
+def test_batch_get_revalidates_compressed_responses_with_the_coded_etag(monkeypatch):
+    monkeypatch.setenv('TMDB_API_KEY', 'test-key')
+    _stub_movies_batches(monkeypatch, lambda tmdb_id: {'tmdb_id': tmdb_id, 'movie': {'title': 'x' * 40}, 'error': None})
+    url = '/tmdb/movies/batch?ids=' + ','.join(str(i) for i in range(1, 60))
+
+    with TestClient(main.app) as client:
+        first = client.get(url, headers={'Accept-Encoding': 'gzip'})
+        revalidated = client.get(url, headers={'Accept-Encoding': 'gzip', 'If-None-Match': first.headers['etag']})
+        identity = client.get(url, headers={'Accept-Encoding': 'identity', 'If-None-Match': first.headers['etag']})
+
+    assert first.headers['content-encoding'] == 'gzip'
+    assert first.headers['etag'].endswith('-gzip"')
+    assert revalidated.status_code == 304
+    assert revalidated.headers['etag'] == first.headers['etag']
+    assert identity.status_code == 304
+    assert identity.headers['etag'] == first.headers['etag'][:-len('-gzip"')] + '"'
+
+
+def test_batch_get_does_not_let_caches_store_incomplete_results(monkeypatch):
+    monkeypatch.setenv('TMDB_API_KEY', 'test-key')
+    _stub_movies_batches(
+        monkeypatch,
+        lambda tmdb_id: {'tmdb_id': tmdb_id, 'movie': None, 'error': 'TMDb unavailable' if tmdb_id == 2 else None},
+    )
+
+    with TestClient(main.app) as client:
+        response = client.get('/tmdb/movies/credits/batch?ids=1,2')
+
+    assert response.status_code == 200
+    assert response.headers['cache-control'] == 'no-store'
+
+
+@pytest.mark.parametrize('query', ['ids=', 'ids=1,abc', 'ids=0,1', 'ids=1&fields=movie.budget', 'ids=' + ','.join(map(str, range(1, 502)))])
+def test_batch_get_rejects_invalid_queries(monkeypatch, query):
+    monkeypatch.setenv('TMDB_API_KEY', 'test-key')
+    _stub_movies_batches(monkeypatch, lambda tmdb_id: {'tmdb_id': tmdb_id})
+
+    with TestClient(main.app) as client:
+        response = client.get(f'/tmdb/movies/batch?{query}', follow_redirects=False)
+
+    assert response.status_code == 400
+
+
+def test_sync_endpoint_passes_known_versions_and_returns_delta(monkeypatch):
+    monkeypatch.setenv('TMDB_API_KEY', 'test-key')
+    captured = {}
+
+    async def fake_sync(known, api_key):
+        captured['known'] = known
+        return {'results': [{'tmdb_id': 2, 'movie': {}, 'error': None, 'version': 'v2'}], 'deleted': [3], 'unchanged': 1}
+
+    stub = types.SimpleNamespace(sync_batch=fake_sync)
+    monkeypatch.setattr(app_pkg, 'tmdb_batch_movies', stub, raising=False)
+    monkeypatch.setitem(sys.modules, 'app.tmdb_batch_movies', stub)
+
+    with TestClient(main.app) as client:
+        response = client.post(
+            '/tmdb/movies/sync',
+            json={'entries': [{'tmdb_id': 1, 'version': 'v1'}, {'tmdb_id': 2, 'version': 'old'}, {'tmdb_id': 3}]},
+        )
+        too_many = client.post('/tmdb/movies/sync', json={'entries': [{'tmdb_id': i} for i in range(501)]})
+
+    assert response.status_code == 200
+    assert response.json()['deleted'] == [3]
+    assert response.json()['unchanged'] == 1
+    assert captured['known'] == {1: 'v1', 2: 'old', 3: None}
+    assert too_many.status_code == 400
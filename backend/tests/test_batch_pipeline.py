@@ -0,0 +1,135 @@
+import asyncio
+import sys
+import time
+from contextlib import aclosing
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from app import batch_pipeline
+
+
+def test_run_ordered_keeps_order_and_bounds_workers():
+    active = 0
+    peak = 0
+
+    async def handler(item):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.001 * (10 - item))
+        active -= 1
+        if item == 3:
+            raise ValueError("bad item")
+        return item * 2
+
+    results = asyncio.run(batch_pipeline.run_ordered(list(range(10)), handler, workers=3))
+
+    assert results[:3] == [0, 2, 4]
+    assert isinstance(results[3], ValueError)
+    assert results[4:] == [8, 10, 12, 14, 16, 18]
+    assert peak == 3
+
+
+def test_global_cap_is_shared_between_batches(monkeypatch):
+    monkeypatch.setattr(batch_pipeline, "BATCH_MAX_IN_FLIGHT", 2)
+    monkeypatch.setattr(batch_pipeline, "_global_slots", None)
+    active = 0
+    peak = 0
+
+    async def handler(item):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.001)
+        active -= 1
+        return item
+
+    async def two_batches():
+        return await asyncio.gather(
+            batch_pipeline.run_ordered(list(range(5)), handler, workers=4),
+            batch_pipeline.run_ordered(list(range(5)), handler, workers=4),
+        )
+
+    first, second = asyncio.run(two_batches())
+
+    assert first == second == [0, 1, 2, 3, 4]
+    assert peak == 2
+
+
+def test_closing_the_stream_cancels_workers():
+    started = []
+    cancelled = []
+
+    async def handler(item):
+        started.append(item)
+        if item == 0:
+            return item
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(item)
+            raise
+
+    async def first_only():
+        stream = batch_pipeline.run_unordered(list(range(100)), handler, workers=4)
+        async with aclosing(stream):
+            async for index, result in stream:
+                return index, result
+
+    assert asyncio.run(first_only()) == (0, 0)
+    # Four workers, one of which may already have picked up its next item.
+    assert len(started) <= 5
+    assert sorted(cancelled) == sorted(started[1:])
+
+
+def test_deadline_leaves_unstarted_items_pending_and_finishes_in_background(monkeypatch):
+    monkeypatch.setattr(batch_pipeline, "DEADLINE_MARGIN_S", 0.0)
+    finished = []
+
+    async def handler(item):
+        await asyncio.sleep(0.05 if item == 0 else 0)
+        finished.append(item)
+        return item
+
+    async def scenario():
+        deadline = batch_pipeline.deadline_from_ms(20)
+        results = [batch_pipeline.PENDING] * 3
+
+        async def collect():
+            results[:] = await batch_pipeline.run_ordered([0, 1, 2], handler, workers=1, deadline=deadline)
+
+        completed = await batch_pipeline.wait_until(collect(), deadline)
+        snapshot = list(results)
+        await asyncio.sleep(0.1)
+        return completed, snapshot, results
+
+    completed, snapshot, late = asyncio.run(scenario())
+
+    assert completed is False
+    assert snapshot == [batch_pipeline.PENDING] * 3
+    # The in-flight item finished after the response; nothing new was started.
+    assert finished == [0]
+    assert late == [0, batch_pipeline.PENDING, batch_pipeline.PENDING]
+
+
+def test_until_deadline_yields_pending_for_unfinished_items_on_time(monkeypatch):
+    monkeypatch.setattr(batch_pipeline, "DEADLINE_MARGIN_S", 0.0)
+
+    async def handler(item):
+        await asyncio.sleep(0 if item == 0 else 0.2)
+        return item * 10
+
+    async def scenario():
+        deadline = batch_pipeline.deadline_from_ms(50)
+        stream = batch_pipeline.until_deadline(
+            batch_pipeline.run_unordered([0, 1, 2], handler, deadline=deadline), 3, deadline
+        )
+        return [entry async for entry in stream], time.monotonic() - deadline
+
+    streamed, late_by = asyncio.run(scenario())
+
+    assert streamed == [(0, 0), (1, batch_pipeline.PENDING), (2, batch_pipeline.PENDING)]
+    assert late_by < 0.1
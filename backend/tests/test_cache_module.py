@@ -80,6 +80,14 @@ def test_get_search_returns_none_for_expired_row(monkeypatch):
     assert cache.get_search("Any", 1999) is None
 
 
+def test_get_search_allow_stale_returns_expired_row(monkeypatch):
+    monkeypatch.setattr(cache, "DISABLE_CACHE", False)
+    conn = _FakeConn(one={"tmdb_id": 42, "updated_at": _iso_now(delta_days=-(cache.TTL_DAYS + 2))})
+    monkeypatch.setattr(cache, "_get_read_conn", lambda: conn)
+
+    assert cache.get_search("Any", 1999, allow_stale=True) == 42
+
+
 def test_get_movie_batch_includes_missing_and_skips_expired(monkeypatch):
     monkeypatch.setattr(cache, "DISABLE_CACHE", False)
     rows = [
@@ -104,6 +112,38 @@ def test_get_movie_batch_includes_missing_and_skips_expired(monkeypatch):
     assert result[3] is None
 
 
+def test_get_movie_batch_with_keys_extracts_only_those_keys(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "DISABLE_CACHE", False)
+    db_path = str(tmp_path / "cache.db")
+    cache.init_cache_db(db_path)
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    payload = {
+        "id": 1,
+        "poster_path": "/p.jpg",
+        "runtime": 132,
+        "vote_average": 0.30000000000000004,
+        "genres": [{"id": 18, "name": "Drama"}],
+        "overview": "x" * 1000,
+    }
+    conn.execute(
+        "INSERT INTO movie_cache (tmdb_id, payload_json, updated_at) VALUES (?, ?, ?)",
+        (1, json.dumps(payload), _iso_now()),
+    )
+    monkeypatch.setattr(cache, "_get_read_conn", lambda: conn)
+
+    result = cache.get_movie_batch([1, 2], keys=["genres", "poster_path", "vote_average", "tagline"])
+
+    assert result[1] == {
+        "genres": [{"id": 18, "name": "Drama"}],
+        "poster_path": "/p.jpg",
+        "vote_average": 0.30000000000000004,
+        "tagline": None,
+    }
+    assert result[2] is None
+    assert cache.get_movie_batch([1])[1] == payload
+
+
 def test_get_keywords_batch_returns_empty_for_empty_ids(monkeypatch):
     monkeypatch.setattr(cache, "DISABLE_CACHE", False)
 
@@ -306,3 +346,64 @@ def test_writer_loop_requeues_batch_on_flush_error(monkeypatch):
 
     assert ("movie", 10, json.dumps({"id": 10})) in q.put_calls
     assert conn.closed is True
+
+
+def test_report_round_trips_through_writer_batch(monkeypatch, tmp_path):
+    db_path = str(tmp_path / "cache.db")
+    cache.init_cache_db(db_path)
+    monkeypatch.setattr(cache, "DISABLE_CACHE", False)
+    q = queue.Queue()
+    monkeypatch.setattr(cache, "_WRITE_QUEUE", q)
+    films = [{"key": "amélie:2001", "tmdb_id": 194, "details": {"tmdb_id": 194}}]
+
+    cache.set_report("abc", films)
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    cache._flush_batch(conn, [q.get_nowait()])
+    monkeypatch.setattr(cache, "_get_read_conn", lambda: conn)
+
+    assert cache.get_report("abc") == films
+    assert cache.get_report("missing") is None
+    conn.close()
+
+
+def test_init_cache_db_adds_and_backfills_content_hash(tmp_path):
+    db_path = str(tmp_path / "cache.db")
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE movie_cache (tmdb_id INTEGER PRIMARY KEY, payload_json TEXT NOT NULL, updated_at TEXT NOT NULL)")
+    conn.execute("INSERT INTO movie_cache VALUES (1, ?, ?)", (json.dumps({"id": 1}), _iso_now()))
+    conn.commit()
+    conn.close()
+
+    cache.init_cache_db(db_path)
+    cache.init_cache_db(db_path)
+
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("SELECT content_hash FROM movie_cache WHERE tmdb_id = 1").fetchone()[0] == cache.payload_hash({"id": 1})
+    for table in ("credits_cache", "keywords_cache"):
+        assert "content_hash" in {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+    conn.close()
+
+
+def test_get_entry_versions_needs_fresh_facets_and_versions_missing_ones_as_empty(monkeypatch, tmp_path):
+    db_path = str(tmp_path / "cache.db")
+    cache.init_cache_db(db_path)
+    monkeypatch.setattr(cache, "DISABLE_CACHE", False)
+    movie, credits, keywords = {"id": 1}, {"directors": ["D"], "actors": []}, ["space"]
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    batch = []
+    for tmdb_id in (1, 2, 3):
+        batch.append(("movie", tmdb_id, json.dumps(movie)))
+        batch.append(("credits", tmdb_id, json.dumps(credits)))
+    batch += [("keywords", 1, json.dumps(keywords)), ("keywords", 3, json.dumps(keywords))]
+    cache._flush_batch(conn, batch)
+    conn.execute("UPDATE credits_cache SET updated_at = ? WHERE tmdb_id = 3", (_iso_now(-(cache.TTL_DAYS + 1)),))
+    monkeypatch.setattr(cache, "_get_read_conn", lambda: conn)
+
+    versions = cache.get_entry_versions([1, 2, 3, 4])
+
+    expected = cache.entry_version(cache.payload_hash(movie), cache.payload_hash(credits), cache.payload_hash(keywords))
+    without_keywords = cache.entry_version(cache.payload_hash(movie), cache.payload_hash(credits), None)
+    assert versions == {1: expected, 2: without_keywords, 3: None, 4: None}
+    conn.close()
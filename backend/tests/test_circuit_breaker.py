@@ -0,0 +1,177 @@
+import asyncio
+import contextvars
+import sys
+import types
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from app import circuit_breaker, tmdb_batch_movies
+
+
+def _breaker(monkeypatch, now):
+    monkeypatch.setattr(circuit_breaker.time, "monotonic", lambda: now[0])
+    return circuit_breaker.CircuitBreaker(
+        window_s=10.0, min_requests=4, error_rate=0.5, open_s=5.0, half_open_probes=1
+    )
+
+
+def test_breaker_opens_after_error_rate_threshold(monkeypatch):
+    now = [100.0]
+    breaker = _breaker(monkeypatch, now)
+
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_response(503)
+    assert breaker.state == circuit_breaker.CLOSED
+
+    breaker.record_response(404)
+    breaker.record_failure()
+
+    assert breaker.state == circuit_breaker.OPEN
+    assert breaker.allow_request() is False
+
+
+def test_breaker_half_open_probe_closes_or_reopens(monkeypatch):
+    now = [100.0]
+    breaker = _breaker(monkeypatch, now)
+    for _ in range(4):
+        breaker.record_failure()
+    assert breaker.is_open()
+
+    now[0] += 5.0
+    assert breaker.state == circuit_breaker.HALF_OPEN
+    assert breaker.allow_request() is True
+    assert breaker.allow_request() is False
+    breaker.record_failure()
+    assert breaker.state == circuit_breaker.OPEN
+
+    now[0] += 5.0
+    assert breaker.allow_request() is True
+    breaker.record_response(429)
+    assert breaker.state == circuit_breaker.CLOSED
+    assert breaker.allow_request() is True
+
+
+def test_late_success_from_before_open_does_not_close_half_open_circuit(monkeypatch):
+    now = [100.0]
+    breaker = _breaker(monkeypatch, now)
+    # Each call runs in its own context, as each asyncio task does.
+    stale_call = contextvars.copy_context()
+    assert stale_call.run(breaker.allow_request) is True
+    for _ in range(4):
+        breaker.record_failure()
+    assert breaker.is_open()
+
+    now[0] += 5.0
+    probe = contextvars.copy_context()
+    assert probe.run(breaker.allow_request) is True
+    stale_call.run(breaker.record_success)
+    assert breaker.state == circuit_breaker.HALF_OPEN
+    stale_call.run(breaker.record_failure)
+    assert breaker.state == circuit_breaker.HALF_OPEN
+
+    probe.run(breaker.record_success)
+    assert breaker.state == circuit_breaker.CLOSED
+
+
+def test_cancelled_half_open_probe_does_not_block_the_breaker(monkeypatch):
+    now = [100.0]
+    # Only the breaker's clock is faked: the event loop keeps the real one.
+    monkeypatch.setattr(circuit_breaker, "time", types.SimpleNamespace(monotonic=lambda: now[0]))
+    breaker = circuit_breaker.CircuitBreaker(
+        window_s=10.0, min_requests=4, error_rate=0.5, open_s=5.0, half_open_probes=1, probe_timeout_s=30.0
+    )
+    monkeypatch.setattr(circuit_breaker, "tmdb", breaker)
+    monkeypatch.setattr(tmdb_batch_movies.cache_module, "get_credits", lambda tmdb_id, allow_stale=False: None)
+    monkeypatch.setattr(tmdb_batch_movies.tmdb_keys, "acquire", _no_key)
+    for _ in range(4):
+        breaker.record_failure()
+    now[0] += 5.0
+
+    async def probe_then_cancel():
+        task = asyncio.ensure_future(
+            tmdb_batch_movies._get_movie_credits(_HangingClient(), "k", 1, asyncio.Semaphore(1))
+        )
+        await asyncio.sleep(0.05)
+        assert breaker.state == circuit_breaker.HALF_OPEN
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(probe_then_cancel())
+
+    assert breaker.allow_request() is False
+    now[0] += 30.0
+    assert breaker.state == circuit_breaker.OPEN
+    now[0] += 5.0
+    assert breaker.allow_request() is True
+
+
+async def _no_key():
+    return None
+
+
+class _HangingClient:
+    async def get(self, *_args, **_kwargs):
+        await asyncio.sleep(3600)
+
+
+class _OpenBreaker(circuit_breaker.CircuitBreaker):
+    def allow_request(self):
+        return False
+
+
+class _NoClient:
+    async def get(self, *_args, **_kwargs):
+        raise AssertionError("upstream must not be called while the circuit is open")
+
+
+def test_fetchers_serve_stale_cache_or_fail_fast_when_open(monkeypatch):
+    monkeypatch.setattr(circuit_breaker, "tmdb", _OpenBreaker())
+    stale_reads = []
+
+    def get_credits(tmdb_id, allow_stale=False):
+        stale_reads.append((tmdb_id, allow_stale))
+        if not allow_stale or tmdb_id != 1:
+            return None
+        return {"directors": ["Old"], "actors": []}
+
+    monkeypatch.setattr(tmdb_batch_movies.cache_module, "get_credits", get_credits)
+
+    hit = asyncio.run(tmdb_batch_movies._get_movie_credits(_NoClient(), "k", 1, asyncio.Semaphore(1)))
+    miss = asyncio.run(tmdb_batch_movies._get_movie_credits(_NoClient(), "k", 2, asyncio.Semaphore(1)))
+
+    assert hit == ({"directors": ["Old"], "actors": []}, None, "stale")
+    assert miss == (None, circuit_breaker.CIRCUIT_OPEN_ERROR, "circuit_open")
+    assert (1, True) in stale_reads
+
+
+def test_full_batch_marks_stale_rows_and_reports_per_item_errors(monkeypatch):
+    class _FakeAsyncClient:
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *_):
+            return False
+
+    monkeypatch.setattr(tmdb_batch_movies.httpx, "AsyncClient", lambda *_args, **_kwargs: _FakeAsyncClient())
+    monkeypatch.setattr(tmdb_batch_movies.cache_module, "get_movie_batch", lambda ids: {i: None for i in ids})
+    monkeypatch.setattr(tmdb_batch_movies.cache_module, "get_credits_batch", lambda ids: {i: None for i in ids})
+    monkeypatch.setattr(tmdb_batch_movies.cache_module, "get_keywords_batch", lambda ids: {i: None for i in ids})
+
+    async def fake_unified(_client, _api_key, tmdb_id, _semaphore):
+        if tmdb_id == 1:
+            return ({"id": 1, "release_date": "2001-01-01"}, None, ["old"], None, "stale")
+        return (None, None, None, circuit_breaker.CIRCUIT_OPEN_ERROR, "circuit_open")
+
+    monkeypatch.setattr(tmdb_batch_movies, "_get_movie_details_with_credits_keywords", fake_unified)
+
+    result = asyncio.run(tmdb_batch_movies.full_batch([1, 2], "k"))
+
+    assert result[0]["stale"] is True
+    assert result[0]["movie"]["id"] == 1
+    assert result[0]["error"] is None
+    assert result[1]["movie"] is None
+    assert result[1]["error"] == circuit_breaker.CIRCUIT_OPEN_ERROR
@@ -0,0 +1,110 @@
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from app import columnar
+
+pytest.importorskip("msgpack")
+
+
+def _full_entry(tmdb_id, **overrides):
+    entry = {
+        "tmdb_id": tmdb_id,
+        "movie": {
+            "id": tmdb_id,
+            "poster_path": f"/poster{tmdb_id}.jpg",
+            "genres": ["Drama", "Comedy"] if tmdb_id % 2 else ["Drama"],
+            "runtime": 90 + tmdb_id,
+            "vote_average": 7.234 if tmdb_id % 2 else 6.5,
+            "vote_count": 100 * tmdb_id,
+            "original_language": "en",
+            "production_countries": ["United States of America"],
+            "release_date": f"20{tmdb_id:02d}-01-01",
+        },
+        "credits": {"directors": ["Bong Joon-ho"], "actors": ["Song Kang-ho", f"Actor {tmdb_id}"]},
+        "keywords": ["family", f"keyword {tmdb_id}"],
+        "error": None,
+    }
+    entry.update(overrides)
+    return entry
+
+
+RESULTS = [
+    _full_entry(1),
+    _full_entry(2, stale=True),
+    _full_entry(3, movie=None, credits=None, keywords=None, error="TMDb unavailable (circuit open)"),
+    _full_entry(4, movie=None, credits=None, keywords=None, pending=True),
+    _full_entry(5),
+]
+
+
+def test_round_trip_restores_the_json_results():
+    assert columnar.loads(columnar.dumps(RESULTS)) == RESULTS
+    assert json.dumps(columnar.loads(columnar.dumps(RESULTS))) == json.dumps(RESULTS)
+
+
+def test_repeated_strings_are_dictionary_encoded():
+    document = columnar.encode(RESULTS)
+    movie = document["columns"]["movie"]
+    credits = document["columns"]["credits"]
+
+    assert movie["nulls"] == [2, 3]
+    assert movie["fields"]["genres"]["type"] == "dict_list"
+    assert movie["fields"]["original_language"]["type"] == "dict"
+    assert movie["fields"]["production_countries"]["type"] == "dict_list"
+    assert credits["fields"]["directors"]["type"] == "dict_list"
+    # Unique per film: a dictionary would only add indices.
+    assert movie["fields"]["poster_path"]["type"] == "plain"
+    assert document["strings"].count("Drama") == 1
+
+
+def test_floats_with_few_decimals_become_scaled_integers():
+    column = columnar.encode(RESULTS)["columns"]["movie"]["fields"]["vote_average"]
+
+    assert column == {"type": "decimal", "scale": 1000, "values": [7234, 6500, 7234]}
+    assert columnar.encode([{"x": 0.1 + 0.2}])["columns"]["x"]["type"] == "plain"
+
+
+def test_keys_present_on_some_rows_only_stay_absent_elsewhere():
+    document = columnar.encode(RESULTS)
+    decoded = columnar.decode(document)
+
+    assert document["columns"]["stale"]["missing"] == [0, 2, 3, 4]
+    assert "stale" not in decoded[0]
+    assert decoded[1]["stale"] is True
+    assert decoded[3]["pending"] is True
+
+
+def test_search_results_round_trip():
+    results = [
+        {"title": "Parasite", "year": 2019, "tmdb": {"tmdb_id": 496243, "genres": ["Comedy", "Thriller"]}, "error": None},
+        {"title": "Unknown", "year": None, "tmdb": None, "error": None},
+        {"title": "Mother", "year": 2009, "tmdb": {"tmdb_id": 30018, "genres": ["Drama", "Thriller"]}, "error": None},
+    ]
+
+    assert columnar.loads(columnar.dumps(results)) == results
+    assert columnar.loads(columnar.dumps([])) == []
+
+
+def test_decode_rejects_other_documents():
+    with pytest.raises(columnar.ColumnarError):
+        columnar.decode({"format": "something-else", "version": 1})
+
+
+@pytest.mark.parametrize(
+    ("accept", "expected"),
+    [
+        (None, False),
+        ("application/json", False),
+        ("application/vnd.msgpack", True),
+        ("application/x-msgpack, application/json;q=0.5", True),
+    ],
+)
+def test_wants_columnar(accept, expected):
+    assert columnar.wants_columnar(accept) is expected
@@ -0,0 +1,199 @@
+import json
+import sys
+import zlib
+from pathlib import Path
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from app import compression
+
+BIG = {"results": [{"tmdb_id": i, "title": f"Film {i}", "genres": ["Drama", "Comedy"]} for i in range(300)]}
+LINES = [json.dumps({"index": i, "title": f"Film {i}"}) + "\n" for i in range(20)]
+
+
+def _decoders():
+    decoders = {"gzip": lambda: zlib.decompressobj(31).decompress}
+    try:
+        import brotli
+        decoders["br"] = lambda: brotli.Decompressor().process
+    except ImportError:
+        pass
+    try:
+        import zstandard
+        decoders["zstd"] = lambda: zstandard.ZstdDecompressor().decompressobj().decompress
+    except ImportError:
+        pass
+    return decoders
+
+
+DECODERS = _decoders()
+
+
+@pytest.fixture
+def client(tmp_path):
+    big_file = tmp_path / "big.json"
+    big_file.write_text(json.dumps(BIG))
+    app = FastAPI()
+    app.add_middleware(compression.CompressionMiddleware)
+
+    @app.get("/big")
+    async def big():
+        return BIG
+
+    @app.get("/small")
+    async def small():
+        return {"status": "ok"}
+
+    @app.get("/etag")
+    async def etag():
+        return Response(json.dumps(BIG), media_type="application/json", headers={"ETag": '"abc"'})
+
+    @app.get("/encoded")
+    async def encoded():
+        return Response(zlib.compress(b"x" * 5000), headers={"Content-Encoding": "deflate"})
+
+    @app.get("/poster.jpg")
+    async def poster():
+        return Response(b"\xff\xd8" + b"\x00" * 5000, media_type="image/jpeg")
+
+    @app.get("/tmdb/image/w500/poster.json")
+    async def proxied():
+        return BIG
+
+    @app.get("/file.json")
+    async def file():
+        return FileResponse(big_file, media_type="application/json")
+
+    @app.get("/content-range")
+    async def content_range():
+        body = json.dumps(BIG).encode()
+        return Response(
+            body,
+            media_type="application/json",
+            headers={"Content-Range": f"bytes 0-{len(body) - 1}/{len(body)}"},
+        )
+
+    @app.get("/no-transform")
+    async def no_transform():
+        return Response(json.dumps(BIG), media_type="application/json", headers={"Cache-Control": "public, no-transform"})
+
+    @app.get("/stream")
+    async def stream():
+        async def generate():
+            for line in LINES:
+                yield line
+
+        return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+    return TestClient(app)
+
+
+def _raw(client, path, accept_encoding):
+    with client.stream("GET", path, headers={"Accept-Encoding": accept_encoding}) as response:
+        return response, b"".join(response.iter_raw())
+
+
+@pytest.mark.parametrize(
+    ("header", "expected"),
+    [
+        ("gzip", "gzip"),
+        ("gzip, br", "br"),
+        ("gzip, br, zstd", "zstd"),
+        ("zstd;q=0, gzip", "gzip"),
+        ("identity", None),
+    ],
+)
+def test_negotiates_the_preferred_available_coding(client, header, expected):
+    if expected is not None and expected not in compression.available_encodings():
+        pytest.skip(f"{expected} is not installed")
+    response, raw = _raw(client, "/big", header)
+
+    assert response.headers.get("content-encoding") == expected
+    if expected is None:
+        assert json.loads(raw) == BIG
+        return
+    assert json.loads(DECODERS[expected]()(raw)) == BIG
+    assert int(response.headers["content-length"]) == len(raw)
+    assert response.headers["vary"] == "Accept-Encoding"
+
+
+@pytest.mark.parametrize("path", ["/small", "/encoded", "/poster.jpg", "/tmdb/image/w500/poster.json"])
+def test_leaves_small_encoded_and_image_responses_alone(client, path):
+    response, _ = _raw(client, path, "gzip")
+
+    assert response.headers.get("content-encoding") in (None, "deflate")
+    assert "vary" not in response.headers
+
+
+def test_range_request_gets_identity_bytes_that_match_content_range(client):
+    response = client.get("/file.json", headers={"Accept-Encoding": "gzip", "Range": "bytes=0-4999"})
+
+    assert response.status_code == 206
+    assert "content-encoding" not in response.headers
+    assert response.headers["content-range"].startswith("bytes 0-4999/")
+    assert response.content == json.dumps(BIG).encode()[:5000]
+
+
+@pytest.mark.parametrize("path", ["/content-range", "/no-transform"])
+def test_leaves_content_range_and_no_transform_responses_alone(client, path):
+    response, raw = _raw(client, path, "gzip")
+
+    assert "content-encoding" not in response.headers
+    assert json.loads(raw) == BIG
+
+
+def test_tags_strong_etag_of_compressed_response_with_the_coding(client):
+    response, _ = _raw(client, "/etag", "gzip")
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["etag"] == '"abc-gzip"'
+
+
+@pytest.mark.parametrize("encoding", sorted(DECODERS))
+def test_streamed_ndjson_is_decodable_after_every_chunk(encoding):
+    encoder = compression.Encoder(encoding)
+    decode = DECODERS[encoding]()
+    received = b""
+    for line in LINES:
+        received += decode(encoder.chunk(line.encode()))
+        # Each flush makes everything sent so far decodable: no line waits for the next one.
+        assert received.endswith(line.encode())
+    received += decode(encoder.finish())
+
+    assert received == "".join(LINES).encode()
+
+
+def test_streaming_response_is_compressed_without_content_length(client):
+    response, raw = _raw(client, "/stream", "gzip")
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert zlib.decompress(raw, 31).decode() == "".join(LINES)
+
+
+def test_exports_byte_counts_and_cpu_time(client):
+    def sample(name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0.0
+
+    bytes_in = sample("http_compression_bytes_total", encoding="gzip", direction="in")
+    bytes_out = sample("http_compression_bytes_total", encoding="gzip", direction="out")
+    ratios = sample("http_compression_ratio_count", encoding="gzip")
+    skipped = sample("http_compression_skipped_total", reason="small")
+
+    _, raw = _raw(client, "/big", "gzip")
+    _raw(client, "/small", "gzip")
+
+    body = json.dumps(BIG, separators=(",", ":")).encode()
+    assert sample("http_compression_bytes_total", encoding="gzip", direction="in") - bytes_in == len(body)
+    assert sample("http_compression_bytes_total", encoding="gzip", direction="out") - bytes_out == len(raw)
+    assert sample("http_compression_ratio_count", encoding="gzip") - ratios == 1
+    assert sample("http_compression_cpu_seconds_total", encoding="gzip") >= 0
+    assert sample("http_compression_skipped_total", reason="small") - skipped == 1
@@ -0,0 +1,82 @@
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from app import demo_report
+
+BASE = "https://api.example.com/tmdb/image"
+
+
+def _film(title, poster_path, date="2024-03-01", **extra):
+    film = {"title": title, "date": date, "poster_path": poster_path}
+    film["poster_url"] = f"{BASE}/w500{poster_path}" if poster_path else None
+    film["poster_url_w342"] = f"{BASE}/w342{poster_path}" if poster_path else None
+    film["rating"] = 4
+    film.update(extra)
+    return film
+
+
+def _report():
+    films = [_film("A", "/a.jpg"), _film("B", None, date="2023-12-31"), _film("C", "/c.jpg")]
+    return {
+        "filmsLite": films[:2],
+        "filmsLiteAll": films,
+        "availableYears": [2023, 2024],
+        "simplifiedMode": False,
+        "fileName": "ratings.csv",
+        "warnings": [],
+    }
+
+
+def test_compact_stores_films_once_without_derived_fields():
+    compact = demo_report.to_compact(_report())
+
+    assert compact["poster_base"] == BASE
+    assert compact["fields"] == ["title", "date", "poster_path", "rating"]
+    assert len(compact["films"]) == 3
+    assert compact["views"] == {"filmsLite": [0, 1], "filmsLiteAll": [0, 1, 2]}
+    assert compact["meta"]["availableYears"] == [2023, 2024]
+
+
+def test_compat_view_reproduces_the_report_and_key_order():
+    report = _report()
+    compact = json.loads(demo_report.dump_compact(demo_report.to_compact(report)))
+
+    view = demo_report.compat_view(compact)
+
+    assert json.dumps(view) == json.dumps(report)
+
+
+def test_underivable_poster_url_is_rejected():
+    report = _report()
+    report["filmsLiteAll"][2] = {**report["filmsLiteAll"][2], "poster_url": "https://elsewhere/c.jpg"}
+
+    with pytest.raises(demo_report.DemoReportError):
+        demo_report.to_compact(report)
+
+
+def test_film_slice_filters_by_watch_year_and_projects_fields():
+    table = demo_report.FilmTable(demo_report.to_compact(_report()))
+
+    page = demo_report.film_slice(table, offset=1, limit=1, year=2024, fields=["title", "poster_url_w342"])
+
+    assert page == {
+        "total": 2,
+        "offset": 1,
+        "fields": ["title", "poster_url_w342"],
+        "films": [{"title": "C", "poster_url_w342": f"{BASE}/w342/c.jpg"}],
+    }
+
+
+def test_committed_compact_asset_is_a_valid_compact_report():
+    compact = demo_report.load_compact()
+    report = demo_report.compat_view(compact)
+
+    assert len(report["filmsLite"]) == 1046
+    assert demo_report.to_compact(report) == compact
@@ -0,0 +1,97 @@
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from app import hedging
+
+
+class _SlowClient:
+    """Each call sleeps for the next configured delay and returns (call_index, params)."""
+
+    def __init__(self, delays):
+        self.delays = list(delays)
+        self.calls = 0
+        self.cancelled = []
+
+    async def get(self, url, params=None, timeout=None):
+        index = self.calls
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delays[index])
+        except asyncio.CancelledError:
+            self.cancelled.append(index)
+            raise
+        return (index, params)
+
+
+@pytest.fixture(autouse=True)
+def hedging_enabled(monkeypatch):
+    monkeypatch.setattr(hedging, "HEDGE_ENABLED", True)
+    monkeypatch.setattr(hedging, "HEDGE_MIN_SAMPLES", 3)
+    monkeypatch.setattr(hedging, "HEDGE_MIN_DELAY_S", 0.0)
+    monkeypatch.setattr(hedging, "_trackers", {})
+    for seconds in (0.01, 0.01, 0.02, 0.5):
+        hedging.tracker("search").record(seconds)
+
+
+def test_slow_call_is_hedged_and_loser_cancelled(monkeypatch):
+    async def spare_token():
+        return True, "hedge-key"
+
+    monkeypatch.setattr(hedging.tmdb_keys, "try_acquire_now", spare_token)
+    monkeypatch.setattr(hedging, "HEDGE_QUANTILE", 0.5)
+    client = _SlowClient([5.0, 0.01])
+
+    response, key = asyncio.run(hedging.get(client, "search", "u", {"api_key": "own"}, None, timeout=1))
+
+    assert response == (1, {"api_key": "hedge-key"})
+    assert key == "hedge-key"
+    assert client.cancelled == [0]
+
+
+def test_no_hedge_without_spare_budget(monkeypatch):
+    async def no_token():
+        return False, None
+
+    monkeypatch.setattr(hedging.tmdb_keys, "try_acquire_now", no_token)
+    monkeypatch.setattr(hedging, "HEDGE_QUANTILE", 0.5)
+    client = _SlowClient([0.1])
+
+    response, key = asyncio.run(hedging.get(client, "search", "u", {"api_key": "own"}, "k1", timeout=1))
+
+    assert response == (0, {"api_key": "k1"})
+    assert key == "k1"
+    assert client.calls == 1
+
+
+def test_hedging_waits_for_enough_samples(monkeypatch):
+    monkeypatch.setattr(hedging, "HEDGE_MIN_SAMPLES", 100)
+
+    assert hedging.hedge_delay("search") is None
+
+    monkeypatch.setattr(hedging, "HEDGE_MIN_SAMPLES", 3)
+    assert hedging.hedge_delay("search") == 0.5
+
+
+def test_primary_latency_is_recorded_when_the_hedge_wins(monkeypatch):
+    async def spare_token():
+        return True, "hedge-key"
+
+    monkeypatch.setattr(hedging.tmdb_keys, "try_acquire_now", spare_token)
+    monkeypatch.setattr(hedging, "HEDGE_QUANTILE", 0.5)
+    client = _SlowClient([5.0, 0.05])
+    before = len(hedging.tracker("search"))
+
+    asyncio.run(hedging.get(client, "search", "u", {"api_key": "own"}, None, timeout=1))
+
+    latencies = hedging.tracker("search")
+    assert client.cancelled == [0]
+    assert len(latencies) == before + 1
+    # Censored at cancellation: the hedge delay (p50 = 0.02 s) plus the hedge's own 0.05 s.
+    assert latencies._samples[-1] >= 0.06
@@ -0,0 +1,459 @@
+import asyncio
+import io
+import json
+import sys
+import zipfile
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from app import job_store, jobs, main
+
+# The app's startup is kept off the real jobs.db below; the `store` fixture opens a temporary one.
+init_job_store = job_store.init_job_store
+
+
+@pytest.fixture(autouse=True)
+def mock_cache(monkeypatch):
+    monkeypatch.setattr('app.cache.init_cache_db', lambda: None)
+    monkeypatch.setattr('app.cache.start_writer', lambda: None)
+    monkeypatch.setattr('app.cache.stop_writer', lambda: None)
+    monkeypatch.setattr('app.job_store.init_job_store', lambda: None)
+    monkeypatch.setattr('app.cache.get_report', lambda digest: None)
+    monkeypatch.setattr('app.cache.set_report', lambda digest, films: None)
+
+
+@pytest.fixture
+def store(tmp_path):
+    init_job_store(str(tmp_path / 'jobs.db'))
+    yield job_store
+    job_store.close_job_store()
+
+
+@pytest.fixture
+def reports(monkeypatch):
+    stored = {}
+    monkeypatch.setattr('app.cache.get_report', stored.get)
+    monkeypatch.setattr('app.cache.set_report', stored.__setitem__)
+    return stored
+
+
+def _install_fake_pipeline(monkeypatch, searched, fetched, ids=None):
+    ids = ids or {'interstellar': 157336, 'dune': 438631, 'arrival': 329865}
+
+    async def fake_search_stream(items, _api_key, _deadline=None):
+        searched.append(list(items))
+        for i, item in enumerate(items):
+            tmdb_id = ids.get(item['title'].lower())
+            tmdb = {'tmdb_id': tmdb_id} if tmdb_id else None
+            yield i, {'title': item['title'], 'year': item['year'], 'tmdb': tmdb}
+
+    async def fake_full_stream(tmdb_ids, _api_key, _deadline=None):
+        fetched.append(list(tmdb_ids))
+        for i, tmdb_id in enumerate(tmdb_ids):
+            yield i, {'tmdb_id': tmdb_id, 'movie': {'id': tmdb_id}, 'credits': None, 'keywords': None}
+
+    monkeypatch.setattr(jobs.tmdb_batch, 'search_batch_stream', fake_search_stream)
+    monkeypatch.setattr(jobs.tmdb_batch_movies, 'full_batch_stream', fake_full_stream)
+
+
+def test_search_key_matches_frontend():
+    assert jobs.search_key('  Dune ', 2021) == 'dune:2021'
+    assert jobs.search_key('Dune', None) == 'dune:0'
+
+
+def test_job_dedupes_rows_and_fetches_details_once_per_match(monkeypatch):
+    searched, fetched = [], []
+    _install_fake_pipeline(monkeypatch, searched, fetched)
+    rows = [
+        {'title': 'Dune', 'year': 2021},
+        {'title': 'dune ', 'year': 2021},
+        {'title': 'Unknown film', 'year': 1999},
+        {'title': 'Interstellar', 'year': 2014},
+    ]
+
+    async def run():
+        job = jobs.create_job(rows, 'k')
+        await job.task
+        return job
+
+    job = asyncio.run(run())
+
+    assert job.status == jobs.DONE
+    assert len(searched[0]) == 3
+    assert sorted(i for chunk in fetched for i in chunk) == [157336, 438631]
+    events = [e['event'] for e in job.events]
+    assert events[-1] == 'done'
+    search = [e['data'] for e in job.events if e['event'] == 'search']
+    assert search[0]['indices'] == [0, 1]
+    assert search[1]['tmdb_id'] is None
+    details = [e['data']['tmdb_id'] for e in job.events if e['event'] == 'details']
+    assert sorted(details) == [157336, 438631]
+    assert job.progress['tmdb_search'] == {'done': 3, 'total': 3}
+    assert job.progress['tmdb_details'] == {'done': 2, 'total': 2}
+    assert [e['seq'] for e in job.events] == list(range(1, len(job.events) + 1))
+
+
+def test_job_failure_is_reported_as_last_event(monkeypatch):
+    async def broken_stream(_items, _api_key, _deadline=None):
+        raise RuntimeError('boom')
+        yield  # pragma: no cover
+
+    monkeypatch.setattr(jobs.tmdb_batch, 'search_batch_stream', broken_stream)
+
+    async def run():
+        job = jobs.create_job([{'title': 'Dune', 'year': 2021}], 'k')
+        await job.task
+        return job
+
+    job = asyncio.run(run())
+
+    assert job.status == jobs.FAILED
+    assert job.events[-1]['event'] == 'failed'
+    assert job.events[-1]['data']['error'] == 'boom'
+
+
+def test_subscribe_replays_after_cursor_and_waits_for_new_events():
+    async def run():
+        job = jobs.Job('j', [])
+        job.emit('progress', {'n': 1})
+        job.emit('progress', {'n': 2})
+        seen = []
+
+        async def consume():
+            async for event in job.subscribe(after=1):
+                seen.append(event['seq'])
+
+        consumer = asyncio.ensure_future(consume())
+        await asyncio.sleep(0)
+        job.emit('progress', {'n': 3})
+        job.status = jobs.DONE
+        job.emit('done', {})
+        await consumer
+        return seen
+
+    assert asyncio.run(run()) == [2, 3, 4]
+
+
+def test_jobs_api_streams_events_as_sse(monkeypatch):
+    monkeypatch.setenv('TMDB_API_KEY', 'test-key')
+    _install_fake_pipeline(monkeypatch, [], [])
+
+    with TestClient(main.app) as client:
+        created = client.post('/api/jobs', json={'rows': [{'title': 'Arrival', 'year': 2016}]})
+        assert created.status_code == 202
+        job_id = created.json()['job_id']
+
+        with client.stream('GET', f'/api/jobs/{job_id}/events') as response:
+            assert response.headers['content-type'].startswith('text/event-stream')
+            body = ''.join(response.iter_text())
+
+        summary = client.get(f'/api/jobs/{job_id}').json()
+        missing = client.get('/api/jobs/nope')
+
+    blocks = [b for b in body.split('\n\n') if b]
+    parsed = [dict(line.split(': ', 1) for line in block.split('\n')) for block in blocks]
+    assert parsed[0]['id'] == '1'
+    assert parsed[-1]['event'] == 'done'
+    details = [json.loads(p['data']) for p in parsed if p['event'] == 'details']
+    assert details[0]['tmdb_id'] == 329865
+    assert summary['status'] == 'done'
+    assert missing.status_code == 404
+
+
+def test_jobs_api_rejects_too_many_rows(monkeypatch):
+    monkeypatch.setenv('TMDB_API_KEY', 'test-key')
+    monkeypatch.setattr(jobs, 'JOB_MAX_ROWS', 1)
+
+    with TestClient(main.app) as client:
+        response = client.post('/api/jobs', json={'rows': [{'title': 'A'}, {'title': 'B'}]})
+
+    assert response.status_code == 400
+
+
+def test_job_is_checkpointed_to_the_store(monkeypatch, store):
+    _install_fake_pipeline(monkeypatch, [], [])
+
+    async def run():
+        job = jobs.create_job([{'title': 'Dune', 'year': 2021}], 'k')
+        await job.task
+        return job
+
+    job = asyncio.run(run())
+    stored = store.load_job(job.id)
+
+    assert stored['status'] == jobs.DONE
+    assert stored['rows'] == [{'title': 'Dune', 'year': 2021}]
+    assert stored['events'] == job.events
+
+
+def test_resume_skips_searches_and_details_already_checkpointed(monkeypatch, store):
+    searched, fetched = [], []
+    _install_fake_pipeline(monkeypatch, searched, fetched)
+    rows = [
+        {'title': 'Dune', 'year': 2021},
+        {'title': 'Arrival', 'year': 2016},
+        {'title': 'Interstellar', 'year': 2014},
+    ]
+    store.save_job('resumed', rows, jobs.RUNNING, 1.0)
+    store.checkpoint(
+        'resumed',
+        [
+            {'seq': 1, 'event': 'search', 'data': {'indices': [0], 'title': 'Dune', 'year': 2021, 'tmdb_id': 438631, 'error': None}},
+            {'seq': 2, 'event': 'search', 'data': {'indices': [1], 'title': 'Arrival', 'year': 2016, 'tmdb_id': 329865, 'error': None}},
+            {'seq': 3, 'event': 'details', 'data': {'tmdb_id': 438631, 'movie': {'id': 438631}}},
+        ],
+        jobs.RUNNING,
+    )
+
+    async def run():
+        resumed = await jobs.resume_unfinished('k')
+        await resumed[0].task
+        return resumed[0]
+
+    job = asyncio.run(run())
+
+    assert searched == [[{'title': 'Interstellar', 'year': 2014}]]
+    assert sorted(i for chunk in fetched for i in chunk) == [157336, 329865]
+    assert job.events[3]['seq'] == 4
+    assert job.progress['tmdb_search'] == {'done': 3, 'total': 3}
+    assert job.progress['tmdb_details'] == {'done': 3, 'total': 3}
+    assert store.load_job('resumed')['status'] == jobs.DONE
+    assert store.unfinished_job_ids(jobs.UNFINISHED) == []
+
+
+def test_shutdown_checkpoints_and_leaves_job_unfinished(monkeypatch, store):
+    async def slow_search_stream(items, _api_key, _deadline=None):
+        yield 0, {'title': items[0]['title'], 'year': items[0]['year'], 'tmdb': None}
+        await asyncio.sleep(60)
+        yield 1, {}  # pragma: no cover
+
+    monkeypatch.setattr(jobs.tmdb_batch, 'search_batch_stream', slow_search_stream)
+
+    async def run():
+        job = jobs.create_job([{'title': 'A', 'year': 2000}, {'title': 'B', 'year': 2001}], 'k')
+        while not any(e['event'] == 'search' for e in job.events):
+            await asyncio.sleep(0.01)
+        await jobs.shutdown()
+        return job
+
+    job = asyncio.run(run())
+    stored = store.load_job(job.id)
+
+    assert stored['status'] == jobs.RUNNING
+    assert [e['event'] for e in stored['events']] == ['progress', 'search']
+
+
+def test_resume_skips_jobs_leased_to_another_worker(monkeypatch, store):
+    _install_fake_pipeline(monkeypatch, [], [])
+    monkeypatch.setattr(store, 'WORKER_ID', 'other-worker')
+    store.save_job('theirs', [{'title': 'Dune', 'year': 2021}], jobs.RUNNING, 1.0, 'base')
+    store.save_job('expired', [{'title': 'Arrival', 'year': 2016}], jobs.RUNNING, 2.0, 'base')
+    monkeypatch.setattr(store, 'JOB_LEASE_S', -1.0)
+    store.renew_lease('expired')
+    monkeypatch.setattr(store, 'WORKER_ID', 'this-worker')
+    monkeypatch.setattr(store, 'JOB_LEASE_S', 60.0)
+
+    async def run():
+        resumed = await jobs.resume_unfinished('k')
+        await resumed[0].task
+        await jobs.shutdown()
+        return resumed
+
+    resumed = asyncio.run(run())
+
+    assert [job.id for job in resumed] == ['expired']
+    assert resumed[0].base_digest == 'base'
+    assert store.load_job('expired')['status'] == jobs.DONE
+    assert store.load_job('theirs')['status'] == jobs.RUNNING
+    assert store.claim('theirs', jobs.UNFINISHED) is False
+    assert store.checkpoint('theirs', [], jobs.DONE) is False
+
+
+def test_job_run_by_another_worker_is_served_from_the_store(monkeypatch, store):
+    monkeypatch.setattr(jobs, 'FOLLOW_POLL_S', 0.01)
+    monkeypatch.setattr(store, 'WORKER_ID', 'other-worker')
+    store.save_job('remote', [{'title': 'Dune', 'year': 2021}], jobs.RUNNING, 1.0)
+    progress = {'seq': 1, 'event': 'progress', 'data': {'stage': 'tmdb_search', 'done': 0, 'total': 1}}
+    store.checkpoint('remote', [progress], jobs.RUNNING)
+
+    async def run():
+        job = await jobs.get_job('remote')
+        seen = []
+        async for event in job.subscribe():
+            seen.append(event['seq'])
+            if event['seq'] == 1:
+                done = {'seq': 2, 'event': jobs.DONE, 'data': {'status': jobs.DONE}}
+                await asyncio.to_thread(store.checkpoint, 'remote', [done], jobs.DONE, None, 2.0)
+        return job, seen
+
+    job, seen = asyncio.run(run())
+
+    assert seen == [1, 2]
+    assert job.status == jobs.DONE
+    assert job.progress == {'tmdb_search': {'done': 0, 'total': 1}}
+    assert 'remote' not in jobs._jobs
+
+
+def test_job_stops_when_another_worker_takes_over_its_lease(monkeypatch, store):
+    monkeypatch.setattr(jobs, 'CHECKPOINT_EVERY', 1)
+    _install_fake_pipeline(monkeypatch, [], [])
+
+    async def run():
+        job = jobs.Job('stolen', [{'title': 'Dune', 'year': 2021}])
+        monkeypatch.setattr(store, 'WORKER_ID', 'this-worker')
+        monkeypatch.setattr(store, 'JOB_LEASE_S', -1.0)
+        await asyncio.to_thread(store.save_job, job.id, job.rows, jobs.RUNNING, job.created_at)
+        monkeypatch.setattr(store, 'WORKER_ID', 'other-worker')
+        monkeypatch.setattr(store, 'JOB_LEASE_S', 60.0)
+        assert await asyncio.to_thread(store.claim, job.id, jobs.UNFINISHED)
+        monkeypatch.setattr(store, 'WORKER_ID', 'this-worker')
+        jobs._jobs[job.id] = job
+        await jobs._run(job, 'k')
+        return job
+
+    job = asyncio.run(run())
+
+    assert job.follower
+    assert job.events == []
+    assert 'stolen' not in jobs._jobs
+    assert store.load_job('stolen')['events'] == []
+
+
+def test_jobs_api_resumes_stream_after_last_event_id(monkeypatch):
+    monkeypatch.setenv('TMDB_API_KEY', 'test-key')
+    _install_fake_pipeline(monkeypatch, [], [])
+
+    with TestClient(main.app) as client:
+        job_id = client.post('/api/jobs', json={'rows': [{'title': 'Arrival', 'year': 2016}]}).json()['job_id']
+        with client.stream('GET', f'/api/jobs/{job_id}/events') as response:
+            full = ''.join(response.iter_text())
+        with client.stream('GET', f'/api/jobs/{job_id}/events', headers={'Last-Event-ID': '2'}) as response:
+            tail = ''.join(response.iter_text())
+        bad = client.get(f'/api/jobs/{job_id}/events', headers={'Last-Event-ID': 'x'})
+
+    ids = [line[4:] for line in tail.split('\n') if line.startswith('id: ')]
+    assert ids[0] == '3'
+    assert full.endswith(tail)
+    assert bad.status_code == 400
+
+
+def test_jobs_api_accepts_ratings_upload(monkeypatch):
+    monkeypatch.setenv('TMDB_API_KEY', 'test-key')
+    searched = []
+    _install_fake_pipeline(monkeypatch, searched, [])
+    csv_bytes = b'Date,Name,Year,Letterboxd URI,Rating\n2024-01-02,Dune,2021,,4.5\n2024-02-02,dune,2021,,5\n'
+
+    with TestClient(main.app) as client:
+        created = client.post('/api/jobs/upload', files={'file': ('ratings.csv', csv_bytes, 'text/csv')})
+        job_id = created.json()['job_id']
+        with client.stream('GET', f'/api/jobs/{job_id}/events') as response:
+            ''.join(response.iter_text())
+        rows = client.get(f'/api/jobs/{job_id}/rows').json()['rows']
+        bad = client.post('/api/jobs/upload', files={'file': ('ratings.csv', b'Film\nDune\n', 'text/csv')})
+
+    assert created.status_code == 202
+    assert created.json()['total'] == 2
+    assert created.json()['unique'] == 1
+    assert searched == [[{'title': 'Dune', 'year': 2021}]]
+    assert [r['rating'] for r in rows] == [4.5, 5.0]
+    assert bad.status_code == 400
+
+
+def test_jobs_api_reads_only_the_top_level_ratings_csv_from_a_zip(monkeypatch):
+    monkeypatch.setenv('TMDB_API_KEY', 'test-key')
+    searched = []
+    _install_fake_pipeline(monkeypatch, searched, [])
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, 'w') as zf:
+        zf.writestr('deleted/ratings.csv', 'Name,Year,Rating\nNope,2022,1\n')
+        zf.writestr('ratings.csv', 'Name,Year,Rating\nArrival,2016,4\n')
+
+    with TestClient(main.app) as client:
+        created = client.post('/api/jobs/upload', files={'file': ('export.zip', archive.getvalue(), 'application/zip')})
+        with client.stream('GET', f"/api/jobs/{created.json()['job_id']}/events") as response:
+            ''.join(response.iter_text())
+
+    assert created.status_code == 202
+    assert searched == [[{'title': 'Arrival', 'year': 2016}]]
+
+
+def test_jobs_api_refuses_uploads_over_the_size_limit(monkeypatch):
+    monkeypatch.setenv('TMDB_API_KEY', 'test-key')
+    monkeypatch.setattr(jobs, 'JOB_UPLOAD_MAX_BYTES', 64)
+    csv_bytes = b'Name,Year\n' + b'Dune,2021\n' * 20
+
+    def chunks():
+        yield b'--b\r\nContent-Disposition: form-data; name="file"; filename="ratings.csv"\r\n\r\n'
+        yield csv_bytes
+        yield b'\r\n--b--\r\n'
+
+    with TestClient(main.app) as client:
+        sized = client.post('/api/jobs/upload', files={'file': ('ratings.csv', csv_bytes, 'text/csv')})
+        chunked = client.post(
+            '/api/jobs/upload',
+            content=chunks(),
+            headers={'Content-Type': 'multipart/form-data; boundary=b'},
+        )
+
+    assert sized.status_code == 413
+    assert chunked.status_code == 413
+
+
+def _run_job(rows, base_digest=None):
+    async def run():
+        job = jobs.create_job(rows, 'k', base_digest)
+        await job.task
+        return job
+
+    return asyncio.run(run())
+
+
+def test_report_digest_ignores_order_case_and_duplicates():
+    a = [{'title': 'Dune', 'year': 2021}, {'title': 'Arrival', 'year': 2016}]
+    b = [{'title': 'arrival ', 'year': 2016}, {'title': 'DUNE', 'year': 2021}, {'title': 'Dune', 'year': 2021}]
+
+    assert jobs.report_digest(a) == jobs.report_digest(b)
+    assert jobs.report_digest(a) != jobs.report_digest(a[:1])
+
+
+def test_identical_upload_is_replayed_from_stored_report(monkeypatch, reports):
+    searched, fetched = [], []
+    _install_fake_pipeline(monkeypatch, searched, fetched)
+    rows = [{'title': 'Dune', 'year': 2021}, {'title': 'Nope', 'year': 1990}]
+
+    first = _run_job(rows)
+    searched.clear()
+    fetched.clear()
+    second = _run_job(list(reversed(rows)))
+
+    assert first.digest == second.digest
+    assert list(reports) == [first.digest]
+    assert first.events[-1]['data']['digest'] == first.digest
+    assert searched == [[]]
+    assert fetched == []
+    search = {e['data']['title']: e['data'] for e in second.events if e['event'] == 'search'}
+    assert search['Dune']['tmdb_id'] == 438631
+    assert search['Nope']['indices'] == [0]
+    assert [e['data']['tmdb_id'] for e in second.events if e['event'] == 'details'] == [438631]
+    assert second.status == jobs.DONE
+
+
+def test_base_digest_reuses_previous_report_for_unchanged_rows(monkeypatch, reports):
+    searched, fetched = [], []
+    _install_fake_pipeline(monkeypatch, searched, fetched)
+    base = _run_job([{'title': 'Dune', 'year': 2021}])
+    searched.clear()
+    fetched.clear()
+
+    job = _run_job([{'title': 'Dune', 'year': 2021}, {'title': 'Arrival', 'year': 2016}], base.digest)
+
+    assert searched == [[{'title': 'Arrival', 'year': 2016}]]
+    assert fetched == [[329865]]
+    assert job.progress['tmdb_details'] == {'done': 2, 'total': 2}
+    assert sorted(f['tmdb_id'] for f in reports[job.digest]) == [329865, 438631]
@@ -0,0 +1,72 @@
+import importlib.util
+import json
+import sys
+from pathlib import Path
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from app import json_response, main
+
+
+def _stdlib(content):
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+def _load_bench():
+    spec = importlib.util.spec_from_file_location("bench_json_response", BACKEND_DIR / "scripts" / "bench_json_response.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class _Item(BaseModel):
+    title: str
+    year: int
+
+
+@pytest.mark.parametrize(
+    "content",
+    [
+        {"title": "Амели", "sep": " ", "rating": 4.5, "votes": 12, "stale": True, "error": None},
+        {"tiny": 1e-05, "huge": [1e16, -2.5e-10], "plain": [0.1, 0.30000000000000004, -0.0, 5.0]},
+        {"paths": ["/3e4x.jpg", ",12e5", "[1e-3]"]},
+        {"share": 1.5e-05, "small": [-2.5e-05, 9.99e-05, 1e-05, 0.0001, 10.00001]},
+        {"paths": ["/0.00001.jpg", ",0.00002"]},
+        {1: "int key", "big": 2**70},
+        {"model": _Item(title="Heat", year=1995)},
+        [],
+    ],
+)
+def test_dumps_is_byte_identical_to_json_response(content):
+    assert json_response.dumps(content) == _stdlib(content)
+
+
+def test_demo_report_and_full_batch_serialize_identically():
+    bench = _load_bench()
+
+    for payload in (bench.demo_report_payload(), bench.synthetic_full_batch(500)):
+        assert json_response.FastJSONResponse(payload).body == _stdlib(payload)
+
+
+def test_api_endpoints_use_fast_json_response(monkeypatch):
+    monkeypatch.setattr("app.cache.init_cache_db", lambda: None)
+    monkeypatch.setattr("app.cache.start_writer", lambda: None)
+    monkeypatch.setattr("app.cache.stop_writer", lambda: None)
+    monkeypatch.setattr("app.job_store.init_job_store", lambda: None)
+    rendered = []
+    original = json_response.dumps
+    monkeypatch.setattr(json_response, "dumps", lambda content: rendered.append(content) or original(content))
+
+    with TestClient(main.app) as client:
+        response = client.post("/api/lists/progress", json={"tmdb_ids": [278]})
+
+    assert rendered and rendered[-1] == response.json()
+    assert response.content == _stdlib(json.loads(response.content))
@@ -0,0 +1,87 @@
+import importlib.util
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from app import list_index, main
+
+
+def _load_build_script():
+    spec = importlib.util.spec_from_file_location("build_list_index", BACKEND_DIR / "scripts" / "build_list_index.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _naive_progress(index_data, tmdb_ids):
+    user = set(tmdb_ids)
+    result = []
+    for entry in index_data["lists"]:
+        listed = {index_data["tmdb_ids"][m] for m in entry["members"]}
+        watched = len(listed & user)
+        result.append((entry["id"], watched, int(watched / entry["total"] * 100 + 0.5)))
+    return result
+
+
+def test_committed_index_matches_frontend_lists():
+    build = _load_build_script()
+    lists = build.parse_movie_lists(build.SOURCE.read_text(encoding="utf-8"))
+
+    with open(list_index.INDEX_PATH, "r", encoding="utf-8") as f:
+        committed = json.load(f)
+
+    assert committed == build.build_index(lists)
+    assert [entry["id"] for entry in lists][:2] == ["imdb_top_250", "letterboxd_top_250"]
+
+
+def test_progress_matches_set_intersection():
+    with open(list_index.INDEX_PATH, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    user = data["tmdb_ids"][::3] + [1, 999999999, data["tmdb_ids"][0]]
+
+    result = list_index.progress(user)
+
+    assert [(e["id"], e["watched"], e["percent"]) for e in result] == _naive_progress(data, user)
+    assert result[0]["name"] == "IMDb Top 250"
+    assert all(e["watched"] == 0 for e in list_index.progress([]))
+
+
+def test_progress_scales_to_many_lists():
+    rng = np.random.default_rng(7)
+    tmdb_ids = np.unique(rng.integers(1, 1_000_000, 50_000))
+    members = [np.unique(rng.integers(0, len(tmdb_ids), 1000)) for _ in range(500)]
+    index = list_index.ListIndex(
+        lists=[{"id": f"list_{i}", "total": len(m)} for i, m in enumerate(members)],
+        tmdb_ids=tmdb_ids,
+        members=np.concatenate(members),
+        owners=np.repeat(np.arange(len(members)), [len(m) for m in members]),
+    )
+    user = rng.choice(tmdb_ids, 3000, replace=False)
+
+    result = list_index.progress(user.tolist(), index)
+
+    user_dense = set(np.searchsorted(tmdb_ids, user).tolist())
+    assert [e["watched"] for e in result] == [len(user_dense & set(m.tolist())) for m in members]
+
+
+def test_lists_progress_endpoint(monkeypatch):
+    monkeypatch.setattr("app.cache.init_cache_db", lambda: None)
+    monkeypatch.setattr("app.cache.start_writer", lambda: None)
+    monkeypatch.setattr("app.cache.stop_writer", lambda: None)
+    monkeypatch.setattr("app.job_store.init_job_store", lambda: None)
+
+    with TestClient(main.app) as client:
+        response = client.post("/api/lists/progress", json={"tmdb_ids": [278, 238, 278, 5]})
+
+    assert response.status_code == 200
+    imdb = response.json()["lists"][0]
+    assert imdb["id"] == "imdb_top_250"
+    assert imdb["watched"] == 2
+    assert imdb["percent"] == 1
@@ -0,0 +1,85 @@
+import gzip
+import sys
+from pathlib import Path
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from app import precompressed
+
+BODY = b'{"films":[' + b",".join(b'{"title":"Film %d"}' % i for i in range(500)) + b"]}"
+
+
+@pytest.fixture
+def client():
+    asset = precompressed.precompress(BODY)
+    app = FastAPI()
+
+    @app.get("/asset")
+    async def get_asset(request: Request):
+        return precompressed.respond(request, asset)
+
+    return TestClient(app)
+
+
+@pytest.mark.parametrize(
+    ("header", "expected"),
+    [
+        (None, "identity"),
+        ("gzip", "gzip"),
+        ("gzip, deflate, br", "br"),
+        ("br;q=0, gzip;q=0.5", "gzip"),
+        ("*", "br"),
+        ("*;q=0, gzip", "gzip"),
+        ("identity", "identity"),
+        ("deflate", "identity"),
+    ],
+)
+def test_choose_encoding_honours_quality_values(header, expected):
+    assert precompressed.choose_encoding(header, ["br", "gzip"]) == expected
+
+
+def test_variants_decode_to_the_original_bytes():
+    asset = precompressed.precompress(BODY)
+
+    assert asset.body == BODY
+    assert gzip.decompress(asset.variants["gzip"]) == BODY
+    assert precompressed.precompress(BODY).variants["gzip"] == asset.variants["gzip"]
+
+
+def test_brotli_variant_when_available():
+    brotli = pytest.importorskip("brotli")
+    asset = precompressed.precompress(BODY)
+
+    assert brotli.decompress(asset.variants["br"]) == BODY
+    assert len(asset.variants["br"]) < len(asset.variants["gzip"])
+
+
+def test_respond_serves_encoded_variant_with_strong_etag(client):
+    response = client.get("/asset", headers={"Accept-Encoding": "gzip"})
+
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.headers["etag"].endswith('-gzip"')
+    assert not response.headers["etag"].startswith("W/")
+    assert response.content == BODY
+
+
+def test_respond_returns_304_for_any_matching_etag(client):
+    identity = client.get("/asset", headers={"Accept-Encoding": "identity"})
+    etag = identity.headers["etag"]
+
+    cached = client.get("/asset", headers={"Accept-Encoding": "gzip", "If-None-Match": f'"other", W/{etag}'})
+    stale = client.get("/asset", headers={"If-None-Match": '"other"'})
+
+    assert "content-encoding" not in identity.headers
+    assert cached.status_code == 304
+    assert cached.content == b""
+    assert cached.headers["etag"].endswith('-gzip"')
+    assert stale.status_code == 200
@@ -0,0 +1,204 @@
+import asyncio
+import json
+import sqlite3
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from app import batch_pipeline, cache, projection, tmdb_batch, tmdb_batch_movies
+
+
+class _FakeAsyncClient:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *_):
+        return False
+
+
+def test_parse_collects_facets_and_keys():
+    selection = projection.parse("full", ["movie.poster_path", "movie.runtime", "keywords"])
+
+    assert selection.facets == {"movie": frozenset({"poster_path", "runtime"}), "keywords": None}
+    assert not selection.wants("credits")
+    assert projection.parse("full", ["movie.runtime", "movie"]).keys("movie") is None
+    assert projection.parse("full", None) is None
+
+
+@pytest.mark.parametrize(
+    ("endpoint", "fields"),
+    [
+        ("full", ["movie.overview"]),
+        ("full", ["poster_path"]),
+        ("keywords", ["keywords.name"]),
+        ("movies", ["credits"]),
+        ("search", []),
+    ],
+)
+def test_parse_rejects_unknown_fields(endpoint, fields):
+    with pytest.raises(projection.FieldsError):
+        projection.parse(endpoint, fields)
+
+
+def test_apply_keeps_identity_and_status_keys():
+    selection = projection.parse("full", ["movie.runtime"])
+    entry = {
+        "tmdb_id": 1,
+        "movie": {"id": 1, "runtime": 90, "genres": ["Drama"]},
+        "credits": {"directors": [], "actors": []},
+        "keywords": ["tag"],
+        "error": None,
+        "stale": True,
+    }
+
+    assert selection.apply(entry) == {"tmdb_id": 1, "movie": {"runtime": 90}, "error": None, "stale": True}
+
+
+def _stub_full_cache(monkeypatch, movies, credits=None, keywords=None):
+    reads = []
+
+    def getter(name, rows):
+        def get(ids, keys=None):
+            reads.append((name, keys))
+            return {i: rows.get(i) for i in ids}
+        return get
+
+    monkeypatch.setattr(tmdb_batch_movies.cache_module, "get_movie_batch", getter("movie", movies))
+    monkeypatch.setattr(tmdb_batch_movies.cache_module, "get_credits_batch", getter("credits", credits or {}))
+    monkeypatch.setattr(tmdb_batch_movies.cache_module, "get_keywords_batch", getter("keywords", keywords or {}))
+    monkeypatch.setattr(tmdb_batch_movies.httpx, "AsyncClient", lambda *_args, **_kwargs: _FakeAsyncClient())
+    return reads
+
+
+def test_full_batch_reads_and_fetches_only_projected_facets(monkeypatch):
+    reads = _stub_full_cache(monkeypatch, movies={1: {"poster_path": "/one.jpg", "runtime": 100}})
+    fetched = []
+
+    async def fake_movie(_client, _api_key, tmdb_id, _semaphore):
+        fetched.append(tmdb_id)
+        return {"id": tmdb_id, "poster_path": "/two.jpg", "runtime": 120, "overview": "..."}, None, "api"
+
+    async def unexpected(*_args):
+        raise AssertionError("credits/keywords must not be fetched")
+
+    monkeypatch.setattr(tmdb_batch_movies, "_get_movie_details", fake_movie)
+    monkeypatch.setattr(tmdb_batch_movies, "_get_movie_details_with_credits_keywords", unexpected)
+    selection = projection.parse("full", ["movie.poster_path", "movie.runtime"])
+
+    result = asyncio.run(tmdb_batch_movies.full_batch([1, 2], "k", projection=selection))
+
+    assert reads == [("movie", ["poster_path", "runtime"])]
+    assert fetched == [2]
+    assert result == [
+        {"tmdb_id": 1, "movie": {"poster_path": "/one.jpg", "runtime": 100}, "error": None},
+        {"tmdb_id": 2, "movie": {"poster_path": "/two.jpg", "runtime": 120}, "error": None},
+    ]
+
+
+def test_full_batch_stream_with_projection_skips_unrequested_facets(monkeypatch):
+    reads = _stub_full_cache(monkeypatch, movies={}, keywords={1: ["cached"]})
+
+    async def fake_keywords(_client, _api_key, tmdb_id, _semaphore):
+        return ["api"], None, "api"
+
+    monkeypatch.setattr(tmdb_batch_movies, "_get_movie_keywords", fake_keywords)
+    selection = projection.parse("full", ["keywords"])
+
+    async def collect():
+        return [item async for item in tmdb_batch_movies.full_batch_stream([2, 1], "k", projection=selection)]
+
+    streamed = asyncio.run(collect())
+
+    assert reads == [("keywords", None)]
+    assert streamed == [
+        (1, {"tmdb_id": 1, "keywords": ["cached"], "error": None}),
+        (0, {"tmdb_id": 2, "keywords": ["api"], "error": None}),
+    ]
+
+
+def _traced_cache(tmp_path, monkeypatch):
+    """Real cache DB with movie/credits rows for id 1; returns the list of SQL statements run."""
+    monkeypatch.setattr(cache, "DISABLE_CACHE", False)
+    db_path = str(tmp_path / "cache.db")
+    cache.init_cache_db(db_path)
+    conn = sqlite3.connect(db_path, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    now = datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+    movie = {"id": 1, "poster_path": "/p.jpg", "runtime": 132, "overview": "x" * 1000}
+    conn.execute("INSERT INTO movie_cache (tmdb_id, payload_json, updated_at) VALUES (?, ?, ?)", (1, json.dumps(movie), now))
+    credits = {"directors": ["D"], "actors": ["A"]}
+    conn.execute("INSERT INTO credits_cache (tmdb_id, payload_json, updated_at) VALUES (?, ?, ?)", (1, json.dumps(credits), now))
+    statements = []
+    conn.set_trace_callback(statements.append)
+    monkeypatch.setattr(cache, "_get_read_conn", lambda: conn)
+    monkeypatch.setattr(tmdb_batch_movies.httpx, "AsyncClient", lambda *_args, **_kwargs: _FakeAsyncClient())
+    return statements
+
+
+@pytest.mark.skipif(not cache._JSON_ARROW, reason="SQLite without the -> JSON operator reads whole payloads")
+@pytest.mark.parametrize("deadline_ms", [None, 60_000], ids=["per_id", "batch"])
+def test_movies_and_credits_batch_read_only_projected_keys(tmp_path, monkeypatch, deadline_ms):
+    statements = _traced_cache(tmp_path, monkeypatch)
+    deadline = batch_pipeline.deadline_from_ms(deadline_ms) if deadline_ms else None
+
+    movies = asyncio.run(
+        tmdb_batch_movies.movies_batch([1], "k", deadline, projection=projection.parse("movies", ["movie.runtime"]))
+    )
+    credits = asyncio.run(
+        tmdb_batch_movies.credits_batch(
+            [1], "k", deadline, projection=projection.parse("credits", ["credits.directors"])
+        )
+    )
+
+    assert movies == [{"tmdb_id": 1, "movie": {"runtime": 132}, "error": None}]
+    assert credits == [{"tmdb_id": 1, "credits": {"directors": ["D"]}, "error": None}]
+    reads = [sql for sql in statements if sql.startswith("SELECT")]
+    assert len(reads) == 2
+    assert "json_object('runtime', payload_json -> '$.\"runtime\"')" in reads[0]
+    assert "FROM movie_cache" in reads[0]
+    assert "json_object('directors', payload_json -> '$.\"directors\"')" in reads[1]
+    assert "FROM credits_cache" in reads[1]
+
+
+def test_search_batch_with_match_id_only_skips_movie_details(monkeypatch):
+    async def no_rate_limit():
+        return None
+
+    class _SearchClient:
+        def __init__(self):
+            self.urls = []
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *_):
+            return False
+
+        async def get(self, url, params=None, timeout=None):
+            self.urls.append(url)
+            return httpx.Response(200, json={"results": [{"id": 99}]}, request=httpx.Request("GET", url))
+
+    client = _SearchClient()
+    monkeypatch.setattr(tmdb_batch, "_rate_limit", no_rate_limit)
+    monkeypatch.setattr(tmdb_batch.httpx, "AsyncClient", lambda *_args, **_kwargs: client)
+    monkeypatch.setattr(tmdb_batch.cache_module, "get_search", lambda title, _year: 10 if title == "cached" else None)
+    monkeypatch.setattr(tmdb_batch.cache_module, "get_movie", lambda _id: pytest.fail("movie row read"))
+    monkeypatch.setattr(tmdb_batch.cache_module, "set_search", lambda *_args: None)
+    selection = projection.parse("search", ["tmdb.tmdb_id"])
+
+    result = asyncio.run(
+        tmdb_batch.search_batch(
+            [{"title": "Cached", "year": None}, {"title": "Fresh", "year": 2001}], "k", projection=selection
+        )
+    )
+
+    assert [entry["tmdb"] for entry in result] == [{"tmdb_id": 10}, {"tmdb_id": 99}]
+    assert client.urls == [f"{tmdb_batch.TMDB_BASE_URL}/search/movie"]
+
@@ -0,0 +1,100 @@
+import asyncio
+import sqlite3
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from app import rate_limit
+
+
+def test_memory_limiter_allows_burst_then_reports_wait(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(rate_limit.time, "time", lambda: now[0])
+    limiter = rate_limit.MemoryRateLimiter()
+
+    waits = [limiter.try_acquire("b", rate=10.0, capacity=3.0) for _ in range(4)]
+
+    assert waits[:3] == [0.0, 0.0, 0.0]
+    assert abs(waits[3] - 0.1) < 1e-9
+
+    now[0] += 0.1
+    assert limiter.try_acquire("b", rate=10.0, capacity=3.0) == 0.0
+
+
+def test_sqlite_limiter_shares_bucket_between_instances(tmp_path):
+    db_path = str(tmp_path / "rl.db")
+    worker_a = rate_limit.SQLiteRateLimiter(db_path)
+    worker_b = rate_limit.SQLiteRateLimiter(db_path)
+    try:
+        assert worker_a.try_acquire("tmdb", rate=0.001, capacity=2.0) == 0.0
+        assert worker_b.try_acquire("tmdb", rate=0.001, capacity=2.0) == 0.0
+        assert worker_a.try_acquire("tmdb", rate=0.001, capacity=2.0) > 0
+        assert worker_b.available("tmdb", rate=0.001, capacity=2.0) < 1.0
+        assert worker_b.try_acquire("other", rate=0.001, capacity=2.0) == 0.0
+    finally:
+        worker_a.close()
+        worker_b.close()
+
+
+def test_sqlite_limiter_close_closes_connections_of_all_threads(tmp_path):
+    limiter = rate_limit.SQLiteRateLimiter(str(tmp_path / "rl.db"))
+    barrier = threading.Barrier(3)
+
+    def open_conn():
+        conn = limiter._conn()
+        barrier.wait()  # keep the three threads alive, so each opens its own connection
+        return conn
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        conns = list(pool.map(lambda _: open_conn(), range(3)))
+    assert len(set(map(id, conns))) == 3
+
+    limiter.close()
+
+    for conn in conns:
+        with pytest.raises(sqlite3.ProgrammingError, match="closed"):
+            conn.execute("SELECT 1")
+    assert limiter.try_acquire("tmdb", rate=1.0, capacity=1.0) == 0.0
+    limiter.close()
+
+
+def test_acquire_sleeps_for_reported_wait(monkeypatch):
+    class _Backend(rate_limit.RateLimiterBackend):
+        def __init__(self):
+            self.waits = [0.25, 0.0]
+
+        def try_acquire(self, bucket, rate, capacity, tokens=1.0):
+            return self.waits.pop(0)
+
+        def available(self, bucket, rate, capacity):
+            return 0.0
+
+    delays = []
+
+    async def fake_sleep(delay):
+        delays.append(delay)
+
+    monkeypatch.setattr(rate_limit.asyncio, "sleep", fake_sleep)
+    monkeypatch.setattr(rate_limit, "_backend", _Backend())
+
+    asyncio.run(rate_limit.acquire())
+
+    assert delays == [0.25]
+
+
+def test_backend_selected_from_env(monkeypatch, tmp_path):
+    monkeypatch.setattr(rate_limit, "_backend", None)
+    monkeypatch.setattr(rate_limit, "DB_PATH", str(tmp_path / "rl.db"))
+    monkeypatch.setenv("TMDB_RATE_LIMIT_BACKEND", "sqlite")
+
+    backend = rate_limit.get_backend()
+
+    assert isinstance(backend, rate_limit.SQLiteRateLimiter)
+    rate_limit.set_backend(None)
@@ -0,0 +1,88 @@
+import io
+import sys
+import zipfile
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from app import ratings_import
+
+RATINGS_CSV = (
+    '\ufeffDate,Name,Year,Letterboxd URI,Rating\r\n'
+    '2024-01-02,Dune,2021,https://boxd.it/abc,4.5\r\n'
+    '2024-01-03,"Crouching Tiger, Hidden Dragon",2000,https://boxd.it/def,5\r\n'
+    '\r\n'
+    '2024-01-04,   ,1999,,3\r\n'
+    '2024-01-05,Untitled,,,\r\n'
+)
+
+
+def _zip(members):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for name, content in members.items():
+            archive.writestr(name, content)
+    buffer.seek(0)
+    return buffer
+
+
+def test_find_column_matches_frontend_substring_rules():
+    header = ['Date', 'Name', 'Year', 'Letterboxd URI', 'Rating']
+    assert ratings_import.find_column(header, 'Name', 'name', 'Title') == 1
+    assert ratings_import.find_column(header, 'Letterboxd URI', 'URI') == 3
+    assert ratings_import.find_column(['Film title'], 'Name', 'Title') == 0
+    assert ratings_import.find_column(['Film'], 'Name', 'Title') is None
+
+
+def test_read_ratings_parses_csv_like_the_browser():
+    rows = ratings_import.read_ratings(io.BytesIO(RATINGS_CSV.encode('utf-8')), max_rows=100)
+
+    assert rows == [
+        {'title': 'Dune', 'year': 2021, 'rating': 4.5, 'date': '2024-01-02', 'letterboxd_url': 'https://boxd.it/abc'},
+        {
+            'title': 'Crouching Tiger, Hidden Dragon',
+            'year': 2000,
+            'rating': 5.0,
+            'date': '2024-01-03',
+            'letterboxd_url': 'https://boxd.it/def',
+        },
+        {'title': 'Untitled', 'year': None, 'rating': None, 'date': '2024-01-05', 'letterboxd_url': None},
+    ]
+
+
+def test_read_ratings_accepts_tab_separated_files():
+    data = 'Name\tYear\tRating\nArrival\t2016\t4\n'.encode('utf-8')
+
+    rows = ratings_import.read_ratings(io.BytesIO(data), max_rows=100)
+
+    assert rows == [{'title': 'Arrival', 'year': 2016, 'rating': 4.0, 'date': None, 'letterboxd_url': None}]
+
+
+def test_read_ratings_reads_ratings_csv_from_letterboxd_zip():
+    archive = _zip({
+        'watched.csv': 'Date,Name,Year\n2024-01-01,Wrong,2000\n',
+        'ratings.csv': RATINGS_CSV,
+    })
+
+    rows = ratings_import.read_ratings(archive, max_rows=100)
+
+    assert [r['title'] for r in rows] == ['Dune', 'Crouching Tiger, Hidden Dragon', 'Untitled']
+
+
+@pytest.mark.parametrize(
+    ('payload', 'message'),
+    [
+        (_zip({'diary.csv': 'Name\nDune\n'}).getvalue(), 'No ratings.csv'),
+        (b'PK\x03\x04broken', 'Invalid ZIP'),
+        (b'Film,Score\nDune,4\n', 'No Name/Title column'),
+        ('Name\nAmélie\n'.encode('latin-1'), 'not UTF-8'),
+        (b'Name\nA\nB\nC\n', 'Too many rows'),
+    ],
+)
+def test_read_ratings_rejects_bad_uploads(payload, message):
+    with pytest.raises(ratings_import.RatingsImportError, match=message):
+        ratings_import.read_ratings(io.BytesIO(payload), max_rows=2)
@@ -0,0 +1,52 @@
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from app import retry_budget
+
+
+def test_budget_allows_min_retries_then_denies():
+    budget = retry_budget.RetryBudget(ratio=0.5, min_retries=2, window_s=60)
+
+    assert budget.try_spend()
+    assert budget.try_spend()
+    assert not budget.try_spend()
+
+
+def test_budget_grows_with_successful_traffic():
+    budget = retry_budget.RetryBudget(ratio=0.5, min_retries=1, window_s=60)
+    for _ in range(10):
+        budget.record_success()
+
+    assert budget.allowance() == 5
+    assert all(budget.try_spend() for _ in range(5))
+    assert not budget.try_spend()
+
+
+def test_budget_forgets_retries_outside_window(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(retry_budget.time, "monotonic", lambda: now[0])
+    budget = retry_budget.RetryBudget(ratio=0.0, min_retries=1, window_s=10)
+
+    assert budget.try_spend()
+    assert not budget.try_spend()
+    now[0] += 11
+    assert budget.try_spend()
+
+
+def test_next_delay_is_decorrelated_and_capped(monkeypatch):
+    monkeypatch.setattr(retry_budget.random, "uniform", lambda low, high: high)
+
+    assert retry_budget.next_delay(0.0, 0.5, 2.0) == 0.5
+    assert retry_budget.next_delay(0.5, 0.5, 2.0) == 1.5
+    assert retry_budget.next_delay(1.5, 0.5, 2.0) == 2.0
+
+
+def test_next_delay_honours_retry_after(monkeypatch):
+    monkeypatch.setattr(retry_budget.random, "uniform", lambda low, high: low)
+
+    assert retry_budget.next_delay(0.0, 0.5, 2.0, "7") == 7.0
+    assert retry_budget.next_delay(0.0, 0.5, 2.0, "soon") == 0.5
@@ -57,7 +57,7 @@ def test_format_result_ignores_malformed_named_items():
 
 
 def test_search_batch_collects_task_exceptions(monkeypatch):
-    async def fake_search_single(_client, _api_key, title, year, _semaphore):
+    async def fake_search_single(_client, _api_key, title, year, _semaphore, _details=True):
         if title == "A":
             raise RuntimeError("boom")
         return (42, {"title": "B", "release_date": "2020-01-01"}, None)
@@ -84,3 +84,34 @@ def test_search_batch_collects_task_exceptions(monkeypatch):
     assert "boom" in result[0]["error"]
     assert result[1]["title"] == "B"
     assert result[1]["tmdb"]["tmdb_id"] == 42
+
+
+def test_search_batch_stream_yields_cache_hits_before_upstream(monkeypatch):
+    async def fake_search_cached(title, _year, _details=True):
+        if title == "Cached":
+            return (1, {"title": "Cached"})
+        return None
+
+    async def fake_search_single(_client, _api_key, title, year, _semaphore, _details=True):
+        return (2, {"title": title}, None)
+
+    class _FakeAsyncClient:
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *_):
+            return False
+
+    monkeypatch.setattr(tmdb_batch, "_search_cached", fake_search_cached)
+    monkeypatch.setattr(tmdb_batch, "_search_single", fake_search_single)
+    monkeypatch.setattr(tmdb_batch.httpx, "AsyncClient", lambda *_args, **_kwargs: _FakeAsyncClient())
+
+    async def collect():
+        items = [{"title": "Fresh", "year": None}, {"title": "Cached", "year": None}]
+        return [item async for item in tmdb_batch.search_batch_stream(items, "k")]
+
+    streamed = asyncio.run(collect())
+
+    assert [index for index, _ in streamed] == [1, 0]
+    assert streamed[0][1]["tmdb"]["tmdb_id"] == 1
+    assert streamed[1][1]["tmdb"]["tmdb_id"] == 2
@@ -55,3 +55,59 @@ def test_full_batch_normalizes_invalid_cache_shapes(monkeypatch):
 
     assert result[0]['tmdb_id'] == 7
     assert result[0]['error'] is None
+
+
+def test_full_batch_stream_yields_cached_first_with_indices(monkeypatch):
+    monkeypatch.setattr(tmdb_batch_movies.httpx, 'AsyncClient', lambda *_args, **_kwargs: _FakeAsyncClient())
+    monkeypatch.setattr(tmdb_batch_movies.cache_module, 'get_movie_batch', lambda ids: {1: {'id': 1}} if 1 in ids else {})
+    monkeypatch.setattr(tmdb_batch_movies.cache_module, 'get_credits_batch', lambda ids: {1: {'directors': [], 'actors': []}})
+    monkeypatch.setattr(tmdb_batch_movies.cache_module, 'get_keywords_batch', lambda ids: {1: ['cached']})
+
+    async def fake_unified(_client, _api_key, tmdb_id, _semaphore):
+        await asyncio.sleep(0)
+        return ({'id': tmdb_id}, None, ['api'], None, 'api')
+
+    monkeypatch.setattr(tmdb_batch_movies, '_get_movie_details_with_credits_keywords', fake_unified)
+
+    async def collect():
+        return [item async for item in tmdb_batch_movies.full_batch_stream([2, 1, 2], 'k')]
+
+    streamed = asyncio.run(collect())
+
+    assert [index for index, _ in streamed] == [1, 0, 2]
+    assert streamed[0][1]['keywords'] == ['cached']
+    assert streamed[1][1]['keywords'] == ['api']
+    assert streamed[2][1]['movie']['id'] == 2
+
+
+def test_full_batch_stream_marks_unfinished_ids_pending_at_the_deadline(monkeypatch):
+    monkeypatch.setattr(tmdb_batch_movies.batch_pipeline, 'DEADLINE_MARGIN_S', 0.0)
+    monkeypatch.setattr(tmdb_batch_movies.httpx, 'AsyncClient', lambda *_args, **_kwargs: _FakeAsyncClient())
+    monkeypatch.setattr(tmdb_batch_movies.cache_module, 'get_movie_batch', lambda ids: {1: {'id': 1}})
+    monkeypatch.setattr(tmdb_batch_movies.cache_module, 'get_credits_batch', lambda ids: {1: {'directors': [], 'actors': []}})
+    monkeypatch.setattr(tmdb_batch_movies.cache_module, 'get_keywords_batch', lambda ids: {1: ['cached']})
+    finished = []
+
+    async def slow_unified(_client, _api_key, tmdb_id, _semaphore):
+        await asyncio.sleep(0.2)
+        finished.append(tmdb_id)
+        return ({'id': tmdb_id}, None, ['api'], None, 'api')
+
+    monkeypatch.setattr(tmdb_batch_movies, '_get_movie_details_with_credits_keywords', slow_unified)
+
+    async def scenario():
+        deadline = tmdb_batch_movies.batch_pipeline.deadline_from_ms(50)
+        streamed = [item async for item in tmdb_batch_movies.full_batch_stream([1, 2, 3], 'k', deadline)]
+        elapsed_at_end = tmdb_batch_movies.batch_pipeline.time.monotonic() - deadline
+        await asyncio.sleep(0.3)
+        return streamed, elapsed_at_end
+
+    streamed, elapsed_at_end = asyncio.run(scenario())
+
+    assert [index for index, _ in streamed] == [0, 1, 2]
+    assert streamed[0][1]['keywords'] == ['cached']
+    assert streamed[1][1] == {'tmdb_id': 2, 'movie': None, 'credits': None, 'keywords': None, 'error': None, 'pending': True}
+    assert streamed[2][1]['pending'] is True
+    # The stream ends at the deadline; fetches already started still complete (and reach the cache).
+    assert elapsed_at_end < 0.1
+    assert sorted(finished) == [2, 3]
@@ -1,4 +1,6 @@
 import asyncio
+import json
+import sqlite3
 import sys
 from pathlib import Path
 
@@ -66,3 +68,98 @@ def test_keywords_batch_maps_error_and_empty_keywords(monkeypatch):
         {"tmdb_id": 1, "keywords": None, "error": "TMDb error 500"},
         {"tmdb_id": 2, "keywords": [], "error": None},
     ]
+
+
+def test_credits_batch_with_deadline_serves_cache_and_marks_pending(monkeypatch):
+    monkeypatch.setattr(tmdb_batch_movies.batch_pipeline, "DEADLINE_MARGIN_S", 0.0)
+    monkeypatch.setattr(
+        tmdb_batch_movies.cache_module,
+        "get_credits_batch",
+        lambda ids: {1: {"directors": ["D"], "actors": []}},
+    )
+    fetched = []
+
+    async def slow_credits(_client, _api_key, tmdb_id, _semaphore):
+        await asyncio.sleep(0.2)
+        fetched.append(tmdb_id)
+        return {"directors": [], "actors": []}, None, "api"
+
+    monkeypatch.setattr(tmdb_batch_movies, "_get_movie_credits", slow_credits)
+    # A real client loads certificates on creation, which can eat the whole 100 ms deadline.
+    monkeypatch.setattr(tmdb_batch_movies.httpx, "AsyncClient", lambda *_args, **_kwargs: _FakeAsyncClient())
+
+    async def scenario():
+        deadline = tmdb_batch_movies.batch_pipeline.deadline_from_ms(100)
+        results = await tmdb_batch_movies.credits_batch([1, 2], "k", deadline)
+        await asyncio.sleep(0.3)
+        return results
+
+    results = asyncio.run(scenario())
+
+    assert results[0] == {"tmdb_id": 1, "credits": {"directors": ["D"], "actors": []}, "error": None}
+    assert results[1] == {"tmdb_id": 2, "credits": None, "error": None, "pending": True}
+    assert fetched == [2]
+
+
+def test_sync_batch_returns_changed_entries_and_tombstones(monkeypatch):
+    cache = tmdb_batch_movies.cache_module
+    movie = {"id": 1, "release_date": "2019-05-30", "genres": [{"name": "Drama"}]}
+    credits = {"directors": ["Bong Joon-ho"], "actors": []}
+    keywords = ["family"]
+    current = tmdb_batch_movies._entry_version(movie, credits, keywords)
+    monkeypatch.setattr(cache, "get_entry_versions", lambda ids: {tid: current if tid in (1, 2) else None for tid in ids})
+    monkeypatch.setattr(cache, "get_movie_batch", lambda ids: {tid: movie for tid in ids if tid in (1, 2)})
+    monkeypatch.setattr(cache, "get_credits_batch", lambda ids: {tid: credits for tid in ids if tid in (1, 2)})
+    monkeypatch.setattr(cache, "get_keywords_batch", lambda ids: {tid: keywords for tid in ids if tid in (1, 2)})
+    fetched = []
+
+    async def fake_fetch(_client, _api_key, tmdb_id, _semaphore):
+        fetched.append(tmdb_id)
+        if tmdb_id == 3:
+            return None, None, None, tmdb_batch_movies.NOT_FOUND_ERROR, "api_error"
+        if tmdb_id == 4:
+            return None, None, None, "TMDb error 503", "api_error"
+        return {**movie, "id": tmdb_id}, credits, keywords, None, "api"
+
+    monkeypatch.setattr(tmdb_batch_movies, "_get_movie_details_with_credits_keywords", fake_fetch)
+    monkeypatch.setattr(tmdb_batch_movies.httpx, "AsyncClient", lambda *_args, **_kwargs: _FakeAsyncClient())
+
+    delta = asyncio.run(tmdb_batch_movies.sync_batch({1: current, 2: "outdated", 3: "v", 4: "v", 5: None}, "k"))
+
+    assert delta["unchanged"] == 1
+    assert delta["deleted"] == [3]
+    assert [entry["tmdb_id"] for entry in delta["results"]] == [2, 4, 5]
+    assert delta["results"][0]["version"] == current
+    assert delta["results"][0]["movie"]["genres"] == ["Drama"]
+    assert delta["results"][1]["error"] == "TMDb error 503"
+    assert "version" not in delta["results"][1]
+    assert delta["results"][2]["version"] == tmdb_batch_movies._entry_version({**movie, "id": 5}, credits, keywords)
+    assert sorted(fetched) == [3, 4, 5]
+
+
+def test_sync_batch_does_not_refetch_films_without_keywords(monkeypatch, tmp_path):
+    cache = tmdb_batch_movies.cache_module
+    db_path = str(tmp_path / "cache.db")
+    cache.init_cache_db(db_path)
+    monkeypatch.setattr(cache, "DISABLE_CACHE", False)
+    movie, credits = {"id": 7, "release_date": "2001-01-01"}, {"directors": ["D"], "actors": []}
+    conn = sqlite3.connect(db_path, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    # TMDb answered with no keywords, so _store_full wrote no keywords row.
+    cache._flush_batch(conn, [("movie", 7, json.dumps(movie)), ("credits", 7, json.dumps(credits))])
+    monkeypatch.setattr(cache, "_get_read_conn", lambda: conn)
+    fetched = []
+
+    async def fake_fetch(_client, _api_key, tmdb_id, _semaphore):
+        fetched.append(tmdb_id)
+        return movie, credits, [], None, "api"  # pragma: no cover
+
+    monkeypatch.setattr(tmdb_batch_movies, "_get_movie_details_with_credits_keywords", fake_fetch)
+    monkeypatch.setattr(tmdb_batch_movies.httpx, "AsyncClient", lambda *_args, **_kwargs: _FakeAsyncClient())
+
+    version = tmdb_batch_movies._entry_version(movie, credits, [])
+    delta = asyncio.run(tmdb_batch_movies.sync_batch({7: version}, "k"))
+    conn.close()
+
+    assert delta == {"results": [], "deleted": [], "unchanged": 1}
+    assert fetched == []
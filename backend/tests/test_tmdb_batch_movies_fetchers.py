@@ -197,3 +197,77 @@ def test_get_movie_details_with_credits_keywords_extracts_and_caches(monkeypatch
     assert credits == {"directors": ["Fincher"], "actors": ["Pitt"]}
     assert keywords == ["serial killer"]
     assert [w[0] for w in writes] == ["movie", "credits", "keywords"]
+
+
+def test_retry_backoff_does_not_hold_semaphore(monkeypatch):
+    semaphore = asyncio.Semaphore(1)
+    locked_during_sleep = []
+
+    async def no_rate_limit():
+        return None
+
+    async def fake_sleep(_delay):
+        locked_during_sleep.append(semaphore.locked())
+
+    monkeypatch.setattr(tmdb_batch_movies, "_rate_limit", no_rate_limit)
+    monkeypatch.setattr(tmdb_batch_movies.asyncio, "sleep", fake_sleep)
+    monkeypatch.setattr(tmdb_batch_movies, "MAX_RETRIES", 1)
+    monkeypatch.setattr(tmdb_batch_movies.cache_module, "get_keywords", lambda _id: None)
+    monkeypatch.setattr(tmdb_batch_movies.cache_module, "set_keywords", lambda *_args: None)
+
+    client = _FakeClient([_FakeResponse(503), _FakeResponse(200, payload={"keywords": [{"name": "k"}]})])
+    keywords, error, status = asyncio.run(
+        tmdb_batch_movies._get_movie_keywords(client, "k", 5, semaphore)
+    )
+
+    assert (keywords, error, status) == (["k"], None, "api")
+    assert locked_during_sleep == [False]
+
+
+def test_exhausted_retry_budget_fails_without_retrying(monkeypatch):
+    async def no_rate_limit():
+        return None
+
+    monkeypatch.setattr(tmdb_batch_movies, "_rate_limit", no_rate_limit)
+    monkeypatch.setattr(tmdb_batch_movies.retry_budget.tmdb, "try_spend", lambda: False)
+    monkeypatch.setattr(tmdb_batch_movies.cache_module, "get_credits", lambda _id: None)
+
+    client = _FakeClient([_FakeResponse(503)])
+    credits, error, status = asyncio.run(
+        tmdb_batch_movies._get_movie_credits(client, "k", 5, asyncio.Semaphore(1))
+    )
+
+    assert credits is None
+    assert error == "TMDb error 503"
+    assert status == "api_error"
+    assert len(client.calls) == 1
+
+
+def test_client_errors_fail_at_once_without_spending_retry_budget(monkeypatch):
+    async def no_rate_limit():
+        return None
+
+    def no_spend():
+        raise AssertionError("4xx must not spend retry budget")
+
+    def no_success():
+        raise AssertionError("4xx is not a success")
+
+    monkeypatch.setattr(tmdb_batch_movies, "_rate_limit", no_rate_limit)
+    monkeypatch.setattr(tmdb_batch_movies.retry_budget.tmdb, "try_spend", no_spend)
+    monkeypatch.setattr(tmdb_batch_movies.retry_budget.tmdb, "record_success", no_success)
+    monkeypatch.setattr(tmdb_batch_movies.cache_module, "get_movie", lambda _id: None)
+    monkeypatch.setattr(tmdb_batch_movies.cache_module, "get_credits", lambda _id: None)
+    monkeypatch.setattr(tmdb_batch_movies.cache_module, "get_keywords", lambda _id: None)
+
+    client = _FakeClient([_FakeResponse(404)])
+    result = asyncio.run(
+        tmdb_batch_movies._get_movie_details_with_credits_keywords(client, "k", 5, asyncio.Semaphore(1))
+    )
+    assert result == (None, None, None, tmdb_batch_movies.NOT_FOUND_ERROR, "api_error")
+    assert len(client.calls) == 1
+
+    client = _FakeClient([_FakeResponse(401)])
+    credits, error, _ = asyncio.run(tmdb_batch_movies._get_movie_credits(client, "k", 5, asyncio.Semaphore(1)))
+    assert (credits, error) == (None, "HTTP 401")
+    assert len(client.calls) == 1
@@ -124,3 +124,39 @@ def test_search_single_returns_tmdb_error_for_movie_details_after_retries(monkey
     )
 
     assert result == (55, None, "TMDb error 500")
+
+
+def test_search_match_is_cached_even_if_request_is_cancelled_during_details(monkeypatch):
+    set_search_calls = []
+
+    async def no_rate_limit():
+        return None
+
+    class _HangingDetailsClient(_FakeClient):
+        async def get(self, url, params=None, timeout=None):
+            if "/search/" in url:
+                return _FakeResponse(200, payload={"results": [{"id": 77}]})
+            self.calls.append(url)
+            await asyncio.sleep(10)
+
+    monkeypatch.setattr(tmdb_batch, "_rate_limit", no_rate_limit)
+    monkeypatch.setattr(tmdb_batch.cache_module, "get_search", lambda _title, _year: None)
+    monkeypatch.setattr(
+        tmdb_batch.cache_module,
+        "set_search",
+        lambda title, year, tmdb_id: set_search_calls.append((title, year, tmdb_id)),
+    )
+
+    async def abandon():
+        client = _HangingDetailsClient([])
+        task = asyncio.ensure_future(
+            tmdb_batch._search_single(client, "k", "Heat", 1995, asyncio.Semaphore(1))
+        )
+        while not client.calls:
+            await asyncio.sleep(0.001)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(abandon())
+
+    assert set_search_calls == [("heat", 1995, 77)]
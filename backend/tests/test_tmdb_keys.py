@@ -0,0 +1,74 @@
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from app import rate_limit, tmdb_keys
+
+
+@pytest.fixture(autouse=True)
+def memory_limiter(monkeypatch):
+    monkeypatch.setattr(rate_limit, "_backend", rate_limit.MemoryRateLimiter())
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_PER_SECOND", 0.001)
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_BURST", 3.0)
+
+
+def test_acquire_prefers_key_with_most_budget():
+    pool = tmdb_keys.KeyPool(["a", "b"])
+
+    picked = [asyncio.run(pool.acquire()) for _ in range(4)]
+
+    assert sorted(picked) == ["a", "a", "b", "b"]
+
+
+def test_401_quarantines_key():
+    pool = tmdb_keys.KeyPool(["bad", "good"])
+    pool.report("bad", 401)
+
+    picked = {asyncio.run(pool.acquire()) for _ in range(3)}
+
+    assert picked == {"good"}
+
+
+def test_consecutive_429s_quarantine_key_and_success_resets_streak(monkeypatch):
+    monkeypatch.setattr(tmdb_keys, "KEY_MAX_CONSECUTIVE_429", 2)
+    pool = tmdb_keys.KeyPool(["a", "b"])
+
+    pool.report("a", 429)
+    pool.report("a", 200)
+    pool.report("a", 429)
+    assert asyncio.run(pool.acquire()) in {"a", "b"}
+    assert pool._states["a"].is_healthy(tmdb_keys.time.monotonic())
+
+    pool.report("a", 429)
+    assert not pool._states["a"].is_healthy(tmdb_keys.time.monotonic())
+
+
+def test_pool_is_built_from_env_list(monkeypatch):
+    monkeypatch.setenv("TMDB_API_KEYS", " k1, k2 ,,k1")
+    monkeypatch.setenv("TMDB_API_KEY", "ignored")
+
+    assert tmdb_keys.get_pool().keys == ["k1", "k2"]
+    assert tmdb_keys.primary_key() == "k1"
+
+
+def test_acquire_without_configured_keys_returns_none(monkeypatch):
+    monkeypatch.delenv("TMDB_API_KEYS", raising=False)
+    monkeypatch.delenv("TMDB_API_KEY", raising=False)
+
+    assert asyncio.run(tmdb_keys.acquire()) is None
+    assert tmdb_keys.with_key({"api_key": "own"}, None) == {"api_key": "own"}
+    assert tmdb_keys.with_key({"api_key": "own", "q": 1}, "pool") == {"api_key": "pool", "q": 1}
+
+
+def test_try_acquire_now_never_waits():
+    pool = tmdb_keys.KeyPool(["a"])
+
+    picked = [asyncio.run(pool.try_acquire_now()) for _ in range(4)]
+
+    assert picked == ["a", "a", "a", None]